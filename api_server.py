@@ -0,0 +1,409 @@
+# api_server.py
+# Máy chủ HTTP/JSON nhẹ (asyncio, chỉ dùng thư viện chuẩn) cho MedicalSystemLogic: tra cứu BN,
+# đăng ký khám, xem hàng đợi, gọi BN tiếp theo. Dùng cho màn hình phòng chờ hoặc các máy trạm
+# dùng chung một bộ dữ liệu thay vì mỗi máy chạy một bản GUI riêng.
+#
+# Ví dụ:
+#   python api_server.py                                # http://127.0.0.1:8765
+#   python api_server.py --host 0.0.0.0 --api-token bi_mat   # mở cho mạng LAN, yêu cầu token
+#
+# Các thao tác thay đổi dữ liệu (ghi CSV hoặc nhật ký hàng đợi: tạo hồ sơ BN, đăng ký, gọi, vắng, hoàn thành khám...)
+# chạy trong ThreadPoolExecutor để không chặn vòng lặp sự kiện; tra cứu chạy trực tiếp (nhanh, chỉ giữ khóa đọc ngắn).
+import argparse
+import asyncio
+import concurrent.futures
+import datetime
+import hmac
+import json
+import re
+import sys
+import threading
+import urllib.parse
+
+from app_logic import MedicalSystemLogic, DEFAULT_APPOINTMENT_MINUTES
+from patient_name_index import DEFAULT_MAX_NAME_EDIT_DISTANCE, DEFAULT_FUZZY_NAME_LIMIT
+from models import DATE_FORMAT_CSV, DATETIME_FORMAT_DISPLAY
+
+DEFAULT_API_PORT = 8765
+MAX_REQUEST_LINE_BYTES = 8 * 1024
+MAX_HEADER_COUNT = 100
+MAX_BODY_BYTES = 1024 * 1024
+KEEP_ALIVE_IDLE_SECONDS = 30.0
+DEFAULT_SEARCH_LIMIT = 50
+
+HTTP_STATUS_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+                       409: "Conflict", 411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"}
+# Mức thông báo của logic -> mã HTTP
+LOGIC_LEVEL_TO_STATUS = {"INFO": 200, "WARNING": 409, "ERROR": 400}
+
+
+class ApiError(Exception):
+    """Lỗi trả về cho client dưới dạng JSON {"error": ...} với mã HTTP tương ứng."""
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def _date_to_str(date_val):
+    if isinstance(date_val, datetime.datetime): return date_val.strftime(DATETIME_FORMAT_DISPLAY)
+    if isinstance(date_val, datetime.date): return date_val.strftime(DATE_FORMAT_CSV)
+    return date_val
+
+
+def patient_to_json(patient_obj):
+    return {"patient_id": patient_obj.patient_id, "full_name": patient_obj.full_name, "date_of_birth": _date_to_str(patient_obj.date_of_birth),
+            "gender": patient_obj.gender, "address": patient_obj.address, "phone_number": patient_obj.phone_number, "national_id": patient_obj.national_id,
+            "health_insurance_id": patient_obj.health_insurance_id, "medical_history_summary": patient_obj.medical_history_summary,
+            "drug_allergies": patient_obj.drug_allergies, "system_registration_time": _date_to_str(patient_obj.system_registration_time)}
+
+
+def queued_patient_to_json(queued_item, position, estimated_wait_seconds=None):
+    return {"position": position, "patient_id": queued_item.patient_id, "full_name": queued_item.patient_profile.full_name,
+            "priority": queued_item.get_priority_display_name(), "priority_level": queued_item.priority,
+            "registration_time": _date_to_str(queued_item.registration_time), "absent_count": queued_item.absent_count,
+            "estimated_wait_seconds": None if estimated_wait_seconds is None else round(estimated_wait_seconds)}
+
+
+def appointment_to_json(appointment_obj):
+    return {"appointment_id": appointment_obj.appointment_id, "patient_id": appointment_obj.patient_id, "clinic_id": appointment_obj.clinic_id,
+            "doctor_id": appointment_obj.doctor_id, "start_time": _date_to_str(appointment_obj.start_time), "end_time": _date_to_str(appointment_obj.end_time),
+            "priority": appointment_obj.priority_level_str, "status": appointment_obj.status}
+
+
+def _require_fields(body, field_names):
+    missing_fields = [name for name in field_names if not str(body.get(name, "")).strip()]
+    if missing_fields: raise ApiError(400, f"Thiếu trường bắt buộc: {', '.join(missing_fields)}.")
+
+
+def _logic_result_status(message_level, success_status=200):
+    return success_status if message_level == "INFO" else LOGIC_LEVEL_TO_STATUS.get(message_level, 400)
+
+
+class MedicalApiServer:
+    """Máy chủ HTTP/1.1 tối giản trên asyncio, trả JSON, phục vụ một instance MedicalSystemLogic."""
+    def __init__(self, logic, host="127.0.0.1", port=DEFAULT_API_PORT, api_token=None, executor_workers=2):
+        self.logic = logic
+        self.host = host; self.port = port
+        self.api_token = api_token # None -> không yêu cầu xác thực (chỉ nên dùng khi bind localhost)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix="api_blocking")
+        self.called_patients = {} # patient_id -> (PatientInQueue, clinic_id) của BN đã gọi nhưng chưa khám xong / vắng
+        self._called_patients_lock = threading.Lock() # Handler trong executor và trên event loop cùng sửa called_patients
+        self._server = None
+        self._open_writers = set() # Kết nối đang mở (đóng hết khi tắt máy chủ)
+        # Bảng định tuyến: (method, regex đường dẫn, hàm xử lý, chạy trong executor?)
+        self.routes = [
+            ("GET", re.compile(r"^/api/health$"), self.handle_health, False),
+            ("GET", re.compile(r"^/api/patients$"), self.handle_search_patients, False),
+            ("POST", re.compile(r"^/api/patients$"), self.handle_create_patient, True),
+            ("GET", re.compile(r"^/api/patients/(?P<patient_id>[^/]+)$"), self.handle_get_patient, False),
+            ("GET", re.compile(r"^/api/patient-name-suggestions$"), self.handle_patient_name_suggestions, False),
+            ("GET", re.compile(r"^/api/clinics$"), self.handle_list_clinics, False),
+            ("GET", re.compile(r"^/api/clinics/(?P<clinic_id>[^/]+)/queue$"), self.handle_get_queue, False),
+            ("POST", re.compile(r"^/api/clinics/(?P<clinic_id>[^/]+)/queue$"), self.handle_register, True),
+            ("POST", re.compile(r"^/api/clinics/(?P<clinic_id>[^/]+)/call-next$"), self.handle_call_next, True), # Có thể đưa BN có lịch hẹn vào HĐ (ghi CSV lịch hẹn)
+            ("POST", re.compile(r"^/api/clinics/(?P<clinic_id>[^/]+)/absent$"), self.handle_absent, True),
+            ("POST", re.compile(r"^/api/examinations$"), self.handle_complete_examination, True),
+            ("POST", re.compile(r"^/api/clinics/(?P<clinic_id>[^/]+)/doctors/(?P<doctor_id>[^/]+)/call-next$"), self.handle_doctor_call_next, True),
+            ("POST", re.compile(r"^/api/clinics/(?P<clinic_id>[^/]+)/doctors/(?P<doctor_id>[^/]+)/absent$"), self.handle_doctor_absent, True),
+            ("POST", re.compile(r"^/api/clinics/(?P<clinic_id>[^/]+)/doctors/(?P<doctor_id>[^/]+)/complete$"), self.handle_doctor_complete, True),
+            ("GET", re.compile(r"^/api/doctor-throughput$"), self.handle_doctor_throughput, False),
+            ("GET", re.compile(r"^/api/appointments$"), self.handle_list_appointments, False),
+            ("POST", re.compile(r"^/api/appointments$"), self.handle_book_appointment, True),
+            ("POST", re.compile(r"^/api/appointments/(?P<appointment_id>[^/]+)/cancel$"), self.handle_cancel_appointment, True),
+            ("GET", re.compile(r"^/api/doctors/(?P<doctor_id>[^/]+)/next-free-slot$"), self.handle_next_free_slot, False),
+        ]
+
+    # --- Vòng đời máy chủ ---
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, limit=MAX_REQUEST_LINE_BYTES * 2)
+        self.port = self._server.sockets[0].getsockname()[1] # Lấy cổng thật khi port=0
+        return self
+
+    async def serve_forever(self):
+        if self._server is None: await self.start()
+        async with self._server: await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for open_writer in list(self._open_writers): open_writer.close() # Kết nối keep-alive đang chờ sẽ nhận EOF và tự kết thúc
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=True) # Chờ các lần ghi CSV đang chạy
+
+    # --- Tầng HTTP ---
+    async def _handle_connection(self, reader, writer):
+        self._open_writers.add(writer)
+        try:
+            while True:
+                try: request = await asyncio.wait_for(self._read_request(reader), timeout=KEEP_ALIVE_IDLE_SECONDS)
+                except ApiError as request_error:
+                    await self._write_response(writer, request_error.status_code, {"error": request_error.message}, keep_alive=False); return
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError): return
+                if request is None: return # Client đóng kết nối
+                method, path, query_params, headers, body_bytes, keep_alive = request
+                status_code, payload = await self._dispatch(method, path, query_params, headers, body_bytes)
+                await self._write_response(writer, status_code, payload, keep_alive)
+                if not keep_alive: return
+        except ConnectionError: pass
+        finally:
+            self._open_writers.discard(writer)
+            writer.close()
+            try: await writer.wait_closed()
+            except ConnectionError: pass
+
+    async def _read_request(self, reader):
+        # Đọc 1 request HTTP/1.x. Trả về None nếu kết nối đã đóng trước khi có request.
+        try: request_line = await reader.readuntil(b"\r\n")
+        except asyncio.IncompleteReadError as eof_error:
+            if not eof_error.partial: return None
+            raise
+        except asyncio.LimitOverrunError: raise ApiError(400, "Dòng request quá dài.")
+        try: method, target, version = request_line.decode("latin-1").strip().split(" ")
+        except ValueError: raise ApiError(400, "Dòng request không hợp lệ.")
+        if not version.startswith("HTTP/1."): raise ApiError(400, "Chỉ hỗ trợ HTTP/1.x.")
+        headers = {}
+        while True:
+            header_line = await reader.readuntil(b"\r\n")
+            if header_line == b"\r\n": break
+            if len(headers) >= MAX_HEADER_COUNT: raise ApiError(400, "Quá nhiều header.")
+            name, sep, value = header_line.decode("latin-1").partition(":")
+            if not sep: raise ApiError(400, "Header không hợp lệ.")
+            headers[name.strip().lower()] = value.strip()
+        body_bytes = b""
+        if "transfer-encoding" in headers: raise ApiError(411, "Cần header Content-Length (không hỗ trợ chunked).")
+        if "content-length" in headers:
+            try: content_length = int(headers["content-length"])
+            except ValueError: raise ApiError(400, "Content-Length không hợp lệ.")
+            if content_length < 0: raise ApiError(400, "Content-Length không hợp lệ.")
+            if content_length > MAX_BODY_BYTES: raise ApiError(413, "Nội dung request quá lớn.")
+            body_bytes = await reader.readexactly(content_length)
+        connection_header = headers.get("connection", "").lower()
+        keep_alive = connection_header != "close" if version == "HTTP/1.1" else connection_header == "keep-alive"
+        parsed_target = urllib.parse.urlsplit(target)
+        query_params = {key: values[-1] for key, values in urllib.parse.parse_qs(parsed_target.query).items()}
+        return method.upper(), urllib.parse.unquote(parsed_target.path), query_params, headers, body_bytes, keep_alive
+
+    async def _write_response(self, writer, status_code, payload, keep_alive):
+        body_bytes = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status_code} {HTTP_STATUS_REASONS.get(status_code, 'Unknown')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\nContent-Length: {len(body_bytes)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body_bytes)
+        await writer.drain()
+
+    async def _dispatch(self, method, path, query_params, headers, body_bytes):
+        # Định tuyến request tới hàm xử lý; trả về (mã HTTP, payload JSON).
+        try:
+            if self.api_token and not self._is_authorized(headers): raise ApiError(401, "Thiếu hoặc sai token (Authorization: Bearer <token>).")
+            path_matched = False
+            for route_method, path_pattern, handler_func, is_blocking in self.routes:
+                path_match = path_pattern.match(path)
+                if not path_match: continue
+                path_matched = True
+                if route_method != method: continue
+                body = self._parse_json_body(body_bytes) if method == "POST" else {}
+                if is_blocking: # Thao tác ghi CSV / nhật ký HĐ: chạy trong executor
+                    return await asyncio.get_running_loop().run_in_executor(self.executor, lambda: handler_func(query_params, body, **path_match.groupdict()))
+                return handler_func(query_params, body, **path_match.groupdict())
+            raise ApiError(405 if path_matched else 404, "Phương thức không được hỗ trợ." if path_matched else f"Không có endpoint {path}.")
+        except ApiError as api_error: return api_error.status_code, {"error": api_error.message}
+        except Exception as unexpected_error:
+            print(f"Lỗi khi xử lý {method} {path}: {unexpected_error!r}", file=sys.stderr)
+            return 500, {"error": "Lỗi máy chủ."}
+
+    def _is_authorized(self, headers):
+        auth_header = headers.get("authorization", "")
+        return auth_header.startswith("Bearer ") and hmac.compare_digest(auth_header[len("Bearer "):].encode("utf-8"), self.api_token.encode("utf-8"))
+
+    def _parse_json_body(self, body_bytes):
+        if not body_bytes: return {}
+        try: body = json.loads(body_bytes.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError): raise ApiError(400, "Nội dung request không phải JSON hợp lệ.")
+        if not isinstance(body, dict): raise ApiError(400, "Nội dung JSON phải là object.")
+        return body
+
+    # --- Các endpoint ---
+    def handle_health(self, query_params, body):
+        return 200, {"status": "ok", "patients": len(self.logic.list_all_patients()), "clinics": len(self.logic.list_all_clinics())}
+
+    def handle_search_patients(self, query_params, body):
+        # GET /api/patients?phone=...|national_id=... (chính xác, Radix Tree) hoặc full_name/date_of_birth/health_insurance_id (chứa)
+        try: result_limit = max(1, min(int(query_params.get("limit", DEFAULT_SEARCH_LIMIT)), 1000))
+        except ValueError: raise ApiError(400, "limit phải là số nguyên.")
+        search_criteria = {"phone_number_exact": query_params.get("phone", ""), "national_id_exact": query_params.get("national_id", ""),
+                           "full_name": query_params.get("full_name", ""), "date_of_birth": query_params.get("date_of_birth", ""),
+                           "health_insurance_id": query_params.get("health_insurance_id", "")}
+        if not any(value.strip() for value in search_criteria.values()): raise ApiError(400, "Cần ít nhất một tiêu chí: phone, national_id, full_name, date_of_birth, health_insurance_id.")
+        search_results = self.logic.advanced_patient_search(**search_criteria)
+        return 200, {"total": len(search_results), "patients": [patient_to_json(search_results.get(i)) for i in range(min(len(search_results), result_limit))]}
+
+    def handle_patient_name_suggestions(self, query_params, body):
+        # GET /api/patient-name-suggestions?q=...&max_distance=2&limit=10: BN có họ tên gần đúng (gõ sai/không dấu), gần nhất trước
+        name_query = query_params.get("q", "").strip()
+        if not name_query: raise ApiError(400, "Thiếu tham số q (họ tên cần tìm).")
+        try:
+            max_distance = max(0, int(query_params.get("max_distance", DEFAULT_MAX_NAME_EDIT_DISTANCE)))
+            result_limit = max(1, min(int(query_params.get("limit", DEFAULT_FUZZY_NAME_LIMIT)), 100))
+        except ValueError: raise ApiError(400, "max_distance và limit phải là số nguyên.")
+        similar_patients = self.logic.fuzzy_search_patients_by_name(name_query, max_distance, result_limit)
+        return 200, {"query": name_query, "patients": [dict(patient_to_json(patient_obj), edit_distance=name_distance) for patient_obj, name_distance in similar_patients]}
+
+    def handle_get_patient(self, query_params, body, patient_id):
+        patient_obj = self.logic.find_patient_by_id(patient_id)
+        if not patient_obj: raise ApiError(404, f"Không tìm thấy BN {patient_id}.")
+        payload = patient_to_json(patient_obj)
+        if query_params.get("include_history") in ("1", "true"):
+            history_records = self.logic.get_patient_examination_history(patient_id) or []
+            payload["examination_history"] = [{key: _date_to_str(value) for key, value in record.items()} for record in history_records]
+        return 200, payload
+
+    def handle_create_patient(self, query_params, body):
+        _require_fields(body, ("full_name", "date_of_birth", "gender", "phone_number", "national_id"))
+        patient_obj, message_text, message_lvl = self.logic.create_patient_record(
+            full_name_val=str(body["full_name"]), dob_str=str(body["date_of_birth"]), gender_val=str(body["gender"]), address_val=str(body.get("address", "")),
+            phone_val=str(body["phone_number"]), national_id_val=str(body["national_id"]), health_insurance_id_val=str(body.get("health_insurance_id", "")),
+            medical_history_val=str(body.get("medical_history_summary", "")), drug_allergies_val=str(body.get("drug_allergies", "")))
+        if not patient_obj: raise ApiError(409 if "đã tồn tại" in message_text else 400, message_text)
+        return 201, {"message": message_text, "patient": patient_to_json(patient_obj)}
+
+    def handle_list_clinics(self, query_params, body):
+        all_clinics = self.logic.list_all_clinics(); clinics_payload = []
+        for i in range(len(all_clinics)):
+            clinic_obj = all_clinics.get(i); queue_items = self.logic.get_clinic_queue_items(clinic_obj.clinic_id)
+            clinics_payload.append({"clinic_id": clinic_obj.clinic_id, "clinic_name": clinic_obj.clinic_name, "clinic_specialty": clinic_obj.clinic_specialty,
+                                    "doctor_ids": [clinic_obj.doctor_id_list.get(j) for j in range(len(clinic_obj.doctor_id_list))],
+                                    "queue_length": len(queue_items) if queue_items else 0})
+        clinics_payload.sort(key=lambda clinic_json: clinic_json["clinic_id"])
+        return 200, {"clinics": clinics_payload}
+
+    def handle_get_queue(self, query_params, body, clinic_id):
+        if not self.logic.find_clinic_by_id(clinic_id): raise ApiError(404, f"Không tìm thấy PK {clinic_id}.")
+        queue_wait_estimates = self.logic.get_clinic_queue_wait_estimates(clinic_id)
+        queue_payload = []
+        for i in range(len(queue_wait_estimates) if queue_wait_estimates else 0):
+            queued_item, estimated_wait_seconds = queue_wait_estimates.get(i)
+            queue_payload.append(queued_patient_to_json(queued_item, i + 1, estimated_wait_seconds))
+        queue_response = {"clinic_id": clinic_id, "queue_length": len(queue_payload), "queue": queue_payload,
+                          "average_service_seconds": round(self.logic.service_time_estimator.get_average_service_seconds(clinic_id))}
+        if query_params.get("priority"): # ?priority=<mức ưu tiên>: thời gian chờ nếu đăng ký ngay lúc này
+            new_registration_estimate, message_text, message_lvl = self.logic.estimate_wait_for_new_registration(clinic_id, query_params["priority"])
+            if not new_registration_estimate: raise ApiError(_logic_result_status(message_lvl), message_text)
+            queue_response["new_registration"] = {"patients_ahead": new_registration_estimate[0], "estimated_wait_seconds": round(new_registration_estimate[1])}
+        return 200, queue_response
+
+    def handle_register(self, query_params, body, clinic_id):
+        _require_fields(body, ("patient_id", "priority"))
+        success_flag, message_text, message_lvl = self.logic.register_for_examination(str(body["patient_id"]), clinic_id, str(body["priority"]))
+        if not success_flag: raise ApiError(404 if "Không tìm thấy" in message_text else _logic_result_status(message_lvl), message_text)
+        return 201, {"message": message_text}
+
+    def handle_call_next(self, query_params, body, clinic_id):
+        exam_patient, message_text, message_lvl = self.logic.call_next_patient_for_exam(clinic_id)
+        if not exam_patient: return 200, {"message": message_text, "patient": None}
+        with self._called_patients_lock: self.called_patients[exam_patient.patient_id] = (exam_patient, clinic_id)
+        return 200, {"message": message_text, "patient": queued_patient_to_json(exam_patient, 0)}
+
+    def handle_absent(self, query_params, body, clinic_id):
+        # BN đã gọi qua API nhưng vắng mặt: đưa lại hàng đợi (giảm ưu tiên) hoặc loại nếu vắng quá 3 lần.
+        _require_fields(body, ("patient_id",))
+        with self._called_patients_lock: # Lấy ra và kiểm tra PK trong một lần giữ khóa để hai yêu cầu không cùng xử lý một BN
+            called_entry = self.called_patients.pop(str(body["patient_id"]), None)
+            if called_entry and called_entry[1] != clinic_id: self.called_patients[str(body["patient_id"])] = called_entry; called_entry = None
+        if not called_entry: raise ApiError(404, f"BN {body['patient_id']} chưa được gọi tại PK {clinic_id}.")
+        was_removed, message_text, message_lvl = self.logic.handle_absent_called_patient(called_entry[0], clinic_id)
+        if message_lvl == "ERROR": raise ApiError(400, message_text)
+        return 200, {"message": message_text, "removed_from_queue": was_removed}
+
+    def handle_complete_examination(self, query_params, body):
+        _require_fields(body, ("patient_id", "exam_type", "exam_result"))
+        success_flag, message_text, message_lvl = self.logic.complete_examination(
+            str(body["patient_id"]), str(body["exam_type"]), str(body["exam_result"]), str(body.get("exam_notes", "")),
+            str(body.get("doctor_id", "")), str(body.get("clinic_id", "")))
+        if not success_flag: raise ApiError(404, message_text)
+        with self._called_patients_lock: self.called_patients.pop(str(body["patient_id"]), None)
+        return 201, {"message": message_text}
+
+    # --- Ô khám theo BS (nhiều BS cùng PK gọi song song) ---
+    def handle_doctor_call_next(self, query_params, body, clinic_id, doctor_id):
+        exam_patient, message_text, message_lvl = self.logic.call_next_patient_for_doctor(clinic_id, doctor_id)
+        if message_lvl == "ERROR": raise ApiError(404 if "Không tìm thấy" in message_text else 400, message_text)
+        if message_lvl == "WARNING": raise ApiError(409, message_text) # BS đang khám BN khác
+        return 200, {"message": message_text, "patient": queued_patient_to_json(exam_patient, 0) if exam_patient else None}
+
+    def handle_doctor_absent(self, query_params, body, clinic_id, doctor_id):
+        was_removed, message_text, message_lvl = self.logic.handle_absent_for_doctor(clinic_id, doctor_id)
+        if message_lvl == "ERROR": raise ApiError(404, message_text)
+        if message_lvl == "WARNING": raise ApiError(409, message_text) # Lượt kết thúc khác của BS đang chạy
+        return 200, {"message": message_text, "removed_from_queue": was_removed}
+
+    def handle_doctor_complete(self, query_params, body, clinic_id, doctor_id):
+        _require_fields(body, ("exam_type", "exam_result"))
+        success_flag, message_text, message_lvl = self.logic.complete_examination_for_doctor(clinic_id, doctor_id, str(body["exam_type"]), str(body["exam_result"]), str(body.get("exam_notes", "")))
+        if not success_flag: raise ApiError(409 if message_lvl == "WARNING" else 404, message_text)
+        return 201, {"message": message_text}
+
+    def handle_doctor_throughput(self, query_params, body):
+        throughput_rows, message_text, message_lvl = self.logic.get_doctor_throughput_report(query_params.get("clinic_id") or None)
+        if throughput_rows is None: raise ApiError(404, message_text)
+        return 200, {"doctors": throughput_rows}
+
+    # --- Lịch hẹn khám ---
+    def handle_list_appointments(self, query_params, body):
+        # ?date=YYYY-MM-DD: chỉ lịch của ngày đó; lọc thêm theo doctor_id / clinic_id / patient_id.
+        from_time = to_time = None
+        if query_params.get("date"):
+            try: from_time = datetime.datetime.strptime(query_params["date"], DATE_FORMAT_CSV)
+            except ValueError: raise ApiError(400, f"Ngày '{query_params['date']}' không đúng định dạng {DATE_FORMAT_CSV}.")
+            to_time = from_time + datetime.timedelta(days=1)
+        appointment_list = self.logic.list_appointments(from_time, to_time, query_params.get("doctor_id"), query_params.get("clinic_id"), query_params.get("patient_id"))
+        return 200, {"appointments": [appointment_to_json(appointment_obj) for appointment_obj in appointment_list]}
+
+    def handle_book_appointment(self, query_params, body):
+        _require_fields(body, ("patient_id", "clinic_id", "doctor_id", "start_time"))
+        appointment_obj, message_text, message_lvl = self.logic.book_appointment(str(body["patient_id"]), str(body["clinic_id"]), str(body["doctor_id"]), str(body["start_time"]),
+                                                                                 body.get("duration_minutes", DEFAULT_APPOINTMENT_MINUTES), str(body.get("priority", "Thông thường")))
+        if not appointment_obj: raise ApiError(404 if "Không tìm thấy" in message_text else _logic_result_status(message_lvl), message_text) # 409: trùng lịch
+        return 201, {"message": message_text, "appointment": appointment_to_json(appointment_obj)}
+
+    def handle_cancel_appointment(self, query_params, body, appointment_id):
+        success_flag, message_text, message_lvl = self.logic.cancel_appointment(appointment_id)
+        if not success_flag: raise ApiError(404 if "Không tìm thấy" in message_text else _logic_result_status(message_lvl), message_text)
+        return 200, {"message": message_text}
+
+    def handle_next_free_slot(self, query_params, body, doctor_id):
+        free_start, message_text, message_lvl = self.logic.find_next_free_appointment_slot(doctor_id, query_params.get("from"), query_params.get("duration_minutes", DEFAULT_APPOINTMENT_MINUTES), query_params.get("patient_id"))
+        if free_start is None: raise ApiError(_logic_result_status(message_lvl), message_text)
+        return 200, {"doctor_id": doctor_id, "start_time": _date_to_str(free_start), "message": message_text}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Máy chủ HTTP/JSON cho hệ thống quản lý khám bệnh.")
+    parser.add_argument("--host", default="127.0.0.1", help="Địa chỉ bind (mặc định chỉ máy cục bộ; 0.0.0.0 để mở cho mạng LAN).")
+    parser.add_argument("--port", type=int, default=DEFAULT_API_PORT, help="Cổng (0 = tự chọn cổng trống).")
+    parser.add_argument("--data-dir", default=None, help="Thư mục chứa các file CSV (mặc định như GUI).")
+    parser.add_argument("--api-token", default=None, help="Token yêu cầu trong header 'Authorization: Bearer <token>'.")
+    parser.add_argument("--executor-workers", type=int, default=2, help="Số luồng cho các thao tác ghi CSV.")
+    return parser.parse_args(argv)
+
+
+async def _run_server(args):
+    logic = MedicalSystemLogic(data_directory=args.data_dir)
+    api_server = await MedicalApiServer(logic, args.host, args.port, args.api_token, args.executor_workers).start()
+    print(f"Đang lắng nghe tại http://{args.host}:{api_server.port}", flush=True)
+    if args.host not in ("127.0.0.1", "localhost", "::1") and not args.api_token:
+        print("CẢNH BÁO: máy chủ mở ra ngoài máy cục bộ nhưng không có --api-token.", file=sys.stderr)
+    try: await api_server.serve_forever()
+    finally:
+        await api_server.close()
+        logic.close()
+
+
+def main(argv=None):
+    try: asyncio.run(_run_server(parse_args(argv)))
+    except KeyboardInterrupt: pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
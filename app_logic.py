@@ -3,9 +3,22 @@ import datetime
 import csv
 import os
 import sys
-
-from models import Patient, PatientInQueue, DATE_FORMAT_CSV, Doctor, Clinic
-from custom_structures import CustomPriorityQueue, LinkedList, HashTable, List, RadixTree
+import threading
+
+from models import Patient, PatientInQueue, DATE_FORMAT_CSV, Doctor, Clinic, Appointment
+from custom_structures import CustomPriorityQueue, ChunkedList, HashTable, HashSet, List, RadixTree, BidirectionalAssignmentIndex, get_hash_table_class, get_clinic_queue_class
+from sync_primitives import ReadWriteLock
+from examined_registry import ExaminedTodayRegistry
+from visit_statistics import VisitStatistics
+from history_analytics import ExaminationHistoryColumns
+import change_events
+from change_events import ChangeEvent, ChangeEventBus
+from queue_journal import ClinicQueueJournal
+from clinic_load_balancer import SpecialtyLoadIndex
+from wait_time_estimator import ClinicServiceTimeEstimator, DEFAULT_SMOOTHING_FACTOR
+from doctor_dispatch import ClinicExamSlots
+from appointment_schedule import AppointmentBook
+from patient_name_index import PatientNameIndex, DEFAULT_MAX_NAME_EDIT_DISTANCE, DEFAULT_FUZZY_NAME_LIMIT
 
 def resource_path(relative_path):
     # Khi chạy .py: lấy theo folder chứa app_logic.py
@@ -21,42 +34,217 @@ def resource_path(relative_path):
 PATIENTS_CSV_FILENAME = "patients_data.csv"
 DOCTORS_CSV_FILENAME = "doctors_data.csv"
 CLINICS_CSV_FILENAME = "clinics_data.csv"
+APPOINTMENTS_CSV_FILENAME = "appointments_data.csv" # Lịch hẹn khám (tạo khi đặt lịch hẹn đầu tiên)
+QUEUE_JOURNAL_FILENAME = "clinic_queues.journal" # Nhật ký hàng đợi khám (khôi phục khi khởi động lại)
+
+APPOINTMENT_TIME_FORMAT = "%Y-%m-%d %H:%M" # Định dạng giờ hẹn nhập từ GUI/API
+DEFAULT_APPOINTMENT_MINUTES = 15 # Thời lượng mặc định một khung giờ hẹn
+
+# Các nơi dùng bảng băm chọn được cài đặt (xem MedicalSystemLogic(hash_table_implementation=...))
+HASH_TABLE_USE_SITES = ("patients", "doctors", "clinics", "radix_children")
 
 class MedicalSystemLogic:
     """Logic nghiệp vụ chính của hệ thống."""
-    def __init__(self, hash_table_default_size=100):
+    def __init__(self, hash_table_default_size=100, data_directory=None, clock=None, hash_table_implementation="chaining", queue_heap_arity=2, persist_clinic_queues=True, clinic_queue_implementation="heap", service_time_smoothing_factor=DEFAULT_SMOOTHING_FACTOR):
+        # data_directory: thư mục chứa các file CSV (None -> mặc định như cũ)
+        self.data_directory = data_directory
+        # hash_table_implementation: "chaining" (HashTable) hoặc "robin_hood" (RobinHoodHashTable) cho mọi nơi dùng
+        # trong HASH_TABLE_USE_SITES, hoặc dict {nơi dùng: cài đặt} (nơi không ghi giữ "chaining")
+        self.hash_table_classes = self._resolve_hash_table_classes(hash_table_implementation)
+        # queue_heap_arity: số con mỗi nút của heap trong hàng đợi PK (2 = nhị phân, 4 = cây thấp hơn)
+        self.queue_heap_arity = queue_heap_arity
+        # clinic_queue_implementation: "heap" (CustomPriorityQueue) hoặc "bucketed" (BucketedPriorityQueue, mỗi mức
+        # ưu tiên một FIFO) cho mọi PK, hoặc dict {mã PK: cài đặt} (PK không ghi dùng "heap")
+        for implementation_name in ([clinic_queue_implementation] if isinstance(clinic_queue_implementation, str) else clinic_queue_implementation.values()): get_clinic_queue_class(implementation_name) # Báo lỗi tên sai ngay
+        self.clinic_queue_implementation = clinic_queue_implementation
+        # clock: hàm trả về datetime hiện tại (mặc định giờ hệ thống; mô phỏng dùng đồng hồ ảo)
+        self.clock = clock if clock else datetime.datetime.now
+        # Sự kiện thay đổi dữ liệu (phát sau khi thao tác ghi thành công, ngoài mọi khóa)
+        self.change_event_bus = ChangeEventBus()
+
+        # Khóa cho nhiều luồng gọi cùng lúc (nhiều quầy tiếp đón / phòng khám). Thứ tự lấy khóa để tránh deadlock:
+        # bảng BN -> bảng PK -> bảng BS -> bảng lịch hẹn -> khóa hàng đợi từng PK -> chỉ mục BN đang chờ -> DS đã khám hôm nay.
+        # Nhật ký hàng đợi, chỉ mục tải PK và bộ ước lượng thời gian chờ có khóa riêng trong cùng, cập nhật khi đang giữ khóa hàng đợi của PK.
+        # Hàm lưu CSV tự lấy khóa đọc của bảng, nên chỉ được gọi khi không giữ khóa bảng nào.
+        self._patient_table_lock = ReadWriteLock() # Bảng BN, 2 Radix Tree, chỉ mục họ tên, lịch sử khám, bộ đếm mã BN
+        self._clinic_table_lock = ReadWriteLock() # Bảng PK, bộ đếm mã PK
+        self._doctor_table_lock = ReadWriteLock() # Bảng BS, bộ đếm mã BS
+        self._appointment_table_lock = ReadWriteLock() # Sổ lịch hẹn, bộ đếm mã lịch hẹn
+        self._clinic_queue_registry_lock = threading.Lock() # Cấu trúc clinic_examination_queues, bảng khóa hàng đợi và bảng ô khám
+        self._clinic_queue_locks = HashTable(initial_table_size=20) # key: clinic_id, value: RLock của hàng đợi PK đó
+        self._queue_membership_lock = threading.Lock() # Chỉ mục BN đang chờ và BN đang ở ô khám
+        self._examined_today_lock = threading.Lock()
+        self._csv_save_locks = {PATIENTS_CSV_FILENAME: threading.Lock(), DOCTORS_CSV_FILENAME: threading.Lock(), CLINICS_CSV_FILENAME: threading.Lock(), APPOINTMENTS_CSV_FILENAME: threading.Lock()}
+        self._csv_table_locks = {PATIENTS_CSV_FILENAME: self._patient_table_lock, DOCTORS_CSV_FILENAME: self._doctor_table_lock, CLINICS_CSV_FILENAME: self._clinic_table_lock, APPOINTMENTS_CSV_FILENAME: self._appointment_table_lock}
+
         # Bảng băm lưu hồ sơ BN, key: patient_id
-        self.patient_records_table = HashTable(initial_table_size=hash_table_default_size)
+        self.patient_records_table = self.hash_table_classes["patients"](initial_table_size=hash_table_default_size)
         self.next_patient_id_counter = 1 # Tạo mã BN tự động
 
         # Radix Tree tìm BN theo SĐT và CCCD
-        self.phone_radix_tree = RadixTree()
-        self.national_id_radix_tree = RadixTree()
+        self.phone_radix_tree = self._create_radix_tree()
+        self.national_id_radix_tree = self._create_radix_tree()
+        # Chỉ mục họ tên bỏ dấu (BKTree) để tìm BN khi gõ sai/không dấu
+        self.patient_name_index = PatientNameIndex()
 
-        patients_data_path = resource_path(PATIENTS_CSV_FILENAME)
-        doctors_data_path = resource_path(DOCTORS_CSV_FILENAME)
-        clinics_data_path = resource_path(CLINICS_CSV_FILENAME)
+        patients_data_path = self._get_load_path(PATIENTS_CSV_FILENAME)
+        doctors_data_path = self._get_load_path(DOCTORS_CSV_FILENAME)
+        clinics_data_path = self._get_load_path(CLINICS_CSV_FILENAME)
 
         # Tải dữ liệu từ CSV
         self._load_data_from_csv(patients_data_path, Patient, self.patient_records_table, self._update_next_patient_id_counter, key_attribute_name='patient_id', id_prefix='BN')
         
-        # Bảng băm lưu hàng đợi khám của PK, key: clinic_id, value: CustomPriorityQueue
+        # Bảng băm lưu hàng đợi khám của PK, key: clinic_id, value: CustomPriorityQueue / BucketedPriorityQueue
         self.clinic_examination_queues = HashTable(initial_table_size=20)
-        self.examined_patients_today_list = LinkedList() # BN đã khám trong ngày
+        # Ô đang khám theo BS của từng PK, key: clinic_id, value: ClinicExamSlots (dùng chung khóa hàng đợi PK)
+        self.clinic_exam_slots = HashTable(initial_table_size=20)
+        # Chỉ mục BN đang chờ, key: patient_id, value: clinic_id (BN chỉ được ở 1 hàng đợi)
+        self.queued_patient_clinic_index = HashTable(initial_table_size=hash_table_default_size)
+        # Chỉ mục BN đang ở ô khám của BS, key: patient_id, value: (clinic_id, doctor_id). Cùng khóa với chỉ mục BN đang chờ:
+        # BN được gọi chuyển từ chỉ mục này sang chỉ mục kia trong một lần giữ khóa, nên không lúc nào "biến mất" khỏi cả hai
+        self.examining_patient_slot_index = HashTable(initial_table_size=hash_table_default_size)
+        # BN đã khám theo ngày (tự sang ngày mới theo self.clock); khởi động giữa ngày thì dựng lại từ lịch sử
+        self.examined_today_registry = ExaminedTodayRegistry(self.clock)
+        self.examined_today_registry.install_day_record(ExaminedTodayRegistry.rebuild_day_from_history(self.clock().date(), self.patient_records_table.iter_values()))
+        # Bộ đếm lượt khám theo ngày/PK/BS/loại khám (cùng khóa với bảng BN)
+        self.visit_statistics = VisitStatistics()
+        self.visit_statistics.rebuild_from_patients(self.patient_records_table.iter_values())
 
         # Bảng băm lưu hồ sơ BS, key: doctor_id
-        self.doctor_records_table = HashTable(initial_table_size=50); self.next_doctor_id_counter = 1
+        self.doctor_records_table = self.hash_table_classes["doctors"](initial_table_size=50); self.next_doctor_id_counter = 1
         self._load_data_from_csv(doctors_data_path, Doctor, self.doctor_records_table, self._update_next_doctor_id_counter, key_attribute_name='doctor_id', id_prefix='BS')
 
         # Bảng băm lưu hồ sơ PK, key: clinic_id
-        self.clinic_records_table = HashTable(initial_table_size=20); self.next_clinic_id_counter = 1
+        self.clinic_records_table = self.hash_table_classes["clinics"](initial_table_size=20); self.next_clinic_id_counter = 1
         self._load_data_from_csv(clinics_data_path, Clinic, self.clinic_records_table, self._update_next_clinic_id_counter, key_attribute_name='clinic_id', id_prefix='PK')
 
         # Khởi tạo hàng đợi cho mỗi phòng khám đã tải
-        all_clinics_list = self.clinic_records_table.get_all_values_as_list()
-        for i in range(len(all_clinics_list)):
-            clinic_obj = all_clinics_list.get(i)
-            if clinic_obj and isinstance(clinic_obj, Clinic): self.clinic_examination_queues.put_item(clinic_obj.clinic_id, CustomPriorityQueue())
+        for clinic_obj in self.clinic_records_table.iter_values():
+            if clinic_obj and isinstance(clinic_obj, Clinic): self.clinic_examination_queues.put_item(clinic_obj.clinic_id, self._create_clinic_queue(clinic_obj.clinic_id))
+
+        # Quan hệ BS <-> PK (khóa trái: doctor_id, khóa phải: clinic_id). Là nguồn chuẩn cho việc gán;
+        # doctor.clinic_id_list / clinic.doctor_id_list được giữ đồng bộ để hiển thị và ghi CSV.
+        self.doctor_clinic_assignments = BidirectionalAssignmentIndex(initial_table_size=50)
+        self._rebuild_doctor_clinic_assignments()
+
+        # Hàng đợi khám được ghi nhật ký để không mất BN đang chờ khi chương trình bị tắt/treo
+        self.clinic_queue_journal = ClinicQueueJournal(self._get_save_path(QUEUE_JOURNAL_FILENAME)) if persist_clinic_queues else None
+        if self.clinic_queue_journal: self._restore_clinic_queues_from_journal()
+
+        # Thời gian khám trung bình (EWMA) từng PK, đo từ lúc gọi đến lúc hoàn thành khám
+        self.service_time_estimator = ClinicServiceTimeEstimator(smoothing_factor=service_time_smoothing_factor)
+        # Tải các PK theo chuyên khoa (chọn PK ít chờ nhất khi đăng ký theo chuyên khoa)
+        self.clinic_load_index = SpecialtyLoadIndex()
+        for clinic_obj in self.clinic_records_table.iter_values(): self._index_clinic_load(clinic_obj)
+
+        # Sổ lịch hẹn khám theo khung giờ của BS (đến giờ thì BN được đưa vào hàng đợi PK)
+        self.appointment_book = AppointmentBook(); self.next_appointment_id_counter = 1
+        self._load_appointments(self._get_load_path(APPOINTMENTS_CSV_FILENAME))
+        self._appointments_pruned_date = self.clock().date() # Lúc tải đã bỏ lịch đã xử lý của các ngày trước
+
+    @staticmethod
+    def _resolve_hash_table_classes(hash_table_implementation):
+        if isinstance(hash_table_implementation, str): implementation_by_site = {use_site: hash_table_implementation for use_site in HASH_TABLE_USE_SITES}
+        else:
+            unknown_sites = set(hash_table_implementation).difference(HASH_TABLE_USE_SITES)
+            if unknown_sites: raise ValueError(f"Nơi dùng bảng băm không hợp lệ: {', '.join(sorted(unknown_sites))}")
+            implementation_by_site = {use_site: hash_table_implementation.get(use_site, "chaining") for use_site in HASH_TABLE_USE_SITES}
+        return {use_site: get_hash_table_class(implementation_name) for use_site, implementation_name in implementation_by_site.items()}
+
+    def _create_radix_tree(self):
+        children_table_class = self.hash_table_classes["radix_children"]
+        # Bảng địa chỉ mở tự giãn nên bắt đầu nhỏ (phần lớn nút chỉ có 1-2 con)
+        return RadixTree(children_table_class, children_table_size=10 if children_table_class is HashTable else 2)
+
+    def _restore_clinic_queues_from_journal(self):
+        # Phát lại nhật ký, dựng lại hàng đợi từng PK theo lô (heapify / chia mức) (giữ thời điểm đăng ký và số lần vắng),
+        # rồi ghi gọn nhật ký chỉ còn các BN đang chờ. Bỏ qua BN/PK đã bị xóa, và BN đăng ký từ các ngày trước
+        # (hàng đợi không qua ngày; giữ lại thì BN hôm qua với thời điểm đăng ký sớm hơn sẽ đứng trước mọi BN hôm nay).
+        entries_by_clinic = self.clinic_queue_journal.replay()
+        today_date = self.clock().date()
+        restored_count = 0; stale_entry_count = 0
+        for clinic_id_val, entry_states in entries_by_clinic.items():
+            clinic_queue, _queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
+            if not clinic_queue: continue
+            restored_queue_items = []
+            for entry_state in entry_states.values():
+                if entry_state.registration_time.date() < today_date: stale_entry_count += 1; continue
+                patient_obj = self.patient_records_table.get_item(entry_state.patient_id)
+                priority_name = PatientInQueue.PRIORITY_DISPLAY_MAP.get(entry_state.priority)
+                if not patient_obj or not priority_name or self.queued_patient_clinic_index.get_item(entry_state.patient_id): continue
+                queue_item = PatientInQueue(patient_obj, priority_name, entry_state.registration_time)
+                queue_item.absent_count = entry_state.absent_count
+                restored_queue_items.append(queue_item)
+                self.queued_patient_clinic_index.put_item(entry_state.patient_id, clinic_id_val)
+            clinic_queue.replace_all_items(restored_queue_items); restored_count += len(restored_queue_items)
+        if restored_count or stale_entry_count or self.clinic_queue_journal.skipped_line_count:
+            print(f"Đã khôi phục {restored_count} BN vào hàng đợi từ {self.clinic_queue_journal.journal_path} (bỏ {stale_entry_count} BN của ngày trước, bỏ qua {self.clinic_queue_journal.skipped_line_count} dòng hỏng).")
+        self.clinic_queue_journal.rewrite({clinic_id_val: clinic_queue.get_all_items() for clinic_id_val, clinic_queue in self.clinic_examination_queues.iter_items()})
+
+    def _load_appointments(self, appointments_data_path):
+        # Tải lịch hẹn từ CSV (nếu đã có) vào sổ. Bỏ lịch đã xử lý của các ngày trước, lịch của BN/PK/BS không còn
+        # hoặc BS không còn thuộc PK, và lịch trùng giờ (file bị sửa tay).
+        if not os.path.exists(appointments_data_path): return # Chưa đặt lịch hẹn nào
+        loaded_appointments_table = HashTable(initial_table_size=64)
+        self._load_data_from_csv(appointments_data_path, Appointment, loaded_appointments_table, self._update_next_appointment_id_counter, key_attribute_name='appointment_id', id_prefix='LH')
+        today_start = datetime.datetime.combine(self.clock().date(), datetime.time())
+        for appointment_obj in sorted(loaded_appointments_table.iter_values(), key=lambda appointment_obj: (appointment_obj.start_time, appointment_obj.appointment_id)):
+            if not appointment_obj.is_booked() and appointment_obj.end_time < today_start: continue
+            if not self.patient_records_table.contains_key(appointment_obj.patient_id) or not self.doctor_clinic_assignments.has_link(appointment_obj.doctor_id, appointment_obj.clinic_id):
+                print(f"Bỏ qua lịch hẹn {appointment_obj.appointment_id}: BN/BS/PK không còn hoặc BS không thuộc PK."); continue
+            try: self.appointment_book.add_appointment(appointment_obj)
+            except ValueError as e: print(f"Bỏ qua lịch hẹn {appointment_obj.appointment_id}: {e}")
+
+    def _index_clinic_load(self, clinic_obj):
+        # Thêm/cập nhật PK trong chỉ mục tải (gọi khi giữ khóa bảng PK; không giữ khóa hàng đợi).
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_obj.clinic_id)
+        queued_count = 0
+        if clinic_queue:
+            with queue_lock: queued_count = clinic_queue.current_size
+        self.clinic_load_index.set_clinic(clinic_obj.clinic_id, clinic_obj.clinic_specialty, queued_count, len(self.doctor_clinic_assignments.get_left_keys(clinic_obj.clinic_id)),
+                                          self.service_time_estimator.get_average_service_seconds(clinic_obj.clinic_id))
+
+    def _refresh_doctor_counts(self, clinic_ids_iterable):
+        for clinic_id_val in clinic_ids_iterable: self.clinic_load_index.update_doctor_count(clinic_id_val, len(self.doctor_clinic_assignments.get_left_keys(clinic_id_val)))
+
+    def _journal_queued(self, clinic_id_val, queue_item):
+        if self.clinic_queue_journal: self.clinic_queue_journal.record_queued(clinic_id_val, queue_item)
+    def _journal_removed(self, clinic_id_val, patient_id_val):
+        if self.clinic_queue_journal: self.clinic_queue_journal.record_removed(clinic_id_val, patient_id_val)
+    def _journal_cleared(self, clinic_id_val):
+        if self.clinic_queue_journal: self.clinic_queue_journal.record_cleared(clinic_id_val)
+
+    def close(self):
+        # Đóng file nhật ký hàng đợi (gọi khi thoát chương trình; các bản ghi đã được flush từng dòng).
+        if self.clinic_queue_journal: self.clinic_queue_journal.close()
+
+    def _rebuild_doctor_clinic_assignments(self):
+        # Dựng quan hệ BS <-> PK từ danh sách trong cả 2 file CSV (hợp 2 chiều, bỏ mã không tồn tại),
+        # rồi chuẩn hóa lại danh sách của từng BS/PK để lần lưu sau 2 file khớp nhau.
+        for doc_obj in self.doctor_records_table.iter_values():
+            for clinic_id_val in doc_obj.clinic_id_list:
+                if self.clinic_records_table.contains_key(clinic_id_val): self.doctor_clinic_assignments.add_link(doc_obj.doctor_id, clinic_id_val)
+        for clinic_obj in self.clinic_records_table.iter_values():
+            for doctor_id_val in clinic_obj.doctor_id_list:
+                if self.doctor_records_table.contains_key(doctor_id_val): self.doctor_clinic_assignments.add_link(doctor_id_val, clinic_obj.clinic_id)
+        for doc_obj in self.doctor_records_table.iter_values(): doc_obj.clinic_id_list = self._merge_linked_ids(doc_obj.clinic_id_list, self.doctor_clinic_assignments.get_right_keys(doc_obj.doctor_id))
+        for clinic_obj in self.clinic_records_table.iter_values(): clinic_obj.doctor_id_list = self._merge_linked_ids(clinic_obj.doctor_id_list, self.doctor_clinic_assignments.get_left_keys(clinic_obj.clinic_id))
+
+    def _merge_linked_ids(self, current_id_list, linked_id_list):
+        # Giữ thứ tự cũ cho các mã còn liên kết, thêm các mã liên kết còn thiếu vào cuối, bỏ trùng.
+        linked_id_set = HashSet(); merged_id_list = List(); added_id_set = HashSet()
+        for linked_id in linked_id_list: linked_id_set.add(linked_id)
+        for id_val in current_id_list:
+            if id_val in linked_id_set and added_id_set.add(id_val): merged_id_list.append(id_val)
+        for linked_id in linked_id_list:
+            if added_id_set.add(linked_id): merged_id_list.append(linked_id)
+        return merged_id_list
+
+    def _remove_id_from_custom_list(self, custom_list_obj, id_val):
+        # Xóa một mã khỏi List (O(độ dài List đó)); trả về True nếu có xóa.
+        for i in range(len(custom_list_obj)):
+            if custom_list_obj.get(i) == id_val: custom_list_obj.pop(i); return True
+        return False
 
     def _get_csv_fieldnames(self, model_class_ref):
         # Lấy danh sách tên cột (fieldnames) cho file CSV dựa trên lớp model.
@@ -65,11 +253,13 @@ class MedicalSystemLogic:
         if model_class_ref == Patient: base_field_py_list = ["ma_bn", "ho_ten", "ngay_sinh", "gioi_tinh", "dia_chi", "sdt", "cccd", "bhyt", "tien_su_benh_an", "di_ung_thuoc", "thoi_diem_dang_ky_he_thong", "lich_su_kham_benh"]
         elif model_class_ref == Doctor: base_field_py_list = ["ma_bac_si", "ho_ten_bac_si", "chuyen_khoa", "danh_sach_ma_phong_kham"]
         elif model_class_ref == Clinic: base_field_py_list = ["ma_phong_kham", "ten_phong_kham", "chuyen_khoa_pk", "danh_sach_ma_bac_si"]
+        elif model_class_ref == Appointment: base_field_py_list = ["ma_lich_hen", "ma_bn", "ma_phong_kham", "ma_bac_si", "bat_dau", "ket_thuc", "muc_uu_tien", "trang_thai"]
         for f_name in base_field_py_list: fields_list.append(f_name)
         return fields_list
 
     def _convert_custom_list_to_py_list(self, custom_list_obj):
         # Chuyển đổi List tùy chỉnh sang list Python.
+        if isinstance(custom_list_obj, List): return custom_list_obj.to_py_list()
         py_list = []
         if custom_list_obj and len(custom_list_obj) > 0:
              for i in range(len(custom_list_obj)): py_list.append(custom_list_obj.get(i))
@@ -91,7 +281,8 @@ class MedicalSystemLogic:
         required_fields_map_dict = { # Các trường bắt buộc cho từng model
             Patient: ["ma_bn", "ho_ten", "ngay_sinh", "gioi_tinh", "sdt", "cccd"],
             Doctor: ["ma_bac_si", "ho_ten_bac_si", "chuyen_khoa"],
-            Clinic: ["ma_phong_kham", "ten_phong_kham", "chuyen_khoa_pk"]
+            Clinic: ["ma_phong_kham", "ten_phong_kham", "chuyen_khoa_pk"],
+            Appointment: ["ma_lich_hen", "ma_bn", "ma_phong_kham", "ma_bac_si", "bat_dau", "ket_thuc"]
         }
         required_field_list = required_fields_map_dict.get(model_class_ref, [key_attribute_name])
 
@@ -119,6 +310,7 @@ class MedicalSystemLogic:
                                 self.phone_radix_tree.insert(item_instance.phone_number.strip(), item_instance.patient_id)
                             if item_instance.national_id and item_instance.national_id.strip():
                                 self.national_id_radix_tree.insert(item_instance.national_id.strip(), item_instance.patient_id)
+                            self.patient_name_index.add_patient(item_instance.patient_id, item_instance.full_name)
 
                         # Cập nhật bộ đếm ID lớn nhất
                         if item_unique_id.startswith(id_prefix):
@@ -135,9 +327,16 @@ class MedicalSystemLogic:
     def _update_next_patient_id_counter(self, next_val): self.next_patient_id_counter = next_val
     def _update_next_doctor_id_counter(self, next_val): self.next_doctor_id_counter = next_val
     def _update_next_clinic_id_counter(self, next_val): self.next_clinic_id_counter = next_val
+    def _update_next_appointment_id_counter(self, next_val): self.next_appointment_id_counter = next_val
+
+    def _get_load_path(self, csv_filename_const):
+        # Xác định đường dẫn đọc file CSV.
+        if self.data_directory: return os.path.join(self.data_directory, csv_filename_const)
+        return resource_path(csv_filename_const)
 
     def _get_save_path(self, csv_filename_const):
         # Xác định đường dẫn lưu file CSV (quan trọng cho PyInstaller).
+        if self.data_directory: return os.path.join(self.data_directory, csv_filename_const)
         if getattr(sys, 'frozen', False): # Chạy từ .exe
             application_path = os.path.dirname(sys.executable)
             return os.path.join(application_path, csv_filename_const)
@@ -154,23 +353,50 @@ class MedicalSystemLogic:
             print(f"Không có fieldnames cho {model_class_ref.__name__}. Không lưu."); return
 
         csv_fieldnames_py_list = self._convert_custom_list_to_py_list(csv_fieldnames_custom_array)
-        all_items_custom_array = source_hash_table_obj.get_all_values_as_list()
-        saved_items_count = 0
-        try:
-            os.makedirs(os.path.dirname(actual_csv_filepath), exist_ok=True) # Tạo thư mục nếu chưa có
-
-            with open(actual_csv_filepath, mode='w', encoding='utf-8', newline='') as csvfile:
-                csv_writer = csv.DictWriter(csvfile, fieldnames=csv_fieldnames_py_list, extrasaction='ignore')
-                csv_writer.writeheader()
-                for i in range(len(all_items_custom_array)):
-                    current_item = all_items_custom_array.get(i)
-                    if isinstance(current_item, model_class_ref):
-                        csv_writer.writerow(current_item.to_csv_row())
-                        saved_items_count +=1
-            print(f"Đã lưu {saved_items_count} mục vào {actual_csv_filepath}")
-        except IOError as e: print(f"Lỗi IO khi lưu {actual_csv_filepath}: {e}.")
-        except Exception as save_exception: print(f"Lỗi không xác định khi lưu {actual_csv_filepath}: {save_exception}")
-
+        # Mỗi file chỉ một luồng ghi; dữ liệu được chụp dưới khóa đọc của bảng rồi mới ghi ra đĩa
+        with self._csv_save_locks[csv_filename_const]:
+            with self._csv_table_locks[csv_filename_const].read_locked():
+                csv_row_dicts = [item_obj.to_csv_row() for item_obj in source_hash_table_obj.iter_values() if isinstance(item_obj, model_class_ref)]
+            try:
+                os.makedirs(os.path.dirname(actual_csv_filepath), exist_ok=True) # Tạo thư mục nếu chưa có
+
+                with open(actual_csv_filepath, mode='w', encoding='utf-8', newline='') as csvfile:
+                    csv_writer = csv.DictWriter(csvfile, fieldnames=csv_fieldnames_py_list, extrasaction='ignore')
+                    csv_writer.writeheader()
+                    csv_writer.writerows(csv_row_dicts)
+                print(f"Đã lưu {len(csv_row_dicts)} mục vào {actual_csv_filepath}")
+            except IOError as e: print(f"Lỗi IO khi lưu {actual_csv_filepath}: {e}.")
+            except Exception as save_exception: print(f"Lỗi không xác định khi lưu {actual_csv_filepath}: {save_exception}")
+
+    def _create_clinic_queue(self, clinic_id_val):
+        # Tạo hàng đợi rỗng cho một PK theo cài đặt đã chọn cho PK đó.
+        if isinstance(self.clinic_queue_implementation, str): implementation_name = self.clinic_queue_implementation
+        else: implementation_name = self.clinic_queue_implementation.get(clinic_id_val, "heap")
+        clinic_queue_class = get_clinic_queue_class(implementation_name)
+        if clinic_queue_class is CustomPriorityQueue: return CustomPriorityQueue(heap_arity=self.queue_heap_arity, ordering_key_attribute="ordering_key")
+        return clinic_queue_class(min(PatientInQueue.PRIORITY_MAP.values()), max(PatientInQueue.PRIORITY_MAP.values()))
+
+    def _get_clinic_queue_and_lock(self, clinic_id_val, create_if_missing=False):
+        # Lấy (hàng đợi, khóa hàng đợi) của PK. Trả về (None, None) nếu PK chưa có hàng đợi và không tạo mới.
+        with self._clinic_queue_registry_lock:
+            clinic_queue = self.clinic_examination_queues.get_item(clinic_id_val)
+            if not clinic_queue:
+                if not create_if_missing: return None, None
+                clinic_queue = self._create_clinic_queue(clinic_id_val); self.clinic_examination_queues.put_item(clinic_id_val, clinic_queue)
+            queue_lock = self._clinic_queue_locks.get_item(clinic_id_val)
+            if queue_lock is None: queue_lock = threading.RLock(); self._clinic_queue_locks.put_item(clinic_id_val, queue_lock)
+            return clinic_queue, queue_lock
+
+    def _get_clinic_exam_slots(self, clinic_id_val):
+        # Ô khám theo BS của PK (tạo khi cần). Đọc/ghi ô khám khi đang giữ khóa hàng đợi của PK.
+        with self._clinic_queue_registry_lock:
+            exam_slots = self.clinic_exam_slots.get_item(clinic_id_val)
+            if exam_slots is None: exam_slots = ClinicExamSlots(); self.clinic_exam_slots.put_item(clinic_id_val, exam_slots)
+            return exam_slots
+
+    def _publish_change(self, event_type, entity_id=None, clinic_id=None, change_kind=None, **details):
+        # Phát sự kiện thay đổi. Chỉ gọi khi không giữ khóa nào (callback có thể gọi lại logic).
+        self.change_event_bus.publish(ChangeEvent(event_type, entity_id, clinic_id, change_kind, details))
 
     def _generate_patient_id(self): patient_id_val = f"BN{self.next_patient_id_counter:04d}"; self.next_patient_id_counter += 1; return patient_id_val
     def create_patient_record(self, full_name_val, dob_str, gender_val, address_val, phone_val, national_id_val, health_insurance_id_val="", medical_history_val="", drug_allergies_val=""):
@@ -180,29 +406,42 @@ class MedicalSystemLogic:
         except ValueError: return None, f"Ngày sinh '{dob_str}' không hợp lệ (YYYY-MM-DD).", "ERROR"
 
         cleaned_national_id = national_id_val.strip()
-        if self.national_id_radix_tree.search(cleaned_national_id): return None, f"Số CCCD '{cleaned_national_id}' đã tồn tại.", "ERROR"
         cleaned_phone = phone_val.strip()
-        if self.phone_radix_tree.search(cleaned_phone): return None, f"Số điện thoại '{cleaned_phone}' đã tồn tại.", "ERROR"
+        with self._patient_table_lock.write_locked(): # Kiểm tra trùng và thêm phải nguyên tử
+            if self.national_id_radix_tree.search(cleaned_national_id): return None, f"Số CCCD '{cleaned_national_id}' đã tồn tại.", "ERROR"
+            if self.phone_radix_tree.search(cleaned_phone): return None, f"Số điện thoại '{cleaned_phone}' đã tồn tại.", "ERROR"
 
-        new_patient_id = self._generate_patient_id()
-        if self.patient_records_table.contains_key(new_patient_id): return None, f"Mã BN {new_patient_id} đã tồn tại (lỗi logic).", "ERROR"
+            new_patient_id = self._generate_patient_id()
+            if self.patient_records_table.contains_key(new_patient_id): return None, f"Mã BN {new_patient_id} đã tồn tại (lỗi logic).", "ERROR"
 
-        patient_obj = Patient(new_patient_id, full_name_val, dob_obj, gender_val, address_val, cleaned_phone, cleaned_national_id, health_insurance_id_val, medical_history_val, drug_allergies_val)
-        self.patient_records_table.put_item(new_patient_id, patient_obj)
+            patient_obj = Patient(new_patient_id, full_name_val, dob_obj, gender_val, address_val, cleaned_phone, cleaned_national_id, health_insurance_id_val, medical_history_val, drug_allergies_val)
+            self.patient_records_table.put_item(new_patient_id, patient_obj)
 
-        if cleaned_phone: self.phone_radix_tree.insert(cleaned_phone, new_patient_id)
-        if cleaned_national_id: self.national_id_radix_tree.insert(cleaned_national_id, new_patient_id)
+            if cleaned_phone: self.phone_radix_tree.insert(cleaned_phone, new_patient_id)
+            if cleaned_national_id: self.national_id_radix_tree.insert(cleaned_national_id, new_patient_id)
+            self.patient_name_index.add_patient(new_patient_id, patient_obj.full_name)
 
         self._save_data_to_csv(PATIENTS_CSV_FILENAME, Patient, self.patient_records_table)
+        self._publish_change(change_events.PATIENT_CREATED, new_patient_id)
         return patient_obj, f"Đã tạo hồ sơ BN: {new_patient_id}", "INFO"
 
-    def find_patient_by_id(self, patient_id_val): return self.patient_records_table.get_item(patient_id_val)
+    def find_patient_by_id(self, patient_id_val):
+        with self._patient_table_lock.read_locked(): return self.patient_records_table.get_item(patient_id_val)
+
     def update_patient_info(self, patient_id_val, **update_kwargs):
         # Cập nhật thông tin bệnh nhân.
-        patient_obj = self.find_patient_by_id(patient_id_val)
+        with self._patient_table_lock.write_locked(): update_result = self._apply_patient_update(patient_id_val, update_kwargs)
+        if update_result[0]:
+            self._save_data_to_csv(PATIENTS_CSV_FILENAME, Patient, self.patient_records_table)
+            self._publish_change(change_events.PATIENT_UPDATED, patient_id_val)
+        return update_result
+
+    def _apply_patient_update(self, patient_id_val, update_kwargs):
+        # Áp dụng thay đổi hồ sơ BN (gọi khi đã giữ khóa ghi bảng BN, chưa lưu CSV).
+        patient_obj = self.patient_records_table.get_item(patient_id_val)
         if not patient_obj: return False, f"BN mã {patient_id_val} không tồn tại.", "ERROR"
 
-        old_phone = patient_obj.phone_number; old_national_id = patient_obj.national_id
+        old_phone = patient_obj.phone_number; old_national_id = patient_obj.national_id; old_full_name = patient_obj.full_name
         new_national_id_raw = update_kwargs.get("national_id")
         if new_national_id_raw is not None and not str(new_national_id_raw).strip(): return False, f"CCCD không được trống cho BN {patient_id_val}.", "ERROR"
         cleaned_new_national_id = str(new_national_id_raw).strip() if new_national_id_raw is not None else None
@@ -237,316 +476,765 @@ class MedicalSystemLogic:
             if patient_obj.national_id != old_national_id:
                 if old_national_id and old_national_id.strip(): self.national_id_radix_tree.delete(old_national_id.strip())
                 if patient_obj.national_id and patient_obj.national_id.strip(): self.national_id_radix_tree.insert(patient_obj.national_id.strip(), patient_id_val)
-            self._save_data_to_csv(PATIENTS_CSV_FILENAME, Patient, self.patient_records_table)
+            if patient_obj.full_name != old_full_name: self.patient_name_index.rename_patient(patient_id_val, old_full_name, patient_obj.full_name)
             return True, f"Đã cập nhật BN {patient_id_val}.", "INFO"
         return False, f"Không có thay đổi cho BN {patient_id_val}.", "INFO"
 
     def delete_patient_record(self, patient_id_val):
         # Xóa hồ sơ bệnh nhân.
-        patient_to_delete = self.find_patient_by_id(patient_id_val)
-        if not patient_to_delete: return False, f"Không tìm thấy BN {patient_id_val}.", "ERROR"
-        # Kiểm tra BN có trong hàng đợi nào không
-        all_queues_pairs = self.clinic_examination_queues.get_all_key_value_pairs_as_list()
-        for i in range(len(all_queues_pairs)):
-            clinic_id_key, clinic_queue = all_queues_pairs.get(i)
-            if clinic_queue:
-                all_heap_elements = clinic_queue.internal_heap.get_all_heap_elements()
-                for j in range(len(all_heap_elements)):
-                    if all_heap_elements.get(j).patient_id == patient_id_val: return False, f"Không thể xóa BN {patient_id_val} vì đang trong HĐ của PK {clinic_id_key}.", "ERROR"
-        if self.patient_records_table.delete_item(patient_id_val):
+        with self._patient_table_lock.write_locked():
+            patient_to_delete = self.patient_records_table.get_item(patient_id_val)
+            if not patient_to_delete: return False, f"Không tìm thấy BN {patient_id_val}.", "ERROR"
+            # Kiểm tra BN có trong hàng đợi nào hoặc đang ở ô khám của BS nào không (BN đã được gọi vào khám thì không còn trong HĐ)
+            with self._queue_membership_lock:
+                queued_clinic_id = self.queued_patient_clinic_index.get_item(patient_id_val); examining_slot = self.examining_patient_slot_index.get_item(patient_id_val)
+            if queued_clinic_id: return False, f"Không thể xóa BN {patient_id_val} vì đang trong HĐ của PK {queued_clinic_id}.", "ERROR"
+            if examining_slot: return False, f"Không thể xóa BN {patient_id_val} vì BS {examining_slot[1]} đang khám tại PK {examining_slot[0]}.", "ERROR"
+            with self._appointment_table_lock.read_locked(): booked_appointment = self.appointment_book.find_booked_appointment(patient_id_val=patient_id_val)
+            if booked_appointment: return False, f"Không thể xóa BN {patient_id_val} vì còn lịch hẹn {booked_appointment.appointment_id}.", "ERROR"
+            if not self.patient_records_table.delete_item(patient_id_val): return False, f"Lỗi khi xóa BN {patient_id_val} khỏi bảng băm.", "ERROR"
+            for history_item_dict in patient_to_delete.examination_history: self.visit_statistics.record_history_item(history_item_dict, delta=-1) # Bỏ lượt khám khỏi thống kê
             if patient_to_delete.phone_number and patient_to_delete.phone_number.strip(): self.phone_radix_tree.delete(patient_to_delete.phone_number.strip())
             if patient_to_delete.national_id and patient_to_delete.national_id.strip(): self.national_id_radix_tree.delete(patient_to_delete.national_id.strip())
-            self._save_data_to_csv(PATIENTS_CSV_FILENAME, Patient, self.patient_records_table)
-            return True, f"Đã xóa BN {patient_id_val}.", "INFO"
-        return False, f"Lỗi khi xóa BN {patient_id_val} khỏi bảng băm.", "ERROR"
-
-    def register_for_examination(self, patient_id_val, clinic_id_val, priority_level_str):
-        # Đăng ký bệnh nhân vào hàng đợi khám.
-        patient_obj = self.find_patient_by_id(patient_id_val)
-        if not patient_obj: return False, f"Không tìm thấy BN mã {patient_id_val}.", "ERROR"
-        clinic_obj = self.find_clinic_by_id(clinic_id_val)
-        if not clinic_obj: return False, f"Không tìm thấy PK mã {clinic_id_val}.", "ERROR"
-        # Kiểm tra BN đã có trong hàng đợi nào khác chưa
-        all_queues_pairs = self.clinic_examination_queues.get_all_key_value_pairs_as_list()
-        for i in range(len(all_queues_pairs)):
-            _clinic_id, queue_obj = all_queues_pairs.get(i)
-            if queue_obj:
-                all_heap_elements = queue_obj.internal_heap.get_all_heap_elements()
-                for j in range(len(all_heap_elements)):
-                    if all_heap_elements.get(j).patient_id == patient_id_val: return False, f"BN {patient_id_val} đã có trong HĐ PK {_clinic_id}.", "WARNING"
-        clinic_specific_queue = self.clinic_examination_queues.get_item(clinic_id_val)
-        if not clinic_specific_queue: clinic_specific_queue = CustomPriorityQueue(); self.clinic_examination_queues.put_item(clinic_id_val, clinic_specific_queue)
-        try: patient_queue_item = PatientInQueue(patient_obj, priority_level_str)
-        except ValueError as e: return False, f"Lỗi đăng ký: {e}", "ERROR"
-        clinic_specific_queue.add_item(patient_queue_item)
+            self.patient_name_index.remove_patient(patient_id_val, patient_to_delete.full_name)
+        self.service_time_estimator.discard_call(patient_id_val) # BN đã gọi nhưng chưa khám xong thì không còn lượt nào để đo
+        self._save_data_to_csv(PATIENTS_CSV_FILENAME, Patient, self.patient_records_table)
+        self._publish_change(change_events.PATIENT_DELETED, patient_id_val)
+        return True, f"Đã xóa BN {patient_id_val}.", "INFO"
+
+    def register_for_examination(self, patient_id_val, clinic_id_val, priority_level_str, registration_time=None):
+        # Đăng ký bệnh nhân vào hàng đợi khám. registration_time: thời điểm đăng ký (mặc định lúc gọi; BN có lịch hẹn dùng giờ hẹn).
+        # Giữ khóa đọc bảng BN/PK để BN, PK không bị xóa giữa chừng; chỉ khóa hàng đợi của PK này
+        with self._patient_table_lock.read_locked(), self._clinic_table_lock.read_locked():
+            patient_obj = self.patient_records_table.get_item(patient_id_val)
+            if not patient_obj: return False, f"Không tìm thấy BN mã {patient_id_val}.", "ERROR"
+            clinic_obj = self.clinic_records_table.get_item(clinic_id_val)
+            if not clinic_obj: return False, f"Không tìm thấy PK mã {clinic_id_val}.", "ERROR"
+            clinic_specific_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val, create_if_missing=True)
+            with queue_lock, self._queue_membership_lock:
+                # Kiểm tra BN đã có trong hàng đợi nào khác chưa
+                queued_clinic_id = self.queued_patient_clinic_index.get_item(patient_id_val)
+                if queued_clinic_id: return False, f"BN {patient_id_val} đã có trong HĐ PK {queued_clinic_id}.", "WARNING"
+                try: patient_queue_item = PatientInQueue(patient_obj, priority_level_str, registration_time or self.clock())
+                except ValueError as e: return False, f"Lỗi đăng ký: {e}", "ERROR"
+                clinic_specific_queue.add_item(patient_queue_item)
+                self.queued_patient_clinic_index.put_item(patient_id_val, clinic_id_val)
+                self._journal_queued(clinic_id_val, patient_queue_item)
+                self.clinic_load_index.update_queued_count(clinic_id_val, clinic_specific_queue.current_size)
+        self._publish_change(change_events.QUEUE_CHANGED, patient_id_val, clinic_id_val)
         return True, f"BN {patient_obj.full_name} đã thêm vào HĐ PK {clinic_id_val} ưu tiên '{priority_level_str}'.", "INFO"
 
+    def register_to_best_clinic_for_specialty(self, patient_id_val, specialty_text, priority_level_str):
+        # Đăng ký BN vào PK của chuyên khoa có tải thấp nhất (ít BN chờ trên mỗi BS), chọn O(1) từ chỉ mục tải.
+        # Trả về (mã PK đã đăng ký hoặc None, thông báo, mức).
+        if not specialty_text or not specialty_text.strip(): return None, "Chưa chọn chuyên khoa.", "ERROR"
+        best_clinic_id = self.clinic_load_index.find_best_clinic(specialty_text)
+        if best_clinic_id is None: return None, f"Không có PK nào thuộc chuyên khoa '{specialty_text.strip()}'.", "ERROR"
+        was_registered, msg, msg_level = self.register_for_examination(patient_id_val, best_clinic_id, priority_level_str)
+        return (best_clinic_id if was_registered else None), msg, msg_level
+
+    def list_clinic_specialties(self):
+        # Các chuyên khoa (đã chuẩn hóa chữ thường) có ít nhất một PK, dùng cho ô chọn chuyên khoa.
+        return self.clinic_load_index.list_specialties()
+
     def call_next_patient_for_exam(self, clinic_id_val):
-        # Gọi bệnh nhân tiếp theo từ hàng đợi của phòng khám.
-        clinic_queue = self.clinic_examination_queues.get_item(clinic_id_val)
-        if not clinic_queue or clinic_queue.is_empty(): return None, f"HĐ PK {clinic_id_val} rỗng.", "INFO"
-        exam_patient = clinic_queue.remove_first_item()
-        if exam_patient: return exam_patient, f"Gọi BN: {exam_patient.patient_profile.full_name} (ID: {exam_patient.patient_id}) từ PK {clinic_id_val}", "INFO"
+        # Gọi bệnh nhân tiếp theo từ hàng đợi của phòng khám (BN có lịch hẹn đã đến giờ được đưa vào hàng đợi trước).
+        self.admit_due_appointments()
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
+        if not clinic_queue: return None, f"HĐ PK {clinic_id_val} rỗng.", "INFO"
+        with queue_lock:
+            if clinic_queue.is_empty(): return None, f"HĐ PK {clinic_id_val} rỗng.", "INFO"
+            exam_patient = clinic_queue.remove_first_item()
+            if exam_patient:
+                with self._queue_membership_lock: self.queued_patient_clinic_index.delete_item(exam_patient.patient_id)
+                self._journal_removed(clinic_id_val, exam_patient.patient_id)
+                self.clinic_load_index.update_queued_count(clinic_id_val, clinic_queue.current_size)
+        if exam_patient:
+            self.service_time_estimator.record_call(clinic_id_val, exam_patient.patient_id, self.clock(), replaces_previous_clinic_call=True)
+            self._publish_change(change_events.QUEUE_CHANGED, exam_patient.patient_id, clinic_id_val)
+            return exam_patient, f"Gọi BN: {exam_patient.patient_profile.full_name} (ID: {exam_patient.patient_id}) từ PK {clinic_id_val}", "INFO"
         return None, f"Không có BN trong HĐ PK {clinic_id_val}.", "INFO"
 
     def complete_examination(self, patient_id_val, exam_type, exam_result, exam_notes="", attending_doctor_id="", exam_clinic_id=""):
         # Hoàn thành khám, lưu lịch sử khám cho bệnh nhân.
-        patient_obj = self.find_patient_by_id(patient_id_val)
-        if patient_obj:
-            patient_obj.add_examination_record(datetime.date.today(), exam_type, exam_result, exam_notes, attending_doctor_id, exam_clinic_id)
-            # Thêm vào danh sách đã khám trong ngày (nếu chưa có)
-            is_in_today_list = any(patient_obj.patient_id == self.examined_patients_today_list.get(i).patient_id for i in range(len(self.examined_patients_today_list)))
-            if not is_in_today_list: self.examined_patients_today_list.append(patient_obj)
-            self._save_data_to_csv(PATIENTS_CSV_FILENAME, Patient, self.patient_records_table)
-            return True, f"BN {patient_obj.full_name} đã khám xong (Loại: {exam_type}).", "INFO"
-        return False, f"Không tìm thấy BN {patient_id_val}.", "ERROR"
+        with self._patient_table_lock.write_locked():
+            patient_obj = self.patient_records_table.get_item(patient_id_val)
+            if not patient_obj: return False, f"Không tìm thấy BN {patient_id_val}.", "ERROR"
+            exam_date = self.clock().date()
+            patient_obj.add_examination_record(exam_date, exam_type, exam_result, exam_notes, attending_doctor_id, exam_clinic_id)
+            self.visit_statistics.record_visit(exam_date, exam_clinic_id, attending_doctor_id, exam_type)
+            # Thêm vào sổ đã khám của ngày (bỏ qua nếu đã có, O(1))
+            with self._examined_today_lock: self.examined_today_registry.record_examination(patient_obj, exam_date)
+        service_time_update = self.service_time_estimator.record_completion(patient_id_val, self.clock())
+        if service_time_update: self.clinic_load_index.update_service_time(*service_time_update)
+        self._save_data_to_csv(PATIENTS_CSV_FILENAME, Patient, self.patient_records_table)
+        self._publish_change(change_events.VISIT_ADDED, patient_id_val, exam_clinic_id or None, doctor_id=attending_doctor_id or None)
+        return True, f"BN {patient_obj.full_name} đã khám xong (Loại: {exam_type}).", "INFO"
+
+    def call_next_patient_for_doctor(self, clinic_id_val, doctor_id_val):
+        # Một BS của PK gọi BN tiếp theo vào ô khám của mình; các BS cùng PK gọi song song được.
+        # Lấy BN khỏi hàng đợi và đặt vào ô của BS trong cùng một lần giữ khóa hàng đợi (bàn giao nguyên tử).
+        self.admit_due_appointments()
+        with self._clinic_table_lock.read_locked(), self._doctor_table_lock.read_locked():
+            if not self.clinic_records_table.get_item(clinic_id_val): return None, f"Không tìm thấy PK {clinic_id_val}.", "ERROR"
+            if not self.doctor_clinic_assignments.has_link(doctor_id_val, clinic_id_val): return None, f"BS {doctor_id_val} không được gán cho PK {clinic_id_val}.", "ERROR"
+            clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val, create_if_missing=True)
+            exam_slots = self._get_clinic_exam_slots(clinic_id_val)
+            with queue_lock:
+                busy_exam = exam_slots.get_exam(doctor_id_val)
+                if busy_exam: return None, f"BS {doctor_id_val} đang khám BN {busy_exam.patient_id}.", "WARNING"
+                if clinic_queue.is_empty(): return None, f"HĐ PK {clinic_id_val} rỗng.", "INFO"
+                exam_patient = clinic_queue.remove_first_item()
+                with self._queue_membership_lock:
+                    self.queued_patient_clinic_index.delete_item(exam_patient.patient_id); self.examining_patient_slot_index.put_item(exam_patient.patient_id, (clinic_id_val, doctor_id_val))
+                self._journal_removed(clinic_id_val, exam_patient.patient_id)
+                self.clinic_load_index.update_queued_count(clinic_id_val, clinic_queue.current_size)
+                call_time = self.clock(); exam_slots.start_exam(doctor_id_val, exam_patient, call_time)
+        self.service_time_estimator.record_call(clinic_id_val, exam_patient.patient_id, call_time)
+        self._publish_change(change_events.QUEUE_CHANGED, exam_patient.patient_id, clinic_id_val, doctor_id=doctor_id_val)
+        return exam_patient, f"BS {doctor_id_val} gọi BN: {exam_patient.patient_profile.full_name} (ID: {exam_patient.patient_id}) từ PK {clinic_id_val}", "INFO"
+
+    def _claim_doctor_exam(self, clinic_id_val, doctor_id_val):
+        # Đánh dấu BN trong ô khám của BS là đang được kết thúc (BN vẫn ở trong ô đến khi xử lý xong).
+        # Trả về (ClinicExamSlots, khóa hàng đợi PK, InProgressExam, None) hoặc (None, None, None, kết quả lỗi).
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
+        if not clinic_queue: return None, None, None, (False, f"BS {doctor_id_val} chưa gọi BN nào tại PK {clinic_id_val}.", "ERROR")
+        exam_slots = self._get_clinic_exam_slots(clinic_id_val)
+        with queue_lock:
+            busy_exam = exam_slots.get_exam(doctor_id_val)
+            if not busy_exam: return None, None, None, (False, f"BS {doctor_id_val} chưa gọi BN nào tại PK {clinic_id_val}.", "ERROR")
+            in_progress_exam = exam_slots.claim_exam(doctor_id_val)
+            if not in_progress_exam: return None, None, None, (False, f"BN {busy_exam.patient_id} của BS {doctor_id_val} đang được xử lý, thử lại sau.", "WARNING")
+        return exam_slots, queue_lock, in_progress_exam, None
+
+    def complete_examination_for_doctor(self, clinic_id_val, doctor_id_val, exam_type, exam_result, exam_notes=""):
+        # BS hoàn thành khám BN đang ở ô của mình (ghi lịch sử với BS/PK này) và rảnh để gọi BN tiếp theo.
+        # Ô chỉ được trả sau khi ghi kết quả thành công; lỗi (ví dụ hồ sơ BN đã bị xóa) thì BN vẫn ở trong ô.
+        exam_slots, queue_lock, in_progress_exam, claim_error = self._claim_doctor_exam(clinic_id_val, doctor_id_val)
+        if claim_error: return claim_error
+        completion_result = None
+        try: completion_result = self.complete_examination(in_progress_exam.patient_id, exam_type, exam_result, exam_notes, doctor_id_val, clinic_id_val)
+        finally:
+            with queue_lock:
+                if completion_result and completion_result[0]:
+                    exam_slots.take_exam(doctor_id_val); exam_slots.record_completed(in_progress_exam, self.clock())
+                    with self._queue_membership_lock: self.examining_patient_slot_index.delete_item(in_progress_exam.patient_id)
+                else: exam_slots.release_claim(in_progress_exam)
+        return completion_result
+
+    def handle_absent_for_doctor(self, clinic_id_val, doctor_id_val):
+        # BN BS vừa gọi không có mặt: BS rảnh lại, BN được xử lý như handle_absent_called_patient.
+        exam_slots, queue_lock, in_progress_exam, claim_error = self._claim_doctor_exam(clinic_id_val, doctor_id_val)
+        if claim_error: return claim_error
+        with queue_lock:
+            exam_slots.take_exam(doctor_id_val); exam_slots.record_absent(in_progress_exam)
+            with self._queue_membership_lock: self.examining_patient_slot_index.delete_item(in_progress_exam.patient_id)
+        return self.handle_absent_called_patient(in_progress_exam.patient_in_queue, clinic_id_val)
+
+    def get_doctor_exam_in_progress(self, clinic_id_val, doctor_id_val):
+        # InProgressExam BS đang khám tại PK (None nếu BS đang rảnh).
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
+        if not clinic_queue: return None
+        exam_slots = self._get_clinic_exam_slots(clinic_id_val)
+        with queue_lock: return exam_slots.get_exam(doctor_id_val)
+
+    def get_clinic_exams_in_progress(self, clinic_id_val):
+        # List InProgressExam của mọi BS đang khám tại PK.
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
+        if not clinic_queue: return List()
+        exam_slots = self._get_clinic_exam_slots(clinic_id_val)
+        with queue_lock: return exam_slots.get_all_exams()
+
+    def get_doctor_throughput_report(self, clinic_id_val=None):
+        # Năng suất từng BS (theo PK) trong phiên làm việc: lượt gọi/khám xong/vắng, thời gian khám TB, số BN/giờ,
+        # BN đang khám. clinic_id_val=None: mọi PK. Trả về (list dict sắp theo mã PK, mã BS; thông báo; mức).
+        with self._clinic_table_lock.read_locked():
+            if clinic_id_val and not self.clinic_records_table.get_item(clinic_id_val): return None, f"Không tìm thấy PK {clinic_id_val}.", "ERROR"
+            clinic_ids_py = [clinic_id_val] if clinic_id_val else [clinic_obj.clinic_id for clinic_obj in self.clinic_records_table.iter_values()]
+        throughput_rows = []
+        for report_clinic_id in clinic_ids_py:
+            clinic_queue, queue_lock = self._get_clinic_queue_and_lock(report_clinic_id)
+            if not clinic_queue: continue
+            exam_slots = self._get_clinic_exam_slots(report_clinic_id)
+            with queue_lock:
+                for doctor_stats in exam_slots.get_all_throughput():
+                    average_service_seconds = doctor_stats.average_service_seconds(); in_progress_exam = exam_slots.get_exam(doctor_stats.doctor_id)
+                    throughput_rows.append({"clinic_id": report_clinic_id, "doctor_id": doctor_stats.doctor_id, "called": doctor_stats.called_count,
+                                            "completed": doctor_stats.completed_count, "absent": doctor_stats.absent_count,
+                                            "average_service_minutes": None if average_service_seconds is None else average_service_seconds / 60.0,
+                                            "completed_per_hour": doctor_stats.completed_per_hour(),
+                                            "in_progress_patient_id": in_progress_exam.patient_id if in_progress_exam else None})
+        throughput_rows.sort(key=lambda throughput_row: (throughput_row["clinic_id"], throughput_row["doctor_id"]))
+        if not throughput_rows: return throughput_rows, "Chưa có BS nào gọi BN theo ô khám.", "INFO"
+        return throughput_rows, f"Năng suất của {len(throughput_rows)} lượt BS-PK.", "INFO"
 
     def handle_absent_called_patient(self, absent_patient_obj, original_clinic_id):
         # Xử lý bệnh nhân được gọi nhưng vắng mặt.
         if not absent_patient_obj: return True, "Lỗi: Không có BN vắng mặt.", "ERROR"
-        clinic_queue = self.clinic_examination_queues.get_item(original_clinic_id)
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(original_clinic_id)
         if not clinic_queue: return True, f"Lỗi: Không tìm thấy HĐ PK {original_clinic_id}.", "ERROR"
-        absent_patient_obj.increment_absent_count()
-        msg = f"BN {absent_patient_obj.patient_id} vắng lần {absent_patient_obj.absent_count} tại PK {original_clinic_id}."
-        if absent_patient_obj.should_leave_queue(): return True, msg + f" BN bị loại.", "INFO" # Bị loại nếu vắng quá 3 lần
-        else: # Đưa lại vào hàng đợi với ưu tiên giảm (nếu có thể)
-            curr_prio = absent_patient_obj.priority; min_prio = min(PatientInQueue.PRIORITY_MAP.values())
-            if curr_prio > min_prio: absent_patient_obj.priority = max(min_prio, curr_prio - 1)
-            clinic_queue.add_item(absent_patient_obj)
-            return False, msg + f" BN đưa lại HĐ PK {original_clinic_id} ưu tiên '{absent_patient_obj.get_priority_display_name()}'.", "INFO"
+        self.service_time_estimator.discard_call(absent_patient_obj.patient_id) # Lượt gọi này không được khám
+        with queue_lock:
+            absent_patient_obj.increment_absent_count()
+            msg = f"BN {absent_patient_obj.patient_id} vắng lần {absent_patient_obj.absent_count} tại PK {original_clinic_id}."
+            if absent_patient_obj.should_leave_queue(): return True, msg + f" BN bị loại.", "INFO" # Bị loại nếu vắng quá 3 lần
+            with self._queue_membership_lock: # Đưa lại vào hàng đợi với ưu tiên giảm (nếu có thể)
+                queued_clinic_id = self.queued_patient_clinic_index.get_item(absent_patient_obj.patient_id)
+                if queued_clinic_id: return True, msg + f" BN đã đăng ký lại HĐ PK {queued_clinic_id}.", "INFO"
+                curr_prio = absent_patient_obj.priority; min_prio = min(PatientInQueue.PRIORITY_MAP.values())
+                if curr_prio > min_prio: absent_patient_obj.priority = max(min_prio, curr_prio - 1)
+                clinic_queue.add_item(absent_patient_obj)
+                self.queued_patient_clinic_index.put_item(absent_patient_obj.patient_id, original_clinic_id)
+            self._journal_queued(original_clinic_id, absent_patient_obj)
+            self.clinic_load_index.update_queued_count(original_clinic_id, clinic_queue.current_size)
+            msg += f" BN đưa lại HĐ PK {original_clinic_id} ưu tiên '{absent_patient_obj.get_priority_display_name()}'."
+        self._publish_change(change_events.QUEUE_CHANGED, absent_patient_obj.patient_id, original_clinic_id)
+        return False, msg, "INFO"
 
     def handle_patient_leaving_queue(self, patient_id_leaving, clinic_id_val):
         # Xử lý bệnh nhân tự ý rời hàng đợi.
-        clinic_queue = self.clinic_examination_queues.get_item(clinic_id_val)
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
         if not clinic_queue: return False, f"Không tìm thấy HĐ PK {clinic_id_val}.", "ERROR"
-        # Lấy tất cả BN trong heap, tìm BN cần xóa, tạo lại heap không có BN đó
-        all_q_patients_custom_array = clinic_queue.internal_heap.get_all_heap_elements()
-        temp_py_list_for_filtering = self._convert_custom_list_to_py_list(all_q_patients_custom_array)
-        patient_to_remove_instance = next((p for p in temp_py_list_for_filtering if p.patient_id == patient_id_leaving), None)
+        with queue_lock:
+            patient_to_remove_instance = clinic_queue.remove_item(patient_id_leaving)
+            if patient_to_remove_instance:
+                with self._queue_membership_lock: self.queued_patient_clinic_index.delete_item(patient_id_leaving)
+                self._journal_removed(clinic_id_val, patient_id_leaving)
+                self.clinic_load_index.update_queued_count(clinic_id_val, clinic_queue.current_size)
         if patient_to_remove_instance:
-            temp_py_list_for_filtering.remove(patient_to_remove_instance)
-            clinic_queue.internal_heap.heap_array = List(); # Reset heap
-            for p_item in temp_py_list_for_filtering: clinic_queue.internal_heap.add_item(p_item) # Thêm lại các BN còn lại
+            self._publish_change(change_events.QUEUE_CHANGED, patient_id_leaving, clinic_id_val)
             return True, f"BN {patient_id_leaving} đã xóa khỏi HĐ PK {clinic_id_val}.", "INFO"
         return False, f"Không tìm thấy BN {patient_id_leaving} trong HĐ PK {clinic_id_val}.", "ERROR"
 
     def get_clinic_queue_display_list(self, clinic_id_val):
         # Lấy danh sách chuỗi hiển thị hàng đợi của một phòng khám.
-        clinic_queue = self.clinic_examination_queues.get_item(clinic_id_val)
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
         empty_msg_list = List(); empty_msg_list.append(f"Hàng đợi PK {clinic_id_val} rỗng.")
-        if not clinic_queue or clinic_queue.is_empty(): return empty_msg_list
-        return clinic_queue.get_display_queue_as_strings(patient_in_queue_class_ref=PatientInQueue)
+        if not clinic_queue: return empty_msg_list
+        with queue_lock:
+            if clinic_queue.is_empty(): return empty_msg_list
+            return clinic_queue.get_display_queue_as_strings(patient_in_queue_class_ref=PatientInQueue)
+
+    def get_clinic_queue_items(self, clinic_id_val):
+        # Lấy List PatientInQueue theo thứ tự sẽ được gọi (None nếu PK không có hàng đợi).
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
+        if not clinic_queue: return None
+        with queue_lock: return clinic_queue.get_items_in_priority_order()
+
+    def _estimate_wait_for_ordering_key(self, clinic_id_val, clinic_queue, ordering_key):
+        # (số BN gọi trước khóa, thời gian chờ dự kiến theo giây); gọi khi đang giữ khóa hàng đợi PK.
+        patients_ahead_count = clinic_queue.count_items_ahead_of(ordering_key)
+        clinic_load = self.clinic_load_index.get_clinic_load(clinic_id_val)
+        return patients_ahead_count, self.service_time_estimator.estimate_wait_seconds(clinic_id_val, patients_ahead_count, clinic_load[1] if clinic_load else 0)
+
+    def estimate_wait_for_queued_patient(self, patient_id_val):
+        # Thời gian chờ dự kiến (giây) của BN đang chờ. Trả về ((mã PK, số BN phía trước, số giây) hoặc None, thông báo, mức).
+        with self._queue_membership_lock: clinic_id_val = self.queued_patient_clinic_index.get_item(patient_id_val)
+        if not clinic_id_val: return None, f"BN {patient_id_val} không có trong hàng đợi nào.", "ERROR"
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
+        if not clinic_queue: return None, f"Không tìm thấy HĐ PK {clinic_id_val}.", "ERROR"
+        with queue_lock:
+            queued_item = clinic_queue.find_item(patient_id_val)
+            if queued_item is None: return None, f"BN {patient_id_val} không còn trong HĐ PK {clinic_id_val}.", "ERROR"
+            patients_ahead_count, wait_seconds = self._estimate_wait_for_ordering_key(clinic_id_val, clinic_queue, queued_item.ordering_key)
+        return (clinic_id_val, patients_ahead_count, wait_seconds), f"BN {patient_id_val} còn {patients_ahead_count} BN phía trước tại PK {clinic_id_val}, dự kiến chờ khoảng {round(wait_seconds / 60)} phút.", "INFO"
+
+    def estimate_wait_for_new_registration(self, clinic_id_val, priority_level_str):
+        # Thời gian chờ dự kiến nếu đăng ký ngay bây giờ với mức ưu tiên này. Trả về ((số BN phía trước, số giây) hoặc None, thông báo, mức).
+        numeric_priority = PatientInQueue.PRIORITY_MAP.get(priority_level_str)
+        if numeric_priority is None: return None, f"Ưu tiên '{priority_level_str}' không hợp lệ.", "ERROR"
+        with self._clinic_table_lock.read_locked():
+            if not self.clinic_records_table.get_item(clinic_id_val): return None, f"Không tìm thấy PK mã {clinic_id_val}.", "ERROR"
+            clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val, create_if_missing=True)
+            with queue_lock: patients_ahead_count, wait_seconds = self._estimate_wait_for_ordering_key(clinic_id_val, clinic_queue, PatientInQueue.ordering_key_for_new_registration(numeric_priority, self.clock()))
+        return (patients_ahead_count, wait_seconds), f"Đăng ký PK {clinic_id_val} ưu tiên '{priority_level_str}' lúc này: {patients_ahead_count} BN phía trước, dự kiến chờ khoảng {round(wait_seconds / 60)} phút.", "INFO"
+
+    def get_clinic_queue_wait_estimates(self, clinic_id_val):
+        # List các (PatientInQueue, số giây chờ dự kiến) theo thứ tự sẽ được gọi (None nếu PK không có hàng đợi).
+        # BN thứ i (từ 0) có đúng i BN phía trước nên chỉ cần một lượt theo thứ tự gọi.
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
+        if not clinic_queue: return None
+        with queue_lock: ordered_items = clinic_queue.get_items_in_priority_order()
+        clinic_load = self.clinic_load_index.get_clinic_load(clinic_id_val)
+        seconds_per_patient = self.service_time_estimator.estimate_wait_seconds(clinic_id_val, 1, clinic_load[1] if clinic_load else 0)
+        wait_estimates = List()
+        for item_index in range(len(ordered_items)): wait_estimates.append((ordered_items.get(item_index), item_index * seconds_per_patient))
+        return wait_estimates
 
     def update_priority_for_long_waiters(self, clinic_id_val, max_wait_seconds=3600):
         # Tăng ưu tiên cho bệnh nhân chờ lâu (ví dụ: quá 1 giờ).
-        clinic_queue = self.clinic_examination_queues.get_item(clinic_id_val)
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
         if not clinic_queue: return 0, f"Không tìm thấy HĐ PK {clinic_id_val}.", "ERROR"
-        num_upd = clinic_queue.update_long_waiter_priority(max_wait_seconds, patient_in_queue_class_ref=PatientInQueue)
-        if num_upd > 0: return num_upd, f"Đã cập nhật ưu tiên cho {num_upd} BN chờ lâu tại PK {clinic_id_val}.", "INFO"
+        with queue_lock:
+            priorities_before_py = {queued_item.patient_id: queued_item.priority for queued_item in clinic_queue.get_all_items()} if self.clinic_queue_journal else None
+            num_upd = clinic_queue.update_long_waiter_priority(max_wait_seconds, patient_in_queue_class_ref=PatientInQueue, current_time=self.clock())
+            if num_upd and priorities_before_py is not None:
+                for queued_item in clinic_queue.get_all_items():
+                    if queued_item.priority != priorities_before_py.get(queued_item.patient_id): self._journal_queued(clinic_id_val, queued_item)
+        if num_upd > 0:
+            self._publish_change(change_events.QUEUE_CHANGED, None, clinic_id_val)
+            return num_upd, f"Đã cập nhật ưu tiên cho {num_upd} BN chờ lâu tại PK {clinic_id_val}.", "INFO"
         return 0, f"Không có BN tại PK {clinic_id_val} cần cập nhật ưu tiên.", "INFO"
 
     def change_patient_priority_in_queue(self, clinic_id_val, patient_id_val, new_priority_level_str):
         # Thay đổi mức độ ưu tiên của bệnh nhân trong hàng đợi.
         if new_priority_level_str not in PatientInQueue.PRIORITY_MAP: return False, f"Ưu tiên '{new_priority_level_str}' không hợp lệ.", "ERROR"
-        clinic_queue = self.clinic_examination_queues.get_item(clinic_id_val)
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
         if not clinic_queue: return False, f"Không tìm thấy HĐ PK {clinic_id_val}.", "ERROR"
-        success_flag = clinic_queue.change_queued_patient_priority(patient_id_val, new_priority_level_str, patient_in_queue_class_ref=PatientInQueue)
-        if success_flag: return True, f"Đã đổi ưu tiên BN {patient_id_val} tại PK {clinic_id_val} thành '{new_priority_level_str}'.", "INFO"
+        with queue_lock:
+            success_flag = clinic_queue.change_queued_patient_priority(patient_id_val, new_priority_level_str, patient_in_queue_class_ref=PatientInQueue)
+            if success_flag: self._journal_queued(clinic_id_val, clinic_queue.find_item(patient_id_val))
+        if success_flag:
+            self._publish_change(change_events.QUEUE_CHANGED, patient_id_val, clinic_id_val)
+            return True, f"Đã đổi ưu tiên BN {patient_id_val} tại PK {clinic_id_val} thành '{new_priority_level_str}'.", "INFO"
         return False, f"Không thể đổi ưu tiên BN {patient_id_val} tại PK {clinic_id_val}.", "ERROR"
 
-    def list_all_patients(self): return self.patient_records_table.get_all_values_as_list() # Lấy tất cả BN
-    def list_patients_examined_today(self): return self.examined_patients_today_list # Lấy BN đã khám trong ngày
+    # --- Lịch hẹn khám ---
+    def _generate_appointment_id(self): appointment_id_val = f"LH{self.next_appointment_id_counter:05d}"; self.next_appointment_id_counter += 1; return appointment_id_val
+
+    @staticmethod
+    def _parse_appointment_time(time_value):
+        # Nhận datetime hoặc chuỗi "YYYY-MM-DD HH:MM"; trả về datetime (tính theo phút) hoặc None nếu sai định dạng.
+        if isinstance(time_value, datetime.datetime): return time_value.replace(second=0, microsecond=0)
+        try: return datetime.datetime.strptime(str(time_value).strip(), APPOINTMENT_TIME_FORMAT)
+        except ValueError: return None
+
+    def _get_earliest_bookable_time(self):
+        # Phút tròn đầu tiên chưa qua (không đặt lịch hẹn trong quá khứ).
+        current_time = self.clock()
+        rounded_time = current_time.replace(second=0, microsecond=0)
+        return rounded_time if rounded_time == current_time else rounded_time + datetime.timedelta(minutes=1)
+
+    @staticmethod
+    def _parse_duration_minutes(duration_minutes):
+        try: duration_minutes = int(duration_minutes)
+        except (TypeError, ValueError): return None
+        return duration_minutes if duration_minutes > 0 else None
+
+    def book_appointment(self, patient_id_val, clinic_id_val, doctor_id_val, start_time_val, duration_minutes=DEFAULT_APPOINTMENT_MINUTES, priority_level_str="Thông thường"):
+        # Đặt lịch hẹn khám với BS tại PK trong khung [giờ hẹn, giờ hẹn + thời lượng). Kiểm tra trùng lịch của BS và của BN
+        # trên cây khoảng O(log n); nếu trùng thì gợi ý giờ trống gần nhất. Trả về (Appointment hoặc None, thông báo, mức).
+        start_time = self._parse_appointment_time(start_time_val)
+        if start_time is None: return None, f"Giờ hẹn '{start_time_val}' không đúng định dạng YYYY-MM-DD HH:MM.", "ERROR"
+        appointment_minutes = self._parse_duration_minutes(duration_minutes)
+        if appointment_minutes is None: return None, f"Thời lượng '{duration_minutes}' phải là số phút dương.", "ERROR"
+        if priority_level_str not in PatientInQueue.PRIORITY_MAP: return None, f"Ưu tiên '{priority_level_str}' không hợp lệ.", "ERROR"
+        if start_time < self._get_earliest_bookable_time(): return None, "Không thể đặt lịch hẹn vào thời điểm đã qua.", "ERROR"
+        end_time = start_time + datetime.timedelta(minutes=appointment_minutes)
+        with self._patient_table_lock.read_locked(), self._clinic_table_lock.read_locked(), self._doctor_table_lock.read_locked():
+            patient_obj = self.patient_records_table.get_item(patient_id_val)
+            if not patient_obj: return None, f"Không tìm thấy BN mã {patient_id_val}.", "ERROR"
+            if not self.clinic_records_table.get_item(clinic_id_val): return None, f"Không tìm thấy PK mã {clinic_id_val}.", "ERROR"
+            if not self.doctor_clinic_assignments.has_link(doctor_id_val, clinic_id_val): return None, f"BS {doctor_id_val} không được gán cho PK {clinic_id_val}.", "ERROR"
+            with self._appointment_table_lock.write_locked():
+                conflict_description = self.appointment_book.describe_conflict(doctor_id_val, patient_id_val, start_time, end_time)
+                if conflict_description:
+                    next_free_start = self.appointment_book.find_next_free_start(doctor_id_val, start_time, end_time - start_time, patient_id_val)
+                    return None, f"Trùng lịch: {conflict_description} Giờ trống gần nhất: {next_free_start.strftime(APPOINTMENT_TIME_FORMAT)}.", "WARNING"
+                appointment_obj = Appointment(self._generate_appointment_id(), patient_id_val, clinic_id_val, doctor_id_val, start_time, end_time, priority_level_str)
+                self.appointment_book.add_appointment(appointment_obj)
+        self._save_data_to_csv(APPOINTMENTS_CSV_FILENAME, Appointment, self.appointment_book)
+        self._publish_change(change_events.APPOINTMENT_CHANGED, appointment_obj.appointment_id, clinic_id_val, change_events.CHANGE_KIND_CREATED, doctor_id=doctor_id_val)
+        return appointment_obj, f"Đã đặt lịch hẹn {appointment_obj.appointment_id}: BN {patient_obj.full_name}, BS {doctor_id_val}, PK {clinic_id_val}, {start_time.strftime(APPOINTMENT_TIME_FORMAT)}-{end_time.strftime('%H:%M')}.", "INFO"
+
+    def cancel_appointment(self, appointment_id_val):
+        # Hủy lịch hẹn chưa đến giờ, trả lại khung giờ cho BS.
+        with self._appointment_table_lock.write_locked():
+            appointment_obj = self.appointment_book.get_appointment(appointment_id_val)
+            if not appointment_obj: return False, f"Không tìm thấy lịch hẹn {appointment_id_val}.", "ERROR"
+            if not appointment_obj.is_booked(): return False, f"Lịch hẹn {appointment_id_val} đã được xử lý ({appointment_obj.status}), không thể hủy.", "WARNING"
+            self.appointment_book.remove_appointment(appointment_id_val)
+        self._save_data_to_csv(APPOINTMENTS_CSV_FILENAME, Appointment, self.appointment_book)
+        self._publish_change(change_events.APPOINTMENT_CHANGED, appointment_id_val, appointment_obj.clinic_id, change_events.CHANGE_KIND_DELETED, doctor_id=appointment_obj.doctor_id)
+        return True, f"Đã hủy lịch hẹn {appointment_id_val}.", "INFO"
+
+    def find_next_free_appointment_slot(self, doctor_id_val, earliest_start_val=None, duration_minutes=DEFAULT_APPOINTMENT_MINUTES, patient_id_val=None):
+        # Giờ trống sớm nhất (không sớm hơn earliest_start_val và hiện tại) mà BS, và BN nếu có, đều rảnh trong suốt thời lượng.
+        # Trả về (datetime hoặc None, thông báo, mức).
+        earliest_start = self._get_earliest_bookable_time()
+        if earliest_start_val:
+            requested_start = self._parse_appointment_time(earliest_start_val)
+            if requested_start is None: return None, f"Giờ '{earliest_start_val}' không đúng định dạng YYYY-MM-DD HH:MM.", "ERROR"
+            earliest_start = max(earliest_start, requested_start)
+        appointment_minutes = self._parse_duration_minutes(duration_minutes)
+        if appointment_minutes is None: return None, f"Thời lượng '{duration_minutes}' phải là số phút dương.", "ERROR"
+        with self._appointment_table_lock.read_locked():
+            free_start = self.appointment_book.find_next_free_start(doctor_id_val, earliest_start, datetime.timedelta(minutes=appointment_minutes), patient_id_val or None)
+        return free_start, f"Giờ trống gần nhất của BS {doctor_id_val}: {free_start.strftime(APPOINTMENT_TIME_FORMAT)} ({appointment_minutes} phút).", "INFO"
+
+    def list_appointments(self, from_time=None, to_time=None, doctor_id_val=None, clinic_id_val=None, patient_id_val=None):
+        # List lịch hẹn (sắp theo giờ hẹn) có giờ bắt đầu trong [from_time, to_time), lọc theo BS / PK / BN nếu có.
+        with self._appointment_table_lock.read_locked():
+            return self.appointment_book.list_appointments(from_time, to_time, doctor_id_val or None, clinic_id_val or None, patient_id_val or None)
+
+    def has_due_appointments(self): # Có lịch hẹn "Đã đặt" đã đến giờ chưa (xem đỉnh đống, O(1))
+        with self._appointment_table_lock.read_locked(): return self.appointment_book.has_due_appointments(self.clock())
+
+    def _prune_finished_appointments(self):
+        # Sang ngày mới (chương trình chạy liên tục) thì bỏ lịch đã xử lý của các ngày trước như lúc tải CSV,
+        # để cây khung giờ và file lịch hẹn không lớn mãi. Cùng ngày thì chỉ so ngày, O(1).
+        today_date = self.clock().date()
+        if self._appointments_pruned_date == today_date: return 0 # Đường nhanh không cần khóa; kiểm tra lại dưới khóa
+        with self._appointment_table_lock.write_locked():
+            if self._appointments_pruned_date == today_date: return 0
+            self._appointments_pruned_date = today_date
+            pruned_count = self.appointment_book.prune_finished(datetime.datetime.combine(today_date, datetime.time()))
+        if pruned_count: self._save_data_to_csv(APPOINTMENTS_CSV_FILENAME, Appointment, self.appointment_book)
+        return pruned_count
+
+    def admit_due_appointments(self):
+        # Đưa BN có lịch hẹn đã đến giờ vào hàng đợi PK với thời điểm đăng ký = giờ hẹn, nên BN đứng trước các BN cùng mức
+        # ưu tiên đến sau giờ hẹn. Lịch của ngày đã qua (chương trình tắt cả ngày) được đánh dấu quá hạn.
+        # Không có lịch nào đến giờ thì chỉ xem đỉnh đống (O(1)). Trả về (List lịch đã vào hàng đợi, thông báo, mức);
+        # lịch không vào được hàng đợi được nêu kèm lý do trong thông báo (mức WARNING).
+        self._prune_finished_appointments()
+        if not self.has_due_appointments(): return List(), "Chưa có lịch hẹn nào đến giờ.", "INFO"
+        current_time = self.clock()
+        with self._appointment_table_lock.write_locked(): due_appointments = self.appointment_book.pop_due_appointments(current_time) # Mỗi lịch chỉ được lấy ra một lần
+        admitted_appointments = List(); new_status_by_appointment = []; skipped_reasons_py = []
+        for appointment_obj in due_appointments:
+            if appointment_obj.start_time.date() < current_time.date(): new_status_by_appointment.append((appointment_obj, Appointment.STATUS_EXPIRED)); continue
+            was_registered, register_msg, _msg_level = self.register_for_examination(appointment_obj.patient_id, appointment_obj.clinic_id, appointment_obj.priority_level_str, registration_time=appointment_obj.start_time)
+            if was_registered: admitted_appointments.append(appointment_obj)
+            else: skipped_reasons_py.append(f"{appointment_obj.appointment_id}: {register_msg}")
+            new_status_by_appointment.append((appointment_obj, Appointment.STATUS_ADMITTED if was_registered else Appointment.STATUS_SKIPPED))
+        with self._appointment_table_lock.write_locked():
+            for appointment_obj, new_status in new_status_by_appointment:
+                if self.appointment_book.get_appointment(appointment_obj.appointment_id) is appointment_obj: self.appointment_book.set_status(appointment_obj, new_status) # Bỏ qua lịch vừa bị hủy
+        self._save_data_to_csv(APPOINTMENTS_CSV_FILENAME, Appointment, self.appointment_book)
+        for appointment_obj, _new_status in new_status_by_appointment: self._publish_change(change_events.APPOINTMENT_CHANGED, appointment_obj.appointment_id, appointment_obj.clinic_id, change_events.CHANGE_KIND_UPDATED, doctor_id=appointment_obj.doctor_id)
+        admit_msg = f"Đã đưa {len(admitted_appointments)}/{len(due_appointments)} BN có lịch hẹn đến giờ vào hàng đợi."
+        if skipped_reasons_py: return admitted_appointments, admit_msg + " Không vào được HĐ: " + "; ".join(skipped_reasons_py), "WARNING"
+        return admitted_appointments, admit_msg, "INFO"
+
+    def list_all_patients(self): # Lấy tất cả BN (ảnh chụp: người gọi dùng sau khi đã nhả khóa)
+        with self._patient_table_lock.read_locked(): return self.patient_records_table.get_all_values_as_list()
+    def list_patients_examined_today(self): # Lấy BN đã khám trong ngày (bản sao, an toàn khi luồng khác đang thêm)
+        examined_today_copy = ChunkedList()
+        with self._examined_today_lock:
+            for patient_obj in self.examined_today_registry.get_today_record(): examined_today_copy.append(patient_obj)
+        return examined_today_copy
+    def is_patient_examined_today(self, patient_id_val):
+        with self._examined_today_lock: return self.examined_today_registry.is_examined_today(patient_id_val)
+    def list_patients_examined_on(self, day_date_val):
+        # BN đã khám trong một ngày (date hoặc chuỗi YYYY-MM-DD; None nếu ngày không hợp lệ).
+        # Ngày đang giữ trong sổ thì lấy thẳng, ngày khác dựng lại từ lịch sử khám.
+        if isinstance(day_date_val, str):
+            try: day_date_val = datetime.datetime.strptime(day_date_val.strip(), DATE_FORMAT_CSV).date()
+            except ValueError: return None
+        examined_day_copy = ChunkedList()
+        with self._patient_table_lock.read_locked():
+            with self._examined_today_lock: day_record = self.examined_today_registry.get_day_record(day_date_val)
+            if day_record is None: day_record = ExaminedTodayRegistry.rebuild_day_from_history(day_date_val, self.patient_records_table.iter_values())
+            with self._examined_today_lock:
+                for patient_obj in day_record: examined_day_copy.append(patient_obj)
+        return examined_day_copy
+
+    def reset_clinic_queues(self):
+        # Làm rỗng hàng đợi của mọi PK (ví dụ khi bắt đầu ngày làm việc mới).
+        with self._clinic_table_lock.read_locked():
+            all_clinic_ids_py = [clinic_obj.clinic_id for clinic_obj in self.clinic_records_table.iter_values()]
+            for clinic_id_val in all_clinic_ids_py:
+                clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val, create_if_missing=True)
+                with queue_lock, self._queue_membership_lock:
+                    for queued_item in clinic_queue.get_all_items(): self.queued_patient_clinic_index.delete_item(queued_item.patient_id)
+                    clinic_queue.replace_all_items(())
+                    self._journal_cleared(clinic_id_val)
+                    self.clinic_load_index.update_queued_count(clinic_id_val, 0)
+        for clinic_id_val in all_clinic_ids_py: self._publish_change(change_events.QUEUE_CHANGED, None, clinic_id_val)
 
     def advanced_patient_search(self, **search_criteria):
         # Tìm kiếm bệnh nhân nâng cao theo nhiều tiêu chí.
-        phone_query_exact = search_criteria.get("phone_number_exact", "").strip()
-        national_id_query_exact = search_criteria.get("national_id_exact", "").strip()
-
-        # Ưu tiên tìm kiếm chính xác bằng RadixTree nếu có SĐT hoặc CCCD chính xác
-        if phone_query_exact:
-            patient_id_found = self.search_patient_by_phone_radix(phone_query_exact)
-            if patient_id_found:
-                patient_obj = self.find_patient_by_id(patient_id_found)
-                if patient_obj: result = List(); result.append(patient_obj); return result
-            return List() # Trả về list rỗng nếu không tìm thấy
-        if national_id_query_exact:
-            patient_id_found = self.search_patient_by_national_id_radix(national_id_query_exact)
-            if patient_id_found:
-                patient_obj = self.find_patient_by_id(patient_id_found)
-                if patient_obj: result = List(); result.append(patient_obj); return result
-            return List()
-
-        # Tìm kiếm chứa (contains) nếu không có SĐT/CCCD chính xác
-        results_list = List(); all_pats = self.patient_records_table.get_all_values_as_list()
-        name_query = search_criteria.get("full_name", "").lower().strip()
-        phone_query_contains = search_criteria.get("phone_number", "").strip()
-        dob_query_str = search_criteria.get("date_of_birth", "").strip()
-        national_id_query_contains = search_criteria.get("national_id", "").strip()
-        health_ins_query = search_criteria.get("health_insurance_id", "").strip()
-        dob_query_date = None
-        if dob_query_str:
-            try: dob_query_date = datetime.datetime.strptime(dob_query_str, DATE_FORMAT_CSV).date()
-            except ValueError: pass # Bỏ qua nếu ngày sinh không hợp lệ cho tìm kiếm chứa
-        for i in range(len(all_pats)):
-            pat = all_pats.get(i)
-            match_name = (not name_query) or (name_query in pat.full_name.lower())
-            match_phone = (not phone_query_contains) or (phone_query_contains in pat.phone_number)
-            match_dob = True # Mặc định là true nếu không có dob_query_str
-            if dob_query_str: match_dob = (dob_query_date is not None and pat.date_of_birth == dob_query_date)
-            match_nat_id = (not national_id_query_contains) or (national_id_query_contains.lower() in pat.national_id.lower())
-            match_health_ins = (not health_ins_query) or (health_ins_query.lower() in pat.health_insurance_id.lower())
-            if match_name and match_phone and match_dob and match_nat_id and match_health_ins: results_list.append(pat)
-        return results_list
+        with self._patient_table_lock.read_locked(): # Duyệt bảng BN dưới khóa đọc
+            phone_query_exact = search_criteria.get("phone_number_exact", "").strip()
+            national_id_query_exact = search_criteria.get("national_id_exact", "").strip()
+
+            # Ưu tiên tìm kiếm chính xác bằng RadixTree nếu có SĐT hoặc CCCD chính xác
+            if phone_query_exact:
+                patient_id_found = self.search_patient_by_phone_radix(phone_query_exact)
+                if patient_id_found:
+                    patient_obj = self.find_patient_by_id(patient_id_found)
+                    if patient_obj: result = List(); result.append(patient_obj); return result
+                return List() # Trả về list rỗng nếu không tìm thấy
+            if national_id_query_exact:
+                patient_id_found = self.search_patient_by_national_id_radix(national_id_query_exact)
+                if patient_id_found:
+                    patient_obj = self.find_patient_by_id(patient_id_found)
+                    if patient_obj: result = List(); result.append(patient_obj); return result
+                return List()
+
+            # Tìm kiếm chứa (contains) nếu không có SĐT/CCCD chính xác
+            results_list = List()
+            name_query = search_criteria.get("full_name", "").lower().strip()
+            phone_query_contains = search_criteria.get("phone_number", "").strip()
+            dob_query_str = search_criteria.get("date_of_birth", "").strip()
+            national_id_query_contains = search_criteria.get("national_id", "").strip()
+            health_ins_query = search_criteria.get("health_insurance_id", "").strip()
+            dob_query_date = None
+            if dob_query_str:
+                try: dob_query_date = datetime.datetime.strptime(dob_query_str, DATE_FORMAT_CSV).date()
+                except ValueError: pass # Bỏ qua nếu ngày sinh không hợp lệ cho tìm kiếm chứa
+            def matches_other_criteria(pat):
+                match_phone = (not phone_query_contains) or (phone_query_contains in pat.phone_number)
+                match_dob = True # Mặc định là true nếu không có dob_query_str
+                if dob_query_str: match_dob = (dob_query_date is not None and pat.date_of_birth == dob_query_date)
+                match_nat_id = (not national_id_query_contains) or (national_id_query_contains.lower() in pat.national_id.lower())
+                match_health_ins = (not health_ins_query) or (health_ins_query.lower() in pat.health_insurance_id.lower())
+                return match_phone and match_dob and match_nat_id and match_health_ins
+            for pat in self.patient_records_table.iter_values():
+                match_name = (not name_query) or (name_query in pat.full_name.lower())
+                if match_name and matches_other_criteria(pat): results_list.append(pat)
+            if results_list.is_empty() and name_query:
+                # Không BN nào có họ tên chứa chuỗi đã nhập (gõ sai / không dấu): lấy các BN có họ tên gần đúng, gần nhất trước
+                for pat, _name_distance in self._find_patients_by_similar_name(name_query, limit=None):
+                    if matches_other_criteria(pat): results_list.append(pat)
+            return results_list
+
+    def fuzzy_search_patients_by_name(self, name_query, max_distance=DEFAULT_MAX_NAME_EDIT_DISTANCE, limit=DEFAULT_FUZZY_NAME_LIMIT):
+        # Tối đa limit BN có họ tên (bỏ dấu) gần name_query nhất: List các (Patient, số ký tự sai), gần nhất trước.
+        with self._patient_table_lock.read_locked(): return self._find_patients_by_similar_name(name_query, max_distance, limit)
+
+    def _find_patients_by_similar_name(self, name_query, max_distance=DEFAULT_MAX_NAME_EDIT_DISTANCE, limit=DEFAULT_FUZZY_NAME_LIMIT):
+        # Gọi khi đã giữ khóa bảng BN.
+        similar_patients = List()
+        for patient_id_val, name_distance in self.patient_name_index.search(name_query, max_distance, limit):
+            patient_obj = self.patient_records_table.get_item(patient_id_val)
+            if patient_obj: similar_patients.append((patient_obj, name_distance))
+        return similar_patients
 
     def search_patient_by_phone_radix(self, phone_number):
         # Tìm patient_id bằng SĐT (chính xác) qua RadixTree.
         if not phone_number or not isinstance(phone_number, str): return None
-        return self.phone_radix_tree.search(phone_number.strip())
+        with self._patient_table_lock.read_locked(): return self.phone_radix_tree.search(phone_number.strip())
 
     def search_patient_by_national_id_radix(self, national_id):
         # Tìm patient_id bằng CCCD (chính xác) qua RadixTree.
         if not national_id or not isinstance(national_id, str): return None
-        return self.national_id_radix_tree.search(national_id.strip())
+        with self._patient_table_lock.read_locked(): return self.national_id_radix_tree.search(national_id.strip())
 
     # --- Quản lý Bác sĩ ---
     def _generate_doctor_id(self): doc_id = f"BS{self.next_doctor_id_counter:03d}"; self.next_doctor_id_counter += 1; return doc_id
     def create_doctor(self, doctor_name_val, specialty_val):
         # Tạo bác sĩ mới.
         if not doctor_name_val.strip() or not specialty_val.strip(): return None, "Họ tên BS và chuyên khoa là bắt buộc.", "ERROR"
-        new_doc_id = self._generate_doctor_id()
-        if self.doctor_records_table.contains_key(new_doc_id): return None, f"Mã BS {new_doc_id} đã tồn tại.", "ERROR"
-        doc_obj = Doctor(new_doc_id, doctor_name_val, specialty_val)
-        self.doctor_records_table.put_item(new_doc_id, doc_obj); self._save_data_to_csv(DOCTORS_CSV_FILENAME, Doctor, self.doctor_records_table)
+        with self._doctor_table_lock.write_locked():
+            new_doc_id = self._generate_doctor_id()
+            if self.doctor_records_table.contains_key(new_doc_id): return None, f"Mã BS {new_doc_id} đã tồn tại.", "ERROR"
+            doc_obj = Doctor(new_doc_id, doctor_name_val, specialty_val)
+            self.doctor_records_table.put_item(new_doc_id, doc_obj)
+        self._save_data_to_csv(DOCTORS_CSV_FILENAME, Doctor, self.doctor_records_table)
+        self._publish_change(change_events.DOCTOR_CHANGED, new_doc_id, change_kind=change_events.CHANGE_KIND_CREATED)
         return doc_obj, f"Đã tạo BS: {new_doc_id}", "INFO"
 
-    def find_doctor_by_id(self, doctor_id_val): return self.doctor_records_table.get_item(doctor_id_val)
+    def find_doctor_by_id(self, doctor_id_val):
+        with self._doctor_table_lock.read_locked(): return self.doctor_records_table.get_item(doctor_id_val)
     def update_doctor_info(self, doctor_id_val, new_name=None, new_specialty=None):
         # Cập nhật thông tin bác sĩ.
-        doc_obj = self.find_doctor_by_id(doctor_id_val);
-        if not doc_obj: return False, f"Không tìm thấy BS {doctor_id_val}.", "ERROR"
-        was_upd = False
-        if new_name is not None and new_name.strip() and doc_obj.doctor_name != new_name.strip(): doc_obj.doctor_name = new_name.strip(); was_upd = True
-        if new_specialty is not None and new_specialty.strip() and doc_obj.specialty != new_specialty.strip(): doc_obj.specialty = new_specialty.strip(); was_upd = True
-        if was_upd: self._save_data_to_csv(DOCTORS_CSV_FILENAME, Doctor, self.doctor_records_table); return True, f"Đã cập nhật BS {doctor_id_val}.", "INFO"
+        with self._doctor_table_lock.write_locked():
+            doc_obj = self.doctor_records_table.get_item(doctor_id_val)
+            if not doc_obj: return False, f"Không tìm thấy BS {doctor_id_val}.", "ERROR"
+            was_upd = False
+            if new_name is not None and new_name.strip() and doc_obj.doctor_name != new_name.strip(): doc_obj.doctor_name = new_name.strip(); was_upd = True
+            if new_specialty is not None and new_specialty.strip() and doc_obj.specialty != new_specialty.strip(): doc_obj.specialty = new_specialty.strip(); was_upd = True
+        if was_upd:
+            self._save_data_to_csv(DOCTORS_CSV_FILENAME, Doctor, self.doctor_records_table)
+            self._publish_change(change_events.DOCTOR_CHANGED, doctor_id_val, change_kind=change_events.CHANGE_KIND_UPDATED)
+            return True, f"Đã cập nhật BS {doctor_id_val}.", "INFO"
         return False, f"Không có thay đổi cho BS {doctor_id_val}.", "INFO"
 
     def delete_doctor(self, doctor_id_val):
         # Xóa bác sĩ. Đồng thời xóa BS khỏi danh sách của các PK liên quan.
-        if self.doctor_records_table.delete_item(doctor_id_val):
-            all_clinics_list = self.clinic_records_table.get_all_values_as_list()
-            for i in range(len(all_clinics_list)): # Duyệt qua các PK
-                clinic_obj = all_clinics_list.get(i)
-                # Tạo danh sách BS mới cho PK, loại bỏ BS bị xóa
-                new_doc_id_list_for_clinic = List()
-                for j in range(len(clinic_obj.doctor_id_list)):
-                    if clinic_obj.doctor_id_list.get(j) != doctor_id_val: new_doc_id_list_for_clinic.append(clinic_obj.doctor_id_list.get(j))
-                clinic_obj.doctor_id_list = new_doc_id_list_for_clinic
+        with self._clinic_table_lock.write_locked(), self._doctor_table_lock.write_locked():
+            for clinic_id_val in self.doctor_clinic_assignments.get_right_keys(doctor_id_val):
+                busy_exam = self._find_doctor_exam_in_clinic(doctor_id_val, clinic_id_val)
+                if busy_exam: return False, f"Không thể xóa BS {doctor_id_val} vì đang khám BN {busy_exam.patient_id} tại PK {clinic_id_val}.", "ERROR"
+            with self._appointment_table_lock.read_locked(): booked_appointment = self.appointment_book.find_booked_appointment(doctor_id_val=doctor_id_val)
+            if booked_appointment: return False, f"Không thể xóa BS {doctor_id_val} vì còn lịch hẹn {booked_appointment.appointment_id}.", "ERROR"
+            was_deleted = self.doctor_records_table.delete_item(doctor_id_val)
+            if was_deleted:
+                # Chỉ duyệt các PK mà BS này được gán
+                affected_clinic_ids = self.doctor_clinic_assignments.remove_left_key(doctor_id_val)
+                for clinic_id_val in affected_clinic_ids:
+                    clinic_obj = self.clinic_records_table.get_item(clinic_id_val)
+                    if clinic_obj: self._remove_id_from_custom_list(clinic_obj.doctor_id_list, doctor_id_val)
+                self._refresh_doctor_counts(affected_clinic_ids)
+        if was_deleted:
             self._save_data_to_csv(DOCTORS_CSV_FILENAME, Doctor, self.doctor_records_table)
             self._save_data_to_csv(CLINICS_CSV_FILENAME, Clinic, self.clinic_records_table) # Lưu lại PK vì DS BS đã đổi
+            self._publish_change(change_events.DOCTOR_CHANGED, doctor_id_val, change_kind=change_events.CHANGE_KIND_DELETED)
+            self._publish_change(change_events.CLINIC_CHANGED, None, change_kind=change_events.CHANGE_KIND_ASSIGNMENT, doctor_id=doctor_id_val)
             return True, f"Đã xóa BS {doctor_id_val}.", "INFO"
         return False, f"Không tìm thấy BS {doctor_id_val}.", "ERROR"
-    def list_all_doctors(self): return self.doctor_records_table.get_all_values_as_list()
+    def list_all_doctors(self):
+        with self._doctor_table_lock.read_locked(): return self.doctor_records_table.get_all_values_as_list()
+    def get_clinic_ids_for_doctor(self, doctor_id_val): # List mã PK mà BS được gán
+        with self._clinic_table_lock.read_locked(), self._doctor_table_lock.read_locked(): return self.doctor_clinic_assignments.get_right_keys(doctor_id_val)
+    def get_doctor_ids_for_clinic(self, clinic_id_val): # List mã BS được gán cho PK
+        with self._clinic_table_lock.read_locked(), self._doctor_table_lock.read_locked(): return self.doctor_clinic_assignments.get_left_keys(clinic_id_val)
+    def is_doctor_assigned_to_clinic(self, doctor_id_val, clinic_id_val):
+        with self._clinic_table_lock.read_locked(), self._doctor_table_lock.read_locked(): return self.doctor_clinic_assignments.has_link(doctor_id_val, clinic_id_val)
 
     # --- Quản lý Phòng khám ---
     def _generate_clinic_id(self): clinic_id_val = f"PK{self.next_clinic_id_counter:03d}"; self.next_clinic_id_counter += 1; return clinic_id_val
     def create_clinic(self, clinic_name_val, clinic_specialty_val):
         # Tạo phòng khám mới.
         if not clinic_name_val.strip() or not clinic_specialty_val.strip(): return None, "Tên PK và chuyên khoa là bắt buộc.", "ERROR"
-        new_clinic_id = self._generate_clinic_id()
-        if self.clinic_records_table.contains_key(new_clinic_id): return None, f"Mã PK {new_clinic_id} đã tồn tại.", "ERROR"
-        clinic_obj = Clinic(new_clinic_id, clinic_name_val, clinic_specialty_val)
-        self.clinic_records_table.put_item(new_clinic_id, clinic_obj)
-        self.clinic_examination_queues.put_item(new_clinic_id, CustomPriorityQueue()) # Tạo hàng đợi mới cho PK
+        with self._clinic_table_lock.write_locked():
+            new_clinic_id = self._generate_clinic_id()
+            if self.clinic_records_table.contains_key(new_clinic_id): return None, f"Mã PK {new_clinic_id} đã tồn tại.", "ERROR"
+            clinic_obj = Clinic(new_clinic_id, clinic_name_val, clinic_specialty_val)
+            self.clinic_records_table.put_item(new_clinic_id, clinic_obj)
+            self._get_clinic_queue_and_lock(new_clinic_id, create_if_missing=True) # Tạo hàng đợi mới cho PK
+            self._index_clinic_load(clinic_obj)
         self._save_data_to_csv(CLINICS_CSV_FILENAME, Clinic, self.clinic_records_table)
+        self._publish_change(change_events.CLINIC_CHANGED, new_clinic_id, new_clinic_id, change_events.CHANGE_KIND_CREATED)
         return clinic_obj, f"Đã tạo PK: {new_clinic_id}", "INFO"
 
-    def find_clinic_by_id(self, clinic_id_val): return self.clinic_records_table.get_item(clinic_id_val)
+    def find_clinic_by_id(self, clinic_id_val):
+        with self._clinic_table_lock.read_locked(): return self.clinic_records_table.get_item(clinic_id_val)
     def update_clinic_info(self, clinic_id_val, new_name=None, new_specialty=None):
         # Cập nhật thông tin phòng khám.
-        clinic_obj = self.find_clinic_by_id(clinic_id_val);
-        if not clinic_obj: return False, f"Không tìm thấy PK {clinic_id_val}.", "ERROR"
-        was_upd = False
-        if new_name is not None and new_name.strip() and clinic_obj.clinic_name != new_name.strip(): clinic_obj.clinic_name = new_name.strip(); was_upd = True
-        if new_specialty is not None and new_specialty.strip() and clinic_obj.clinic_specialty != new_specialty.strip(): clinic_obj.clinic_specialty = new_specialty.strip(); was_upd = True
-        if was_upd: self._save_data_to_csv(CLINICS_CSV_FILENAME, Clinic, self.clinic_records_table); return True, f"Đã cập nhật PK {clinic_id_val}.", "INFO"
+        with self._clinic_table_lock.write_locked():
+            clinic_obj = self.clinic_records_table.get_item(clinic_id_val)
+            if not clinic_obj: return False, f"Không tìm thấy PK {clinic_id_val}.", "ERROR"
+            was_upd = False
+            if new_name is not None and new_name.strip() and clinic_obj.clinic_name != new_name.strip(): clinic_obj.clinic_name = new_name.strip(); was_upd = True
+            if new_specialty is not None and new_specialty.strip() and clinic_obj.clinic_specialty != new_specialty.strip():
+                clinic_obj.clinic_specialty = new_specialty.strip(); was_upd = True
+                self.clinic_load_index.set_clinic(clinic_id_val, clinic_obj.clinic_specialty)
+        if was_upd:
+            self._save_data_to_csv(CLINICS_CSV_FILENAME, Clinic, self.clinic_records_table)
+            self._publish_change(change_events.CLINIC_CHANGED, clinic_id_val, clinic_id_val, change_events.CHANGE_KIND_UPDATED)
+            return True, f"Đã cập nhật PK {clinic_id_val}.", "INFO"
         return False, f"Không có thay đổi cho PK {clinic_id_val}.", "INFO"
 
     def delete_clinic(self, clinic_id_val):
         # Xóa phòng khám. Chỉ xóa nếu hàng đợi của PK đó rỗng.
-        clinic_queue = self.clinic_examination_queues.get_item(clinic_id_val)
-        if clinic_queue and not clinic_queue.is_empty(): return False, f"Không thể xóa PK {clinic_id_val} vì còn BN trong HĐ.", "ERROR"
-        if self.clinic_records_table.delete_item(clinic_id_val):
-            self.clinic_examination_queues.delete_item(clinic_id_val) # Xóa hàng đợi của PK
-            # Xóa PK này khỏi danh sách làm việc của các BS liên quan
-            all_doctors_list = self.doctor_records_table.get_all_values_as_list()
-            for i in range(len(all_doctors_list)):
-                doc_obj = all_doctors_list.get(i)
-                new_clinic_id_list_for_doc = List()
-                for j in range(len(doc_obj.clinic_id_list)):
-                    if doc_obj.clinic_id_list.get(j) != clinic_id_val: new_clinic_id_list_for_doc.append(doc_obj.clinic_id_list.get(j))
-                doc_obj.clinic_id_list = new_clinic_id_list_for_doc
+        with self._clinic_table_lock.write_locked(), self._doctor_table_lock.write_locked():
+            clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
+            if clinic_queue:
+                with queue_lock:
+                    if not clinic_queue.is_empty(): return False, f"Không thể xóa PK {clinic_id_val} vì còn BN trong HĐ.", "ERROR"
+                    if self._get_clinic_exam_slots(clinic_id_val).has_exams(): return False, f"Không thể xóa PK {clinic_id_val} vì còn BN đang khám.", "ERROR"
+            with self._appointment_table_lock.read_locked(): booked_appointment = self.appointment_book.find_booked_appointment(clinic_id_val=clinic_id_val)
+            if booked_appointment: return False, f"Không thể xóa PK {clinic_id_val} vì còn lịch hẹn {booked_appointment.appointment_id}.", "ERROR"
+            was_deleted = self.clinic_records_table.delete_item(clinic_id_val)
+            if was_deleted:
+                with self._clinic_queue_registry_lock: # Xóa hàng đợi của PK
+                    self.clinic_examination_queues.delete_item(clinic_id_val); self._clinic_queue_locks.delete_item(clinic_id_val); self.clinic_exam_slots.delete_item(clinic_id_val)
+                self.clinic_load_index.remove_clinic(clinic_id_val); self.service_time_estimator.remove_clinic(clinic_id_val)
+                # Xóa PK này khỏi danh sách làm việc của các BS được gán cho PK
+                for doctor_id_val in self.doctor_clinic_assignments.remove_right_key(clinic_id_val):
+                    doc_obj = self.doctor_records_table.get_item(doctor_id_val)
+                    if doc_obj: self._remove_id_from_custom_list(doc_obj.clinic_id_list, clinic_id_val)
+        if was_deleted:
             self._save_data_to_csv(CLINICS_CSV_FILENAME, Clinic, self.clinic_records_table)
             self._save_data_to_csv(DOCTORS_CSV_FILENAME, Doctor, self.doctor_records_table) # Lưu BS vì DS PK đã đổi
+            self._publish_change(change_events.CLINIC_CHANGED, clinic_id_val, clinic_id_val, change_events.CHANGE_KIND_DELETED)
+            self._publish_change(change_events.DOCTOR_CHANGED, None, clinic_id_val, change_events.CHANGE_KIND_ASSIGNMENT)
             return True, f"Đã xóa PK {clinic_id_val}.", "INFO"
         return False, f"Không tìm thấy PK {clinic_id_val}.", "ERROR"
-    def list_all_clinics(self): return self.clinic_records_table.get_all_values_as_list()
+    def list_all_clinics(self):
+        with self._clinic_table_lock.read_locked(): return self.clinic_records_table.get_all_values_as_list()
 
     def assign_doctor_to_clinic(self, doctor_id_val, clinic_id_val):
         # Gán một bác sĩ vào một phòng khám.
-        doc_obj = self.find_doctor_by_id(doctor_id_val); clinic_obj = self.find_clinic_by_id(clinic_id_val)
-        if not doc_obj: return False, f"Không tìm thấy BS {doctor_id_val}.", "ERROR"
-        if not clinic_obj: return False, f"Không tìm thấy PK {clinic_id_val}.", "ERROR"
-        was_upd = False
-        # Kiểm tra và thêm BS vào danh sách của PK
-        doc_already_in_clinic = any(clinic_obj.doctor_id_list.get(i) == doctor_id_val for i in range(len(clinic_obj.doctor_id_list)))
-        if not doc_already_in_clinic: clinic_obj.doctor_id_list.append(doctor_id_val); was_upd = True
-        # Kiểm tra và thêm PK vào danh sách của BS
-        clinic_already_in_doc_list = any(doc_obj.clinic_id_list.get(i) == clinic_id_val for i in range(len(doc_obj.clinic_id_list)))
-        if not clinic_already_in_doc_list: doc_obj.clinic_id_list.append(clinic_id_val); was_upd = True
+        with self._clinic_table_lock.write_locked(), self._doctor_table_lock.write_locked():
+            doc_obj = self.doctor_records_table.get_item(doctor_id_val); clinic_obj = self.clinic_records_table.get_item(clinic_id_val)
+            if not doc_obj: return False, f"Không tìm thấy BS {doctor_id_val}.", "ERROR"
+            if not clinic_obj: return False, f"Không tìm thấy PK {clinic_id_val}.", "ERROR"
+            was_upd = self.doctor_clinic_assignments.add_link(doctor_id_val, clinic_id_val) # O(1), False nếu đã gán
+            if was_upd: clinic_obj.doctor_id_list.append(doctor_id_val); doc_obj.clinic_id_list.append(clinic_id_val); self._refresh_doctor_counts((clinic_id_val,))
         if was_upd:
             self._save_data_to_csv(CLINICS_CSV_FILENAME, Clinic, self.clinic_records_table)
             self._save_data_to_csv(DOCTORS_CSV_FILENAME, Doctor, self.doctor_records_table)
+            self._publish_assignment_change(doctor_id_val, clinic_id_val)
             return True, f"Đã gán BS {doctor_id_val} cho PK {clinic_id_val}.", "INFO"
         return False, f"BS {doctor_id_val} đã được gán cho PK {clinic_id_val} từ trước.", "INFO"
 
     def remove_doctor_from_clinic(self, doctor_id_val, clinic_id_val):
         # Xóa một bác sĩ khỏi một phòng khám.
-        doc_obj = self.find_doctor_by_id(doctor_id_val); clinic_obj = self.find_clinic_by_id(clinic_id_val)
-        if not doc_obj: return False, f"Không tìm thấy BS {doctor_id_val}.", "ERROR"
-        if not clinic_obj: return False, f"Không tìm thấy PK {clinic_id_val}.", "ERROR"
-        was_removed = False
-        # Xóa BS khỏi danh sách của PK
-        new_doc_id_list_for_clinic = List()
-        for i in range(len(clinic_obj.doctor_id_list)):
-            if clinic_obj.doctor_id_list.get(i) != doctor_id_val: new_doc_id_list_for_clinic.append(clinic_obj.doctor_id_list.get(i))
-            else: was_removed = True
-        clinic_obj.doctor_id_list = new_doc_id_list_for_clinic
-        # Xóa PK khỏi danh sách của BS
-        new_clinic_id_list_for_doc = List()
-        for i in range(len(doc_obj.clinic_id_list)):
-            if doc_obj.clinic_id_list.get(i) != clinic_id_val: new_clinic_id_list_for_doc.append(doc_obj.clinic_id_list.get(i))
-            else: was_removed = True
-        doc_obj.clinic_id_list = new_clinic_id_list_for_doc
+        with self._clinic_table_lock.write_locked(), self._doctor_table_lock.write_locked():
+            doc_obj = self.doctor_records_table.get_item(doctor_id_val); clinic_obj = self.clinic_records_table.get_item(clinic_id_val)
+            if not doc_obj: return False, f"Không tìm thấy BS {doctor_id_val}.", "ERROR"
+            if not clinic_obj: return False, f"Không tìm thấy PK {clinic_id_val}.", "ERROR"
+            busy_exam = self._find_doctor_exam_in_clinic(doctor_id_val, clinic_id_val)
+            if busy_exam: return False, f"BS {doctor_id_val} đang khám BN {busy_exam.patient_id} tại PK {clinic_id_val}, hãy hoàn thành trước.", "ERROR"
+            with self._appointment_table_lock.read_locked(): booked_appointment = self.appointment_book.find_booked_appointment(doctor_id_val=doctor_id_val, clinic_id_val=clinic_id_val)
+            if booked_appointment: return False, f"BS {doctor_id_val} còn lịch hẹn {booked_appointment.appointment_id} tại PK {clinic_id_val}, hãy hủy lịch trước.", "ERROR"
+            was_removed = self.doctor_clinic_assignments.remove_link(doctor_id_val, clinic_id_val)
+            if was_removed:
+                self._remove_id_from_custom_list(clinic_obj.doctor_id_list, doctor_id_val)
+                self._remove_id_from_custom_list(doc_obj.clinic_id_list, clinic_id_val)
+                self._refresh_doctor_counts((clinic_id_val,))
         if was_removed:
             self._save_data_to_csv(CLINICS_CSV_FILENAME, Clinic, self.clinic_records_table)
             self._save_data_to_csv(DOCTORS_CSV_FILENAME, Doctor, self.doctor_records_table)
+            self._publish_assignment_change(doctor_id_val, clinic_id_val)
             return True, f"Đã xóa BS {doctor_id_val} khỏi PK {clinic_id_val}.", "INFO"
         return False, f"BS {doctor_id_val} không có trong PK {clinic_id_val}.", "INFO"
 
+    def _find_doctor_exam_in_clinic(self, doctor_id_val, clinic_id_val):
+        # InProgressExam của BS tại PK hoặc None (gọi khi giữ khóa bảng PK/BS, không tạo hàng đợi/ô khám mới).
+        clinic_queue, queue_lock = self._get_clinic_queue_and_lock(clinic_id_val)
+        with self._clinic_queue_registry_lock: exam_slots = self.clinic_exam_slots.get_item(clinic_id_val)
+        if not clinic_queue or exam_slots is None: return None
+        with queue_lock: return exam_slots.get_exam(doctor_id_val)
+
+    def _publish_assignment_change(self, doctor_id_val, clinic_id_val):
+        # Gán / bỏ gán BS-PK làm thay đổi cả hai danh sách.
+        self._publish_change(change_events.DOCTOR_CHANGED, doctor_id_val, clinic_id_val, change_events.CHANGE_KIND_ASSIGNMENT)
+        self._publish_change(change_events.CLINIC_CHANGED, clinic_id_val, clinic_id_val, change_events.CHANGE_KIND_ASSIGNMENT)
+
+    def get_patient_examination_history(self, patient_id_val):
+        # Lấy bản sao lịch sử khám của một BN (None nếu không tìm thấy BN).
+        with self._patient_table_lock.read_locked():
+            patient_obj = self.patient_records_table.get_item(patient_id_val)
+            if not patient_obj: return None
+            history_records_custom_array = List()
+            for history_item_dict in patient_obj.examination_history: history_records_custom_array.append(dict(history_item_dict))
+            return history_records_custom_array
+
     def _collect_all_examination_history(self):
         # Thu thập tất cả lịch sử khám từ tất cả bệnh nhân.
         all_history_records_custom_array = List()
-        all_patients_custom_array = self.patient_records_table.get_all_values_as_list()
-        for i in range(len(all_patients_custom_array)):
-            patient_obj = all_patients_custom_array.get(i)
-            if isinstance(patient_obj, Patient):
-                for history_item_dict in patient_obj.examination_history: # Duyệt LinkedList lịch sử của BN
-                    record_copy = dict(history_item_dict) # Tạo bản sao
-                    record_copy['ma_bn'] = patient_obj.patient_id # Thêm mã và tên BN vào bản ghi
-                    record_copy['ho_ten_bn'] = patient_obj.full_name
-                    all_history_records_custom_array.append(record_copy)
+        with self._patient_table_lock.read_locked():
+            for patient_obj in self.patient_records_table.iter_values():
+                if isinstance(patient_obj, Patient):
+                    for history_item_dict in patient_obj.examination_history: # Duyệt lịch sử của BN
+                        record_copy = dict(history_item_dict) # Tạo bản sao
+                        record_copy['ma_bn'] = patient_obj.patient_id # Thêm mã và tên BN vào bản ghi
+                        record_copy['ho_ten_bn'] = patient_obj.full_name
+                        all_history_records_custom_array.append(record_copy)
         return all_history_records_custom_array
 
+    def get_visit_statistics_summary(self, from_date_str=None, to_date_str=None):
+        # Thống kê lượt khám theo PK/BS/loại khám/ngày trong khoảng ngày (đọc từ bộ đếm, không duyệt lịch sử).
+        from_date_obj = None; to_date_obj = None
+        if from_date_str:
+            try: from_date_obj = datetime.datetime.strptime(from_date_str, DATE_FORMAT_CSV).date()
+            except ValueError: return None, f"Từ ngày '{from_date_str}' không hợp lệ.", "ERROR"
+        if to_date_str:
+            try: to_date_obj = datetime.datetime.strptime(to_date_str, DATE_FORMAT_CSV).date()
+            except ValueError: return None, f"Đến ngày '{to_date_str}' không hợp lệ.", "ERROR"
+        if from_date_obj and to_date_obj and from_date_obj > to_date_obj: return None, "'Từ ngày' không được lớn hơn 'Đến ngày'.", "ERROR"
+        with self._patient_table_lock.read_locked(): summary_dict = self.visit_statistics.build_summary(from_date_obj, to_date_obj)
+        if summary_dict["total_visits"] == 0: return summary_dict, "Không có lượt khám trong khoảng ngày đã chọn.", "INFO"
+        return summary_dict, f"Có {summary_dict['total_visits']} lượt khám trong {len(summary_dict['daily_totals'])} ngày.", "INFO"
+
+    def count_visits_for_clinic(self, clinic_id_val, from_date=None, to_date=None): # O(số ngày)
+        with self._patient_table_lock.read_locked(): return self.visit_statistics.count_visits_for_clinic(clinic_id_val, from_date, to_date)
+    def count_visits_for_doctor(self, doctor_id_val, from_date=None, to_date=None): # O(số ngày)
+        with self._patient_table_lock.read_locked(): return self.visit_statistics.count_visits_for_doctor(doctor_id_val, from_date, to_date)
+
+    def build_history_analytics(self, use_numpy=None):
+        # Ảnh chụp dạng cột của toàn bộ lịch sử khám cho phân tích dài hạn (NumPy nếu có, không thì Python thuần).
+        try:
+            with self._patient_table_lock.read_locked(): history_columns = ExaminationHistoryColumns.from_patients(self.patient_records_table.iter_values(), use_numpy=use_numpy)
+        except ImportError as e: return None, str(e), "ERROR"
+        backend_name = "NumPy" if history_columns.use_numpy else "Python thuần"
+        return history_columns, f"Đã dựng kho phân tích {history_columns.row_count} lượt khám ({backend_name}).", "INFO"
+
     def filter_examination_history(self, from_date_str=None, to_date_str=None, doctor_id_filter=None, clinic_id_filter=None):
         # Lọc lịch sử khám bệnh theo các tiêu chí.
         all_history_custom_array = self._collect_all_examination_history()
@@ -0,0 +1,157 @@
+# appointment_schedule.py
+# Sổ lịch hẹn khám theo khung giờ của từng BS tại PK.
+# Mỗi BS và mỗi BN có một IntervalTree các khung giờ đang giữ chỗ: kiểm tra trùng lịch và tìm giờ trống
+# gần nhất đủ dài đều O(log n). Lịch hẹn chưa đến giờ nằm trong một IndexedMinHeap theo giờ bắt đầu, nên kiểm tra
+# "đã có lịch đến giờ chưa" chỉ xem đỉnh đống O(1); đến giờ thì MedicalSystemLogic đưa BN vào hàng đợi PK.
+# Kiểm tra "BN/BS/PK còn lịch Đã đặt không" (chặn xóa) chỉ đọc lịch của chủ đó, không duyệt cả sổ.
+# Sổ không có khóa riêng: MedicalSystemLogic giữ khóa bảng lịch hẹn khi gọi.
+from custom_structures import HashTable, IndexedMinHeap, IntervalTree, List
+from models import Appointment
+
+SLOT_HOLDING_STATUSES = (Appointment.STATUS_BOOKED, Appointment.STATUS_ADMITTED) # Trạng thái còn giữ khung giờ của BS/BN
+
+
+class AppointmentBook:
+    """Các lịch hẹn theo mã, cây khoảng theo BS và theo BN, và đống các lịch hẹn chờ đến giờ."""
+    def __init__(self):
+        self._appointments_by_id = HashTable(initial_table_size=64) # mã lịch hẹn -> Appointment
+        self._schedule_by_doctor = HashTable(initial_table_size=32) # mã BS -> IntervalTree (giá trị: Appointment)
+        self._schedule_by_patient = HashTable(initial_table_size=64) # mã BN -> IntervalTree
+        self._pending_by_start = IndexedMinHeap(initial_table_size=64) # mã lịch hẹn "Đã đặt" -> (giờ bắt đầu, mã)
+        self._booked_by_clinic = HashTable(initial_table_size=32) # mã PK -> HashTable (mã lịch hẹn "Đã đặt" -> Appointment)
+
+    def __len__(self): return len(self._appointments_by_id)
+    def iter_values(self): return self._appointments_by_id.iter_values() # Để ghi CSV như các bảng băm
+    def get_appointment(self, appointment_id_val): return self._appointments_by_id.get_item(appointment_id_val)
+
+    @staticmethod
+    def _get_schedule(schedule_table, owner_id, create_if_missing=False):
+        owner_schedule = schedule_table.get_item(owner_id)
+        if owner_schedule is None and create_if_missing: owner_schedule = IntervalTree(); schedule_table.put_item(owner_id, owner_schedule)
+        return owner_schedule
+
+    def _find_conflict(self, schedule_table, owner_id, start_time, end_time):
+        owner_schedule = self._get_schedule(schedule_table, owner_id)
+        overlapping_interval = owner_schedule.find_overlapping(start_time, end_time) if owner_schedule else None
+        return overlapping_interval[2] if overlapping_interval else None
+
+    def find_doctor_conflict(self, doctor_id_val, start_time, end_time): return self._find_conflict(self._schedule_by_doctor, doctor_id_val, start_time, end_time)
+    def find_patient_conflict(self, patient_id_val, start_time, end_time): return self._find_conflict(self._schedule_by_patient, patient_id_val, start_time, end_time)
+
+    def describe_conflict(self, doctor_id_val, patient_id_val, start_time, end_time):
+        # Mô tả lịch hẹn đã có trùng khung giờ với BS hoặc với BN, hoặc None nếu cả hai đều trống.
+        for owner_label, owner_id, conflicting_appointment in (("BS", doctor_id_val, self.find_doctor_conflict(doctor_id_val, start_time, end_time)),
+                                                               ("BN", patient_id_val, self.find_patient_conflict(patient_id_val, start_time, end_time))):
+            if conflicting_appointment:
+                return f"{owner_label} {owner_id} đã có lịch hẹn {conflicting_appointment.appointment_id} ({conflicting_appointment.start_time.strftime('%Y-%m-%d %H:%M')}-{conflicting_appointment.end_time.strftime('%H:%M')})."
+        return None
+
+    def find_next_free_start(self, doctor_id_val, earliest_start, duration, patient_id_val=None):
+        # Giờ bắt đầu sớm nhất >= earliest_start mà BS (và BN nếu có) đều trống trong suốt duration.
+        # Lần lượt nhảy qua lịch của BS rồi của BN cho đến khi cả hai cùng trống; mỗi bước O(log n).
+        doctor_schedule = self._get_schedule(self._schedule_by_doctor, doctor_id_val)
+        patient_schedule = self._get_schedule(self._schedule_by_patient, patient_id_val) if patient_id_val else None
+        candidate_start = earliest_start
+        while True:
+            if doctor_schedule: candidate_start = doctor_schedule.find_first_free_start(candidate_start, duration)
+            if not patient_schedule: return candidate_start
+            patient_free_start = patient_schedule.find_first_free_start(candidate_start, duration)
+            if patient_free_start == candidate_start: return candidate_start
+            candidate_start = patient_free_start
+
+    def _hold_slot(self, appointment_obj):
+        self._get_schedule(self._schedule_by_doctor, appointment_obj.doctor_id, create_if_missing=True).insert(appointment_obj.start_time, appointment_obj.end_time, appointment_obj)
+        self._get_schedule(self._schedule_by_patient, appointment_obj.patient_id, create_if_missing=True).insert(appointment_obj.start_time, appointment_obj.end_time, appointment_obj)
+
+    def _release_slot(self, appointment_obj):
+        for schedule_table, owner_id in ((self._schedule_by_doctor, appointment_obj.doctor_id), (self._schedule_by_patient, appointment_obj.patient_id)):
+            owner_schedule = schedule_table.get_item(owner_id)
+            if owner_schedule is None: continue
+            owner_schedule.remove(appointment_obj.start_time)
+            if owner_schedule.is_empty(): schedule_table.delete_item(owner_id)
+
+    def _track_booked_in_clinic(self, appointment_obj, is_booked):
+        clinic_booked_table = self._booked_by_clinic.get_item(appointment_obj.clinic_id)
+        if is_booked:
+            if clinic_booked_table is None: clinic_booked_table = HashTable(initial_table_size=16); self._booked_by_clinic.put_item(appointment_obj.clinic_id, clinic_booked_table)
+            clinic_booked_table.put_item(appointment_obj.appointment_id, appointment_obj)
+        elif clinic_booked_table is not None and clinic_booked_table.delete_item(appointment_obj.appointment_id) and len(clinic_booked_table) == 0: self._booked_by_clinic.delete_item(appointment_obj.clinic_id)
+
+    def add_appointment(self, appointment_obj):
+        # Thêm lịch hẹn; báo ValueError nếu trùng mã hoặc trùng khung giờ với lịch khác của BS / của BN.
+        if self._appointments_by_id.contains_key(appointment_obj.appointment_id): raise ValueError(f"Mã lịch hẹn {appointment_obj.appointment_id} đã tồn tại.")
+        if not appointment_obj.start_time < appointment_obj.end_time: raise ValueError("Giờ kết thúc phải sau giờ bắt đầu.")
+        if appointment_obj.status in SLOT_HOLDING_STATUSES:
+            conflict_description = self.describe_conflict(appointment_obj.doctor_id, appointment_obj.patient_id, appointment_obj.start_time, appointment_obj.end_time)
+            if conflict_description: raise ValueError(conflict_description)
+            self._hold_slot(appointment_obj)
+        self._appointments_by_id.put_item(appointment_obj.appointment_id, appointment_obj)
+        if appointment_obj.is_booked(): self._pending_by_start.put_item(appointment_obj.appointment_id, (appointment_obj.start_time, appointment_obj.appointment_id)); self._track_booked_in_clinic(appointment_obj, True)
+
+    def remove_appointment(self, appointment_id_val):
+        # Xóa lịch hẹn (hủy hẹn), trả lại khung giờ; trả về Appointment đã xóa hoặc None.
+        appointment_obj = self._appointments_by_id.get_item(appointment_id_val)
+        if appointment_obj is None: return None
+        if appointment_obj.status in SLOT_HOLDING_STATUSES: self._release_slot(appointment_obj)
+        self._pending_by_start.delete_item(appointment_id_val); self._track_booked_in_clinic(appointment_obj, False)
+        self._appointments_by_id.delete_item(appointment_id_val)
+        return appointment_obj
+
+    def set_status(self, appointment_obj, new_status):
+        # Đổi trạng thái; lịch không vào được hàng đợi / quá hạn thì trả lại khung giờ.
+        if appointment_obj.status in SLOT_HOLDING_STATUSES and new_status not in SLOT_HOLDING_STATUSES: self._release_slot(appointment_obj)
+        appointment_obj.status = new_status
+        if not appointment_obj.is_booked(): self._pending_by_start.delete_item(appointment_obj.appointment_id)
+        self._track_booked_in_clinic(appointment_obj, appointment_obj.is_booked())
+
+    def has_due_appointments(self, current_time):
+        earliest_pending = self._pending_by_start.peek_min()
+        return earliest_pending is not None and not current_time < earliest_pending[1][0]
+
+    def pop_due_appointments(self, current_time):
+        # Lấy (theo giờ hẹn) các lịch "Đã đặt" có giờ bắt đầu <= current_time ra khỏi đống chờ; trạng thái do người gọi đặt.
+        due_appointments = List()
+        while self.has_due_appointments(current_time):
+            appointment_id_val, _start_key = self._pending_by_start.peek_min()
+            self._pending_by_start.delete_item(appointment_id_val)
+            due_appointments.append(self._appointments_by_id.get_item(appointment_id_val))
+        return due_appointments
+
+    def list_appointments(self, from_time=None, to_time=None, doctor_id_val=None, clinic_id_val=None, patient_id_val=None):
+        # Lịch hẹn có giờ bắt đầu trong [from_time, to_time), sắp theo giờ. Lọc theo BS (hoặc BN) thì đọc thẳng
+        # khoảng giờ trên cây của BS đó (chỉ gồm lịch còn giữ khung giờ); không thì duyệt toàn bộ sổ.
+        owner_schedule = None
+        if doctor_id_val: owner_schedule = self._get_schedule(self._schedule_by_doctor, doctor_id_val)
+        elif patient_id_val: owner_schedule = self._get_schedule(self._schedule_by_patient, patient_id_val)
+        if doctor_id_val or patient_id_val:
+            if owner_schedule is None: return List()
+            candidate_appointments = (appointment_obj for _start, _end, appointment_obj in owner_schedule.iter_items(from_time, to_time))
+        else:
+            candidate_appointments = sorted((appointment_obj for appointment_obj in self._appointments_by_id.iter_values()
+                                             if (from_time is None or not appointment_obj.start_time < from_time) and (to_time is None or appointment_obj.start_time < to_time)),
+                                            key=lambda appointment_obj: (appointment_obj.start_time, appointment_obj.appointment_id))
+        return List.from_iterable(appointment_obj for appointment_obj in candidate_appointments
+                                  if (not clinic_id_val or appointment_obj.clinic_id == clinic_id_val) and (not patient_id_val or appointment_obj.patient_id == patient_id_val))
+
+    def find_booked_appointment(self, patient_id_val=None, doctor_id_val=None, clinic_id_val=None):
+        # Một lịch "Đã đặt" (chưa đến giờ) khớp mọi điều kiện đã cho, hoặc None; dùng để chặn xóa BN/BS/PK còn lịch hẹn.
+        # Lịch "Đã đặt" luôn giữ khung giờ, nên chỉ cần đọc cây khoảng của BN / của BS, hoặc các lịch "Đã đặt" của PK.
+        if patient_id_val or doctor_id_val:
+            owner_schedule = self._get_schedule(self._schedule_by_patient, patient_id_val) if patient_id_val else self._get_schedule(self._schedule_by_doctor, doctor_id_val)
+            candidate_appointments = (appointment_obj for _start, _end, appointment_obj in owner_schedule.iter_items()) if owner_schedule else ()
+        elif clinic_id_val:
+            clinic_booked_table = self._booked_by_clinic.get_item(clinic_id_val)
+            candidate_appointments = clinic_booked_table.iter_values() if clinic_booked_table else ()
+        else: candidate_appointments = self._appointments_by_id.iter_values()
+        for appointment_obj in candidate_appointments:
+            if appointment_obj.is_booked() and (not patient_id_val or appointment_obj.patient_id == patient_id_val) \
+                    and (not doctor_id_val or appointment_obj.doctor_id == doctor_id_val) and (not clinic_id_val or appointment_obj.clinic_id == clinic_id_val):
+                return appointment_obj
+        return None
+
+    def prune_finished(self, before_time):
+        # Bỏ các lịch đã xử lý xong (không còn "Đã đặt") kết thúc trước before_time để sổ và file CSV không lớn mãi.
+        finished_ids = [appointment_obj.appointment_id for appointment_obj in self._appointments_by_id.iter_values()
+                        if not appointment_obj.is_booked() and appointment_obj.end_time < before_time]
+        for appointment_id_val in finished_ids: self.remove_appointment(appointment_id_val)
+        return len(finished_ids)
@@ -0,0 +1,90 @@
+# benchmarks/bench_common.py
+# Hàm dùng chung cho các script đo hiệu năng (không import GUI).
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+
+@contextlib.contextmanager
+def silence_stdout():
+    # Tắt các lệnh print của app_logic khi đo (tránh đo cả thời gian in ra terminal).
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def summarize_samples(samples_seconds, ops_per_sample=1):
+    # Tóm tắt các lần đo (giây) thành dict thống kê.
+    ordered = sorted(samples_seconds)
+    per_op = [s / ops_per_sample for s in ordered]
+    return {
+        "samples": len(ordered), "ops_per_sample": ops_per_sample,
+        "min_s": per_op[0], "median_s": statistics.median(per_op), "mean_s": statistics.fmean(per_op), "max_s": per_op[-1],
+        "ops_per_s": (ops_per_sample / statistics.median(ordered)) if statistics.median(ordered) > 0 else None,
+    }
+
+
+def time_callable(func, repeat=5, ops_per_call=1, setup=None):
+    # Đo func() `repeat` lần; setup() (nếu có) chạy trước mỗi lần và không tính giờ.
+    samples = []
+    last_result = None
+    for _ in range(repeat):
+        setup_state = setup() if setup else None
+        start = time.perf_counter()
+        last_result = func(setup_state) if setup else func()
+        samples.append(time.perf_counter() - start)
+    return summarize_samples(samples, ops_per_call), last_result
+
+
+def get_git_revision():
+    # Lấy mã commit hiện tại để so sánh kết quả giữa các commit.
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+        return revision + ("-dirty" if dirty else "") if revision else None
+    except (OSError, subprocess.SubprocessError): return None
+
+
+def build_result_document(suite_name, parameters, results):
+    # Gói kết quả kèm metadata máy/commit thành dict (ghi ra JSON).
+    return {
+        "suite": suite_name, "created_at": datetime.datetime.now().isoformat(timespec="seconds"), "git_revision": get_git_revision(),
+        "python": platform.python_version(), "implementation": platform.python_implementation(), "platform": platform.platform(),
+        "parameters": parameters, "results": results,
+    }
+
+
+def write_result_document(result_document, output_path):
+    # Ghi kết quả ra file JSON (hoặc stdout nếu output_path là "-").
+    text = json.dumps(result_document, ensure_ascii=False, indent=2)
+    if output_path == "-": print(text); return
+    with open(output_path, 'w', encoding='utf-8') as f: f.write(text + "\n")
+
+
+def print_result_table(results):
+    # In bảng tóm tắt dễ đọc ra stderr.
+    for bench_name, stats in results.items():
+        if not isinstance(stats, dict) or "median_s" not in stats: continue
+        print(f"{bench_name:<48} median {stats['median_s'] * 1e3:>11.3f} ms/op   min {stats['min_s'] * 1e3:>11.3f} ms/op", file=sys.stderr)
+
+
+def compare_result_files(baseline_path, candidate_path):
+    # So sánh 2 file kết quả (median), in tỉ lệ candidate/baseline.
+    with open(baseline_path, encoding='utf-8') as f: baseline = json.load(f)
+    with open(candidate_path, encoding='utf-8') as f: candidate = json.load(f)
+    print(f"baseline : {baseline.get('git_revision')} ({baseline_path})")
+    print(f"candidate: {candidate.get('git_revision')} ({candidate_path})")
+    for bench_name, candidate_stats in candidate.get("results", {}).items():
+        baseline_stats = baseline.get("results", {}).get(bench_name)
+        if not isinstance(candidate_stats, dict) or "median_s" not in candidate_stats: continue
+        if not baseline_stats or not baseline_stats.get("median_s"): print(f"{bench_name:<48} (mới)"); continue
+        ratio = candidate_stats["median_s"] / baseline_stats["median_s"]
+        print(f"{bench_name:<48} {baseline_stats['median_s'] * 1e3:>11.3f} -> {candidate_stats['median_s'] * 1e3:>11.3f} ms/op  x{ratio:.2f}")
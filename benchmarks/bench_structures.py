@@ -0,0 +1,438 @@
+# benchmarks/bench_structures.py
+# Đo vi mô (microbenchmark) các cấu trúc trong custom_structures, so với cài đặt cũ khi có.
+#
+# Ví dụ:
+#   python benchmarks/bench_structures.py --sizes 1000,10000,100000
+#   python benchmarks/bench_structures.py --only list --output bench_structures.json
+#   python benchmarks/bench_structures.py --only hash_table --sizes 10000,100000,1000000 --repeat 3
+#   python benchmarks/bench_structures.py --only heap --sizes 10,100,1000,10000,100000
+#   python benchmarks/bench_structures.py --only clinic_queue --sizes 100,10000,100000
+#   python benchmarks/bench_structures.py --only interval_tree --sizes 1000,10000,100000
+#   python benchmarks/bench_structures.py --only name_index --sizes 10000,200000 --repeat 3
+import argparse
+import bisect
+import datetime
+import random
+import sys
+import types
+
+from bench_common import time_callable, build_result_document, write_result_document
+
+from custom_structures import BKTree, BucketedPriorityQueue, ChunkedList, CustomPriorityQueue, HashTable, IntervalTree, LinkedList, List, MaxHeap, RobinHoodHashTable, edit_distance
+from models import PatientInQueue
+from patient_name_index import fold_name_for_search
+from synthetic_data import HO_LIST, TEN_DEM_NAM, TEN_DEM_NU, TEN_NAM, TEN_NU
+
+
+class LegacyList:
+    """List trước khi chuyển sang dịch chuyển theo khối (sao chép từng phần tử), giữ lại để so sánh."""
+    def __init__(self, initial_capacity=10):
+        self._capacity = initial_capacity
+        self._size = 0
+        self._elements = [None] * self._capacity
+
+    def __len__(self):
+        return self._size
+
+    def is_empty(self):
+        return self._size == 0
+
+    def _resize(self, new_capacity):
+        # Thay đổi kích thước mảng nội bộ.
+        new_elements = [None] * new_capacity
+        for i in range(self._size):
+            new_elements[i] = self._elements[i]
+        self._elements = new_elements
+        self._capacity = new_capacity
+
+    def append(self, item):
+        # Thêm phần tử vào cuối.
+        if self._size == self._capacity:
+            self._resize(2 * self._capacity if self._capacity > 0 else 1)
+        self._elements[self._size] = item
+        self._size += 1
+
+    def get(self, index):
+        # Lấy phần tử tại chỉ mục.
+        if not (0 <= index < self._size):
+            raise IndexError("List: Chỉ mục ngoài phạm vi")
+        return self._elements[index]
+
+    def set(self, index, item):
+        # Đặt giá trị phần tử tại chỉ mục.
+        if not (0 <= index < self._size):
+            raise IndexError("List: Chỉ mục ngoài phạm vi để đặt giá trị")
+        self._elements[index] = item
+
+    def insert(self, index, item):
+        # Chèn phần tử vào chỉ mục.
+        if not (0 <= index <= self._size):
+            raise IndexError("List: Chỉ mục chèn ngoài phạm vi")
+        if self._size == self._capacity:
+            self._resize(2 * self._capacity if self._capacity > 0 else 1)
+        for i in range(self._size, index, -1):
+            self._elements[i] = self._elements[i-1]
+        self._elements[index] = item
+        self._size += 1
+
+    def pop(self, index=-1):
+        # Xóa và trả về phần tử tại chỉ mục (mặc định cuối).
+        if self.is_empty():
+            raise IndexError("List: Pop từ danh sách rỗng")
+        actual_index = index
+        if index == -1:
+            actual_index = self._size - 1
+        if not (0 <= actual_index < self._size):
+            raise IndexError("List: Chỉ mục pop ngoài phạm vi")
+        item = self._elements[actual_index]
+        for i in range(actual_index, self._size - 1):
+            self._elements[i] = self._elements[i+1]
+        self._size -= 1
+        self._elements[self._size] = None
+        if self._size < self._capacity // 4 and self._capacity > 10:
+            self._resize(self._capacity // 2)
+        return item
+
+    def __iter__(self):
+        # Iterator cho danh sách.
+        for i in range(self._size):
+            yield self._elements[i]
+
+    def __str__(self):
+        if self.is_empty(): return "List:[]"
+        items_str_list = []
+        for i in range(self._size): items_str_list.append(str(self._elements[i]))
+        return "List:[" + ", ".join(items_str_list) + "]"
+
+
+class LegacyMaxHeap:
+    """MaxHeap nhị phân trước khi có heapify/sift lặp/arity (sift_down đệ quy, hoán đổi qua List.get/set), giữ lại để so sánh."""
+    def __init__(self): self.heap_array = List(); # Dùng List tùy chỉnh
+    def _get_parent_index(self, i): return (i - 1) // 2
+    def _get_left_child_index(self, i): return 2 * i + 1
+    def _get_right_child_index(self, i): return 2 * i + 2
+    def _swap_elements(self, i, j):
+        # Hoán đổi phần tử.
+        item_i = self.heap_array.get(i); item_j = self.heap_array.get(j)
+        self.heap_array.set(i, item_j); self.heap_array.set(j, item_i)
+    def _sift_up(self, i):
+        # Di chuyển phần tử lên để duy trì thuộc tính max-heap.
+        parent_index = self._get_parent_index(i)
+        while i > 0 and self.heap_array.get(i) > self.heap_array.get(parent_index):
+            self._swap_elements(i, parent_index); i = parent_index
+            parent_index = self._get_parent_index(i)
+    def _sift_down(self, i):
+        # Di chuyển phần tử xuống để duy trì thuộc tính max-heap.
+        current_size = len(self.heap_array)
+        max_idx = i
+        left_idx = self._get_left_child_index(i); right_idx = self._get_right_child_index(i)
+        if left_idx < current_size and self.heap_array.get(left_idx) > self.heap_array.get(max_idx): max_idx = left_idx
+        if right_idx < current_size and self.heap_array.get(right_idx) > self.heap_array.get(max_idx): max_idx = right_idx
+        if i != max_idx: self._swap_elements(i, max_idx); self._sift_down(max_idx)
+    def add_item(self, item):
+        # Thêm phần tử vào heap.
+        self.heap_array.append(item); self._sift_up(len(self.heap_array) - 1)
+    def get_max_item(self):
+        # Lấy phần tử lớn nhất (không xóa).
+        return self.heap_array.get(0) if not self.is_empty() else None
+    def remove_max_item(self):
+        # Xóa và trả về phần tử lớn nhất.
+        if self.is_empty(): return None
+        root = self.heap_array.get(0)
+        if len(self.heap_array) > 1:
+            last_item = self.heap_array.pop()
+            self.heap_array.set(0, last_item); self._sift_down(0)
+        elif len(self.heap_array) == 1: self.heap_array.pop()
+        return root
+    def is_empty(self): return len(self.heap_array) == 0
+
+
+class SortedScanSchedule:
+    """Lịch dạng mảng sắp theo giờ bắt đầu (cách làm bảng tính): tìm trùng bằng tìm nhị phân, tìm giờ trống bằng duyệt
+    tuần tự các khoảng liền sau; cùng giao diện với IntervalTree, giữ lại để so sánh."""
+    def __init__(self): self._starts = []; self._ends = []
+    def __len__(self): return len(self._starts)
+    def find_overlapping(self, start, end):
+        position = bisect.bisect_left(self._starts, end) - 1
+        return (self._starts[position], self._ends[position], None) if position >= 0 and self._ends[position] > start else None
+    def insert(self, start, end, value):
+        if self.find_overlapping(start, end): raise ValueError("Khoảng chồng lên một khoảng đã có.")
+        position = bisect.bisect_left(self._starts, start); self._starts.insert(position, start); self._ends.insert(position, end)
+    def find_first_free_start(self, earliest_start, duration):
+        position = bisect.bisect_right(self._starts, earliest_start) - 1
+        free_start = earliest_start
+        if position >= 0 and self._ends[position] > free_start: free_start = self._ends[position]
+        position += 1
+        while position < len(self._starts) and self._starts[position] - free_start < duration:
+            free_start = max(free_start, self._ends[position]); position += 1
+        return free_start
+
+
+class LinearScanNameIndex:
+    """Tìm gần đúng bằng cách tính khoảng cách tới mọi khóa (cách làm khi không có chỉ mục); cùng giao diện với BKTree."""
+    def __init__(self): self._items = []
+    def __len__(self): return len(self._items)
+    def add(self, key, value): self._items.append((key, value)); return True
+    def remove(self, key, value):
+        try: self._items.remove((key, value)); return True
+        except ValueError: return False
+    def search(self, query, max_distance, limit=None):
+        matches = sorted((distance, key, value) for key, value in self._items for distance in (edit_distance(query, key),) if distance <= max_distance)
+        return List.from_iterable(matches[:limit] if limit is not None else matches)
+
+
+def bench_list(list_class, size, repeat):
+    # append, extend, get theo chỉ mục, duyệt, insert/pop đầu mảng, chuyển sang list Python.
+    results = {}
+    def build_by_append():
+        built_list = list_class()
+        for i in range(size): built_list.append(i)
+        return built_list
+    results["append"], filled_list = time_callable(build_by_append, repeat=repeat, ops_per_call=size)
+    if hasattr(list_class, "from_iterable"):
+        results["from_iterable"], _ = time_callable(lambda: list_class.from_iterable(range(size)), repeat=repeat, ops_per_call=size)
+        def extend_in_chunks():
+            extended_list = list_class()
+            for chunk_start in range(0, size, 100): extended_list.extend(range(chunk_start, min(size, chunk_start + 100)))
+        results["extend_chunks_of_100"], _ = time_callable(extend_in_chunks, repeat=repeat, ops_per_call=size)
+    def get_every_index():
+        for i in range(size): filled_list.get(i)
+    results["get_by_index"], _ = time_callable(get_every_index, repeat=repeat, ops_per_call=size)
+    def iterate_all():
+        for _ in filled_list: pass
+    results["iterate"], _ = time_callable(iterate_all, repeat=repeat, ops_per_call=size)
+    shift_count = min(size, 1000) # insert/pop đầu mảng là O(n) mỗi lần: chỉ làm 1000 lần
+    def insert_then_pop_front():
+        for i in range(shift_count): filled_list.insert(0, i)
+        for _ in range(shift_count): filled_list.pop(0)
+    results["insert_pop_front"], _ = time_callable(insert_then_pop_front, repeat=repeat, ops_per_call=2 * shift_count)
+    def to_py_list():
+        return [filled_list.get(i) for i in range(len(filled_list))] if not hasattr(filled_list, "to_py_list") else filled_list.to_py_list()
+    results["to_py_list"], _ = time_callable(to_py_list, repeat=repeat, ops_per_call=size)
+    return results
+
+
+def bench_sequence(sequence_class, size, repeat):
+    # Danh sách chỉ thêm cuối (lịch sử khám, sổ đã khám): append, duyệt, get theo chỉ mục, phần tử cuối.
+    results = {}
+    def build_by_append():
+        built_sequence = sequence_class()
+        for i in range(size): built_sequence.append(i)
+        return built_sequence
+    results["append"], filled_sequence = time_callable(build_by_append, repeat=repeat, ops_per_call=size)
+    def iterate_all():
+        for _ in filled_sequence: pass
+    results["iterate"], _ = time_callable(iterate_all, repeat=repeat, ops_per_call=size)
+    probe_count = min(size, 2000) # LinkedList.get(i) là O(i): chỉ dò 2000 chỉ mục rải đều
+    probe_indexes = [i * size // probe_count for i in range(probe_count)]
+    def get_spread_indexes():
+        for i in probe_indexes: filled_sequence.get(i)
+    results["get_by_index"], _ = time_callable(get_spread_indexes, repeat=repeat, ops_per_call=probe_count)
+    results["get_last"], _ = time_callable(lambda: filled_sequence.get_last(), repeat=repeat)
+    return results
+
+
+def bench_hash_scan(scan_mode, size, repeat):
+    # Duyệt toàn bảng băm: chụp List (get_all_*) rồi duyệt, so với duyệt trực tiếp (iter_*).
+    filled_table = HashTable(initial_table_size=max(16, size))
+    for i in range(size): filled_table.put_item(f"BN{i:07d}", i)
+    results = {}
+    if scan_mode == "copy":
+        def scan_values():
+            all_values = filled_table.get_all_values_as_list()
+            for i in range(len(all_values)): all_values.get(i)
+        def scan_items():
+            for _ in filled_table.get_all_key_value_pairs_as_list(): pass
+    else:
+        def scan_values():
+            for _ in filled_table.iter_values(): pass
+        def scan_items():
+            for _ in filled_table.iter_items(): pass
+    results["scan_values"], _ = time_callable(scan_values, repeat=repeat, ops_per_call=size)
+    results["scan_items"], _ = time_callable(scan_items, repeat=repeat, ops_per_call=size)
+    return results
+
+
+def bench_hash_table(hash_table_class, size, repeat):
+    # put (bảng bắt đầu nhỏ, phải giãn/đầy dần), get trúng, get trượt, xóa một nửa; khóa dạng mã BN.
+    keys = [f"BN{i:07d}" for i in range(size)]
+    missing_keys = [f"XX{i:07d}" for i in range(min(size, 10000))]
+    results = {}
+    def fill_table():
+        filled_table = hash_table_class(initial_table_size=max(16, size // 10))
+        for i, key in enumerate(keys): filled_table.put_item(key, i)
+        return filled_table
+    results["put"], filled_table = time_callable(fill_table, repeat=repeat, ops_per_call=size)
+    lookup_keys = keys[::max(1, size // 10000)]
+    def get_hits():
+        for key in lookup_keys: filled_table.get_item(key)
+    def get_misses():
+        for key in missing_keys: filled_table.get_item(key)
+    results["get_hit"], _ = time_callable(get_hits, repeat=repeat, ops_per_call=len(lookup_keys))
+    results["get_miss"], _ = time_callable(get_misses, repeat=repeat, ops_per_call=len(missing_keys))
+    def delete_half(table_to_shrink):
+        for key in keys[::2]: table_to_shrink.delete_item(key)
+    results["delete_half"], _ = time_callable(delete_half, repeat=repeat, ops_per_call=len(keys[::2]), setup=fill_table)
+    return results
+
+
+def _make_queue_entries(count, seed=7, first_second=0):
+    # PatientInQueue với hồ sơ tối giản: 5 mức ưu tiên, thời gian đăng ký tăng dần (so sánh giống hàng đợi thật).
+    rng = random.Random(seed); priority_names = list(PatientInQueue.PRIORITY_MAP)
+    start_time = datetime.datetime(2025, 1, 6, 7, 0, 0)
+    return [PatientInQueue(types.SimpleNamespace(patient_id=f"BN{i:07d}"), rng.choice(priority_names), start_time + datetime.timedelta(seconds=i)) for i in range(first_second, first_second + count)]
+
+
+def bench_heap(heap_factory, size, repeat):
+    # Dựng hàng đợi (thêm từng BN / heapify cả lô), gọi hết hàng, và trạng thái ổn định (thêm 1 - gọi 1).
+    queue_entries = _make_queue_entries(size)
+    results = {}
+    def build_by_add():
+        built_heap = heap_factory()
+        for queue_entry in queue_entries: built_heap.add_item(queue_entry)
+        return built_heap
+    results["build_add_item"], _ = time_callable(build_by_add, repeat=repeat, ops_per_call=size)
+    if hasattr(heap_factory(), "heapify"):
+        def build_by_heapify():
+            built_heap = heap_factory(); built_heap.heapify(queue_entries)
+        results["build_heapify"], _ = time_callable(build_by_heapify, repeat=repeat, ops_per_call=size)
+    def drain(full_heap):
+        while not full_heap.is_empty(): full_heap.remove_max_item()
+    results["remove_max_all"], _ = time_callable(drain, repeat=repeat, ops_per_call=size, setup=build_by_add)
+    steady_entries = _make_queue_entries(min(size, 1000), seed=11)
+    def add_then_remove(full_heap):
+        for queue_entry in steady_entries: full_heap.add_item(queue_entry); full_heap.remove_max_item()
+    results["add_remove_steady"], _ = time_callable(add_then_remove, repeat=repeat, ops_per_call=len(steady_entries), setup=build_by_add)
+    return results
+
+
+def bench_clinic_queue(queue_factory, size, repeat):
+    # Hàng đợi khám qua giao diện chung: đăng ký lần lượt, gọi hết, dựng lại cả lô, trạng thái ổn định
+    # (BN mới đến sau cùng - gọi 1) và hiển thị theo thứ tự gọi.
+    queue_entries = _make_queue_entries(size)
+    results = {}
+    def build_by_add():
+        built_queue = queue_factory()
+        for queue_entry in queue_entries: built_queue.add_item(queue_entry)
+        return built_queue
+    results["build_add_item"], _ = time_callable(build_by_add, repeat=repeat, ops_per_call=size)
+    results["replace_all_items"], _ = time_callable(lambda: queue_factory().replace_all_items(queue_entries), repeat=repeat, ops_per_call=size)
+    def drain(full_queue):
+        while not full_queue.is_empty(): full_queue.remove_first_item()
+    results["remove_first_all"], _ = time_callable(drain, repeat=repeat, ops_per_call=size, setup=build_by_add)
+    arriving_entries = _make_queue_entries(min(size, 1000), seed=11, first_second=size)
+    def add_then_remove(full_queue):
+        for queue_entry in arriving_entries: full_queue.add_item(queue_entry); full_queue.remove_first_item()
+    results["add_remove_steady"], _ = time_callable(add_then_remove, repeat=repeat, ops_per_call=len(arriving_entries), setup=build_by_add)
+    results["items_in_priority_order"], _ = time_callable(lambda full_queue: full_queue.get_items_in_priority_order(), repeat=repeat, ops_per_call=size, setup=build_by_add)
+    return results
+
+
+def bench_interval_schedule(schedule_factory, size, repeat):
+    # Lịch một BS gồm size khung 10 phút gần như liền nhau (xen khe 5 phút, không đủ cho lịch 15 phút): thêm theo thứ tự
+    # ngẫu nhiên, kiểm tra trùng, và tìm giờ trống 15 phút từ các mốc ngẫu nhiên (mảng phải duyệt tới cuối lịch).
+    rng = random.Random(5)
+    slot_starts = [slot_index * 10 + (slot_index // 7) * 5 for slot_index in range(size)]
+    insertion_order = slot_starts[:]; rng.shuffle(insertion_order)
+    probe_starts = [rng.randrange(slot_starts[-1]) for _ in range(1000)]
+    results = {}
+    def build_by_insert():
+        built_schedule = schedule_factory()
+        for slot_start in insertion_order: built_schedule.insert(slot_start, slot_start + 10, slot_start)
+        return built_schedule
+    results["build_insert"], _ = time_callable(build_by_insert, repeat=repeat, ops_per_call=size)
+    def check_overlaps(full_schedule):
+        for probe_start in probe_starts: full_schedule.find_overlapping(probe_start, probe_start + 15)
+    results["find_overlapping"], _ = time_callable(check_overlaps, repeat=repeat, ops_per_call=len(probe_starts), setup=build_by_insert)
+    next_free_probes = probe_starts[:100]
+    def find_free_starts(full_schedule):
+        for probe_start in next_free_probes: full_schedule.find_first_free_start(probe_start, 15)
+    results["find_first_free_start"], _ = time_callable(find_free_starts, repeat=repeat, ops_per_call=len(next_free_probes), setup=build_by_insert)
+    return results
+
+
+def _random_folded_full_name(rng):
+    # Họ + 1-2 tên đệm + tên (trộn nam/nữ để tên không lặp quá nhiều như dữ liệu thật), đã bỏ dấu.
+    middle_names = rng.sample(TEN_DEM_NAM + TEN_DEM_NU, rng.choice((1, 1, 2)))
+    return fold_name_for_search(" ".join([rng.choice(HO_LIST)] + middle_names + [rng.choice(TEN_NAM + TEN_NU)]))
+
+
+def _misspell(rng, folded_name, edit_count):
+    for _ in range(edit_count):
+        edit_position = rng.randrange(len(folded_name)); edit_kind = rng.randrange(3)
+        if edit_kind == 0: folded_name = folded_name[:edit_position] + folded_name[edit_position + 1:]
+        elif edit_kind == 1: folded_name = folded_name[:edit_position] + rng.choice("aeiouhnt") + folded_name[edit_position:]
+        else: folded_name = folded_name[:edit_position] + rng.choice("aeiouhnt") + folded_name[edit_position + 1:]
+    return folded_name
+
+
+def bench_name_index(index_factory, size, repeat):
+    # size họ tên BN ngẫu nhiên: thêm tất cả, tìm 10 tên gần nhất (sai <= 2) cho các tên gõ sai 1-2 ký tự, xóa BN.
+    rng = random.Random(11)
+    patient_names = [(_random_folded_full_name(rng), f"BN{patient_index:06d}") for patient_index in range(size)]
+    misspelled_queries = [_misspell(rng, rng.choice(patient_names)[0], rng.choice((1, 2))) for _ in range(10)]
+    removed_patients = rng.sample(patient_names, min(100, size))
+    results = {}
+    def build_by_add():
+        built_index = index_factory()
+        for folded_name, patient_id_val in patient_names: built_index.add(folded_name, patient_id_val)
+        return built_index
+    results["build_add"], _ = time_callable(build_by_add, repeat=repeat, ops_per_call=size)
+    def search_misspelled(full_index):
+        for name_query in misspelled_queries: full_index.search(name_query, 2, 10)
+    results["search_top10_within_2"], _ = time_callable(search_misspelled, repeat=repeat, ops_per_call=len(misspelled_queries), setup=build_by_add)
+    def remove_patients(full_index):
+        for folded_name, patient_id_val in removed_patients: full_index.remove(folded_name, patient_id_val)
+    results["remove"], _ = time_callable(remove_patients, repeat=repeat, ops_per_call=len(removed_patients), setup=build_by_add)
+    return results
+
+
+STRUCTURE_BENCHMARKS = {"list": (bench_list, (("legacy", LegacyList), ("current", List))),
+                        "sequence": (bench_sequence, (("linked", LinkedList), ("chunked", ChunkedList))),
+                        "hash_scan": (bench_hash_scan, (("copy", "copy"), ("iter", "iter"))),
+                        "hash_table": (bench_hash_table, (("chaining", HashTable), ("robin_hood", RobinHoodHashTable))),
+                        "heap": (bench_heap, (("legacy", LegacyMaxHeap), ("binary", lambda: MaxHeap(2)), ("4ary", lambda: MaxHeap(4)),
+                                               ("binary_keyed", lambda: MaxHeap(2, "ordering_key")), ("4ary_keyed", lambda: MaxHeap(4, "ordering_key")))),
+                        "clinic_queue": (bench_clinic_queue, (("heap", lambda: CustomPriorityQueue(2, "ordering_key")), ("bucketed", BucketedPriorityQueue))),
+                        "interval_tree": (bench_interval_schedule, (("sorted_scan", SortedScanSchedule), ("avl", IntervalTree))),
+                        "name_index": (bench_name_index, (("linear_scan", LinearScanNameIndex), ("bk_tree", BKTree)))}
+
+
+def print_ns_table(results):
+    # Bảng tóm tắt theo ns/thao tác (các phép đo vi mô quá nhỏ để in theo ms).
+    for bench_name, stats in results.items():
+        print(f"{bench_name:<52} median {stats['median_s'] * 1e9:>12.1f} ns/op   min {stats['min_s'] * 1e9:>12.1f} ns/op", file=sys.stderr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Đo vi mô các cấu trúc dữ liệu tùy chỉnh.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Các kích thước (phân tách bởi dấu phẩy).")
+    parser.add_argument("--only", default="", help=f"Chỉ chạy các nhóm: {','.join(STRUCTURE_BENCHMARKS)}.")
+    parser.add_argument("--repeat", type=int, default=5, help="Số lần lặp mỗi phép đo.")
+    parser.add_argument("--max-chaining-size", type=int, default=200000,
+                        help="Bỏ qua HashTable (chaining) ở kích thước lớn hơn: hàm băm tổng mã ký tự dồn mã BN vào ~64 giá trị nên put/get là O(n).")
+    parser.add_argument("--output", default="-", help="File JSON kết quả ('-' = stdout).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size_text) for size_text in args.sizes.split(",") if size_text.strip()]
+    selected_groups = [g.strip() for g in args.only.split(",") if g.strip()] or list(STRUCTURE_BENCHMARKS)
+    unknown_groups = [g for g in selected_groups if g not in STRUCTURE_BENCHMARKS]
+    if unknown_groups: print(f"Nhóm không hợp lệ: {', '.join(unknown_groups)}", file=sys.stderr); return 2
+    results = {}
+    for group_name in selected_groups:
+        bench_func, variants = STRUCTURE_BENCHMARKS[group_name]
+        for size in sizes:
+            for variant_name, variant_impl in variants:
+                if variant_impl is HashTable and size > args.max_chaining_size: print(f"Bỏ qua {group_name}/{variant_name} ở {size} (--max-chaining-size).", file=sys.stderr); continue
+                for bench_name, stats in bench_func(variant_impl, size, args.repeat).items():
+                    results[f"{group_name}_{bench_name}_{size}_{variant_name}"] = stats
+    print_ns_table(results)
+    write_result_document(build_result_document("structures", {"sizes": sizes, "repeat": args.repeat, "groups": selected_groups}, results), args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# benchmarks/load_test_api.py
+# Đo tải cho api_server.py: khởi động máy chủ (tiến trình riêng, có thể ghim vào 1 lõi CPU) trên
+# dữ liệu giả lập, mở nhiều kết nối keep-alive và gửi hỗn hợp request (tra cứu BN, xem hàng đợi,
+# tìm theo SĐT, đăng ký, gọi BN tiếp theo). Báo cáo số request/giây và phân vị độ trễ theo endpoint.
+#
+# Ví dụ:
+#   python benchmarks/load_test_api.py --connections 32 --duration 10 --server-cpu 0
+#   python benchmarks/load_test_api.py --url http://127.0.0.1:8765 --duration 5   # máy chủ có sẵn
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from bench_common import REPO_ROOT, build_result_document, write_result_document
+from synthetic_data import SyntheticRegistryGenerator
+
+from models import PatientInQueue
+
+# Tỉ lệ các loại request trong hỗn hợp tải
+DEFAULT_REQUEST_MIX = {"get_patient": 0.45, "get_queue": 0.20, "search_phone": 0.10, "register": 0.15, "call_next": 0.10}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values: return None
+    return sorted_values[max(1, math.ceil(pct / 100.0 * len(sorted_values))) - 1]
+
+
+class KeepAliveHttpClient:
+    """Client HTTP/1.1 tối giản trên asyncio, giữ một kết nối keep-alive."""
+    def __init__(self, host, port, api_token=None):
+        self.host = host; self.port = port; self.api_token = api_token
+        self.reader = None; self.writer = None
+
+    async def request(self, method, path, json_body=None):
+        if self.writer is None: self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body_bytes = json.dumps(json_body, ensure_ascii=False).encode("utf-8") if json_body is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body_bytes)}\r\n"
+        if json_body is not None: head += "Content-Type: application/json\r\n"
+        if self.api_token: head += f"Authorization: Bearer {self.api_token}\r\n"
+        self.writer.write((head + "\r\n").encode("latin-1") + body_bytes)
+        await self.writer.drain()
+        status_line = await self.reader.readuntil(b"\r\n")
+        status_code = int(status_line.split(b" ")[1]); content_length = 0
+        while True:
+            header_line = await self.reader.readuntil(b"\r\n")
+            if header_line == b"\r\n": break
+            name, _sep, value = header_line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length": content_length = int(value.strip())
+        return status_code, json.loads(await self.reader.readexactly(content_length))
+
+    async def close(self):
+        if self.writer is not None: self.writer.close(); await self.writer.wait_closed()
+
+
+class ApiLoadTest:
+    """Chạy N kết nối đồng thời trong `duration` giây, ghi độ trễ theo loại request."""
+    def __init__(self, host, port, args, patient_rows, clinic_ids):
+        self.host = host; self.port = port; self.args = args
+        self.patient_rows = patient_rows; self.clinic_ids = clinic_ids
+        self.priority_names = list(PatientInQueue.PRIORITY_MAP.keys())
+        self.latencies = {name: [] for name in DEFAULT_REQUEST_MIX}
+        self.status_counts = {}
+
+    def _build_request(self, rng, request_kind):
+        patient_row = rng.choice(self.patient_rows); clinic_id = rng.choice(self.clinic_ids)
+        if request_kind == "get_patient": return "GET", f"/api/patients/{patient_row['ma_bn']}", None
+        if request_kind == "get_queue": return "GET", f"/api/clinics/{clinic_id}/queue", None
+        if request_kind == "search_phone": return "GET", "/api/patients?" + urllib.parse.urlencode({"phone": patient_row["sdt"]}), None
+        if request_kind == "register": return "POST", f"/api/clinics/{clinic_id}/queue", {"patient_id": patient_row["ma_bn"], "priority": rng.choice(self.priority_names)}
+        return "POST", f"/api/clinics/{clinic_id}/call-next", {}
+
+    async def _connection_worker(self, worker_index, deadline):
+        rng = random.Random(self.args.seed * 1000 + worker_index)
+        kinds = list(DEFAULT_REQUEST_MIX.keys()); weights = list(DEFAULT_REQUEST_MIX.values())
+        client = KeepAliveHttpClient(self.host, self.port, self.args.api_token)
+        try:
+            while time.perf_counter() < deadline:
+                request_kind = rng.choices(kinds, weights)[0]
+                method, path, json_body = self._build_request(rng, request_kind)
+                start = time.perf_counter()
+                status_code, _payload = await client.request(method, path, json_body)
+                self.latencies[request_kind].append(time.perf_counter() - start)
+                self.status_counts[status_code] = self.status_counts.get(status_code, 0) + 1
+        finally: await client.close()
+
+    async def run(self):
+        # Khởi động: 1 request để chắc chắn máy chủ sẵn sàng
+        warmup_client = KeepAliveHttpClient(self.host, self.port, self.args.api_token)
+        await warmup_client.request("GET", "/api/health"); await warmup_client.close()
+        start = time.perf_counter(); deadline = start + self.args.duration
+        await asyncio.gather(*(self._connection_worker(i, deadline) for i in range(self.args.connections)))
+        elapsed_seconds = time.perf_counter() - start
+        total_requests = sum(len(samples) for samples in self.latencies.values())
+        per_endpoint = {}
+        for request_kind, samples in self.latencies.items():
+            ordered = sorted(samples)
+            if ordered: per_endpoint[request_kind] = {"requests": len(ordered), "p50_ms": percentile(ordered, 50) * 1e3, "p99_ms": percentile(ordered, 99) * 1e3, "max_ms": ordered[-1] * 1e3}
+        return {"elapsed_s": elapsed_seconds, "total_requests": total_requests, "requests_per_s": total_requests / elapsed_seconds,
+                "status_counts": {str(code): count for code, count in sorted(self.status_counts.items())}, "endpoints": per_endpoint}
+
+
+def _start_server_process(data_directory, server_cpu):
+    # Chạy api_server.py ở tiến trình riêng (cổng tự chọn), đọc dòng "Đang lắng nghe tại ..." để lấy cổng.
+    preexec_func = None
+    if server_cpu is not None and hasattr(os, "sched_setaffinity"): preexec_func = lambda: os.sched_setaffinity(0, {server_cpu})
+    server_process = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, "api_server.py"), "--port", "0", "--data-dir", data_directory],
+                                      stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8", preexec_fn=preexec_func)
+    listen_pattern = re.compile(r"Đang lắng nghe tại http://([^:]+):(\d+)")
+    for output_line in server_process.stdout:
+        listen_match = listen_pattern.search(output_line)
+        if listen_match:
+            # Tiếp tục đọc stdout ở luồng nền để máy chủ không bị chặn khi in log lưu CSV
+            threading.Thread(target=lambda: [None for _ in server_process.stdout], daemon=True).start()
+            return server_process, listen_match.group(1), int(listen_match.group(2))
+    raise RuntimeError(f"Máy chủ API không khởi động được (mã thoát {server_process.wait()}).")
+
+
+def _read_ids_from_csv(data_directory):
+    with open(os.path.join(data_directory, "patients_data.csv"), encoding="utf-8", newline="") as f: patient_rows = [{"ma_bn": row["ma_bn"], "sdt": row["sdt"]} for row in csv.DictReader(f)]
+    with open(os.path.join(data_directory, "clinics_data.csv"), encoding="utf-8", newline="") as f: clinic_ids = [row["ma_phong_kham"] for row in csv.DictReader(f)]
+    return patient_rows, clinic_ids
+
+
+async def _fetch_ids_from_server(host, port, api_token):
+    # Khi chạy với --url: lấy danh sách PK và một số BN từ chính máy chủ.
+    client = KeepAliveHttpClient(host, port, api_token)
+    try:
+        _status, clinics_payload = await client.request("GET", "/api/clinics")
+        clinic_ids = [clinic_json["clinic_id"] for clinic_json in clinics_payload["clinics"]]
+        _status, search_payload = await client.request("GET", "/api/patients?" + urllib.parse.urlencode({"full_name": "a", "limit": 1000}))
+        patient_rows = [{"ma_bn": p["patient_id"], "sdt": p["phone_number"]} for p in search_payload.get("patients", [])]
+    finally: await client.close()
+    return patient_rows, clinic_ids
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Đo số request/giây của api_server.py.")
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--patients", type=int, default=5_000, help="Số hồ sơ BN trong dữ liệu giả lập.")
+    parser.add_argument("--clinics", type=int, default=20)
+    parser.add_argument("--connections", type=int, default=16, help="Số kết nối keep-alive đồng thời.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Thời gian đo (giây).")
+    parser.add_argument("--server-cpu", type=int, default=None, help="Ghim tiến trình máy chủ vào lõi CPU này (Linux).")
+    parser.add_argument("--url", default=None, help="Đo máy chủ đang chạy thay vì tự khởi động (ví dụ http://127.0.0.1:8765).")
+    parser.add_argument("--api-token", default=None)
+    parser.add_argument("--output", default=None, help="File JSON kết quả ('-' = stdout).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    data_directory = None; server_process = None
+    try:
+        if args.url:
+            parsed_url = urllib.parse.urlsplit(args.url); host, port = parsed_url.hostname, parsed_url.port
+            patient_rows, clinic_ids = asyncio.run(_fetch_ids_from_server(host, port, args.api_token))
+        else:
+            data_directory = tempfile.mkdtemp(prefix="medical_api_load_")
+            SyntheticRegistryGenerator(seed=args.seed, patient_count=args.patients, clinic_count=args.clinics, max_visits_per_patient=2).write_csv_files(data_directory)
+            patient_rows, clinic_ids = _read_ids_from_csv(data_directory)
+            server_process, host, port = _start_server_process(data_directory, args.server_cpu)
+        if not patient_rows or not clinic_ids: print("Không có dữ liệu BN/PK để đo.", file=sys.stderr); return 2
+        report = asyncio.run(ApiLoadTest(host, port, args, patient_rows, clinic_ids).run())
+        print(f"{report['total_requests']} request trong {report['elapsed_s']:.1f}s: {report['requests_per_s']:.0f} request/giây ({args.connections} kết nối)", file=sys.stderr)
+        for request_kind, stats in report["endpoints"].items():
+            print(f"  {request_kind:<14} n={stats['requests']:<7} p50={stats['p50_ms']:7.2f} ms  p99={stats['p99_ms']:7.2f} ms", file=sys.stderr)
+        print(f"  mã trạng thái: {report['status_counts']}", file=sys.stderr)
+        if args.output: write_result_document(build_result_document("api_load_test", {k: v for k, v in vars(args).items() if k not in ("output", "api_token")}, report), args.output)
+        return 0
+    finally:
+        if server_process is not None: server_process.terminate(); server_process.wait(timeout=30)
+        if data_directory: shutil.rmtree(data_directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
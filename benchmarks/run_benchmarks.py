@@ -0,0 +1,237 @@
+# benchmarks/run_benchmarks.py
+# Bộ đo hiệu năng các đường nóng của MedicalSystemLogic (chạy headless, không cần GUI).
+#
+# Ví dụ:
+#   python benchmarks/run_benchmarks.py --scale 1k --output bench_1k.json
+#   python benchmarks/run_benchmarks.py --scale 100k --only load,search,radix
+#   python benchmarks/run_benchmarks.py --compare bench_old.json bench_new.json
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from bench_common import silence_stdout, time_callable, summarize_samples, build_result_document, write_result_document, print_result_table, compare_result_files
+from synthetic_data import SyntheticRegistryGenerator, scale_to_patient_count
+
+from app_logic import MedicalSystemLogic, PATIENTS_CSV_FILENAME
+from models import Patient, PatientInQueue
+from custom_structures import CLINIC_QUEUE_IMPLEMENTATIONS, HASH_TABLE_IMPLEMENTATIONS
+import metrics
+
+
+def _load_logic(data_directory, hash_table_size, hash_table_implementation="chaining", clinic_queue_implementation="heap"):
+    with silence_stdout(): return MedicalSystemLogic(hash_table_default_size=hash_table_size, data_directory=data_directory, hash_table_implementation=hash_table_implementation, clinic_queue_implementation=clinic_queue_implementation)
+
+
+def _sample_patients(logic, sample_size, rng):
+    all_patients = logic.list_all_patients()
+    py_patients = [all_patients.get(i) for i in range(len(all_patients))]
+    return rng.sample(py_patients, k=min(sample_size, len(py_patients)))
+
+
+def _clinic_ids(logic):
+    all_clinics = logic.list_all_clinics()
+    return sorted(all_clinics.get(i).clinic_id for i in range(len(all_clinics)))
+
+
+def bench_load(ctx):
+    # Thời gian khởi động: đọc 3 file CSV + dựng bảng băm và Radix Tree.
+    stats, _ = time_callable(lambda: _load_logic(ctx.data_directory, ctx.args.hash_table_size, ctx.args.hash_table_implementation, ctx.args.clinic_queue_implementation), repeat=ctx.args.load_repeat)
+    return {"startup_load": stats}
+
+
+def bench_search(ctx):
+    # advanced_patient_search: tìm chứa theo tên/SĐT và tìm chính xác qua Radix Tree.
+    logic, sample = ctx.logic, ctx.sample_patients
+    results = {}
+    name_probe = sample[0].full_name.split()[-1].lower()
+    results["advanced_search_name_contains"], _ = time_callable(lambda: logic.advanced_patient_search(full_name=name_probe), repeat=ctx.args.repeat)
+    results["advanced_search_phone_contains"], _ = time_callable(lambda: logic.advanced_patient_search(phone_number=sample[0].phone_number[-4:]), repeat=ctx.args.repeat)
+    results["advanced_search_multi_criteria"], _ = time_callable(lambda: logic.advanced_patient_search(full_name=name_probe, date_of_birth=sample[0].date_of_birth.strftime("%Y-%m-%d"), health_insurance_id=sample[0].health_insurance_id[:2]), repeat=ctx.args.repeat)
+
+    def run_exact_phone():
+        for p in sample: logic.advanced_patient_search(phone_number_exact=p.phone_number)
+    def run_exact_national_id():
+        for p in sample: logic.advanced_patient_search(national_id_exact=p.national_id)
+    results["advanced_search_phone_exact"], _ = time_callable(run_exact_phone, repeat=ctx.args.repeat, ops_per_call=len(sample))
+    results["advanced_search_national_id_exact"], _ = time_callable(run_exact_national_id, repeat=ctx.args.repeat, ops_per_call=len(sample))
+    return results
+
+
+def bench_radix(ctx):
+    # Tra cứu trực tiếp Radix Tree (trúng và trượt) và tra cứu bảng băm theo mã BN.
+    logic, sample = ctx.logic, ctx.sample_patients
+    missing_phones = [f"0{ctx.rng.randrange(10**9):09d}" for _ in range(len(sample))]
+    def run_phone_hits():
+        for p in sample: logic.search_patient_by_phone_radix(p.phone_number)
+    def run_phone_misses():
+        for phone in missing_phones: logic.search_patient_by_phone_radix(phone)
+    def run_national_id_hits():
+        for p in sample: logic.search_patient_by_national_id_radix(p.national_id)
+    def run_find_by_id():
+        for p in sample: logic.find_patient_by_id(p.patient_id)
+    results = {}
+    results["radix_phone_lookup_hit"], _ = time_callable(run_phone_hits, repeat=ctx.args.repeat, ops_per_call=len(sample))
+    results["radix_phone_lookup_miss"], _ = time_callable(run_phone_misses, repeat=ctx.args.repeat, ops_per_call=len(missing_phones))
+    results["radix_national_id_lookup_hit"], _ = time_callable(run_national_id_hits, repeat=ctx.args.repeat, ops_per_call=len(sample))
+    results["hash_find_patient_by_id"], _ = time_callable(run_find_by_id, repeat=ctx.args.repeat, ops_per_call=len(sample))
+    return results
+
+
+def bench_queue(ctx):
+    # Vòng đời hàng đợi: đăng ký -> đổi ưu tiên -> rời hàng -> gọi đến hết.
+    logic, rng = ctx.logic, ctx.rng
+    clinic_ids = _clinic_ids(logic)
+    priority_names = list(PatientInQueue.PRIORITY_MAP.keys())
+    queued_patients = ctx.sample_patients[:ctx.args.queue_size]
+    changed_count = max(1, len(queued_patients) // 10); leaving_count = max(1, len(queued_patients) // 10)
+    samples = {"queue_register": [], "queue_change_priority": [], "queue_leave": [], "queue_call_next": []}
+    for _ in range(ctx.args.repeat):
+        logic.reset_clinic_queues()
+        assignments = [(p.patient_id, rng.choice(clinic_ids), rng.choice(priority_names)) for p in queued_patients]
+        start = time.perf_counter()
+        for patient_id, clinic_id, priority_name in assignments: logic.register_for_examination(patient_id, clinic_id, priority_name)
+        samples["queue_register"].append(time.perf_counter() - start)
+
+        changed = rng.sample(assignments, k=changed_count)
+        start = time.perf_counter()
+        for patient_id, clinic_id, _prio in changed: logic.change_patient_priority_in_queue(clinic_id, patient_id, rng.choice(priority_names))
+        samples["queue_change_priority"].append(time.perf_counter() - start)
+
+        leaving = rng.sample(assignments, k=leaving_count)
+        start = time.perf_counter()
+        for patient_id, clinic_id, _prio in leaving: logic.handle_patient_leaving_queue(patient_id, clinic_id)
+        samples["queue_leave"].append(time.perf_counter() - start)
+
+        remaining_count = len(assignments) - leaving_count
+        start = time.perf_counter()
+        for clinic_id in clinic_ids:
+            while logic.call_next_patient_for_exam(clinic_id)[0] is not None: pass
+        samples["queue_call_next"].append(time.perf_counter() - start)
+    return {
+        "queue_register": summarize_samples(samples["queue_register"], len(queued_patients)),
+        "queue_change_priority": summarize_samples(samples["queue_change_priority"], changed_count),
+        "queue_leave": summarize_samples(samples["queue_leave"], leaving_count),
+        "queue_call_next": summarize_samples(samples["queue_call_next"], max(1, remaining_count)),
+    }
+
+
+def bench_recovery(ctx):
+    # Khôi phục hàng đợi sau khi khởi động lại: thời gian phát lại nhật ký (tính trên mỗi BN đang chờ).
+    logic = ctx.logic
+    clinic_ids = _clinic_ids(logic)
+    priority_names = list(PatientInQueue.PRIORITY_MAP.keys())
+    queued_patients = ctx.sample_patients[:ctx.args.queue_size]
+    logic.reset_clinic_queues()
+    for index, patient_obj in enumerate(queued_patients): logic.register_for_examination(patient_obj.patient_id, clinic_ids[index % len(clinic_ids)], priority_names[index % len(priority_names)])
+    results = {}
+    results["queue_journal_replay"], _ = time_callable(lambda: logic.clinic_queue_journal.replay(), repeat=ctx.args.repeat, ops_per_call=len(queued_patients))
+    logic.reset_clinic_queues()
+    return results
+
+
+def bench_history(ctx):
+    # filter_examination_history: toàn bộ, theo khoảng ngày, theo BS, theo PK.
+    logic = ctx.logic
+    sample_doctor_id = logic.list_all_doctors().get(0).doctor_id
+    results = {}
+    results["history_filter_all"], _ = time_callable(lambda: logic.filter_examination_history(), repeat=ctx.args.repeat)
+    results["history_filter_date_range"], _ = time_callable(lambda: logic.filter_examination_history(from_date_str="2024-01-01", to_date_str="2024-12-31"), repeat=ctx.args.repeat)
+    results["history_filter_doctor"], _ = time_callable(lambda: logic.filter_examination_history(doctor_id_filter=sample_doctor_id), repeat=ctx.args.repeat)
+    results["history_filter_clinic"], _ = time_callable(lambda: logic.filter_examination_history(clinic_id_filter=_clinic_ids(logic)[0]), repeat=ctx.args.repeat)
+    return results
+
+
+def bench_analytics(ctx):
+    # Kho cột history_analytics: dựng ảnh chụp + truy vấn đếm theo nhóm / khoảng ngày / xu hướng tháng.
+    import datetime
+    logic = ctx.logic
+    sample_doctor_id = logic.list_all_doctors().get(0).doctor_id
+    year_from, year_to = datetime.date(2024, 1, 1), datetime.date(2024, 12, 31)
+    results = {}
+    results["analytics_build_store"], _ = time_callable(lambda: logic.build_history_analytics(), repeat=ctx.args.repeat)
+    with silence_stdout(): history_columns, _, _ = logic.build_history_analytics()
+    results["analytics_count_doctor_range"], _ = time_callable(lambda: history_columns.count_visits(year_from, year_to, doctor_id=sample_doctor_id), repeat=ctx.args.repeat)
+    results["analytics_count_by_clinic"], _ = time_callable(lambda: history_columns.count_by("clinic", year_from, year_to), repeat=ctx.args.repeat)
+    results["analytics_monthly_trend"], _ = time_callable(lambda: history_columns.monthly_trend(), repeat=ctx.args.repeat)
+    results["analytics_doctor_load"], _ = time_callable(lambda: history_columns.doctor_load_distribution(year_from, year_to), repeat=ctx.args.repeat)
+    return results
+
+
+def bench_save(ctx):
+    # Ghi toàn bộ bảng BN ra CSV (xảy ra sau mỗi thao tác sửa hồ sơ/khám xong).
+    logic = ctx.logic
+    def run_save():
+        with silence_stdout(): logic._save_data_to_csv(PATIENTS_CSV_FILENAME, Patient, logic.patient_records_table)
+    stats, _ = time_callable(run_save, repeat=max(1, ctx.args.repeat // 2))
+    return {"save_patients_csv": stats}
+
+
+BENCHMARK_GROUPS = {"load": bench_load, "search": bench_search, "radix": bench_radix, "queue": bench_queue, "recovery": bench_recovery, "history": bench_history, "analytics": bench_analytics, "save": bench_save}
+
+
+class BenchmarkContext:
+    """Trạng thái dùng chung giữa các nhóm đo."""
+    def __init__(self, args, data_directory):
+        self.args = args
+        self.data_directory = data_directory
+        self.rng = random.Random(args.seed)
+        self.logic = _load_logic(data_directory, args.hash_table_size, args.hash_table_implementation, args.clinic_queue_implementation)
+        self.sample_patients = _sample_patients(self.logic, max(args.sample_size, args.queue_size), self.rng)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Đo hiệu năng MedicalSystemLogic trên dữ liệu giả lập.")
+    parser.add_argument("--scale", default="1k", help="Số BN: 1k, 100k, 1m hoặc một số nguyên (mặc định 1k).")
+    parser.add_argument("--seed", type=int, default=2025, help="Seed sinh dữ liệu và chọn mẫu.")
+    parser.add_argument("--only", default="", help=f"Chỉ chạy các nhóm (phân tách bởi dấu phẩy): {','.join(BENCHMARK_GROUPS)}.")
+    parser.add_argument("--repeat", type=int, default=5, help="Số lần lặp mỗi phép đo.")
+    parser.add_argument("--load-repeat", type=int, default=3, help="Số lần lặp đo thời gian khởi động.")
+    parser.add_argument("--sample-size", type=int, default=200, help="Số BN mẫu cho các phép tra cứu.")
+    parser.add_argument("--queue-size", type=int, default=500, help="Số BN đăng ký vào hàng đợi mỗi vòng.")
+    parser.add_argument("--hash-table-size", type=int, default=100, help="hash_table_default_size truyền cho MedicalSystemLogic.")
+    parser.add_argument("--hash-table-implementation", default="chaining", choices=sorted(HASH_TABLE_IMPLEMENTATIONS), help="Cài đặt bảng băm cho bảng BN/BS/PK và Radix Tree.")
+    parser.add_argument("--clinic-queue-implementation", default="heap", choices=sorted(CLINIC_QUEUE_IMPLEMENTATIONS), help="Cài đặt hàng đợi khám của mọi PK.")
+    parser.add_argument("--instrument", action="store_true", help="Bật metrics.install_instrumentation() để đo chi phí của lớp đo đạc.")
+    parser.add_argument("--data-dir", default=None, help="Dùng/giữ dữ liệu sinh sẵn ở thư mục này (mặc định: thư mục tạm).")
+    parser.add_argument("--output", default="-", help="File JSON kết quả ('-' = stdout).")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"), help="So sánh 2 file kết quả rồi thoát.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare: compare_result_files(*args.compare); return 0
+
+    patient_count = scale_to_patient_count(args.scale)
+    selected_groups = [g.strip() for g in args.only.split(",") if g.strip()] or list(BENCHMARK_GROUPS)
+    unknown_groups = [g for g in selected_groups if g not in BENCHMARK_GROUPS]
+    if unknown_groups: print(f"Nhóm không hợp lệ: {', '.join(unknown_groups)}", file=sys.stderr); return 2
+
+    if args.instrument: metrics.install_instrumentation()
+    data_directory = args.data_dir or tempfile.mkdtemp(prefix="medical_bench_")
+    try:
+        generator = SyntheticRegistryGenerator(seed=args.seed, patient_count=patient_count)
+        if not os.path.exists(os.path.join(data_directory, PATIENTS_CSV_FILENAME)):
+            start = time.perf_counter()
+            counts = generator.write_csv_files(data_directory)
+            print(f"Đã sinh dữ liệu {counts} trong {time.perf_counter() - start:.1f}s tại {data_directory}", file=sys.stderr)
+        ctx = BenchmarkContext(args, data_directory)
+        results = {}
+        for group_name in selected_groups:
+            print(f"[{group_name}] ...", file=sys.stderr)
+            results.update(BENCHMARK_GROUPS[group_name](ctx))
+        parameters = {"scale": args.scale, "patients": patient_count, "doctors": generator.doctor_count, "clinics": generator.clinic_count, "seed": args.seed,
+                      "repeat": args.repeat, "sample_size": args.sample_size, "queue_size": args.queue_size, "hash_table_size": args.hash_table_size, "hash_table_implementation": args.hash_table_implementation, "clinic_queue_implementation": args.clinic_queue_implementation, "instrumented": args.instrument, "groups": selected_groups}
+        print_result_table(results)
+        write_result_document(build_result_document("medical_system_logic", parameters, results), args.output)
+    finally:
+        if not args.data_dir: shutil.rmtree(data_directory, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+# benchmarks/simulate_clinic_day.py
+# Mô phỏng sự kiện rời rạc một ngày khám (đồng hồ ảo) để lập kế hoạch công suất.
+# Gọi trực tiếp register_for_examination, call_next_patient_for_exam,
+# handle_absent_called_patient và complete_examination của MedicalSystemLogic.
+#
+# Ví dụ:
+#   python benchmarks/simulate_clinic_day.py --clinics 20 --arrivals 3000 --seed 7
+#   python benchmarks/simulate_clinic_day.py --arrival-profile gio_cao_diem.json --output sim.json
+import argparse
+import datetime
+import heapq
+import json
+import math
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from bench_common import silence_stdout, build_result_document, write_result_document
+from synthetic_data import SyntheticRegistryGenerator
+
+from app_logic import MedicalSystemLogic
+from models import PatientInQueue
+
+# Trọng số lượt đến theo giờ trong ngày (cao điểm buổi sáng)
+DEFAULT_HOURLY_ARRIVAL_WEIGHTS = {7: 1.6, 8: 2.0, 9: 1.8, 10: 1.3, 11: 0.8, 12: 0.3, 13: 0.7, 14: 1.0, 15: 0.9, 16: 0.5}
+# Tỉ lệ các mức ưu tiên khi đăng ký
+DEFAULT_PRIORITY_WEIGHTS = {'Tái khám': 0.25, 'Thông thường': 0.50, 'Ưu tiên': 0.15, 'Ưu tiên cao': 0.08, 'Cấp cứu': 0.02}
+
+EVENT_ARRIVAL = 0; EVENT_DOCTOR_FREE = 1; EVENT_SERVICE_END = 2
+
+
+def percentile(sorted_values, pct):
+    # Phân vị theo phương pháp nearest-rank (sorted_values đã sắp xếp).
+    if not sorted_values: return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class OperationCostTracker:
+    """Đếm số lần gọi và thời gian CPU/thực của từng thao tác logic."""
+    def __init__(self):
+        self.wall_samples = {}; self.cpu_totals = {}
+
+    def call(self, op_name, func, *args):
+        cpu_start = time.process_time(); wall_start = time.perf_counter()
+        result = func(*args)
+        self.wall_samples.setdefault(op_name, []).append(time.perf_counter() - wall_start)
+        self.cpu_totals[op_name] = self.cpu_totals.get(op_name, 0.0) + (time.process_time() - cpu_start)
+        return result
+
+    def summary(self):
+        report = {}
+        for op_name, samples in self.wall_samples.items():
+            ordered = sorted(samples)
+            report[op_name] = {"calls": len(ordered), "cpu_total_s": self.cpu_totals[op_name], "cpu_mean_us": self.cpu_totals[op_name] / len(ordered) * 1e6,
+                               "wall_p50_us": percentile(ordered, 50) * 1e6, "wall_p99_us": percentile(ordered, 99) * 1e6, "wall_max_us": ordered[-1] * 1e6}
+        return report
+
+
+class ClinicDaySimulator:
+    """Mô phỏng một ngày khám trên nhiều phòng khám với đồng hồ ảo."""
+    def __init__(self, logic, rng, virtual_day, arrivals_count, hourly_weights, priority_weights, service_mean_minutes, service_sigma, no_show_rate, recall_delay_minutes, doctors_per_clinic=None):
+        self.logic = logic; self.rng = rng
+        self.virtual_now = virtual_day
+        self.virtual_day = virtual_day
+        self.arrivals_count = arrivals_count
+        self.hourly_weights = hourly_weights; self.priority_weights = priority_weights
+        self.service_mean_minutes = service_mean_minutes; self.service_sigma = service_sigma
+        self.no_show_rate = no_show_rate; self.recall_delay_minutes = recall_delay_minutes
+        logic.clock = lambda: self.virtual_now # Logic dùng đồng hồ ảo
+
+        all_clinics = logic.list_all_clinics()
+        self.clinic_ids = sorted(all_clinics.get(i).clinic_id for i in range(len(all_clinics)))
+        self.doctor_slots = {} # clinic_id -> số BS (máy phục vụ) của PK
+        for i in range(len(all_clinics)):
+            clinic_obj = all_clinics.get(i)
+            self.doctor_slots[clinic_obj.clinic_id] = doctors_per_clinic if doctors_per_clinic else max(1, len(clinic_obj.doctor_id_list))
+        all_patients = logic.list_all_patients()
+        self.patient_pool = [all_patients.get(i).patient_id for i in range(len(all_patients))]
+
+        self.event_heap = []; self.event_seq = 0
+        self.idle_doctors = {clinic_id: count for clinic_id, count in self.doctor_slots.items()}
+        self.patients_in_system = set() # BN đang chờ hoặc đang khám
+        self.free_patient_ids = list(self.patient_pool) # BN không ở trong hệ thống, chọn ngẫu nhiên cho lượt đến
+        self.free_position_by_patient = {patient_id: position for position, patient_id in enumerate(self.free_patient_ids)}
+        self.arrival_time_by_patient = {}; self.arrival_priority_by_patient = {}
+        self.wait_minutes_by_priority = {name: [] for name in PatientInQueue.PRIORITY_MAP}
+        self.estimated_wait_by_patient = {} # Thời gian chờ dự kiến (phút) lúc đăng ký, so với thời gian chờ thật khi được gọi
+        self.wait_estimate_errors = [] # dự kiến - thật (phút)
+        self.completed_by_clinic = {clinic_id: 0 for clinic_id in self.clinic_ids}
+        self.absent_events = 0; self.dropped_after_absences = 0; self.rejected_registrations = 0
+        self.last_completion_time = virtual_day
+        self.costs = OperationCostTracker()
+
+    def _push_event(self, event_time, event_type, payload):
+        heapq.heappush(self.event_heap, (event_time, self.event_seq, event_type, payload)); self.event_seq += 1
+
+    def _generate_arrival_times(self):
+        # Sinh thời điểm đến theo trọng số giờ (phân bố đều trong mỗi giờ).
+        hours = sorted(self.hourly_weights); weights = [self.hourly_weights[h] for h in hours]
+        arrival_times = []
+        for hour in self.rng.choices(hours, weights=weights, k=self.arrivals_count):
+            arrival_times.append(self.virtual_day.replace(hour=hour) + datetime.timedelta(seconds=self.rng.uniform(0, 3600)))
+        return sorted(arrival_times)
+
+    def _draw_service_minutes(self):
+        # Thời gian khám ~ log-normal với trung bình service_mean_minutes.
+        mu = math.log(self.service_mean_minutes) - self.service_sigma ** 2 / 2
+        return max(1.0, self.rng.lognormvariate(mu, self.service_sigma))
+
+    def _try_dispatch(self, clinic_id):
+        # Gọi BN tiếp theo khi PK còn BS rảnh.
+        while self.idle_doctors[clinic_id] > 0:
+            queue_item, _msg, _lvl = self.costs.call("call_next_patient_for_exam", self.logic.call_next_patient_for_exam, clinic_id)
+            if queue_item is None: return
+            self.idle_doctors[clinic_id] -= 1
+            if self.rng.random() < self.no_show_rate:
+                self.absent_events += 1
+                was_removed, _msg, _lvl = self.costs.call("handle_absent_called_patient", self.logic.handle_absent_called_patient, queue_item, clinic_id)
+                if was_removed: self.dropped_after_absences += 1; self._leave_system(queue_item.patient_id)
+                self._push_event(self.virtual_now + datetime.timedelta(minutes=self.recall_delay_minutes), EVENT_DOCTOR_FREE, clinic_id)
+                continue
+            arrival_time = self.arrival_time_by_patient[queue_item.patient_id]
+            wait_minutes = (self.virtual_now - arrival_time).total_seconds() / 60.0
+            self.wait_minutes_by_priority[self.arrival_priority_by_patient[queue_item.patient_id]].append(wait_minutes)
+            estimated_wait_minutes = self.estimated_wait_by_patient.pop(queue_item.patient_id, None)
+            if estimated_wait_minutes is not None: self.wait_estimate_errors.append(estimated_wait_minutes - wait_minutes)
+            self._push_event(self.virtual_now + datetime.timedelta(minutes=self._draw_service_minutes()), EVENT_SERVICE_END, (clinic_id, queue_item.patient_id))
+
+    def _take_random_free_patient(self):
+        # Lấy ngẫu nhiên 1 BN đang rảnh ra khỏi danh sách rảnh (đổi chỗ với phần tử cuối rồi pop, O(1)); None nếu hết.
+        if not self.free_patient_ids: return None
+        position = self.rng.randrange(len(self.free_patient_ids))
+        patient_id = self.free_patient_ids[position]; last_patient_id = self.free_patient_ids.pop()
+        del self.free_position_by_patient[patient_id]
+        if last_patient_id != patient_id: self.free_patient_ids[position] = last_patient_id; self.free_position_by_patient[last_patient_id] = position
+        return patient_id
+
+    def _return_free_patient(self, patient_id):
+        if patient_id in self.free_position_by_patient: return
+        self.free_position_by_patient[patient_id] = len(self.free_patient_ids); self.free_patient_ids.append(patient_id)
+
+    def _leave_system(self, patient_id):
+        if patient_id in self.patients_in_system: self.patients_in_system.discard(patient_id); self._return_free_patient(patient_id)
+        self.arrival_time_by_patient.pop(patient_id, None); self.arrival_priority_by_patient.pop(patient_id, None)
+        self.estimated_wait_by_patient.pop(patient_id, None)
+
+    def _handle_arrival(self, clinic_id):
+        priority_names = list(self.priority_weights); priority_weights = [self.priority_weights[n] for n in priority_names]
+        patient_id = self._take_random_free_patient()
+        if patient_id is None: self.rejected_registrations += 1; return # Mọi BN trong dữ liệu đang chờ/đang khám
+        priority_name = self.rng.choices(priority_names, weights=priority_weights)[0]
+        success_flag, _msg, _lvl = self.costs.call("register_for_examination", self.logic.register_for_examination, patient_id, clinic_id, priority_name)
+        if not success_flag: self.rejected_registrations += 1; self._return_free_patient(patient_id); return
+        self.patients_in_system.add(patient_id)
+        self.arrival_time_by_patient[patient_id] = self.virtual_now; self.arrival_priority_by_patient[patient_id] = priority_name
+        wait_estimate, _msg, _lvl = self.costs.call("estimate_wait_for_queued_patient", self.logic.estimate_wait_for_queued_patient, patient_id)
+        if wait_estimate: self.estimated_wait_by_patient[patient_id] = wait_estimate[2] / 60.0
+        self._try_dispatch(clinic_id)
+
+    def _handle_service_end(self, clinic_id, patient_id):
+        self.costs.call("complete_examination", self.logic.complete_examination, patient_id, "Khám mô phỏng", "Hoàn thành", "", "", clinic_id)
+        self.completed_by_clinic[clinic_id] += 1; self.last_completion_time = self.virtual_now
+        self._leave_system(patient_id)
+        self.idle_doctors[clinic_id] += 1
+        self._try_dispatch(clinic_id)
+
+    def run(self):
+        if len(self.patient_pool) < 2: raise ValueError("Cần ít nhất 2 BN trong dữ liệu để mô phỏng.")
+        for arrival_time in self._generate_arrival_times(): self._push_event(arrival_time, EVENT_ARRIVAL, self.rng.choice(self.clinic_ids))
+        wall_start = time.perf_counter(); cpu_start = time.process_time()
+        with silence_stdout():
+            while self.event_heap:
+                event_time, _seq, event_type, payload = heapq.heappop(self.event_heap)
+                self.virtual_now = event_time
+                if event_type == EVENT_ARRIVAL: self._handle_arrival(payload)
+                elif event_type == EVENT_SERVICE_END: self._handle_service_end(*payload)
+                elif event_type == EVENT_DOCTOR_FREE: self.idle_doctors[payload] += 1; self._try_dispatch(payload)
+        return self._build_report(time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+    def _build_report(self, wall_seconds, cpu_seconds):
+        wait_report = {}
+        for priority_name, samples in self.wait_minutes_by_priority.items():
+            ordered = sorted(samples)
+            wait_report[priority_name] = {"served": len(ordered), "p50_min": percentile(ordered, 50), "p90_min": percentile(ordered, 90),
+                                          "p95_min": percentile(ordered, 95), "p99_min": percentile(ordered, 99), "max_min": ordered[-1] if ordered else None}
+        completed_total = sum(self.completed_by_clinic.values())
+        absolute_errors = sorted(abs(error) for error in self.wait_estimate_errors)
+        estimate_report = {"samples": len(absolute_errors), "mean_error_min": sum(self.wait_estimate_errors) / len(absolute_errors) if absolute_errors else None,
+                           "p50_abs_error_min": percentile(absolute_errors, 50), "p90_abs_error_min": percentile(absolute_errors, 90)}
+        first_hour = min(self.hourly_weights)
+        operating_hours = max(1e-9, (self.last_completion_time - self.virtual_day.replace(hour=first_hour)).total_seconds() / 3600.0)
+        return {
+            "wait_time_by_priority": wait_report,
+            "wait_estimate_accuracy": estimate_report, # Chỉ tính BN được gọi lần đầu (không tính lượt gọi lại sau khi vắng)
+            "throughput": {"arrivals": self.arrivals_count, "completed": completed_total, "rejected_registrations": self.rejected_registrations,
+                           "absent_events": self.absent_events, "dropped_after_absences": self.dropped_after_absences,
+                           "completed_per_hour": completed_total / operating_hours, "last_completion": self.last_completion_time.strftime("%H:%M"),
+                           "completed_by_clinic": self.completed_by_clinic, "doctors_by_clinic": self.doctor_slots},
+            "operation_cost": self.costs.summary(),
+            "simulation_wall_s": wall_seconds, "simulation_cpu_s": cpu_seconds,
+        }
+
+
+def _load_weight_map(path, key_type):
+    with open(path, encoding='utf-8') as f: raw_map = json.load(f)
+    return {key_type(k): float(v) for k, v in raw_map.items()}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mô phỏng một ngày khám trên đồng hồ ảo.")
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--clinics", type=int, default=20, help="Số phòng khám.")
+    parser.add_argument("--registry-patients", type=int, default=5_000, help="Số hồ sơ BN trong dữ liệu giả lập.")
+    parser.add_argument("--arrivals", type=int, default=2_000, help="Số lượt đăng ký khám trong ngày.")
+    parser.add_argument("--doctors-per-clinic", type=int, default=None, help="Ghi đè số BS mỗi PK (mặc định: theo doctor_id_list).")
+    parser.add_argument("--service-mean-minutes", type=float, default=8.0, help="Thời gian khám trung bình (phút).")
+    parser.add_argument("--service-sigma", type=float, default=0.5, help="Độ lệch log-normal của thời gian khám.")
+    parser.add_argument("--no-show-rate", type=float, default=0.05, help="Xác suất BN vắng khi được gọi.")
+    parser.add_argument("--recall-delay-minutes", type=float, default=1.0, help="Thời gian BS chờ trước khi gọi BN khác khi BN vắng.")
+    parser.add_argument("--arrival-profile", default=None, help="JSON {giờ: trọng số} thay cho hồ sơ lượt đến mặc định.")
+    parser.add_argument("--priority-mix", default=None, help="JSON {tên ưu tiên: trọng số}.")
+    parser.add_argument("--date", default="2025-06-02", help="Ngày mô phỏng (YYYY-MM-DD).")
+    parser.add_argument("--output", default="-", help="File JSON kết quả ('-' = stdout).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    hourly_weights = _load_weight_map(args.arrival_profile, int) if args.arrival_profile else DEFAULT_HOURLY_ARRIVAL_WEIGHTS
+    priority_weights = _load_weight_map(args.priority_mix, str) if args.priority_mix else DEFAULT_PRIORITY_WEIGHTS
+    unknown_priorities = [name for name in priority_weights if name not in PatientInQueue.PRIORITY_MAP]
+    if unknown_priorities: print(f"Mức ưu tiên không hợp lệ: {', '.join(unknown_priorities)}", file=sys.stderr); return 2
+
+    data_directory = tempfile.mkdtemp(prefix="medical_sim_")
+    try:
+        generator = SyntheticRegistryGenerator(seed=args.seed, patient_count=max(args.registry_patients, 2), clinic_count=args.clinics, max_visits_per_patient=2)
+        generator.write_csv_files(data_directory)
+        with silence_stdout(): logic = MedicalSystemLogic(data_directory=data_directory)
+        virtual_day = datetime.datetime.strptime(args.date, "%Y-%m-%d")
+        simulator = ClinicDaySimulator(logic, random.Random(args.seed), virtual_day, args.arrivals, hourly_weights, priority_weights,
+                                       args.service_mean_minutes, args.service_sigma, args.no_show_rate, args.recall_delay_minutes, args.doctors_per_clinic)
+        report = simulator.run()
+        for priority_name, stats in report["wait_time_by_priority"].items():
+            if stats["served"]: print(f"{priority_name:<14} n={stats['served']:<6} p50={stats['p50_min']:7.1f}  p90={stats['p90_min']:7.1f}  p99={stats['p99_min']:7.1f} phút", file=sys.stderr)
+        estimate_stats = report["wait_estimate_accuracy"]
+        if estimate_stats["samples"]: print(f"Sai số dự kiến chờ: lệch TB {estimate_stats['mean_error_min']:+.1f}, |sai số| p50={estimate_stats['p50_abs_error_min']:.1f} p90={estimate_stats['p90_abs_error_min']:.1f} phút", file=sys.stderr)
+        print(f"Hoàn thành {report['throughput']['completed']}/{args.arrivals} lượt, {report['throughput']['completed_per_hour']:.1f} lượt/giờ, kết thúc lúc {report['throughput']['last_completion']}", file=sys.stderr)
+        parameters = {key: value for key, value in vars(args).items() if key != "output"}
+        parameters.update({"hourly_weights": hourly_weights, "priority_weights": priority_weights})
+        write_result_document(build_result_document("clinic_day_simulation", parameters, report), args.output)
+    finally:
+        shutil.rmtree(data_directory, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+# benchmarks/stress_concurrency.py
+# Kiểm tra chịu tải đồng thời: nhiều luồng "quầy tiếp đón", "phòng khám" và "tra cứu"
+# cùng gọi MedicalSystemLogic, sau đó kiểm tra các bất biến của hàng đợi:
+#   - mỗi heap vẫn đúng tính chất max-heap (kể cả sau khi đổi ưu tiên / tăng ưu tiên BN chờ lâu),
+#   - không BN nào nằm ở 2 hàng đợi, chỉ mục BN đang chờ khớp với nội dung hàng đợi,
+#   - cân bằng số lượt: đăng ký + đưa lại (vắng) = gọi khám + rời hàng + còn lại trong hàng đợi,
+#   - file CSV sau khi chạy vẫn đọc lại được đầy đủ.
+# Thoát với mã 1 nếu có bất biến bị vi phạm.
+#
+# Ví dụ:
+#   python benchmarks/stress_concurrency.py --reception-desks 6 --doctor-stations 12 --duration 10
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from bench_common import silence_stdout, build_result_document, write_result_document
+from synthetic_data import SyntheticRegistryGenerator
+
+from app_logic import MedicalSystemLogic
+from models import PatientInQueue
+from custom_structures import CLINIC_QUEUE_IMPLEMENTATIONS
+
+
+class StressCounters:
+    """Bộ đếm dùng chung giữa các luồng (có khóa riêng, không dùng khóa của logic)."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {"registered": 0, "register_rejected": 0, "called": 0, "left": 0, "readded_after_absent": 0,
+                       "removed_after_absent": 0, "completed": 0, "priority_changed": 0, "long_waiter_updates": 0, "lookups": 0, "errors": 0, "doctor_slot_called": 0}
+
+    def add(self, counter_name, amount=1):
+        with self._lock: self.values[counter_name] += amount
+
+
+def check_queue_invariants(logic, quiescent=True):
+    # Kiểm tra tính chất heap + chỉ mục BN đang chờ. Trả về (số BN đang chờ, danh sách lỗi).
+    # Khi các luồng khác còn chạy (quiescent=False) các hàng đợi được đọc lần lượt, không phải ảnh chụp
+    # đồng thời, nên chỉ kiểm tra bất biến trong từng hàng đợi (BN có thể đã chuyển PK giữa 2 lần đọc).
+    violations = []; queued_patient_ids = {}
+    all_clinics_list = logic.list_all_clinics()
+    for i in range(len(all_clinics_list)):
+        clinic_id = all_clinics_list.get(i).clinic_id
+        clinic_queue, queue_lock = logic._get_clinic_queue_and_lock(clinic_id)
+        if not clinic_queue: continue
+        with queue_lock:
+            if hasattr(clinic_queue, "internal_heap"):
+                heap_array = clinic_queue.internal_heap.heap_array
+                for child_index in range(1, len(heap_array)):
+                    parent_item = heap_array.get(clinic_queue.internal_heap._get_parent_index(child_index)); child_item = heap_array.get(child_index)
+                    if child_item > parent_item: violations.append(f"PK {clinic_id}: vi phạm tính chất heap tại vị trí {child_index}")
+            else: # Hàng đợi chia mức: thứ tự gọi không được có BN nào "lớn hơn" BN đứng trước
+                ordered_items = clinic_queue.get_items_in_priority_order()
+                for item_index in range(1, len(ordered_items)):
+                    if ordered_items.get(item_index) > ordered_items.get(item_index - 1): violations.append(f"PK {clinic_id}: sai thứ tự gọi tại vị trí {item_index}")
+                if len(ordered_items) != clinic_queue.current_size: violations.append(f"PK {clinic_id}: current_size {clinic_queue.current_size} khác số BN {len(ordered_items)}")
+            all_queued_items = clinic_queue.get_all_items()
+            for item_index in range(len(all_queued_items)):
+                patient_id = all_queued_items.get(item_index).patient_id
+                if quiescent and patient_id in queued_patient_ids: violations.append(f"BN {patient_id} có mặt ở cả PK {queued_patient_ids[patient_id]} và PK {clinic_id}")
+                queued_patient_ids[patient_id] = clinic_id
+                with logic._queue_membership_lock: indexed_clinic_id = logic.queued_patient_clinic_index.get_item(patient_id)
+                if indexed_clinic_id != clinic_id: violations.append(f"Chỉ mục ghi BN {patient_id} ở PK {indexed_clinic_id}, thực tế ở PK {clinic_id}")
+            clinic_load = logic.clinic_load_index.get_clinic_load(clinic_id) # Cập nhật trong khóa hàng đợi nên phải khớp ngay cả khi đang chạy
+            if clinic_load is None or clinic_load[0] != clinic_queue.current_size: violations.append(f"Chỉ mục tải ghi PK {clinic_id} có {clinic_load and clinic_load[0]} BN chờ, thực tế {clinic_queue.current_size}")
+    if not quiescent: return len(queued_patient_ids), violations
+    with logic._queue_membership_lock: indexed_count = len(logic.queued_patient_clinic_index)
+    if indexed_count != len(queued_patient_ids): violations.append(f"Chỉ mục có {indexed_count} BN, hàng đợi có {len(queued_patient_ids)} BN")
+    return len(queued_patient_ids), violations
+
+
+class ConcurrencyStressRun:
+    """Chạy các luồng quầy tiếp đón / phòng khám / tra cứu trong một khoảng thời gian."""
+    def __init__(self, logic, args):
+        self.logic = logic; self.args = args
+        self.counters = StressCounters()
+        self.stop_event = threading.Event()
+        self.midrun_violations = []
+        all_patients = logic.list_all_patients()
+        self.patients = [all_patients.get(i) for i in range(len(all_patients))]
+        all_clinics = logic.list_all_clinics()
+        self.clinic_ids = sorted(all_clinics.get(i).clinic_id for i in range(len(all_clinics)))
+        self.priority_names = list(PatientInQueue.PRIORITY_MAP.keys())
+        self.doctor_ids_by_clinic = {clinic_id: sorted(logic.get_doctor_ids_for_clinic(clinic_id)) for clinic_id in self.clinic_ids}
+        self.doctor_ids_by_clinic = {clinic_id: doctor_ids for clinic_id, doctor_ids in self.doctor_ids_by_clinic.items() if doctor_ids}
+
+    def _guarded(self, worker_func, thread_seed):
+        # Bọc luồng worker: ngoại lệ không mong muốn được đếm là lỗi.
+        rng = random.Random(thread_seed)
+        while not self.stop_event.is_set():
+            try: worker_func(rng)
+            except Exception as worker_exception:
+                self.counters.add("errors"); print(f"Lỗi trong luồng {threading.current_thread().name}: {worker_exception!r}", file=sys.stderr)
+
+    def _reception_step(self, rng):
+        # Quầy tiếp đón: đăng ký, thỉnh thoảng đổi ưu tiên, tăng ưu tiên BN chờ lâu hoặc cho BN rời hàng.
+        patient_obj = rng.choice(self.patients); clinic_id = rng.choice(self.clinic_ids)
+        success_flag, _msg, _lvl = self.logic.register_for_examination(patient_obj.patient_id, clinic_id, rng.choice(self.priority_names))
+        self.counters.add("registered" if success_flag else "register_rejected")
+        roll = rng.random()
+        if roll < self.args.leave_ratio:
+            if self.logic.handle_patient_leaving_queue(patient_obj.patient_id, clinic_id)[0]: self.counters.add("left")
+        elif roll < self.args.leave_ratio + self.args.priority_change_ratio:
+            if self.logic.change_patient_priority_in_queue(clinic_id, patient_obj.patient_id, rng.choice(self.priority_names))[0]: self.counters.add("priority_changed")
+        elif roll < self.args.leave_ratio + self.args.priority_change_ratio + self.args.long_waiter_ratio:
+            self.logic.update_priority_for_long_waiters(clinic_id, max_wait_seconds=0); self.counters.add("long_waiter_updates") # Mọi BN đang chờ đều "chờ lâu"
+
+    def _doctor_step(self, rng):
+        # Phòng khám: gọi BN tiếp theo, xử lý vắng mặt hoặc hoàn thành khám.
+        clinic_id = rng.choice(self.clinic_ids)
+        exam_patient, _msg, _lvl = self.logic.call_next_patient_for_exam(clinic_id)
+        if not exam_patient: time.sleep(0.0005); return
+        self.counters.add("called")
+        if rng.random() < self.args.no_show_ratio:
+            was_removed, _msg, _lvl = self.logic.handle_absent_called_patient(exam_patient, clinic_id)
+            self.counters.add("removed_after_absent" if was_removed else "readded_after_absent")
+        elif rng.random() < self.args.complete_ratio: # Hoàn thành khám (ghi CSV) với tỉ lệ nhỏ
+            if self.logic.complete_examination(exam_patient.patient_id, "Khám ngoại trú", "Ổn định", "", "", clinic_id)[0]: self.counters.add("completed")
+
+    def _doctor_slot_step(self, rng):
+        # Một BS gọi BN vào ô khám của mình (nhiều BS cùng PK tranh nhau một hàng đợi); BN được giữ trong ô
+        # vài lượt rồi vắng mặt hoặc khám xong. BS đang bận mà bị gọi tiếp thì logic phải từ chối.
+        if not self.doctor_ids_by_clinic: time.sleep(0.001); return
+        clinic_id = rng.choice(sorted(self.doctor_ids_by_clinic)); doctor_id = rng.choice(self.doctor_ids_by_clinic[clinic_id])
+        exam_patient, _msg, message_lvl = self.logic.call_next_patient_for_doctor(clinic_id, doctor_id)
+        if exam_patient: self.counters.add("called"); self.counters.add("doctor_slot_called"); return
+        if message_lvl != "WARNING": time.sleep(0.0005); return # Hàng đợi rỗng
+        roll = rng.random() # BS đang bận: kết thúc lượt khám hiện tại
+        if roll < self.args.complete_ratio:
+            if self.logic.complete_examination_for_doctor(clinic_id, doctor_id, "Khám ngoại trú", "Ổn định")[0]: self.counters.add("completed")
+        elif roll < self.args.complete_ratio + 0.5:
+            was_removed, _msg, message_lvl = self.logic.handle_absent_for_doctor(clinic_id, doctor_id)
+            if message_lvl == "INFO": self.counters.add("removed_after_absent" if was_removed else "readded_after_absent")
+
+    def _lookup_step(self, rng):
+        # Tra cứu hồ sơ: theo mã, theo SĐT (Radix Tree), xem hàng đợi.
+        patient_obj = rng.choice(self.patients)
+        self.logic.find_patient_by_id(patient_obj.patient_id)
+        self.logic.search_patient_by_phone_radix(patient_obj.phone_number)
+        self.logic.get_clinic_queue_display_list(rng.choice(self.clinic_ids))
+        self.counters.add("lookups", 3)
+
+    def _invariant_watcher(self):
+        # Kiểm tra bất biến định kỳ trong lúc các luồng khác đang chạy.
+        while not self.stop_event.wait(self.args.check_interval):
+            _queued_count, violations = check_queue_invariants(self.logic, quiescent=False)
+            self.midrun_violations.extend(violations)
+
+    def run(self):
+        thread_specs = [(f"quay_tiep_don_{i}", self._reception_step) for i in range(self.args.reception_desks)]
+        thread_specs += [(f"phong_kham_{i}", self._doctor_step) for i in range(self.args.doctor_stations)]
+        thread_specs += [(f"bs_o_kham_{i}", self._doctor_slot_step) for i in range(self.args.doctor_slot_stations)]
+        thread_specs += [(f"tra_cuu_{i}", self._lookup_step) for i in range(self.args.lookup_threads)]
+        worker_threads = [threading.Thread(target=self._guarded, args=(step_func, self.args.seed * 1000 + index), name=name, daemon=True) for index, (name, step_func) in enumerate(thread_specs)]
+        worker_threads.append(threading.Thread(target=self._invariant_watcher, name="kiem_tra_bat_bien", daemon=True))
+        start = time.perf_counter()
+        for worker_thread in worker_threads: worker_thread.start()
+        time.sleep(self.args.duration); self.stop_event.set()
+        for worker_thread in worker_threads: worker_thread.join(timeout=30)
+        elapsed_seconds = time.perf_counter() - start
+        hung_threads = [t.name for t in worker_threads if t.is_alive()]
+
+        queued_count, final_violations = check_queue_invariants(self.logic)
+        values = dict(self.counters.values)
+        expected_queued = values["registered"] + values["readded_after_absent"] - values["called"] - values["left"]
+        if expected_queued != queued_count: final_violations.append(f"Cân bằng lượt sai: kỳ vọng {expected_queued} BN còn chờ, thực tế {queued_count}")
+        if hung_threads: final_violations.append(f"Luồng không dừng (nghi deadlock): {', '.join(hung_threads)}")
+        if values["errors"]: final_violations.append(f"{values['errors']} ngoại lệ trong các luồng worker")
+        total_ops = values["registered"] + values["register_rejected"] + values["called"] + values["left"] + values["priority_changed"] + values["lookups"]
+        return {"elapsed_s": elapsed_seconds, "counters": values, "queued_at_end": queued_count, "ops_per_s": total_ops / elapsed_seconds,
+                "midrun_violations": self.midrun_violations[:50], "final_violations": final_violations[:50]}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Kiểm tra MedicalSystemLogic khi nhiều luồng gọi đồng thời.")
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--patients", type=int, default=3_000, help="Số hồ sơ BN trong dữ liệu giả lập.")
+    parser.add_argument("--clinics", type=int, default=12, help="Số phòng khám.")
+    parser.add_argument("--reception-desks", type=int, default=4, help="Số luồng quầy tiếp đón.")
+    parser.add_argument("--doctor-stations", type=int, default=8, help="Số luồng phòng khám gọi BN.")
+    parser.add_argument("--doctor-slot-stations", type=int, default=4, help="Số luồng BS gọi BN vào ô khám riêng (call_next_patient_for_doctor).")
+    parser.add_argument("--lookup-threads", type=int, default=2, help="Số luồng tra cứu hồ sơ.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Thời gian chạy (giây).")
+    parser.add_argument("--check-interval", type=float, default=0.5, help="Chu kỳ kiểm tra bất biến trong lúc chạy (giây).")
+    parser.add_argument("--leave-ratio", type=float, default=0.05)
+    parser.add_argument("--priority-change-ratio", type=float, default=0.10)
+    parser.add_argument("--long-waiter-ratio", type=float, default=0.02, help="Tỉ lệ lượt tiếp đón gọi update_priority_for_long_waiters.")
+    parser.add_argument("--no-show-ratio", type=float, default=0.10)
+    parser.add_argument("--complete-ratio", type=float, default=0.02, help="Tỉ lệ lượt gọi được hoàn thành khám (mỗi lần ghi CSV BN).")
+    parser.add_argument("--clinic-queue-implementation", default="heap", choices=sorted(CLINIC_QUEUE_IMPLEMENTATIONS), help="Cài đặt hàng đợi khám của mọi PK.")
+    parser.add_argument("--output", default=None, help="File JSON kết quả ('-' = stdout).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    data_directory = tempfile.mkdtemp(prefix="medical_stress_")
+    try:
+        generator = SyntheticRegistryGenerator(seed=args.seed, patient_count=args.patients, clinic_count=args.clinics, max_visits_per_patient=2)
+        generator.write_csv_files(data_directory)
+        with silence_stdout():
+            logic = MedicalSystemLogic(data_directory=data_directory, clinic_queue_implementation=args.clinic_queue_implementation)
+            report = ConcurrencyStressRun(logic, args).run()
+            reloaded_logic = MedicalSystemLogic(data_directory=data_directory, clinic_queue_implementation=args.clinic_queue_implementation) # CSV ghi đồng thời phải còn đọc lại được
+        if len(reloaded_logic.list_all_patients()) != len(logic.list_all_patients()):
+            report["final_violations"].append(f"Đọc lại CSV được {len(reloaded_logic.list_all_patients())} BN, kỳ vọng {len(logic.list_all_patients())}")
+        for clinic_obj in logic.clinic_records_table.iter_values(): # Hàng đợi khôi phục từ nhật ký phải khớp hàng đợi lúc dừng
+            def queue_state(some_logic): return [(q.patient_id, q.priority, q.registration_time, q.absent_count) for q in some_logic.get_clinic_queue_items(clinic_obj.clinic_id)]
+            if queue_state(reloaded_logic) != queue_state(logic): report["final_violations"].append(f"Hàng đợi PK {clinic_obj.clinic_id} khôi phục từ nhật ký không khớp")
+        logic.close(); reloaded_logic.close()
+        counters = report["counters"]
+        print(f"{report['elapsed_s']:.1f}s, {report['ops_per_s']:.0f} thao tác/giây: đăng ký {counters['registered']} (từ chối {counters['register_rejected']}), "
+              f"gọi {counters['called']}, rời {counters['left']}, vắng đưa lại {counters['readded_after_absent']}, hoàn thành {counters['completed']}, còn chờ {report['queued_at_end']}", file=sys.stderr)
+        all_violations = report["midrun_violations"] + report["final_violations"]
+        for violation in all_violations: print(f"VI PHẠM: {violation}", file=sys.stderr)
+        if args.output: write_result_document(build_result_document("concurrency_stress", {k: v for k, v in vars(args).items() if k != "output"}, report), args.output)
+        print("OK: không có bất biến nào bị vi phạm." if not all_violations else f"THẤT BẠI: {len(all_violations)} vi phạm.", file=sys.stderr)
+        return 1 if all_violations else 0
+    finally:
+        shutil.rmtree(data_directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# benchmarks/synthetic_data.py
+# Sinh dữ liệu giả lập (BN, BS, PK, lịch sử khám) cho bộ đo hiệu năng.
+import csv
+import datetime
+import os
+import random
+
+from bench_common import REPO_ROOT  # noqa: F401 (thêm thư mục gốc vào sys.path)
+from models import DATE_FORMAT_CSV, DATETIME_FORMAT_DISPLAY, HISTORY_FIELD_SEPARATOR, HISTORY_ITEM_SEPARATOR, LIST_ID_SEPARATOR
+from app_logic import PATIENTS_CSV_FILENAME, DOCTORS_CSV_FILENAME, CLINICS_CSV_FILENAME
+
+# Các quy mô chuẩn (số bệnh nhân)
+SCALE_PRESETS = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+HO_LIST = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ", "Hồ", "Ngô", "Dương", "Lý", "Đinh", "Mai", "Trịnh", "Đào"]
+TEN_DEM_NAM = ["Văn", "Hữu", "Đức", "Minh", "Quang", "Công", "Thành", "Xuân", "Ngọc", "Hoàng", "Gia", "Anh"]
+TEN_DEM_NU = ["Thị", "Ngọc", "Thu", "Thanh", "Minh", "Phương", "Kim", "Hải", "Lan", "Diệu", "Bảo", "Mai"]
+TEN_NAM = ["An", "Bình", "Cường", "Dũng", "Duy", "Giang", "Hải", "Hiếu", "Hùng", "Huy", "Khánh", "Kiên", "Long", "Minh", "Nam", "Phong", "Quân", "Sơn", "Tài", "Thắng", "Toàn", "Trung", "Tuấn", "Việt"]
+TEN_NU = ["An", "Anh", "Chi", "Dung", "Hà", "Hằng", "Hoa", "Hương", "Lan", "Linh", "Loan", "Mai", "My", "Ngân", "Nhung", "Oanh", "Phương", "Quỳnh", "Thảo", "Trang", "Tuyết", "Vân", "Yến"]
+
+# (Tên đường, Quận/Huyện, Tỉnh/TP, mã tỉnh CCCD, tiền tố BHYT)
+DIA_BAN_LIST = [
+    (["Trần Phú", "Lý Thường Kiệt", "Hàng Bài", "Nguyễn Văn Cừ", "Giải Phóng", "Kim Mã"], ["Quận Ba Đình", "Quận Hoàn Kiếm", "Quận Long Biên", "Quận Đống Đa", "Quận Cầu Giấy"], "Hà Nội", "001", "HN"),
+    (["Võ Thị Sáu", "Nguyễn Huệ", "Pasteur", "Điện Biên Phủ", "Cách Mạng Tháng Tám", "Lê Văn Sỹ"], ["Quận 1", "Quận 3", "Quận 10", "Quận Bình Thạnh", "TP. Thủ Đức"], "TP.HCM", "079", "TP"),
+    (["Lê Lợi", "Bạch Đằng", "Nguyễn Văn Linh", "Hùng Vương"], ["Quận Hải Châu", "Quận Thanh Khê", "Quận Sơn Trà"], "Đà Nẵng", "048", "DN"),
+    (["Trần Hưng Đạo", "Nguyễn Trãi", "Ba Tháng Hai"], ["Quận Ninh Kiều", "Quận Cái Răng"], "Cần Thơ", "092", "CT"),
+    (["Lạch Tray", "Tô Hiệu", "Lê Thánh Tông"], ["Quận Ngô Quyền", "Quận Lê Chân"], "Hải Phòng", "031", "HP"),
+]
+PHONE_PREFIXES = ["090", "091", "093", "096", "097", "098", "086", "088", "032", "035", "038", "070", "077", "081", "083"]
+TIEN_SU_LIST = ["Không có tiền sử đáng kể", "Tăng huyết áp", "Tiểu đường type 2", "Hen suyễn", "Viêm mũi dị ứng", "Đau dạ dày", "Gout", "Rối loạn tiền đình", "Thoái hóa cột sống", "Sỏi thận"]
+DI_UNG_LIST = ["Không có", "Không rõ", "Penicillin", "Aspirin", "Ibuprofen", "Sulfonamide", "Paracetamol"]
+
+# (Chuyên khoa, các loại khám, các kết quả)
+CHUYEN_KHOA_LIST = [
+    ("Nội tổng quát", ["Khám tổng quát", "Tái khám nội"], ["Sức khỏe tốt", "Rối loạn tiêu hóa", "Viêm họng cấp"]),
+    ("Nhi khoa", ["Khám nhi", "Tiêm chủng"], ["Sốt siêu vi", "Viêm phế quản", "Phát triển bình thường"]),
+    ("Tim mạch", ["Khám tim mạch", "Đo điện tim"], ["Huyết áp 140/90", "Nhịp tim ổn định", "Thiếu máu cơ tim nhẹ"]),
+    ("Tai mũi họng", ["Khám tai mũi họng", "Nội soi TMH"], ["Viêm mũi cấp", "Viêm xoang", "Viêm amidan"]),
+    ("Da liễu", ["Khám da liễu"], ["Viêm da ổn", "Nấm da", "Mề đay"]),
+    ("Mắt", ["Khám mắt", "Đo thị lực"], ["Cận thị 2 độ", "Viêm kết mạc", "Thị lực bình thường"]),
+    ("Sản phụ khoa", ["Khám thai", "Siêu âm thai"], ["Thai 20 tuần ổn định", "Viêm nhiễm nhẹ"]),
+    ("Chẩn đoán hình ảnh", ["Siêu âm bụng", "Chụp X-quang"], ["Sỏi thận phải 6mm", "Gan nhiễm mỡ độ 1", "Không phát hiện bất thường"]),
+]
+GHI_CHU_LIST = ["Theo dõi thêm", "Tái khám sau 2 tuần", "Uống thuốc theo đơn", "Không có", "Điều chỉnh thuốc"]
+
+
+def scale_to_patient_count(scale_str):
+    # Đổi "1k"/"100k"/"1m" hoặc số nguyên dạng chuỗi sang số bệnh nhân.
+    scale_key = str(scale_str).strip().lower()
+    if scale_key in SCALE_PRESETS: return SCALE_PRESETS[scale_key]
+    return int(scale_key)
+
+
+class SyntheticRegistryGenerator:
+    """Sinh dữ liệu BN/BS/PK có thể tái lập (cùng seed -> cùng dữ liệu)."""
+    def __init__(self, seed=2025, patient_count=1_000, doctor_count=None, clinic_count=None, max_visits_per_patient=6, history_start_date=datetime.date(2020, 1, 1), history_end_date=datetime.date(2025, 5, 31)):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.patient_count = patient_count
+        # Mặc định số BS/PK tăng chậm theo số BN
+        self.clinic_count = clinic_count if clinic_count else max(5, min(200, patient_count // 2_000))
+        self.doctor_count = doctor_count if doctor_count else max(10, self.clinic_count * 3)
+        self.max_visits_per_patient = max_visits_per_patient
+        self.history_start_date = history_start_date
+        self.history_day_span = max(1, (history_end_date - history_start_date).days)
+
+    def _random_full_name(self, is_male):
+        rng = self.rng
+        if is_male: return f"{rng.choice(HO_LIST)} {rng.choice(TEN_DEM_NAM)} {rng.choice(TEN_NAM)}"
+        return f"{rng.choice(HO_LIST)} {rng.choice(TEN_DEM_NU)} {rng.choice(TEN_NU)}"
+
+    def generate_clinic_rows(self):
+        # Sinh PK, mỗi PK gắn với một chuyên khoa.
+        clinic_rows = []
+        for i in range(1, self.clinic_count + 1):
+            specialty, _, _ = CHUYEN_KHOA_LIST[(i - 1) % len(CHUYEN_KHOA_LIST)]
+            clinic_rows.append({"ma_phong_kham": f"PK{i:03d}", "ten_phong_kham": f"Phòng khám {specialty} số {i}", "chuyen_khoa_pk": specialty, "danh_sach_ma_bac_si": []})
+        return clinic_rows
+
+    def generate_doctor_rows(self, clinic_rows):
+        # Sinh BS và phân công 1-3 PK cho mỗi BS (cập nhật cả 2 chiều).
+        doctor_rows = []
+        for i in range(1, self.doctor_count + 1):
+            doctor_id = f"BS{i:03d}"
+            assigned_clinics = self.rng.sample(clinic_rows, k=min(len(clinic_rows), self.rng.randint(1, 3)))
+            for clinic_row in assigned_clinics: clinic_row["danh_sach_ma_bac_si"].append(doctor_id)
+            doctor_rows.append({"ma_bac_si": doctor_id, "ho_ten_bac_si": self._random_full_name(self.rng.random() < 0.5), "chuyen_khoa": assigned_clinics[0]["chuyen_khoa_pk"], "danh_sach_ma_phong_kham": [c["ma_phong_kham"] for c in assigned_clinics]})
+        return doctor_rows
+
+    def _generate_history_str(self, clinic_rows):
+        # Sinh chuỗi lịch sử khám (định dạng CSV của Patient).
+        rng = self.rng
+        visit_count = rng.randint(0, self.max_visits_per_patient)
+        visit_items = []
+        for day_offset in sorted(rng.randrange(self.history_day_span) for _ in range(visit_count)):
+            clinic_row = rng.choice(clinic_rows)
+            doctor_ids = clinic_row["danh_sach_ma_bac_si"]
+            _, exam_types, exam_results = next(ck for ck in CHUYEN_KHOA_LIST if ck[0] == clinic_row["chuyen_khoa_pk"])
+            exam_date = self.history_start_date + datetime.timedelta(days=day_offset)
+            visit_items.append(HISTORY_FIELD_SEPARATOR.join([exam_date.strftime(DATE_FORMAT_CSV), rng.choice(exam_types), rng.choice(exam_results), rng.choice(GHI_CHU_LIST), rng.choice(doctor_ids) if doctor_ids else "", clinic_row["ma_phong_kham"]]))
+        return HISTORY_ITEM_SEPARATOR.join(visit_items)
+
+    def iter_patient_rows(self, clinic_rows):
+        # Sinh lần lượt từng dòng BN; SĐT và CCCD luôn duy nhất.
+        rng = self.rng
+        phone_suffixes = rng.sample(range(10_000_000), self.patient_count)
+        national_id_suffixes = rng.sample(range(1_000_000), self.patient_count) if self.patient_count <= 1_000_000 else None
+        registration_base = datetime.datetime(2020, 1, 1, 7, 0, 0)
+        for i in range(self.patient_count):
+            is_male = rng.random() < 0.5
+            streets, districts, province, province_code, insurance_prefix = rng.choice(DIA_BAN_LIST)
+            date_of_birth = datetime.date(rng.randint(1940, 2023), rng.randint(1, 12), rng.randint(1, 28))
+            # CCCD: mã tỉnh(3) + giới tính/thế kỷ(1) + năm sinh(2) + 6 số ngẫu nhiên
+            gender_century_digit = (0 if date_of_birth.year < 2000 else 2) + (0 if is_male else 1)
+            national_id_suffix = national_id_suffixes[i] if national_id_suffixes else i
+            national_id = f"{province_code}{gender_century_digit}{date_of_birth.year % 100:02d}{national_id_suffix:06d}"
+            registration_time = registration_base + datetime.timedelta(seconds=rng.randrange(5 * 365 * 24 * 3600))
+            yield {
+                "ma_bn": f"BN{i + 1:04d}", "ho_ten": self._random_full_name(is_male), "ngay_sinh": date_of_birth.strftime(DATE_FORMAT_CSV),
+                "gioi_tinh": "Nam" if is_male else "Nữ", "dia_chi": f"{rng.randint(1, 400)} {rng.choice(streets)}, {rng.choice(districts)}, {province}",
+                "sdt": f"{rng.choice(PHONE_PREFIXES)}{phone_suffixes[i]:07d}", "cccd": national_id, "bhyt": f"{insurance_prefix}{rng.randrange(10**9):09d}",
+                "tien_su_benh_an": rng.choice(TIEN_SU_LIST), "di_ung_thuoc": rng.choice(DI_UNG_LIST),
+                "thoi_diem_dang_ky_he_thong": registration_time.strftime(DATETIME_FORMAT_DISPLAY), "lich_su_kham_benh": self._generate_history_str(clinic_rows),
+            }
+
+    def write_csv_files(self, output_directory):
+        # Ghi 3 file CSV (cùng định dạng với dữ liệu thật) vào thư mục đích.
+        os.makedirs(output_directory, exist_ok=True)
+        clinic_rows = self.generate_clinic_rows()
+        doctor_rows = self.generate_doctor_rows(clinic_rows)
+        with open(os.path.join(output_directory, CLINICS_CSV_FILENAME), mode='w', encoding='utf-8', newline='') as csvfile:
+            csv_writer = csv.DictWriter(csvfile, fieldnames=["ma_phong_kham", "ten_phong_kham", "chuyen_khoa_pk", "danh_sach_ma_bac_si"])
+            csv_writer.writeheader()
+            for clinic_row in clinic_rows: csv_writer.writerow(dict(clinic_row, danh_sach_ma_bac_si=LIST_ID_SEPARATOR.join(clinic_row["danh_sach_ma_bac_si"])))
+        with open(os.path.join(output_directory, DOCTORS_CSV_FILENAME), mode='w', encoding='utf-8', newline='') as csvfile:
+            csv_writer = csv.DictWriter(csvfile, fieldnames=["ma_bac_si", "ho_ten_bac_si", "chuyen_khoa", "danh_sach_ma_phong_kham"])
+            csv_writer.writeheader()
+            for doctor_row in doctor_rows: csv_writer.writerow(dict(doctor_row, danh_sach_ma_phong_kham=LIST_ID_SEPARATOR.join(doctor_row["danh_sach_ma_phong_kham"])))
+        patient_fieldnames = ["ma_bn", "ho_ten", "ngay_sinh", "gioi_tinh", "dia_chi", "sdt", "cccd", "bhyt", "tien_su_benh_an", "di_ung_thuoc", "thoi_diem_dang_ky_he_thong", "lich_su_kham_benh"]
+        with open(os.path.join(output_directory, PATIENTS_CSV_FILENAME), mode='w', encoding='utf-8', newline='') as csvfile:
+            csv_writer = csv.DictWriter(csvfile, fieldnames=patient_fieldnames)
+            csv_writer.writeheader()
+            for patient_row in self.iter_patient_rows(clinic_rows): csv_writer.writerow(patient_row)
+        return {"patients": self.patient_count, "doctors": len(doctor_rows), "clinics": len(clinic_rows)}
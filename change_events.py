@@ -0,0 +1,77 @@
+# change_events.py
+# Sự kiện thay đổi dữ liệu do MedicalSystemLogic phát ra sau mỗi thao tác ghi thành công.
+# Giao diện (hoặc module khác) đăng ký nhận theo loại sự kiện để chỉ làm mới phần bị ảnh hưởng.
+import itertools
+import threading
+
+# Các loại sự kiện
+PATIENT_CREATED = "patient_created"
+PATIENT_UPDATED = "patient_updated"
+PATIENT_DELETED = "patient_deleted"
+QUEUE_CHANGED = "queue_changed" # Hàng đợi của một PK thay đổi (clinic_id cho biết PK nào)
+VISIT_ADDED = "visit_added" # Thêm một lượt khám vào lịch sử
+DOCTOR_CHANGED = "doctor_changed"
+CLINIC_CHANGED = "clinic_changed"
+APPOINTMENT_CHANGED = "appointment_changed" # Đặt / hủy lịch hẹn, hoặc lịch hẹn đến giờ được đưa vào hàng đợi
+
+PATIENT_EVENT_TYPES = (PATIENT_CREATED, PATIENT_UPDATED, PATIENT_DELETED)
+ALL_EVENT_TYPES = PATIENT_EVENT_TYPES + (QUEUE_CHANGED, VISIT_ADDED, DOCTOR_CHANGED, CLINIC_CHANGED, APPOINTMENT_CHANGED)
+
+# Kiểu thay đổi cho DOCTOR_CHANGED / CLINIC_CHANGED / APPOINTMENT_CHANGED (change_kind)
+CHANGE_KIND_CREATED = "created"
+CHANGE_KIND_UPDATED = "updated"
+CHANGE_KIND_DELETED = "deleted"
+CHANGE_KIND_ASSIGNMENT = "assignment" # Gán / bỏ gán BS cho PK
+
+
+class ChangeEvent:
+    """Một thay đổi dữ liệu: loại sự kiện, mã đối tượng, PK liên quan (nếu có) và thông tin thêm."""
+    __slots__ = ("event_type", "entity_id", "clinic_id", "change_kind", "details")
+
+    def __init__(self, event_type, entity_id=None, clinic_id=None, change_kind=None, details=None):
+        if event_type not in ALL_EVENT_TYPES: raise ValueError(f"Loại sự kiện '{event_type}' không hợp lệ.")
+        self.event_type = event_type
+        self.entity_id = entity_id # patient_id / doctor_id / clinic_id tùy loại sự kiện
+        self.clinic_id = clinic_id
+        self.change_kind = change_kind
+        self.details = details if details is not None else {}
+
+    def __repr__(self):
+        return f"ChangeEvent({self.event_type}, entity_id={self.entity_id!r}, clinic_id={self.clinic_id!r}, change_kind={self.change_kind!r})"
+
+
+class ChangeEventBus:
+    """Phát/nhận sự kiện thay đổi. An toàn khi phát từ nhiều luồng.
+
+    Callback được gọi đồng bộ trên luồng phát sự kiện (thường là luồng nền đang chạy logic),
+    nên bên nhận phải tự chuyển về luồng của mình nếu cần (ví dụ giao diện Tk).
+    Lỗi trong một callback không làm hỏng thao tác đã thực hiện và không chặn các callback khác.
+    """
+    def __init__(self):
+        self._subscribers_lock = threading.Lock()
+        self._subscribers = {} # token -> (frozenset loại sự kiện, callback)
+        self._token_counter = itertools.count(1)
+
+    def subscribe(self, event_types, callback):
+        # Đăng ký callback(event) cho một hoặc nhiều loại sự kiện; trả về token để hủy đăng ký.
+        if isinstance(event_types, str): event_types = (event_types,)
+        event_type_set = frozenset(event_types)
+        unknown_types = event_type_set.difference(ALL_EVENT_TYPES)
+        if unknown_types: raise ValueError(f"Loại sự kiện không hợp lệ: {', '.join(sorted(unknown_types))}")
+        subscription_token = next(self._token_counter)
+        with self._subscribers_lock: self._subscribers[subscription_token] = (event_type_set, callback)
+        return subscription_token
+
+    def unsubscribe(self, subscription_token):
+        with self._subscribers_lock: return self._subscribers.pop(subscription_token, None) is not None
+
+    def publish(self, event):
+        # Gửi sự kiện tới các callback đã đăng ký loại tương ứng; trả về số callback đã gọi.
+        with self._subscribers_lock: matching_callbacks = [callback for event_type_set, callback in self._subscribers.values() if event.event_type in event_type_set]
+        for callback in matching_callbacks:
+            try: callback(event)
+            except Exception as e: print(f"Lỗi khi xử lý sự kiện {event.event_type}: {e}")
+        return len(matching_callbacks)
+
+    def subscriber_count(self):
+        with self._subscribers_lock: return len(self._subscribers)
@@ -0,0 +1,116 @@
+# clinic_load_balancer.py
+# Chỉ mục tải các phòng khám theo chuyên khoa để đăng ký "vào PK ít chờ nhất của chuyên khoa X".
+# Mỗi chuyên khoa có một IndexedMinHeap các PK, khóa so sánh là thời gian chờ dự kiến; mỗi lần hàng đợi,
+# số BS hoặc thời gian khám trung bình của một PK thay đổi chỉ cập nhật vị trí PK đó (O(log k) trên mỗi chuyên khoa của PK),
+# nên chọn PK là O(1) thay vì duyệt mọi hàng đợi.
+import re
+import threading
+
+from custom_structures import HashTable, IndexedMinHeap
+
+SPECIALTY_SEPARATOR_PATTERN = re.compile(r"\s*[-,;/]\s*") # "Nội tổng quát - Nhi - Tim mạch" -> 3 chuyên khoa
+
+
+def normalize_specialty(specialty_text):
+    # Chuẩn hóa tên chuyên khoa để so khớp (bỏ khoảng trắng thừa, không phân biệt hoa thường).
+    return " ".join((specialty_text or "").split()).casefold()
+
+
+def split_specialty_keys(specialty_text):
+    # Các khóa chuyên khoa của một PK: cả chuỗi và từng phần tách bởi '-', ',', ';', '/'.
+    specialty_keys = [normalize_specialty(specialty_text)]
+    for specialty_part in SPECIALTY_SEPARATOR_PATTERN.split(specialty_text or ""):
+        part_key = normalize_specialty(specialty_part)
+        if part_key and part_key not in specialty_keys: specialty_keys.append(part_key)
+    return [specialty_key for specialty_key in specialty_keys if specialty_key]
+
+
+class ClinicLoadState:
+    """Tải hiện tại của một PK."""
+    __slots__ = ("clinic_id", "specialty_keys", "queued_count", "doctor_count", "average_service_seconds")
+
+    def __init__(self, clinic_id, specialty_keys, queued_count=0, doctor_count=0, average_service_seconds=1.0):
+        self.clinic_id = clinic_id
+        self.specialty_keys = specialty_keys
+        self.queued_count = queued_count
+        self.doctor_count = doctor_count
+        self.average_service_seconds = average_service_seconds # EWMA thời gian khám (xem wait_time_estimator.py)
+
+    def load_priority(self):
+        # Khóa so sánh (nhỏ hơn = nên chọn trước): PK có BS trước, rồi thời gian chờ dự kiến
+        # (số BN chờ * thời gian khám trung bình / số BS), rồi số BN chờ, rồi mã PK.
+        return (0 if self.doctor_count else 1, self.queued_count * self.average_service_seconds / max(1, self.doctor_count), self.queued_count, self.clinic_id)
+
+
+class SpecialtyLoadIndex:
+    """Chỉ mục PK theo chuyên khoa, sắp theo tải; an toàn khi nhiều luồng (khóa riêng, lấy sau cùng)."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clinic_states = HashTable(initial_table_size=32) # clinic_id -> ClinicLoadState
+        self._clinic_heaps_by_specialty = HashTable(initial_table_size=32) # khóa chuyên khoa -> IndexedMinHeap(clinic_id)
+
+    def _reposition(self, clinic_state):
+        load_priority = clinic_state.load_priority()
+        for specialty_key in clinic_state.specialty_keys: self._clinic_heaps_by_specialty.get_item(specialty_key).put_item(clinic_state.clinic_id, load_priority)
+
+    def _unindex(self, clinic_state):
+        for specialty_key in clinic_state.specialty_keys:
+            specialty_heap = self._clinic_heaps_by_specialty.get_item(specialty_key)
+            specialty_heap.delete_item(clinic_state.clinic_id)
+            if specialty_heap.is_empty(): self._clinic_heaps_by_specialty.delete_item(specialty_key)
+
+    def set_clinic(self, clinic_id_val, specialty_text, queued_count=None, doctor_count=None, average_service_seconds=None):
+        # Thêm PK hoặc cập nhật chuyên khoa của PK (giữ số BN chờ / số BS / thời gian khám cũ nếu không truyền).
+        with self._lock:
+            clinic_state = self._clinic_states.get_item(clinic_id_val)
+            if clinic_state is None: clinic_state = ClinicLoadState(clinic_id_val, []); self._clinic_states.put_item(clinic_id_val, clinic_state)
+            else: self._unindex(clinic_state)
+            clinic_state.specialty_keys = split_specialty_keys(specialty_text)
+            if queued_count is not None: clinic_state.queued_count = queued_count
+            if doctor_count is not None: clinic_state.doctor_count = doctor_count
+            if average_service_seconds is not None: clinic_state.average_service_seconds = average_service_seconds
+            for specialty_key in clinic_state.specialty_keys:
+                if not self._clinic_heaps_by_specialty.contains_key(specialty_key): self._clinic_heaps_by_specialty.put_item(specialty_key, IndexedMinHeap(initial_table_size=8))
+            self._reposition(clinic_state)
+
+    def remove_clinic(self, clinic_id_val):
+        with self._lock:
+            clinic_state = self._clinic_states.get_item(clinic_id_val)
+            if clinic_state is None: return False
+            self._unindex(clinic_state); self._clinic_states.delete_item(clinic_id_val)
+            return True
+
+    def update_queued_count(self, clinic_id_val, queued_count):
+        # Gọi mỗi khi số BN chờ của PK thay đổi (O(log k) trên mỗi chuyên khoa của PK).
+        with self._lock:
+            clinic_state = self._clinic_states.get_item(clinic_id_val)
+            if clinic_state is None or clinic_state.queued_count == queued_count: return
+            clinic_state.queued_count = queued_count; self._reposition(clinic_state)
+
+    def update_doctor_count(self, clinic_id_val, doctor_count):
+        with self._lock:
+            clinic_state = self._clinic_states.get_item(clinic_id_val)
+            if clinic_state is None or clinic_state.doctor_count == doctor_count: return
+            clinic_state.doctor_count = doctor_count; self._reposition(clinic_state)
+
+    def update_service_time(self, clinic_id_val, average_service_seconds):
+        with self._lock:
+            clinic_state = self._clinic_states.get_item(clinic_id_val)
+            if clinic_state is None or clinic_state.average_service_seconds == average_service_seconds: return
+            clinic_state.average_service_seconds = average_service_seconds; self._reposition(clinic_state)
+
+    def find_best_clinic(self, specialty_text):
+        # Mã PK tải thấp nhất của chuyên khoa (None nếu không có PK nào), O(1).
+        with self._lock:
+            specialty_heap = self._clinic_heaps_by_specialty.get_item(normalize_specialty(specialty_text))
+            return specialty_heap.peek_min()[0] if specialty_heap is not None and not specialty_heap.is_empty() else None
+
+    def get_clinic_load(self, clinic_id_val):
+        # (số BN chờ, số BS) của PK, hoặc None.
+        with self._lock:
+            clinic_state = self._clinic_states.get_item(clinic_id_val)
+            return (clinic_state.queued_count, clinic_state.doctor_count) if clinic_state else None
+
+    def list_specialties(self):
+        # Các khóa chuyên khoa đang có PK (đã chuẩn hóa), sắp xếp.
+        with self._lock: return sorted(self._clinic_heaps_by_specialty.iter_keys())
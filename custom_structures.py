@@ -1,14 +1,27 @@
 # custom_structures.py
+import bisect
 import datetime
+import itertools
 
 # --- Cấu trúc List (Danh sách tùy chỉnh dựa trên mảng động) ---
 class List:
-    """Mảng động tùy chỉnh, tự thay đổi kích thước."""
+    """Mảng động tùy chỉnh, tự thay đổi kích thước.
+
+    Dịch chuyển phần tử (resize, insert, pop giữa mảng, extend) làm theo khối bằng gán lát cắt
+    trên mảng nội bộ thay vì từng phần tử một.
+    """
     def __init__(self, initial_capacity=10):
         self._capacity = initial_capacity
         self._size = 0
         self._elements = [None] * self._capacity
 
+    @classmethod
+    def from_iterable(cls, iterable):
+        # Tạo List từ một iterable bất kỳ (một lần cấp phát).
+        new_list = cls(0)
+        new_list.extend(iterable)
+        return new_list
+
     def __len__(self):
         return self._size
 
@@ -16,13 +29,15 @@ class List:
         return self._size == 0
 
     def _resize(self, new_capacity):
-        # Thay đổi kích thước mảng nội bộ.
-        new_elements = [None] * new_capacity
-        for i in range(self._size):
-            new_elements[i] = self._elements[i]
-        self._elements = new_elements
+        # Thay đổi kích thước mảng nội bộ (sao chép theo khối).
+        new_capacity = max(new_capacity, self._size)
+        self._elements = self._elements[:self._size] + [None] * (new_capacity - self._size)
         self._capacity = new_capacity
 
+    def _ensure_capacity(self, required_capacity):
+        if required_capacity > self._capacity:
+            self._resize(max(required_capacity, 2 * self._capacity))
+
     def append(self, item):
         # Thêm phần tử vào cuối.
         if self._size == self._capacity:
@@ -30,6 +45,15 @@ class List:
         self._elements[self._size] = item
         self._size += 1
 
+    def extend(self, iterable):
+        # Thêm nhiều phần tử vào cuối.
+        new_items = iterable._elements[:iterable._size] if isinstance(iterable, List) else list(iterable)
+        if not new_items: return
+        new_size = self._size + len(new_items)
+        self._ensure_capacity(new_size)
+        self._elements[self._size:new_size] = new_items
+        self._size = new_size
+
     def get(self, index):
         # Lấy phần tử tại chỉ mục.
         if not (0 <= index < self._size):
@@ -42,14 +66,20 @@ class List:
             raise IndexError("List: Chỉ mục ngoài phạm vi để đặt giá trị")
         self._elements[index] = item
 
+    def __getitem__(self, index_or_slice):
+        # list_obj[i] (cho phép chỉ mục âm) hoặc list_obj[a:b:c] -> List mới.
+        if isinstance(index_or_slice, slice):
+            return List.from_iterable(self._elements[:self._size][index_or_slice])
+        if index_or_slice < 0: index_or_slice += self._size
+        return self.get(index_or_slice)
+
     def insert(self, index, item):
         # Chèn phần tử vào chỉ mục.
         if not (0 <= index <= self._size):
             raise IndexError("List: Chỉ mục chèn ngoài phạm vi")
         if self._size == self._capacity:
             self._resize(2 * self._capacity if self._capacity > 0 else 1)
-        for i in range(self._size, index, -1):
-            self._elements[i] = self._elements[i-1]
+        self._elements[index + 1:self._size + 1] = self._elements[index:self._size]
         self._elements[index] = item
         self._size += 1
 
@@ -63,24 +93,30 @@ class List:
         if not (0 <= actual_index < self._size):
             raise IndexError("List: Chỉ mục pop ngoài phạm vi")
         item = self._elements[actual_index]
-        for i in range(actual_index, self._size - 1):
-            self._elements[i] = self._elements[i+1]
+        self._elements[actual_index:self._size - 1] = self._elements[actual_index + 1:self._size]
         self._size -= 1
         self._elements[self._size] = None
         if self._size < self._capacity // 4 and self._capacity > 10:
             self._resize(self._capacity // 2)
         return item
 
+    def clear(self):
+        # Xóa toàn bộ phần tử, trả mảng nội bộ về dung lượng mặc định.
+        self._capacity = 10
+        self._size = 0
+        self._elements = [None] * self._capacity
+
+    def to_py_list(self):
+        # Bản sao dạng list Python.
+        return self._elements[:self._size]
+
     def __iter__(self):
         # Iterator cho danh sách.
-        for i in range(self._size):
-            yield self._elements[i]
+        return itertools.islice(self._elements, 0, self._size)
 
     def __str__(self):
         if self.is_empty(): return "List:[]"
-        items_str_list = []
-        for i in range(self._size): items_str_list.append(str(self._elements[i]))
-        return "List:[" + ", ".join(items_str_list) + "]"
+        return "List:[" + ", ".join(str(item) for item in self) + "]"
 
 # --- LinkedList (Danh sách liên kết đơn) ---
 class ListNode:
@@ -133,6 +169,72 @@ class LinkedList:
         elements_str_list_py = [str(item) for item in self]
         return "LinkedList:[" + " -> ".join(elements_str_list_py) + "]" if not self.is_empty() else "LinkedList:(empty)"
 
+# --- ChunkedList (Danh sách chia khối - unrolled list) ---
+class ChunkedList:
+    """Danh sách chỉ thêm cuối, lưu theo các khối cố định `chunk_size` phần tử.
+
+    Cùng giao diện với LinkedList (append, get, get_last, duyệt, get_all_elements_as_list) nhưng
+    get(i) là O(1): mọi khối trừ khối cuối đều đầy nên vị trí = (i // chunk_size, i % chunk_size).
+    Duyệt theo khối nên nhanh hơn đi theo từng nút.
+    """
+    def __init__(self, chunk_size=32):
+        if chunk_size <= 0: raise ValueError("Kích thước khối phải dương.")
+        self.chunk_size = chunk_size
+        self._chunks = List(4) # Mỗi phần tử là một khối (list Python tối đa chunk_size phần tử)
+        self._tail_chunk = None # Khối cuối (đang được thêm vào)
+        self._list_size = 0
+
+    @classmethod
+    def from_iterable(cls, iterable, chunk_size=32):
+        new_chunked_list = cls(chunk_size)
+        new_chunked_list.extend(iterable)
+        return new_chunked_list
+
+    def append(self, value):
+        # Thêm vào cuối: O(1) (khối cuối đầy thì mở khối mới).
+        if self._tail_chunk is None or len(self._tail_chunk) == self.chunk_size:
+            self._tail_chunk = [value]; self._chunks.append(self._tail_chunk)
+        else: self._tail_chunk.append(value)
+        self._list_size += 1
+
+    def extend(self, iterable):
+        for value in iterable: self.append(value)
+
+    def __len__(self): return self._list_size
+    def is_empty(self): return self._list_size == 0
+
+    def __iter__(self):
+        # Duyệt theo khối.
+        for chunk in self._chunks: yield from chunk
+
+    def __reversed__(self):
+        for chunk_index in range(len(self._chunks) - 1, -1, -1): yield from reversed(self._chunks.get(chunk_index))
+
+    def get_all_elements_as_list(self):
+        # Lấy tất cả phần tử dưới dạng List tùy chỉnh.
+        return List.from_iterable(self)
+
+    def get(self, index):
+        # Lấy phần tử tại chỉ mục: O(1).
+        if not (0 <= index < self._list_size): raise IndexError("ChunkedList: Chỉ mục ngoài phạm vi")
+        return self._chunks.get(index // self.chunk_size)[index % self.chunk_size]
+
+    def set(self, index, value):
+        if not (0 <= index < self._list_size): raise IndexError("ChunkedList: Chỉ mục ngoài phạm vi để đặt giá trị")
+        self._chunks.get(index // self.chunk_size)[index % self.chunk_size] = value
+
+    def __getitem__(self, index):
+        if index < 0: index += self._list_size
+        return self.get(index)
+
+    def get_last(self):
+        # Lấy phần tử cuối.
+        return self._tail_chunk[-1] if self._tail_chunk else None
+
+    def __str__(self):
+        elements_str_list_py = [str(item) for item in self]
+        return "ChunkedList:[" + ", ".join(elements_str_list_py) + "]" if not self.is_empty() else "ChunkedList:(empty)"
+
 # --- HashTable (Bảng băm với giải quyết xung đột bằng chaining) ---
 class HashNode:
     """Nút trong bucket của bảng băm."""
@@ -146,8 +248,9 @@ class HashTable: # Đổi tên từ CustomHashTable
         if initial_table_size <= 0: raise ValueError("Kích thước bảng băm phải dương.")
         self.table_size = initial_table_size
         self.buckets_array = List(self.table_size) # Mảng các bucket
-        for i in range(self.table_size): self.buckets_array.append(None)
+        self.buckets_array.extend(itertools.repeat(None, self.table_size))
         self.item_count = 0
+        self._modification_count = 0 # Tăng khi thêm khóa mới/xóa khóa; iter_* dùng để phát hiện sửa bảng khi đang duyệt
 
     def _calculate_hash_index(self, key):
         # Tính chỉ mục bucket cho khóa.
@@ -166,7 +269,7 @@ class HashTable: # Đổi tên từ CustomHashTable
         new_hash_node = HashNode(key, value)
         new_hash_node.next_node = self.buckets_array.get(index)
         self.buckets_array.set(index, new_hash_node)
-        self.item_count += 1
+        self.item_count += 1; self._modification_count += 1
 
     def get_item(self, key):
         # Lấy giá trị theo khóa.
@@ -185,7 +288,7 @@ class HashTable: # Đổi tên từ CustomHashTable
             if current_hash_node.key == key:
                 if prev_hash_node: prev_hash_node.next_node = current_hash_node.next_node
                 else: self.buckets_array.set(index, current_hash_node.next_node)
-                self.item_count -= 1; return True
+                self.item_count -= 1; self._modification_count += 1; return True
             prev_hash_node = current_hash_node; current_hash_node = current_hash_node.next_node
         return False
 
@@ -193,50 +296,334 @@ class HashTable: # Đổi tên từ CustomHashTable
         # Kiểm tra khóa tồn tại.
         return self.get_item(key) is not None
 
+    def _raise_if_modified(self, expected_modification_count):
+        if self._modification_count != expected_modification_count: raise RuntimeError("HashTable: Bảng bị thêm/xóa khóa trong khi đang duyệt")
+
+    # iter_*: duyệt trực tiếp trên bucket, không tạo List trung gian. Thêm/xóa khóa trong lúc duyệt
+    # (cùng luồng, hoặc luồng khác không giữ chung khóa) làm lần lấy phần tử kế tiếp báo RuntimeError;
+    # cập nhật giá trị của khóa đã có thì được phép. Cần ảnh chụp để dùng sau khi nhả khóa thì dùng get_all_*.
+    def iter_keys(self):
+        expected_modification_count = self._modification_count
+        for bucket_head_node in self.buckets_array:
+            current_hash_node = bucket_head_node
+            while current_hash_node:
+                yield current_hash_node.key
+                self._raise_if_modified(expected_modification_count); current_hash_node = current_hash_node.next_node
+
+    def iter_values(self):
+        expected_modification_count = self._modification_count
+        for bucket_head_node in self.buckets_array:
+            current_hash_node = bucket_head_node
+            while current_hash_node:
+                yield current_hash_node.value
+                self._raise_if_modified(expected_modification_count); current_hash_node = current_hash_node.next_node
+
+    def iter_items(self):
+        expected_modification_count = self._modification_count
+        for bucket_head_node in self.buckets_array:
+            current_hash_node = bucket_head_node
+            while current_hash_node:
+                yield current_hash_node.key, current_hash_node.value
+                self._raise_if_modified(expected_modification_count); current_hash_node = current_hash_node.next_node
+
     def get_all_values_as_list(self):
-        # Lấy tất cả giá trị dạng List tùy chỉnh.
-        values_custom_list = List()
-        for i in range(self.table_size):
-            current_hash_node = self.buckets_array.get(i)
-            while current_hash_node: values_custom_list.append(current_hash_node.value); current_hash_node = current_hash_node.next_node
-        return values_custom_list
+        # Lấy tất cả giá trị dạng List tùy chỉnh (ảnh chụp).
+        return List.from_iterable(self.iter_values())
 
     def get_all_key_value_pairs_as_list(self):
-        # Lấy tất cả cặp key-value dạng List tùy chỉnh các tuple.
-        pairs_custom_list = List()
-        for i in range(self.table_size):
-            current_hash_node = self.buckets_array.get(i)
-            while current_hash_node: pairs_custom_list.append((current_hash_node.key, current_hash_node.value)); current_hash_node = current_hash_node.next_node
-        return pairs_custom_list
+        # Lấy tất cả cặp key-value dạng List tùy chỉnh các tuple (ảnh chụp).
+        return List.from_iterable(self.iter_items())
 
     def __len__(self): return self.item_count
     def is_empty(self): return self.item_count == 0
 
+# --- RobinHoodHashTable (Bảng băm địa chỉ mở, dò tuyến tính kiểu Robin Hood) ---
+class RobinHoodHashTable:
+    """Bảng băm địa chỉ mở, cùng giao diện với HashTable.
+
+    Mỗi ô lưu khóa/giá trị/mã băm trong các mảng song song, không tạo HashNode cho từng mục.
+    Khi chèn, mục đã dò xa vị trí gốc hơn được giữ ô ("cướp của người giàu"), nên độ dài dò
+    đồng đều và tra cứu trượt dừng sớm. Xóa dùng dịch lùi (backward shift), không để lại bia mộ.
+    Tự nhân đôi khi vượt `max_load_factor`. Chuỗi dùng hash() của Python vì tổng mã ký tự của
+    HashTable dồn các mã như BN0000001..BN9999999 vào vài chục giá trị, quá tệ cho dò tuyến tính.
+    """
+    def __init__(self, initial_table_size=16, max_load_factor=0.85):
+        if initial_table_size <= 0: raise ValueError("Kích thước bảng băm phải dương.")
+        if not 0.1 <= max_load_factor < 1.0: raise ValueError("Hệ số tải tối đa phải trong [0.1, 1).")
+        self.max_load_factor = max_load_factor
+        self.item_count = 0
+        self._modification_count = 0
+        table_size = 4
+        while table_size * max_load_factor < initial_table_size: table_size *= 2 # Lũy thừa của 2: chỉ mục = mã băm & mask
+        self._allocate_slots(table_size)
+
+    def _allocate_slots(self, table_size):
+        self.table_size = table_size
+        self._index_mask = table_size - 1
+        self._resize_threshold = int(table_size * self.max_load_factor)
+        self._slot_probe_distances = [-1] * table_size # -1: ô trống; >= 0: khoảng cách tới vị trí gốc
+        self._slot_hashes = [0] * table_size
+        self._slot_keys = [None] * table_size
+        self._slot_values = [None] * table_size
+
+    def _grow(self):
+        # Nhân đôi bảng và chèn lại mọi mục.
+        old_slots = zip(self._slot_probe_distances, self._slot_hashes, self._slot_keys, self._slot_values)
+        self._allocate_slots(self.table_size * 2)
+        for probe_distance, hash_val, key, value in old_slots:
+            if probe_distance >= 0: self._insert_new_entry(hash_val, key, value)
+
+    def _insert_new_entry(self, hash_val, key, value):
+        # Chèn mục chắc chắn chưa có trong bảng (không so khóa).
+        probe_distances, slot_hashes, slot_keys, slot_values = self._slot_probe_distances, self._slot_hashes, self._slot_keys, self._slot_values
+        index_mask = self._index_mask
+        slot_index = hash_val & index_mask; probe_distance = 0
+        while True:
+            slot_probe_distance = probe_distances[slot_index]
+            if slot_probe_distance < 0:
+                probe_distances[slot_index] = probe_distance; slot_hashes[slot_index] = hash_val
+                slot_keys[slot_index] = key; slot_values[slot_index] = value
+                return
+            if slot_probe_distance < probe_distance: # Mục đang ở ô gần gốc hơn: nhường ô cho mục đang chèn
+                probe_distances[slot_index], probe_distance = probe_distance, slot_probe_distance
+                slot_hashes[slot_index], hash_val = hash_val, slot_hashes[slot_index]
+                slot_keys[slot_index], key = key, slot_keys[slot_index]
+                slot_values[slot_index], value = value, slot_values[slot_index]
+            slot_index = (slot_index + 1) & index_mask; probe_distance += 1
+
+    def _find_slot_index(self, key, hash_val):
+        # Chỉ mục ô chứa khóa, hoặc -1. Dừng khi gặp ô trống hoặc mục gần gốc hơn khoảng đã dò.
+        probe_distances, slot_hashes, slot_keys = self._slot_probe_distances, self._slot_hashes, self._slot_keys
+        index_mask = self._index_mask
+        slot_index = hash_val & index_mask; probe_distance = 0
+        while probe_distances[slot_index] >= probe_distance:
+            if slot_hashes[slot_index] == hash_val and slot_keys[slot_index] == key: return slot_index
+            slot_index = (slot_index + 1) & index_mask; probe_distance += 1
+        return -1
+
+    def put_item(self, key, value):
+        # Thêm/cập nhật cặp key-value.
+        hash_val = hash(key)
+        slot_index = self._find_slot_index(key, hash_val)
+        if slot_index >= 0: self._slot_values[slot_index] = value; return
+        if self.item_count + 1 > self._resize_threshold: self._grow()
+        self._insert_new_entry(hash_val, key, value)
+        self.item_count += 1; self._modification_count += 1
+
+    def get_item(self, key):
+        # Lấy giá trị theo khóa.
+        slot_index = self._find_slot_index(key, hash(key))
+        return self._slot_values[slot_index] if slot_index >= 0 else None
+
+    def delete_item(self, key):
+        # Xóa cặp key-value theo khóa, dịch lùi các mục phía sau về gần vị trí gốc.
+        slot_index = self._find_slot_index(key, hash(key))
+        if slot_index < 0: return False
+        probe_distances, slot_hashes, slot_keys, slot_values = self._slot_probe_distances, self._slot_hashes, self._slot_keys, self._slot_values
+        index_mask = self._index_mask
+        next_index = (slot_index + 1) & index_mask
+        while probe_distances[next_index] > 0:
+            probe_distances[slot_index] = probe_distances[next_index] - 1; slot_hashes[slot_index] = slot_hashes[next_index]
+            slot_keys[slot_index] = slot_keys[next_index]; slot_values[slot_index] = slot_values[next_index]
+            slot_index = next_index; next_index = (next_index + 1) & index_mask
+        probe_distances[slot_index] = -1; slot_keys[slot_index] = None; slot_values[slot_index] = None
+        self.item_count -= 1; self._modification_count += 1
+        return True
+
+    def contains_key(self, key):
+        # Kiểm tra khóa tồn tại.
+        return self.get_item(key) is not None
+
+    def _raise_if_modified(self, expected_modification_count):
+        if self._modification_count != expected_modification_count: raise RuntimeError("RobinHoodHashTable: Bảng bị thêm/xóa khóa trong khi đang duyệt")
+
+    def _iter_occupied_slot_indexes(self):
+        expected_modification_count = self._modification_count
+        probe_distances = self._slot_probe_distances
+        for slot_index in range(self.table_size):
+            if probe_distances[slot_index] >= 0:
+                yield slot_index
+                self._raise_if_modified(expected_modification_count)
+
+    def iter_keys(self):
+        for slot_index in self._iter_occupied_slot_indexes(): yield self._slot_keys[slot_index]
+    def iter_values(self):
+        for slot_index in self._iter_occupied_slot_indexes(): yield self._slot_values[slot_index]
+    def iter_items(self):
+        for slot_index in self._iter_occupied_slot_indexes(): yield self._slot_keys[slot_index], self._slot_values[slot_index]
+
+    def get_all_values_as_list(self): return List.from_iterable(self.iter_values())
+    def get_all_key_value_pairs_as_list(self): return List.from_iterable(self.iter_items())
+
+    def max_probe_distance(self): return max(self._slot_probe_distances, default=-1) # Để đo/kiểm tra phân bố
+    def __len__(self): return self.item_count
+    def is_empty(self): return self.item_count == 0
+
+
+# Cài đặt bảng băm chọn được theo từng nơi dùng (xem MedicalSystemLogic(hash_table_implementation=...))
+HASH_TABLE_IMPLEMENTATIONS = {"chaining": HashTable, "robin_hood": RobinHoodHashTable}
+
+
+def get_hash_table_class(implementation_name):
+    hash_table_class = HASH_TABLE_IMPLEMENTATIONS.get(implementation_name)
+    if hash_table_class is None: raise ValueError(f"Cài đặt bảng băm '{implementation_name}' không hợp lệ ({', '.join(HASH_TABLE_IMPLEMENTATIONS)}).")
+    return hash_table_class
+
+# --- HashSet (Tập hợp dựa trên HashTable) ---
+class HashSet:
+    """Tập hợp khóa không trùng; thêm/xóa/kiểm tra thuộc O(1) trung bình."""
+    def __init__(self, initial_table_size=16):
+        self._key_table = HashTable(initial_table_size=initial_table_size) # key -> True
+
+    def add(self, key):
+        # Thêm khóa; trả về False nếu đã có.
+        if self._key_table.contains_key(key): return False
+        self._key_table.put_item(key, True); return True
+
+    def remove(self, key): return self._key_table.delete_item(key) # Trả về False nếu không có
+    def __contains__(self, key): return self._key_table.contains_key(key)
+    def __len__(self): return len(self._key_table)
+    def is_empty(self): return self._key_table.is_empty()
+    def __iter__(self): return self._key_table.iter_keys()
+    def get_all_keys_as_list(self):
+        # Lấy tất cả khóa dạng List tùy chỉnh.
+        return List.from_iterable(self._key_table.iter_keys())
+
+# --- BidirectionalAssignmentIndex (Quan hệ nhiều-nhiều, tra cứu 2 chiều) ---
+class BidirectionalAssignmentIndex:
+    """Quan hệ nhiều-nhiều giữa khóa trái và khóa phải (ví dụ BS <-> PK).
+
+    Mỗi chiều là HashTable khóa -> HashSet khóa phía bên kia, nên gán/bỏ gán/kiểm tra là O(1)
+    và xóa hẳn một khóa chỉ tốn O(số liên kết của khóa đó).
+    """
+    def __init__(self, initial_table_size=50, link_set_table_size=8):
+        self.link_set_table_size = link_set_table_size
+        self._right_keys_by_left = HashTable(initial_table_size=initial_table_size)
+        self._left_keys_by_right = HashTable(initial_table_size=initial_table_size)
+        self.link_count = 0
+
+    def _get_or_create_set(self, side_table, key):
+        key_set = side_table.get_item(key)
+        if key_set is None: key_set = HashSet(self.link_set_table_size); side_table.put_item(key, key_set)
+        return key_set
+
+    def add_link(self, left_key, right_key):
+        # Thêm liên kết; trả về False nếu đã có.
+        if not self._get_or_create_set(self._right_keys_by_left, left_key).add(right_key): return False
+        self._get_or_create_set(self._left_keys_by_right, right_key).add(left_key)
+        self.link_count += 1; return True
+
+    def _discard_from_side(self, side_table, key, other_key):
+        key_set = side_table.get_item(key)
+        if key_set is None or not key_set.remove(other_key): return False
+        if key_set.is_empty(): side_table.delete_item(key)
+        return True
+
+    def remove_link(self, left_key, right_key):
+        # Xóa liên kết; trả về False nếu không có.
+        if not self._discard_from_side(self._right_keys_by_left, left_key, right_key): return False
+        self._discard_from_side(self._left_keys_by_right, right_key, left_key)
+        self.link_count -= 1; return True
+
+    def has_link(self, left_key, right_key):
+        right_key_set = self._right_keys_by_left.get_item(left_key)
+        return right_key_set is not None and right_key in right_key_set
+
+    def get_right_keys(self, left_key):
+        right_key_set = self._right_keys_by_left.get_item(left_key)
+        return right_key_set.get_all_keys_as_list() if right_key_set is not None else List()
+
+    def get_left_keys(self, right_key):
+        left_key_set = self._left_keys_by_right.get_item(right_key)
+        return left_key_set.get_all_keys_as_list() if left_key_set is not None else List()
+
+    def remove_left_key(self, left_key):
+        # Xóa mọi liên kết của khóa trái; trả về List các khóa phải từng liên kết.
+        linked_right_keys = self.get_right_keys(left_key)
+        for right_key in linked_right_keys: self.remove_link(left_key, right_key)
+        return linked_right_keys
+
+    def remove_right_key(self, right_key):
+        # Xóa mọi liên kết của khóa phải; trả về List các khóa trái từng liên kết.
+        linked_left_keys = self.get_left_keys(right_key)
+        for left_key in linked_left_keys: self.remove_link(left_key, right_key)
+        return linked_left_keys
+
+    def __len__(self): return self.link_count
+
 # --- MaxHeap (Đống cực đại) & CustomPriorityQueue (Hàng đợi ưu tiên tùy chỉnh) ---
 class MaxHeap:
-    """Đống Cực Đại (Max Heap). Phần tử lớn nhất ở gốc."""
-    def __init__(self): self.heap_array = List(); # Dùng List tùy chỉnh
-    def _get_parent_index(self, i): return (i - 1) // 2
-    def _get_left_child_index(self, i): return 2 * i + 1
-    def _get_right_child_index(self, i): return 2 * i + 2
+    """Đống Cực Đại (Max Heap) d-phân. Phần tử lớn nhất ở gốc.
+
+    arity=2 là heap nhị phân như trước; arity=4 cho cây thấp hơn (ít mức phải sift khi lấy ra,
+    đổi lại mỗi mức so sánh nhiều con hơn). Sift lặp, dời "lỗ" thay vì hoán đổi từng cặp.
+    """
+    def __init__(self, arity=2, ordering_key_attribute=None):
+        if arity < 2: raise ValueError("Số con mỗi nút của heap phải >= 2.")
+        self.arity = arity
+        # ordering_key_attribute: tên thuộc tính chứa khóa so sánh tính sẵn của phần tử (ví dụ "ordering_key" của
+        # PatientInQueue). Có thì sift so sánh thẳng các khóa, không gọi __gt__ của phần tử ở mỗi bước.
+        self.ordering_key_attribute = ordering_key_attribute
+        self.heap_array = List() # Dùng List tùy chỉnh
+    def _get_parent_index(self, i): return (i - 1) // self.arity
+    def _get_left_child_index(self, i): return self.arity * i + 1
+    def _get_right_child_index(self, i): return self.arity * i + self.arity # Con cuối cùng của nút
     def _swap_elements(self, i, j):
         # Hoán đổi phần tử.
         item_i = self.heap_array.get(i); item_j = self.heap_array.get(j)
         self.heap_array.set(i, item_j); self.heap_array.set(j, item_i)
     def _sift_up(self, i):
         # Di chuyển phần tử lên để duy trì thuộc tính max-heap.
-        parent_index = self._get_parent_index(i)
-        while i > 0 and self.heap_array.get(i) > self.heap_array.get(parent_index):
-            self._swap_elements(i, parent_index); i = parent_index
-            parent_index = self._get_parent_index(i)
+        heap_elements = self.heap_array._elements; arity = self.arity; key_attribute = self.ordering_key_attribute
+        moving_item = heap_elements[i]
+        if key_attribute is None:
+            while i > 0:
+                parent_index = (i - 1) // arity; parent_item = heap_elements[parent_index]
+                if not moving_item > parent_item: break
+                heap_elements[i] = parent_item; i = parent_index
+        else:
+            moving_key = getattr(moving_item, key_attribute)
+            while i > 0:
+                parent_index = (i - 1) // arity; parent_item = heap_elements[parent_index]
+                if not moving_key > getattr(parent_item, key_attribute): break
+                heap_elements[i] = parent_item; i = parent_index
+        heap_elements[i] = moving_item
     def _sift_down(self, i):
         # Di chuyển phần tử xuống để duy trì thuộc tính max-heap.
-        current_size = len(self.heap_array)
-        max_idx = i
-        left_idx = self._get_left_child_index(i); right_idx = self._get_right_child_index(i)
-        if left_idx < current_size and self.heap_array.get(left_idx) > self.heap_array.get(max_idx): max_idx = left_idx
-        if right_idx < current_size and self.heap_array.get(right_idx) > self.heap_array.get(max_idx): max_idx = right_idx
-        if i != max_idx: self._swap_elements(i, max_idx); self._sift_down(max_idx)
+        heap_elements = self.heap_array._elements; arity = self.arity; current_size = len(self.heap_array); key_attribute = self.ordering_key_attribute
+        moving_item = heap_elements[i]
+        if key_attribute is None:
+            while True:
+                first_child_index = arity * i + 1
+                if first_child_index >= current_size: break
+                max_child_index = first_child_index; max_child_item = heap_elements[first_child_index]
+                for child_index in range(first_child_index + 1, min(first_child_index + arity, current_size)):
+                    child_item = heap_elements[child_index]
+                    if child_item > max_child_item: max_child_index = child_index; max_child_item = child_item
+                if not max_child_item > moving_item: break
+                heap_elements[i] = max_child_item; i = max_child_index
+        else:
+            moving_key = getattr(moving_item, key_attribute)
+            while True:
+                first_child_index = arity * i + 1
+                if first_child_index >= current_size: break
+                last_child_bound = first_child_index + arity
+                if last_child_bound > current_size: last_child_bound = current_size
+                max_child_index = first_child_index; max_child_key = getattr(heap_elements[first_child_index], key_attribute)
+                for child_index in range(first_child_index + 1, last_child_bound):
+                    child_key = getattr(heap_elements[child_index], key_attribute)
+                    if child_key > max_child_key: max_child_index = child_index; max_child_key = child_key
+                if not max_child_key > moving_key: break
+                heap_elements[i] = heap_elements[max_child_index]; i = max_child_index
+        heap_elements[i] = moving_item
+    def heapify(self, items_iterable):
+        # Thay nội dung heap bằng một lô phần tử, dựng từ dưới lên trong O(n).
+        self.heap_array = List.from_iterable(items_iterable)
+        for parent_index in range((len(self.heap_array) - 2) // self.arity, -1, -1): self._sift_down(parent_index)
+    @classmethod
+    def from_items(cls, items_iterable, arity=2, ordering_key_attribute=None):
+        new_heap = cls(arity, ordering_key_attribute); new_heap.heapify(items_iterable)
+        return new_heap
     def add_item(self, item):
         # Thêm phần tử vào heap.
         self.heap_array.append(item); self._sift_up(len(self.heap_array) - 1)
@@ -252,7 +639,28 @@ class MaxHeap:
             self.heap_array.set(0, last_item); self._sift_down(0)
         elif len(self.heap_array) == 1: self.heap_array.pop()
         return root
+    def remove_item_at(self, index):
+        # Xóa phần tử tại vị trí index (O(log n)): đưa phần tử cuối vào chỗ trống rồi sift xuống/lên.
+        removed_item = self.heap_array.get(index); last_item = self.heap_array.pop()
+        if index < len(self.heap_array):
+            self.heap_array.set(index, last_item); self._sift_down(index)
+            if self.heap_array.get(index) is last_item: self._sift_up(index)
+        return removed_item
+    def count_items_greater_than(self, probe, key_attribute=None):
+        # Đếm số phần tử lớn hơn probe trong O(k * arity), k = kết quả: nút không lớn hơn probe thì cả nhánh con
+        # cũng không, nên chỉ duyệt phần "đỉnh" của heap. key_attribute (mặc định ordering_key_attribute):
+        # so sánh thuộc tính đó của phần tử với probe thay vì chính phần tử.
+        heap_elements = self.heap_array._elements; arity = self.arity; current_size = len(self.heap_array)
+        if key_attribute is None: key_attribute = self.ordering_key_attribute
+        greater_count = 0; pending_indices = [0] if current_size else []
+        while pending_indices:
+            node_index = pending_indices.pop(); node_item = heap_elements[node_index]
+            if not (getattr(node_item, key_attribute) if key_attribute else node_item) > probe: continue
+            greater_count += 1; first_child_index = arity * node_index + 1
+            pending_indices.extend(range(first_child_index, min(first_child_index + arity, current_size)))
+        return greater_count
     def is_empty(self): return len(self.heap_array) == 0
+    def __len__(self): return len(self.heap_array)
     def get_all_heap_elements(self): return self.heap_array # Trả về List các phần tử heap.
     def change_item_priority(self, item_id_to_change, new_priority_str, patient_in_queue_class_ref):
         # Thay đổi độ ưu tiên của mục trong heap (cho PatientInQueue).
@@ -270,52 +678,621 @@ class MaxHeap:
             return True
         return False
 
+def _format_queue_display_line(item_number, p_item):
+    # Một dòng hiển thị hàng đợi (dùng chung cho các cài đặt hàng đợi ưu tiên).
+    return f"{item_number}. ID:{p_item.patient_id},Tên:{p_item.patient_profile.full_name},Ưu tiên:{p_item.get_priority_display_name()}({p_item.priority}),TGĐK:{p_item.registration_time.strftime('%H:%M:%S')},Vắng:{p_item.absent_count}"
+
 # --- Cấu trúc PriorityQueue (Hàng đợi ưu tiên dựa trên MaxHeap) ---
 class CustomPriorityQueue:
-    """Hàng đợi ưu tiên, dùng MaxHeap. Phần tử ưu tiên cao nhất (số lớn) ra trước."""
-    def __init__(self): self.internal_heap = MaxHeap()
+    """Hàng đợi ưu tiên, dùng MaxHeap. Phần tử ưu tiên cao nhất (số lớn) ra trước.
+
+    Khi heap so sánh theo ordering_key_attribute, thứ tự gọi (dùng cho danh sách chờ / ước lượng thời gian chờ) được
+    sắp một lần ở lần hỏi đầu tiên rồi cập nhật từng bước khi thêm/lấy/xóa/đổi ưu tiên (tìm nhị phân theo khóa),
+    không phải dựng lại heap tạm và lấy hết ra mỗi lần hỏi. Tăng ưu tiên hàng loạt / thay cả lô thì bỏ và sắp lại khi cần.
+    """
+    def __init__(self, heap_arity=2, ordering_key_attribute=None):
+        self.internal_heap = MaxHeap(heap_arity, ordering_key_attribute)
+        self._call_order_keys = None # Khóa tăng dần (BN gọi trước ở cuối); None = chưa sắp / đã bỏ
+        self._call_order_items = None # Phần tử song song với _call_order_keys
     @property
     def current_size(self): return len(self.internal_heap.heap_array)
+    def _build_call_order(self):
+        key_attribute = self.internal_heap.ordering_key_attribute
+        if key_attribute is None or self._call_order_keys is not None: return
+        self._call_order_items = sorted(self.internal_heap.get_all_heap_elements(), key=lambda queued_item: getattr(queued_item, key_attribute))
+        self._call_order_keys = [getattr(queued_item, key_attribute) for queued_item in self._call_order_items]
+    def _insert_into_call_order(self, item):
+        if self._call_order_keys is None: return
+        item_key = getattr(item, self.internal_heap.ordering_key_attribute); insert_index = bisect.bisect_left(self._call_order_keys, item_key)
+        self._call_order_keys.insert(insert_index, item_key); self._call_order_items.insert(insert_index, item)
+    def _remove_from_call_order(self, item):
+        if self._call_order_keys is None: return
+        item_index = bisect.bisect_left(self._call_order_keys, getattr(item, self.internal_heap.ordering_key_attribute))
+        if item_index < len(self._call_order_items) and self._call_order_items[item_index] is item: del self._call_order_keys[item_index]; del self._call_order_items[item_index]
+        else: self._call_order_keys = self._call_order_items = None # Không khớp (khóa bị đổi từ ngoài): bỏ, sắp lại khi cần
     def get_first_item(self): return self.internal_heap.get_max_item() # Lấy phần tử ưu tiên nhất (không xóa).
-    def remove_first_item(self): return self.internal_heap.remove_max_item() # Xóa và trả về phần tử ưu tiên nhất.
-    def add_item(self, item): self.internal_heap.add_item(item) # Thêm phần tử.
+    def remove_first_item(self):
+        # Xóa và trả về phần tử ưu tiên nhất.
+        first_item = self.internal_heap.remove_max_item()
+        if first_item is not None: self._remove_from_call_order(first_item)
+        return first_item
+    def add_item(self, item): self.internal_heap.add_item(item); self._insert_into_call_order(item) # Thêm phần tử.
     def is_empty(self): return self.internal_heap.is_empty()
-    def update_long_waiter_priority(self, max_wait_time_seconds, patient_in_queue_class_ref, priority_increase=1):
-        # Tăng ưu tiên cho bệnh nhân chờ lâu.
-        now = datetime.datetime.now(); updated_items_count = 0; indices_to_re_sift = []
-        for idx in range(len(self.internal_heap.heap_array)):
-            patient_item = self.internal_heap.heap_array.get(idx)
-            if (now - patient_item.registration_time).total_seconds() > max_wait_time_seconds:
-                max_numeric_prio = max(patient_in_queue_class_ref.PRIORITY_MAP.values())
-                if patient_item.priority < max_numeric_prio:
-                    old_prio = patient_item.priority; new_prio = min(patient_item.priority + priority_increase, max_numeric_prio)
-                    if new_prio != old_prio: patient_item.priority = new_prio; indices_to_re_sift.append(idx); updated_items_count +=1
-        for idx_to_fix in sorted(indices_to_re_sift, reverse=True): self.internal_heap._sift_up(idx_to_fix)
+    def replace_all_items(self, items_iterable):
+        # Thay toàn bộ hàng đợi bằng một lô (O(n)).
+        self.internal_heap.heapify(items_iterable); self._call_order_keys = self._call_order_items = None
+    def update_long_waiter_priority(self, max_wait_time_seconds, patient_in_queue_class_ref, priority_increase=1, current_time=None):
+        # Tăng ưu tiên cho bệnh nhân chờ lâu, rồi dựng lại heap một lần bằng heapify (O(n)) thay vì sift lên từng chỉ số đã đổi.
+        now = current_time if current_time else datetime.datetime.now(); updated_items_count = 0
+        max_numeric_prio = max(patient_in_queue_class_ref.PRIORITY_MAP.values())
+        for patient_item in self.internal_heap.get_all_heap_elements():
+            if (now - patient_item.registration_time).total_seconds() > max_wait_time_seconds and patient_item.priority < max_numeric_prio:
+                patient_item.priority = min(patient_item.priority + priority_increase, max_numeric_prio); updated_items_count += 1
+        if updated_items_count: self.internal_heap.heapify(self.internal_heap.get_all_heap_elements()); self._call_order_keys = self._call_order_items = None
         return updated_items_count
     def get_display_queue_as_strings(self, patient_in_queue_class_ref):
         # Lấy danh sách chuỗi hiển thị hàng đợi (sắp xếp ưu tiên).
         display_str_list = List()
         if self.internal_heap.is_empty(): display_str_list.append("Hàng đợi rỗng."); return display_str_list
-        temp_display_heap = MaxHeap() # Heap tạm để không thay đổi heap gốc
-        for item_original in self.internal_heap.get_all_heap_elements():
-            profile_copy = item_original.patient_profile
-            patient_copy = patient_in_queue_class_ref(profile_copy, item_original.get_priority_display_name(), item_original.registration_time)
-            patient_copy.priority = item_original.priority; patient_copy.absent_count = item_original.absent_count
-            temp_display_heap.add_item(patient_copy)
-        item_number = 1
-        while not temp_display_heap.is_empty():
-            p_item = temp_display_heap.remove_max_item()
-            if p_item: display_str_list.append(f"{item_number}. ID:{p_item.patient_id},Tên:{p_item.patient_profile.full_name},Ưu tiên:{p_item.get_priority_display_name()}({p_item.priority}),TGĐK:{p_item.registration_time.strftime('%H:%M:%S')},Vắng:{p_item.absent_count}"); item_number+=1
+        for item_number, p_item in enumerate(self.get_items_in_priority_order(), start=1): display_str_list.append(_format_queue_display_line(item_number, p_item))
         return display_str_list
+    def get_items_in_priority_order(self):
+        # Lấy List các phần tử theo đúng thứ tự sẽ được gọi (không thay đổi heap gốc). O(n) khi thứ tự gọi đã được giữ sẵn.
+        self._build_call_order()
+        if self._call_order_items is not None: return List.from_iterable(reversed(self._call_order_items))
+        ordered_items = List(); temp_heap = MaxHeap.from_items(self.internal_heap.get_all_heap_elements(), self.internal_heap.arity, self.internal_heap.ordering_key_attribute)
+        while not temp_heap.is_empty(): ordered_items.append(temp_heap.remove_max_item())
+        return ordered_items
+    def find_item(self, patient_id):
+        # Tìm phần tử theo mã BN (O(n)); None nếu không có.
+        for queued_item in self.internal_heap.get_all_heap_elements():
+            if queued_item.patient_id == patient_id: return queued_item
+        return None
+    def remove_item(self, patient_id):
+        # Xóa BN khỏi hàng đợi (tìm O(n), xóa O(log n)); trả về phần tử đã xóa hoặc None.
+        heap_elements = self.internal_heap.heap_array
+        for item_index in range(len(heap_elements)):
+            if heap_elements.get(item_index).patient_id == patient_id:
+                removed_item = self.internal_heap.remove_item_at(item_index); self._remove_from_call_order(removed_item)
+                return removed_item
+        return None
+    def get_all_items(self): return self.internal_heap.get_all_heap_elements() # List mọi phần tử (thứ tự trong heap, không phải thứ tự gọi)
+    def count_items_ahead_of(self, ordering_key):
+        # Số BN gọi trước khóa này: tìm nhị phân trên thứ tự gọi nếu đang giữ, không thì duyệt đỉnh heap O(kết quả).
+        if self._call_order_keys is not None and self.internal_heap.ordering_key_attribute == "ordering_key": return len(self._call_order_keys) - bisect.bisect_right(self._call_order_keys, ordering_key)
+        return self.internal_heap.count_items_greater_than(ordering_key, "ordering_key")
+    def change_queued_patient_priority(self, patient_id, new_priority_str, patient_in_queue_class_ref):
+        # Thay đổi ưu tiên của bệnh nhân trong hàng đợi (thứ tự gọi đang giữ: bỏ BN ra theo khóa cũ, chèn lại theo khóa mới).
+        queued_item = self.find_item(patient_id) if self._call_order_keys is not None else None
+        if queued_item is not None: self._remove_from_call_order(queued_item)
+        success_flag = self.internal_heap.change_item_priority(patient_id, new_priority_str, patient_in_queue_class_ref)
+        if queued_item is not None: self._insert_into_call_order(queued_item)
+        return success_flag
+
+# --- Hàng đợi ưu tiên chia ngăn (mỗi mức ưu tiên một FIFO) ---
+class BucketedPriorityQueue:
+    """Hàng đợi ưu tiên cho số mức ưu tiên cố định, nhỏ (PatientInQueue có 5 mức).
+
+    Mỗi mức là một FIFO sắp theo thứ tự gọi (thời điểm đăng ký); một mặt nạ bit ghi các mức đang có BN, mức cao
+    nhất = bit cao nhất (int.bit_length), nên thêm/lấy ra O(1) và không cần so sánh phần tử.
+    Cùng giao diện và cùng thứ tự gọi với CustomPriorityQueue. BN đăng ký sau cùng chỉ việc nối đuôi;
+    BN phải được gọi trước đuôi (đưa lại sau khi vắng, đổi ưu tiên) được chèn đúng chỗ bằng tìm kiếm
+    nhị phân, so sánh bằng chính phép > của phần tử như MaxHeap.
+    """
+    def __init__(self, lowest_priority=1, highest_priority=5):
+        if highest_priority < lowest_priority: raise ValueError("Mức ưu tiên cao nhất phải >= mức thấp nhất.")
+        self.lowest_priority = lowest_priority; self.highest_priority = highest_priority
+        level_count = highest_priority - lowest_priority + 1
+        self._level_items = [[] for _ in range(level_count)] # FIFO của từng mức (chỉ số 0 = mức thấp nhất)
+        self._level_heads = [0] * level_count # Vị trí đầu FIFO; ô trước đầu đã được lấy ra, dọn theo lô
+        self._non_empty_level_mask = 0 # Bit i = 1 nếu mức i còn BN
+        self._item_count = 0
+
+    def _get_level_index(self, priority):
+        level_index = priority - self.lowest_priority
+        if not 0 <= level_index < len(self._level_items): raise ValueError(f"Mức ưu tiên {priority} ngoài khoảng [{self.lowest_priority}, {self.highest_priority}].")
+        return level_index
+    def _get_top_level_index(self): return self._non_empty_level_mask.bit_length() - 1 # -1 nếu rỗng
+
+    def _insert_into_level(self, item):
+        level_index = self._get_level_index(item.priority)
+        level_items = self._level_items[level_index]; head_index = self._level_heads[level_index]
+        if len(level_items) == head_index or not item > level_items[-1]: level_items.append(item) # Đường nhanh: đến sau cùng
+        else:
+            low, high = head_index, len(level_items) # Vị trí sau mọi BN được gọi trước item
+            while low < high:
+                middle = (low + high) // 2
+                if item > level_items[middle]: high = middle
+                else: low = middle + 1
+            level_items.insert(low, item)
+        self._non_empty_level_mask |= 1 << level_index; self._item_count += 1
+
+    def _compact_level(self, level_index):
+        # Dọn ô đã lấy ra ở đầu FIFO; tắt bit của mức nếu mức rỗng.
+        level_items = self._level_items[level_index]; head_index = self._level_heads[level_index]
+        if head_index == len(level_items): level_items.clear(); self._level_heads[level_index] = 0; self._non_empty_level_mask &= ~(1 << level_index)
+        elif head_index >= 32 and head_index * 2 >= len(level_items): del level_items[:head_index]; self._level_heads[level_index] = 0
+
+    def _remove_from_level(self, item):
+        level_index = self._get_level_index(item.priority); level_items = self._level_items[level_index]
+        for item_index in range(self._level_heads[level_index], len(level_items)):
+            if level_items[item_index] is item:
+                del level_items[item_index]; self._item_count -= 1; self._compact_level(level_index)
+                return True
+        return False
+
+    def _iter_items_in_priority_order(self):
+        for level_index in range(len(self._level_items) - 1, -1, -1):
+            yield from itertools.islice(self._level_items[level_index], self._level_heads[level_index], None)
+
+    @property
+    def current_size(self): return self._item_count
+    def is_empty(self): return self._non_empty_level_mask == 0
+    def add_item(self, item): self._insert_into_level(item)
+    def get_first_item(self):
+        top_level_index = self._get_top_level_index()
+        if top_level_index < 0: return None
+        return self._level_items[top_level_index][self._level_heads[top_level_index]]
+    def remove_first_item(self):
+        top_level_index = self._get_top_level_index()
+        if top_level_index < 0: return None
+        level_items = self._level_items[top_level_index]; head_index = self._level_heads[top_level_index]
+        first_item = level_items[head_index]; level_items[head_index] = None
+        self._level_heads[top_level_index] = head_index + 1; self._item_count -= 1
+        self._compact_level(top_level_index)
+        return first_item
+    def replace_all_items(self, items_iterable):
+        # Thay toàn bộ hàng đợi bằng một lô: chia theo mức rồi sắp từng mức theo thứ tự gọi.
+        level_count = len(self._level_items)
+        new_level_items = [[] for _ in range(level_count)]
+        for item in items_iterable: new_level_items[self._get_level_index(item.priority)].append(item)
+        self._level_items = new_level_items; self._level_heads = [0] * level_count
+        self._non_empty_level_mask = 0; self._item_count = 0
+        for level_index, level_items in enumerate(new_level_items):
+            if level_items: level_items.sort(reverse=True); self._non_empty_level_mask |= 1 << level_index; self._item_count += len(level_items)
+    def get_all_items(self): return List.from_iterable(self._iter_items_in_priority_order())
+    def get_items_in_priority_order(self): return List.from_iterable(self._iter_items_in_priority_order()) # Các FIFO đã đúng thứ tự gọi
+    def count_items_ahead_of(self, ordering_key):
+        # Số BN được gọi trước một BN có khóa ordering_key: cộng cỡ các mức cao hơn, rồi tìm nhị phân trong mức của khóa.
+        level_index = min(ordering_key[0] - self.lowest_priority, len(self._level_items))
+        ahead_count = 0
+        for higher_level_index in range(max(level_index + 1, 0), len(self._level_items)): ahead_count += len(self._level_items[higher_level_index]) - self._level_heads[higher_level_index]
+        if not 0 <= level_index < len(self._level_items): return ahead_count
+        level_items = self._level_items[level_index]; low, high = self._level_heads[level_index], len(level_items)
+        while low < high:
+            middle = (low + high) // 2
+            if level_items[middle].ordering_key > ordering_key: low = middle + 1
+            else: high = middle
+        return ahead_count + low - self._level_heads[level_index]
+    def find_item(self, patient_id):
+        for queued_item in self._iter_items_in_priority_order():
+            if queued_item.patient_id == patient_id: return queued_item
+        return None
+    def remove_item(self, patient_id):
+        queued_item = self.find_item(patient_id)
+        if queued_item is None or not self._remove_from_level(queued_item): return None
+        return queued_item
     def change_queued_patient_priority(self, patient_id, new_priority_str, patient_in_queue_class_ref):
-        # Thay đổi ưu tiên của bệnh nhân trong hàng đợi.
-        return self.internal_heap.change_item_priority(patient_id, new_priority_str, patient_in_queue_class_ref)
+        new_numeric_priority = patient_in_queue_class_ref.PRIORITY_MAP.get(new_priority_str)
+        queued_item = self.find_item(patient_id)
+        if queued_item is None or new_numeric_priority is None: return False
+        self._get_level_index(new_numeric_priority)
+        self._remove_from_level(queued_item); queued_item.priority = new_numeric_priority; self._insert_into_level(queued_item)
+        return True
+    def update_long_waiter_priority(self, max_wait_time_seconds, patient_in_queue_class_ref, priority_increase=1, current_time=None):
+        # Tăng ưu tiên cho BN chờ lâu (cùng quy tắc với CustomPriorityQueue), rồi chia lại các mức.
+        now = current_time if current_time else datetime.datetime.now(); updated_items_count = 0
+        max_numeric_prio = min(max(patient_in_queue_class_ref.PRIORITY_MAP.values()), self.highest_priority)
+        all_items_py = list(self._iter_items_in_priority_order())
+        for patient_item in all_items_py:
+            if (now - patient_item.registration_time).total_seconds() > max_wait_time_seconds and patient_item.priority < max_numeric_prio:
+                patient_item.priority = min(patient_item.priority + priority_increase, max_numeric_prio); updated_items_count += 1
+        if updated_items_count: self.replace_all_items(all_items_py)
+        return updated_items_count
+    def get_display_queue_as_strings(self, patient_in_queue_class_ref):
+        display_str_list = List()
+        if self.is_empty(): display_str_list.append("Hàng đợi rỗng."); return display_str_list
+        for item_number, p_item in enumerate(self._iter_items_in_priority_order(), start=1): display_str_list.append(_format_queue_display_line(item_number, p_item))
+        return display_str_list
+
+
+# Cài đặt hàng đợi khám chọn được cho từng PK (xem MedicalSystemLogic(clinic_queue_implementation=...))
+CLINIC_QUEUE_IMPLEMENTATIONS = {"heap": CustomPriorityQueue, "bucketed": BucketedPriorityQueue}
+
+
+def get_clinic_queue_class(implementation_name):
+    clinic_queue_class = CLINIC_QUEUE_IMPLEMENTATIONS.get(implementation_name)
+    if clinic_queue_class is None: raise ValueError(f"Cài đặt hàng đợi '{implementation_name}' không hợp lệ ({', '.join(CLINIC_QUEUE_IMPLEMENTATIONS)}).")
+    return clinic_queue_class
+
+# --- IndexedMinHeap (Đống cực tiểu đánh chỉ mục theo khóa) ---
+class IndexedMinHeap:
+    """Đống cực tiểu nhị phân các cặp (khóa, độ ưu tiên), tra vị trí theo khóa bằng HashTable.
+
+    Thêm / đổi độ ưu tiên / xóa một khóa bất kỳ là O(log n), xem phần tử nhỏ nhất O(1).
+    Độ ưu tiên là giá trị so sánh được (ví dụ tuple); khóa phải băm được.
+    """
+    def __init__(self, initial_table_size=16):
+        self._heap_keys = [] # Khóa theo vị trí trong đống
+        self._heap_priorities = [] # Độ ưu tiên song song với _heap_keys
+        self._position_by_key = HashTable(initial_table_size=initial_table_size)
+
+    def __len__(self): return len(self._heap_keys)
+    def is_empty(self): return not self._heap_keys
+    def contains_key(self, key): return self._position_by_key.contains_key(key)
+    def get_priority(self, key):
+        position = self._position_by_key.get_item(key)
+        return self._heap_priorities[position] if position is not None else None
+
+    def _place(self, position, key, priority):
+        self._heap_keys[position] = key; self._heap_priorities[position] = priority; self._position_by_key.put_item(key, position)
+
+    def _sift_up(self, position):
+        key = self._heap_keys[position]; priority = self._heap_priorities[position]
+        while position > 0:
+            parent_position = (position - 1) // 2
+            if not priority < self._heap_priorities[parent_position]: break
+            self._place(position, self._heap_keys[parent_position], self._heap_priorities[parent_position]); position = parent_position
+        self._place(position, key, priority)
+
+    def _sift_down(self, position):
+        key = self._heap_keys[position]; priority = self._heap_priorities[position]; heap_size = len(self._heap_keys)
+        while True:
+            child_position = 2 * position + 1
+            if child_position >= heap_size: break
+            if child_position + 1 < heap_size and self._heap_priorities[child_position + 1] < self._heap_priorities[child_position]: child_position += 1
+            if not self._heap_priorities[child_position] < priority: break
+            self._place(position, self._heap_keys[child_position], self._heap_priorities[child_position]); position = child_position
+        self._place(position, key, priority)
+
+    def put_item(self, key, priority):
+        # Thêm khóa mới hoặc đổi độ ưu tiên của khóa đã có.
+        position = self._position_by_key.get_item(key)
+        if position is None:
+            self._heap_keys.append(key); self._heap_priorities.append(priority)
+            self._sift_up(len(self._heap_keys) - 1); return
+        old_priority = self._heap_priorities[position]; self._heap_priorities[position] = priority
+        if priority < old_priority: self._sift_up(position)
+        else: self._sift_down(position)
+
+    def delete_item(self, key):
+        # Xóa khóa; trả về False nếu không có.
+        position = self._position_by_key.get_item(key)
+        if position is None: return False
+        self._position_by_key.delete_item(key)
+        last_key = self._heap_keys.pop(); last_priority = self._heap_priorities.pop()
+        if position < len(self._heap_keys):
+            self._place(position, last_key, last_priority)
+            self._sift_down(position)
+            if self._heap_keys[position] == last_key: self._sift_up(position)
+        return True
+
+    def peek_min(self):
+        # (khóa, độ ưu tiên) nhỏ nhất, hoặc None nếu rỗng.
+        return (self._heap_keys[0], self._heap_priorities[0]) if self._heap_keys else None
+
+# --- IntervalTree (Cây khoảng không chồng nhau, cân bằng AVL) ---
+class IntervalTreeNode:
+    """Nút cây khoảng: khoảng [start, end) kèm giá trị, và thông tin tăng cường của cả cây con."""
+    __slots__ = ("start", "end", "value", "left", "right", "height", "subtree_min_start", "subtree_max_end", "subtree_max_gap")
+
+    def __init__(self, start, end, value):
+        self.start = start; self.end = end; self.value = value
+        self.left = None; self.right = None; self.height = 1
+        self.subtree_min_start = start # start của khoảng đầu tiên trong cây con
+        self.subtree_max_end = end # end của khoảng cuối cùng (các khoảng không chồng nhau nên end tăng theo start)
+        self.subtree_max_gap = None # Khe trống dài nhất giữa 2 khoảng liền kề trong cây con (None: chỉ có 1 khoảng)
+
+def _larger_gap(first_gap, second_gap):
+    if first_gap is None: return second_gap
+    if second_gap is None: return first_gap
+    return first_gap if first_gap >= second_gap else second_gap
+
+class IntervalTree:
+    """Cây AVL các khoảng nửa mở [start, end) KHÔNG chồng nhau, khóa theo start.
+
+    Mỗi nút giữ start nhỏ nhất, end lớn nhất và khe trống dài nhất của cây con (cập nhật khi xoay),
+    nên kiểm tra trùng, thêm, xóa và tìm khe trống đầu tiên đủ dài kể từ một mốc đều O(log n).
+    start/end là giá trị so sánh và trừ được (số, datetime); duration cùng kiểu với end - start.
+    """
+    def __init__(self):
+        self._root = None
+        self._item_count = 0
+
+    def __len__(self): return self._item_count
+    def is_empty(self): return self._item_count == 0
+
+    @staticmethod
+    def _height(node): return node.height if node else 0
+
+    @staticmethod
+    def _update(node):
+        left_node, right_node = node.left, node.right
+        node.height = 1 + max(left_node.height if left_node else 0, right_node.height if right_node else 0)
+        node.subtree_min_start = left_node.subtree_min_start if left_node else node.start
+        node.subtree_max_end = right_node.subtree_max_end if right_node else node.end
+        max_gap = None
+        if left_node: max_gap = _larger_gap(left_node.subtree_max_gap, node.start - left_node.subtree_max_end)
+        if right_node: max_gap = _larger_gap(max_gap, _larger_gap(right_node.subtree_max_gap, right_node.subtree_min_start - node.end))
+        node.subtree_max_gap = max_gap
+
+    def _rotate_right(self, node):
+        new_root = node.left; node.left = new_root.right; new_root.right = node
+        self._update(node); self._update(new_root)
+        return new_root
+
+    def _rotate_left(self, node):
+        new_root = node.right; node.right = new_root.left; new_root.left = node
+        self._update(node); self._update(new_root)
+        return new_root
+
+    def _rebalance(self, node):
+        self._update(node)
+        balance_factor = self._height(node.left) - self._height(node.right)
+        if balance_factor > 1:
+            if self._height(node.left.left) < self._height(node.left.right): node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if balance_factor < -1:
+            if self._height(node.right.right) < self._height(node.right.left): node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
+        return node
+
+    def _find_last_node_starting_before(self, key, inclusive):
+        # Nút có start lớn nhất < key (hoặc <= key nếu inclusive).
+        current_node = self._root; found_node = None
+        while current_node:
+            if current_node.start < key or (inclusive and current_node.start == key): found_node = current_node; current_node = current_node.right
+            else: current_node = current_node.left
+        return found_node
+
+    def _find_first_node_starting_from(self, key):
+        # Nút có start nhỏ nhất >= key.
+        current_node = self._root; found_node = None
+        while current_node:
+            if current_node.start < key: current_node = current_node.right
+            else: found_node = current_node; current_node = current_node.left
+        return found_node
+
+    def get(self, start):
+        # Giá trị của khoảng bắt đầu đúng tại start, hoặc None.
+        found_node = self._find_last_node_starting_before(start, inclusive=True)
+        return found_node.value if found_node and found_node.start == start else None
+
+    def find_overlapping(self, start, end):
+        # Khoảng đã có chồng lên [start, end), trả về (start, end, giá trị) hoặc None. Chỉ cần xét khoảng
+        # có start lớn nhất < end: các khoảng không chồng nhau nên nếu nó kết thúc trước start thì mọi khoảng trước nó cũng vậy.
+        candidate_node = self._find_last_node_starting_before(end, inclusive=False)
+        if candidate_node and candidate_node.end > start: return candidate_node.start, candidate_node.end, candidate_node.value
+        return None
+
+    def insert(self, start, end, value):
+        # Thêm khoảng [start, end); báo ValueError nếu khoảng rỗng hoặc chồng lên khoảng đã có.
+        if not start < end: raise ValueError("Khoảng phải có start < end.")
+        if self.find_overlapping(start, end): raise ValueError("Khoảng chồng lên một khoảng đã có.")
+        self._root = self._insert_node(self._root, IntervalTreeNode(start, end, value)); self._item_count += 1
+
+    def _insert_node(self, node, new_node):
+        if node is None: return new_node
+        if new_node.start < node.start: node.left = self._insert_node(node.left, new_node)
+        else: node.right = self._insert_node(node.right, new_node)
+        return self._rebalance(node)
+
+    def remove(self, start):
+        # Xóa khoảng bắt đầu tại start; trả về giá trị của nó hoặc None nếu không có.
+        removed_holder = []
+        self._root = self._remove_node(self._root, start, removed_holder)
+        if not removed_holder: return None
+        self._item_count -= 1
+        return removed_holder[0].value
+
+    def _remove_node(self, node, start, removed_holder):
+        if node is None: return None
+        if start < node.start: node.left = self._remove_node(node.left, start, removed_holder)
+        elif node.start < start: node.right = self._remove_node(node.right, start, removed_holder)
+        else:
+            removed_holder.append(node)
+            if node.left is None: return node.right
+            if node.right is None: return node.left
+            new_right, successor_node = self._remove_min_node(node.right) # Nút kế tiếp thay chỗ nút bị xóa
+            successor_node.left = node.left; successor_node.right = new_right
+            return self._rebalance(successor_node)
+        return self._rebalance(node)
+
+    def _remove_min_node(self, node):
+        # Tách nút nhỏ nhất khỏi cây con; trả về (gốc mới của cây con, nút đã tách).
+        if node.left is None: return node.right, node
+        node.left, min_node = self._remove_min_node(node.left)
+        return self._rebalance(node), min_node
+
+    def find_first_free_start(self, earliest_start, duration):
+        # Mốc sớm nhất s >= earliest_start sao cho [s, s + duration) không chồng khoảng nào, O(log n).
+        free_start = earliest_start
+        covering_node = self._find_last_node_starting_before(free_start, inclusive=True)
+        if covering_node and covering_node.end > free_start: free_start = covering_node.end # Đang nằm trong một khoảng -> nhảy tới cuối khoảng đó
+        next_node = self._find_first_node_starting_from(free_start)
+        if next_node is None or next_node.start - free_start >= duration: return free_start
+        gap_start, last_end = self._find_first_wide_gap(self._root, next_node.start, duration, None)
+        return gap_start if gap_start is not None else last_end # Không còn khe nào đủ dài: sau khoảng cuối cùng
+
+    def _find_first_wide_gap(self, node, from_start, duration, previous_end):
+        # Duyệt theo thứ tự các khoảng có start >= from_start (None: cả cây con) trong cây con node, previous_end là end
+        # của khoảng liền trước đã duyệt. Trả về (đầu khe đầu tiên dài >= duration hoặc None, end của khoảng cuối đã duyệt).
+        # Cây con nằm trọn trong phạm vi mà không chứa khe đủ dài thì bỏ qua cả cây nhờ subtree_max_gap.
+        if node is None: return None, previous_end
+        if from_start is None or not node.subtree_min_start < from_start:
+            if (node.subtree_max_gap is None or node.subtree_max_gap < duration) and (previous_end is None or node.subtree_min_start - previous_end < duration):
+                return None, node.subtree_max_end
+            from_start = None
+        if from_start is not None and node.start < from_start: return self._find_first_wide_gap(node.right, from_start, duration, previous_end)
+        gap_start, previous_end = self._find_first_wide_gap(node.left, from_start, duration, previous_end)
+        if gap_start is not None: return gap_start, previous_end
+        if previous_end is not None and node.start - previous_end >= duration: return previous_end, previous_end
+        return self._find_first_wide_gap(node.right, None, duration, node.end)
+
+    def iter_items(self, from_start=None, to_start=None):
+        # Duyệt (start, end, giá trị) theo thứ tự start, chỉ các khoảng có from_start <= start < to_start (None: không giới hạn).
+        node_stack = []; current_node = self._root
+        while node_stack or current_node:
+            while current_node:
+                if from_start is not None and current_node.start < from_start: current_node = current_node.right # Cả cây con trái nằm trước from_start
+                else: node_stack.append(current_node); current_node = current_node.left
+            if not node_stack: return
+            current_node = node_stack.pop()
+            if to_start is not None and not current_node.start < to_start: return
+            yield current_node.start, current_node.end, current_node.value
+            current_node = current_node.right
+
+# --- BKTree (Cây BK theo khoảng cách sửa chuỗi) ---
+def _build_char_position_masks(pattern_text):
+    # Mặt nạ bit của từng ký tự trong pattern: bit i bật nếu pattern_text[i] là ký tự đó.
+    char_position_masks = {}
+    for char_index, pattern_char in enumerate(pattern_text): char_position_masks[pattern_char] = char_position_masks.get(pattern_char, 0) | (1 << char_index)
+    return char_position_masks
+
+def _bit_parallel_edit_distance(char_position_masks, pattern_length, text):
+    # Khoảng cách Levenshtein giữa pattern (đã tính mặt nạ) và text theo thuật toán song song bit Myers/Hyyrö:
+    # mỗi ký tự của text xử lý cả cột quy hoạch động bằng vài phép toán trên số nguyên, thay vì len(pattern) phép so sánh.
+    if pattern_length == 0: return len(text)
+    all_pattern_bits = (1 << pattern_length) - 1; last_row_bit = 1 << (pattern_length - 1)
+    vertical_positive = all_pattern_bits; vertical_negative = 0; distance = pattern_length
+    for text_char in text:
+        char_match_mask = char_position_masks.get(text_char, 0)
+        vertical_changes = char_match_mask | vertical_negative
+        horizontal_changes = (((char_match_mask & vertical_positive) + vertical_positive) ^ vertical_positive) | char_match_mask
+        horizontal_positive = vertical_negative | ~(horizontal_changes | vertical_positive)
+        horizontal_negative = vertical_positive & horizontal_changes
+        if horizontal_positive & last_row_bit: distance += 1
+        elif horizontal_negative & last_row_bit: distance -= 1
+        horizontal_positive = (horizontal_positive << 1) | 1
+        horizontal_negative <<= 1
+        vertical_positive = (horizontal_negative | ~(vertical_changes | horizontal_positive)) & all_pattern_bits
+        vertical_negative = horizontal_positive & vertical_changes
+    return distance
+
+def edit_distance(first_text, second_text):
+    """Khoảng cách Levenshtein (số lần thêm/xóa/thay 1 ký tự) giữa hai chuỗi."""
+    return _bit_parallel_edit_distance(_build_char_position_masks(first_text), len(first_text), second_text)
+
+class BKTreeNode:
+    """Nút cây BK: một khóa, tập giá trị của khóa đó, và các con đánh số theo khoảng cách tới khóa."""
+    __slots__ = ("key", "values", "children_by_distance")
+
+    def __init__(self, key):
+        self.key = key
+        self.values = HashSet(initial_table_size=4) # Rỗng: khóa đã bị xóa, nút chỉ còn dùng để rẽ nhánh
+        self.children_by_distance = None # Mảng Python, chỉ mục = khoảng cách tới khóa của nút (None: chưa có con)
+
+class BKTree:
+    """Cây BK (Burkhard-Keller) các chuỗi theo khoảng cách Levenshtein; mỗi khóa giữ một tập giá trị.
+
+    Con của một nút được đánh số theo khoảng cách tới khóa của nút, nên theo bất đẳng thức tam giác tìm các khóa
+    cách truy vấn <= k chỉ phải vào các con có số trong [d - k, d + k] (d: khoảng cách từ truy vấn tới nút).
+    Khóa hết giá trị chỉ bị đánh dấu xóa (vẫn dùng để rẽ nhánh); số nút đã xóa vượt số nút còn dùng thì dựng lại cây.
+    Bảng khóa -> nút cho phép thêm giá trị vào khóa đã có (tên trùng) và xóa mà không phải đi lại đường từ gốc.
+    """
+    def __init__(self):
+        self.root = None
+        self._node_by_key = RobinHoodHashTable() # Băm bằng hash() của Python: khóa là chuỗi dài, gần giống nhau
+        self._value_count = 0
+        self._live_key_count = 0 # Số nút còn giá trị
+        self._dead_key_count = 0 # Số nút đã xóa hết giá trị
+
+    def __len__(self): return self._value_count
+    def is_empty(self): return self._value_count == 0
+
+    def _find_or_create_node(self, key):
+        # Trả về (nút của khóa, nút mới tạo hay không).
+        existing_node = self._node_by_key.get_item(key)
+        if existing_node is not None: return existing_node, False
+        new_node = self._insert_new_node(key); self._node_by_key.put_item(key, new_node)
+        return new_node, True
+
+    def _insert_new_node(self, key):
+        # Gắn nút cho khóa chưa có vào cây: đi từ gốc, mỗi bước theo con có số = khoảng cách tới khóa của nút.
+        if self.root is None: self.root = BKTreeNode(key); return self.root
+        key_masks = _build_char_position_masks(key); key_length = len(key)
+        current_node = self.root
+        while True:
+            node_distance = _bit_parallel_edit_distance(key_masks, key_length, current_node.key)
+            children_by_distance = current_node.children_by_distance
+            if children_by_distance is None: children_by_distance = current_node.children_by_distance = []
+            if node_distance >= len(children_by_distance): children_by_distance.extend([None] * (node_distance + 1 - len(children_by_distance)))
+            child_node = children_by_distance[node_distance]
+            if child_node is None: child_node = children_by_distance[node_distance] = BKTreeNode(key); return child_node
+            current_node = child_node
+
+    def add(self, key, value):
+        # Thêm giá trị cho khóa; trả về False nếu cặp (khóa, giá trị) đã có.
+        target_node, is_new_node = self._find_or_create_node(key)
+        had_no_values = target_node.values.is_empty()
+        if not target_node.values.add(value): return False
+        self._value_count += 1
+        if had_no_values:
+            self._live_key_count += 1
+            if not is_new_node: self._dead_key_count -= 1 # Khóa đã xóa được dùng lại
+        return True
+
+    def remove(self, key, value):
+        # Bỏ giá trị khỏi khóa; trả về False nếu không có. Khóa hết giá trị thì nút thành nút đã xóa.
+        target_node = self._node_by_key.get_item(key)
+        if target_node is None or not target_node.values.remove(value): return False
+        self._value_count -= 1
+        if target_node.values.is_empty():
+            self._live_key_count -= 1; self._dead_key_count += 1
+            if self._dead_key_count > self._live_key_count: self._rebuild()
+        return True
+
+    def _iter_nodes(self):
+        pending_nodes = [self.root] if self.root else []
+        while pending_nodes:
+            current_node = pending_nodes.pop()
+            yield current_node
+            if current_node.children_by_distance: pending_nodes.extend(child_node for child_node in current_node.children_by_distance if child_node is not None)
+
+    def _rebuild(self):
+        # Dựng lại cây chỉ từ các nút còn giá trị (giữ nguyên tập giá trị của từng khóa).
+        live_nodes = [current_node for current_node in self._iter_nodes() if not current_node.values.is_empty()]
+        self.root = None; self._node_by_key = RobinHoodHashTable(); self._dead_key_count = 0
+        for live_node in live_nodes: self._find_or_create_node(live_node.key)[0].values = live_node.values
+
+    def iter_items(self):
+        # Các cặp (khóa, giá trị), không theo thứ tự nào.
+        for current_node in self._iter_nodes():
+            for value in current_node.values: yield current_node.key, value
+
+    def search(self, query, max_distance, limit=None):
+        """Các (khoảng cách, khóa, giá trị) có khóa cách query <= max_distance, sắp tăng dần.
+
+        limit: chỉ lấy limit kết quả gần nhất; khi đã đủ thì ngưỡng khoảng cách co lại bằng kết quả xa nhất đang giữ,
+        nên càng tìm được nhiều khóa gần thì càng ít nhánh phải đi.
+        """
+        if self.root is None or max_distance < 0 or (limit is not None and limit <= 0): return List()
+        query_masks = _build_char_position_masks(query); query_length = len(query)
+        nearest_results = MaxHeap() # Kết quả (khoảng cách, khóa, giá trị) đang giữ, xa nhất ở gốc
+        distance_bound = max_distance; pending_nodes = [self.root]
+        while pending_nodes:
+            current_node = pending_nodes.pop()
+            node_distance = _bit_parallel_edit_distance(query_masks, query_length, current_node.key)
+            if node_distance <= distance_bound:
+                for value in current_node.values:
+                    candidate_result = (node_distance, current_node.key, value)
+                    if limit is None or len(nearest_results) < limit: nearest_results.add_item(candidate_result)
+                    elif candidate_result < nearest_results.get_max_item(): nearest_results.remove_max_item(); nearest_results.add_item(candidate_result)
+                if limit is not None and len(nearest_results) >= limit: distance_bound = nearest_results.get_max_item()[0]
+            children_by_distance = current_node.children_by_distance
+            if children_by_distance:
+                lowest_child_distance = max(1, node_distance - distance_bound)
+                highest_child_distance = min(len(children_by_distance) - 1, node_distance + distance_bound)
+                for child_distance in range(lowest_child_distance, highest_child_distance + 1):
+                    child_node = children_by_distance[child_distance]
+                    if child_node is not None: pending_nodes.append(child_node)
+        return List.from_iterable(sorted(nearest_results.get_all_heap_elements()))
 
 # --- Cấu trúc Radix Tree (Cây cơ số hay Patricia Trie) ---
 class RadixTreeNode:
     """Nút trong Cây Cơ số (Radix Tree)."""
-    def __init__(self):
-        self.children = HashTable(initial_table_size=10) # Con là HashTable, key: ký tự, value: RadixTreeNode
+    def __init__(self, children_table_class=HashTable, children_table_size=10):
+        self.children = children_table_class(initial_table_size=children_table_size) # Con là bảng băm, key: ký tự, value: RadixTreeNode
         self.is_end_of_key = False # Đánh dấu kết thúc của một khóa
         self.value = None # Giá trị liên kết với khóa (thường là patient_id)
 
@@ -324,8 +1301,10 @@ class RadixTreeNode:
 
 class RadixTree:
     """Cây Cơ số (Radix Tree/Patricia Trie) để tìm kiếm chuỗi nhanh."""
-    def __init__(self):
-        self.root = RadixTreeNode() # Nút gốc
+    def __init__(self, children_table_class=HashTable, children_table_size=10):
+        self.children_table_class = children_table_class # Loại bảng băm cho con của mỗi nút
+        self.children_table_size = children_table_size
+        self.root = RadixTreeNode(children_table_class, children_table_size) # Nút gốc
 
     def insert(self, key_str, value):
         """Chèn cặp khóa-giá trị (chuỗi) vào cây."""
@@ -336,7 +1315,7 @@ class RadixTree:
         for char_code in key_str:
             char_as_str = str(char_code)
             if not current_node.children.contains_key(char_as_str):
-                current_node.children.put_item(char_as_str, RadixTreeNode())
+                current_node.children.put_item(char_as_str, RadixTreeNode(self.children_table_class, self.children_table_size))
             current_node = current_node.children.get_item(char_as_str)
         current_node.is_end_of_key = True
         current_node.value = value
@@ -0,0 +1,89 @@
+# doctor_dispatch.py
+# Ô "đang khám" theo từng BS của một PK: nhiều BS cùng PK gọi BN song song từ chung một hàng đợi.
+# Ô khám không có khóa riêng mà dùng khóa hàng đợi của PK: lấy BN đầu hàng đợi và đặt vào ô của BS trong
+# cùng một lần giữ khóa, nên hai BS không bao giờ nhận cùng một BN và BN luôn ở đúng một nơi (hàng đợi hoặc ô khám).
+from custom_structures import HashTable, List
+
+
+class InProgressExam:
+    """Một BN đang được một BS khám (đã gọi, chưa hoàn thành/vắng)."""
+    __slots__ = ("doctor_id", "patient_in_queue", "call_time", "is_being_closed")
+
+    def __init__(self, doctor_id, patient_in_queue, call_time):
+        self.doctor_id = doctor_id
+        self.patient_in_queue = patient_in_queue # PatientInQueue (giữ để đưa lại hàng đợi nếu BN vắng)
+        self.call_time = call_time
+        self.is_being_closed = False # Đang ghi kết quả khám / xử lý vắng (BN vẫn ở trong ô cho đến khi xong)
+
+    @property
+    def patient_id(self): return self.patient_in_queue.patient_id
+
+
+class DoctorThroughputStats:
+    """Năng suất một BS tại một PK: số lượt gọi / khám xong / vắng và tổng thời gian khám."""
+    __slots__ = ("doctor_id", "called_count", "completed_count", "absent_count", "total_service_seconds", "first_call_time", "last_completion_time")
+
+    def __init__(self, doctor_id):
+        self.doctor_id = doctor_id
+        self.called_count = 0; self.completed_count = 0; self.absent_count = 0
+        self.total_service_seconds = 0.0
+        self.first_call_time = None; self.last_completion_time = None
+
+    def average_service_seconds(self): return self.total_service_seconds / self.completed_count if self.completed_count else None
+
+    def completed_per_hour(self):
+        # Số BN khám xong mỗi giờ, tính từ lượt gọi đầu tiên đến lượt hoàn thành gần nhất.
+        if not self.completed_count: return None
+        active_hours = (self.last_completion_time - self.first_call_time).total_seconds() / 3600.0
+        return self.completed_count / active_hours if active_hours > 0 else None
+
+
+class ClinicExamSlots:
+    """Các ô đang khám (mỗi BS tối đa một BN) và năng suất từng BS của một PK. Gọi khi đang giữ khóa hàng đợi PK."""
+    def __init__(self):
+        self._exams_by_doctor = HashTable(initial_table_size=8) # mã BS -> InProgressExam
+        self._throughput_by_doctor = HashTable(initial_table_size=8) # mã BS -> DoctorThroughputStats
+
+    def _get_throughput(self, doctor_id_val):
+        doctor_stats = self._throughput_by_doctor.get_item(doctor_id_val)
+        if doctor_stats is None: doctor_stats = DoctorThroughputStats(doctor_id_val); self._throughput_by_doctor.put_item(doctor_id_val, doctor_stats)
+        return doctor_stats
+
+    def get_exam(self, doctor_id_val): return self._exams_by_doctor.get_item(doctor_id_val)
+    def has_exams(self): return len(self._exams_by_doctor) > 0
+
+    def start_exam(self, doctor_id_val, patient_in_queue, call_time):
+        # Đặt BN vào ô của BS (ô phải đang trống).
+        if self._exams_by_doctor.contains_key(doctor_id_val): raise ValueError(f"BS {doctor_id_val} đang khám BN khác.")
+        in_progress_exam = InProgressExam(doctor_id_val, patient_in_queue, call_time)
+        self._exams_by_doctor.put_item(doctor_id_val, in_progress_exam)
+        doctor_stats = self._get_throughput(doctor_id_val); doctor_stats.called_count += 1
+        if doctor_stats.first_call_time is None: doctor_stats.first_call_time = call_time
+        return in_progress_exam
+
+    def claim_exam(self, doctor_id_val):
+        # Đánh dấu BN trong ô của BS là đang được kết thúc (khám xong/vắng). Ô vẫn giữ BN đến khi take_exam, nên BS
+        # chưa gọi được BN khác và hai lượt kết thúc cùng lúc không xử lý trùng. None nếu ô trống hoặc đã được đánh dấu.
+        in_progress_exam = self._exams_by_doctor.get_item(doctor_id_val)
+        if in_progress_exam is None or in_progress_exam.is_being_closed: return None
+        in_progress_exam.is_being_closed = True
+        return in_progress_exam
+
+    def release_claim(self, in_progress_exam): in_progress_exam.is_being_closed = False # Kết thúc không thành: BN ở lại ô
+
+    def take_exam(self, doctor_id_val):
+        # Lấy BN ra khỏi ô của BS (BS rảnh lại); None nếu ô trống.
+        in_progress_exam = self._exams_by_doctor.get_item(doctor_id_val)
+        if in_progress_exam is None: return None
+        self._exams_by_doctor.delete_item(doctor_id_val)
+        return in_progress_exam
+
+    def record_completed(self, in_progress_exam, completion_time):
+        doctor_stats = self._get_throughput(in_progress_exam.doctor_id)
+        doctor_stats.completed_count += 1; doctor_stats.last_completion_time = completion_time
+        doctor_stats.total_service_seconds += max(0.0, (completion_time - in_progress_exam.call_time).total_seconds())
+
+    def record_absent(self, in_progress_exam): self._get_throughput(in_progress_exam.doctor_id).absent_count += 1
+
+    def get_all_exams(self): return List.from_iterable(self._exams_by_doctor.iter_values()) # Ảnh chụp các ô đang khám
+    def get_all_throughput(self): return List.from_iterable(self._throughput_by_doctor.iter_values())
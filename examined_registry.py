@@ -0,0 +1,102 @@
+# examined_registry.py
+# Danh sách BN đã khám theo ngày: kiểm tra trùng O(1), giữ thứ tự khám, tự sang ngày mới
+# theo đồng hồ của logic, và dựng lại một ngày bất kỳ từ lịch sử khám khi cần.
+import datetime
+
+from custom_structures import ChunkedList, HashSet, HashTable, List
+
+
+class ExaminedDayRecord:
+    """BN đã khám trong một ngày: ChunkedList theo thứ tự khám + HashSet mã BN để kiểm tra trùng."""
+    def __init__(self, day_date, patient_set_table_size=128):
+        self.day_date = day_date
+        self.patients_in_exam_order = ChunkedList()
+        self.patient_id_set = HashSet(patient_set_table_size)
+
+    def add_patient(self, patient_obj):
+        # Thêm BN nếu chưa có trong ngày; trả về False nếu đã có.
+        if not self.patient_id_set.add(patient_obj.patient_id): return False
+        self.patients_in_exam_order.append(patient_obj); return True
+
+    def __contains__(self, patient_id_val): return patient_id_val in self.patient_id_set
+    def __len__(self): return len(self.patients_in_exam_order)
+    def __iter__(self): return iter(self.patients_in_exam_order)
+
+
+class ExaminedTodayRegistry:
+    """Sổ BN đã khám theo ngày (key: datetime.date).
+
+    Ngày hiện tại lấy từ `clock` (cùng đồng hồ với MedicalSystemLogic), nên khi qua nửa đêm
+    lần đọc/ghi kế tiếp tự chuyển sang sổ mới; chỉ giữ `retained_day_count` ngày gần nhất.
+    Không tự khóa: logic gọi khi đang giữ khóa DS đã khám hôm nay.
+    """
+    def __init__(self, clock, retained_day_count=1):
+        if retained_day_count < 1: raise ValueError("Phải giữ ít nhất 1 ngày.")
+        self.clock = clock
+        self.retained_day_count = retained_day_count
+        self._day_records = HashTable(initial_table_size=16) # date -> ExaminedDayRecord
+        self._retained_dates = List() # Các ngày đang giữ, tăng dần
+        self.current_day_date = None
+
+    def _roll_over_if_needed(self):
+        # Sang ngày mới: bỏ các ngày cũ vượt quá số ngày được giữ.
+        today_date = self.clock().date()
+        if today_date == self.current_day_date: return
+        self.current_day_date = today_date
+        still_retained_dates = List()
+        for day_date in self._retained_dates:
+            if 0 <= (today_date - day_date).days < self.retained_day_count: still_retained_dates.append(day_date)
+            else: self._day_records.delete_item(day_date)
+        self._retained_dates = still_retained_dates
+
+    def _get_or_create_day_record(self, day_date):
+        day_record = self._day_records.get_item(day_date)
+        if day_record is None:
+            day_record = ExaminedDayRecord(day_date)
+            self._day_records.put_item(day_date, day_record)
+            insert_index = len(self._retained_dates) # Giữ _retained_dates tăng dần
+            while insert_index > 0 and self._retained_dates.get(insert_index - 1) > day_date: insert_index -= 1
+            self._retained_dates.insert(insert_index, day_date)
+        return day_record
+
+    def record_examination(self, patient_obj, exam_date=None):
+        # Ghi nhận BN khám xong (mặc định ngày hiện tại); trả về True nếu là lần đầu trong ngày đó.
+        self._roll_over_if_needed()
+        exam_date = exam_date if exam_date is not None else self.current_day_date
+        if not 0 <= (self.current_day_date - exam_date).days < self.retained_day_count: return False # Ngoài khoảng ngày được giữ
+        return self._get_or_create_day_record(exam_date).add_patient(patient_obj)
+
+    def is_examined_today(self, patient_id_val):
+        self._roll_over_if_needed()
+        today_record = self._day_records.get_item(self.current_day_date)
+        return today_record is not None and patient_id_val in today_record
+
+    def get_day_record(self, day_date):
+        # Sổ của một ngày đang giữ (None nếu không có).
+        self._roll_over_if_needed()
+        return self._day_records.get_item(day_date)
+
+    def get_today_record(self):
+        self._roll_over_if_needed()
+        return self._get_or_create_day_record(self.current_day_date)
+
+    def install_day_record(self, day_record):
+        # Thay sổ của một ngày bằng sổ dựng lại (ví dụ khi khởi động giữa ngày).
+        self._roll_over_if_needed()
+        if not 0 <= (self.current_day_date - day_record.day_date).days < self.retained_day_count: return False
+        self._get_or_create_day_record(day_record.day_date) # Ghi nhận ngày vào danh sách đang giữ
+        self._day_records.put_item(day_record.day_date, day_record); return True
+
+    @staticmethod
+    def rebuild_day_from_history(day_date, patients_iterable):
+        # Dựng sổ một ngày từ lịch sử khám của các BN. Lịch sử chỉ lưu ngày (không có giờ)
+        # nên thứ tự trong sổ dựng lại là theo mã BN.
+        examined_patients_py = []
+        for patient_obj in patients_iterable:
+            for history_item_dict in patient_obj.examination_history:
+                exam_date_val = history_item_dict.get('ngay_kham')
+                if isinstance(exam_date_val, datetime.date) and exam_date_val == day_date: examined_patients_py.append(patient_obj); break
+        examined_patients_py.sort(key=lambda patient_obj: patient_obj.patient_id)
+        day_record = ExaminedDayRecord(day_date)
+        for patient_obj in examined_patients_py: day_record.add_patient(patient_obj)
+        return day_record
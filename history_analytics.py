@@ -0,0 +1,143 @@
+# history_analytics.py
+# Kho cột (columnar) cho phân tích lịch sử khám dài hạn: mỗi lượt khám là một dòng, mỗi thuộc tính
+# là một mảng số nguyên (ngày = số ngày ordinal, BS/PK/loại khám = mã phân loại). Các truy vấn
+# lọc theo khoảng ngày / nhóm / đếm chạy trên mảng thay vì duyệt dict trong lịch sử khám của từng BN.
+# Dùng NumPy nếu có; không có thì chạy bằng Python thuần (array + bisect) với cùng kết quả.
+import array
+import bisect
+import datetime
+
+try:
+    import numpy
+except ImportError: # NumPy là tùy chọn
+    numpy = None
+
+# Các chiều có thể nhóm/đếm
+CATEGORICAL_DIMENSIONS = ("doctor", "clinic", "exam_type")
+GROUP_BY_DIMENSIONS = CATEGORICAL_DIMENSIONS + ("month", "day")
+
+
+def is_numpy_available(): return numpy is not None
+
+
+def _month_index(day_date): return day_date.year * 12 + day_date.month - 1
+def _month_label(month_index): return f"{month_index // 12:04d}-{month_index % 12 + 1:02d}"
+
+
+class ExaminationHistoryColumns:
+    """Ảnh chụp toàn bộ lịch sử khám dưới dạng cột, sắp xếp tăng dần theo ngày khám.
+
+    Chỉ đọc sau khi dựng; muốn số liệu mới thì dựng lại (MedicalSystemLogic.build_history_analytics).
+    Bản ghi có ngày khám lỗi bị bỏ qua (giống filter_examination_history khi lọc theo ngày).
+    """
+    def __init__(self, use_numpy=None):
+        if use_numpy and numpy is None: raise ImportError("Chưa cài NumPy (pip install numpy) hoặc đặt use_numpy=False.")
+        self.use_numpy = is_numpy_available() if use_numpy is None else bool(use_numpy)
+        self.category_labels = {dimension: [] for dimension in CATEGORICAL_DIMENSIONS} # mã -> nhãn
+        self._category_codes = {dimension: {} for dimension in CATEGORICAL_DIMENSIONS} # nhãn -> mã
+        self.columns = {}
+        self.row_count = 0
+
+    def _encode(self, dimension, label):
+        label_codes = self._category_codes[dimension]
+        code = label_codes.get(label)
+        if code is None: code = label_codes[label] = len(self.category_labels[dimension]); self.category_labels[dimension].append(label)
+        return code
+
+    @classmethod
+    def from_patients(cls, patients_iterable, use_numpy=None):
+        # Dựng kho cột từ Patient.examination_history của các BN.
+        store = cls(use_numpy=use_numpy)
+        encoded_rows = []
+        for patient_obj in patients_iterable:
+            for history_item_dict in patient_obj.examination_history:
+                exam_date_val = history_item_dict.get('ngay_kham')
+                if not isinstance(exam_date_val, datetime.date): continue
+                encoded_rows.append((exam_date_val.toordinal(), _month_index(exam_date_val),
+                                     store._encode("doctor", history_item_dict.get('ma_bac_si_kham', '') or ''),
+                                     store._encode("clinic", history_item_dict.get('ma_phong_kham_kham', '') or ''),
+                                     store._encode("exam_type", history_item_dict.get('loai_kham', '') or '')))
+        encoded_rows.sort(key=lambda row: row[0])
+        store.row_count = len(encoded_rows)
+        for column_index, column_name in enumerate(("day", "month", "doctor", "clinic", "exam_type")):
+            column_values = [row[column_index] for row in encoded_rows]
+            store.columns[column_name] = numpy.array(column_values, dtype=numpy.int32) if store.use_numpy else array.array('i', column_values)
+        return store
+
+    def to_column_lists(self):
+        # Xuất dạng cột Python thuần (list) kèm bảng nhãn, ví dụ để ghi file hoặc đưa sang công cụ khác.
+        exported_columns = {column_name: list(column_values) for column_name, column_values in self.columns.items()}
+        exported_columns["labels"] = {dimension: list(labels) for dimension, labels in self.category_labels.items()}
+        return exported_columns
+
+    def _row_slice(self, from_date, to_date):
+        # Khoảng dòng [start, stop) có ngày trong [from_date, to_date] (cột ngày đã sắp xếp -> tìm nhị phân).
+        day_column = self.columns.get("day")
+        if day_column is None or self.row_count == 0: return 0, 0
+        lower_day = from_date.toordinal() if from_date else None; upper_day = to_date.toordinal() if to_date else None
+        if self.use_numpy:
+            start = int(numpy.searchsorted(day_column, lower_day, side="left")) if lower_day is not None else 0
+            stop = int(numpy.searchsorted(day_column, upper_day, side="right")) if upper_day is not None else self.row_count
+        else:
+            start = bisect.bisect_left(day_column, lower_day) if lower_day is not None else 0
+            stop = bisect.bisect_right(day_column, upper_day) if upper_day is not None else self.row_count
+        return start, max(start, stop)
+
+    def _equality_filters(self, doctor_id=None, clinic_id=None, exam_type=None):
+        # Đổi bộ lọc nhãn sang mã; None nếu có nhãn không tồn tại (kết quả chắc chắn rỗng).
+        equality_filters = []
+        for dimension, label in (("doctor", doctor_id), ("clinic", clinic_id), ("exam_type", exam_type)):
+            if label is None: continue
+            code = self._category_codes[dimension].get(label)
+            if code is None: return None
+            equality_filters.append((dimension, code))
+        return equality_filters
+
+    def _selected_values(self, value_column_name, from_date=None, to_date=None, doctor_id=None, clinic_id=None, exam_type=None):
+        # Giá trị cột `value_column_name` của các dòng thỏa bộ lọc (mảng NumPy hoặc list).
+        equality_filters = self._equality_filters(doctor_id, clinic_id, exam_type)
+        start, stop = self._row_slice(from_date, to_date)
+        if equality_filters is None or start == stop: return numpy.zeros(0, dtype=numpy.int32) if self.use_numpy else []
+        value_slice = self.columns[value_column_name][start:stop]
+        if not equality_filters: return value_slice if self.use_numpy else list(value_slice)
+        if self.use_numpy:
+            row_mask = numpy.ones(stop - start, dtype=bool)
+            for dimension, code in equality_filters: row_mask &= self.columns[dimension][start:stop] == code
+            return value_slice[row_mask]
+        filter_slices = [(self.columns[dimension][start:stop], code) for dimension, code in equality_filters]
+        return [value_slice[i] for i in range(stop - start) if all(filter_slice[i] == code for filter_slice, code in filter_slices)]
+
+    def count_visits(self, from_date=None, to_date=None, doctor_id=None, clinic_id=None, exam_type=None):
+        return len(self._selected_values("day", from_date, to_date, doctor_id, clinic_id, exam_type))
+
+    def count_by(self, dimension, from_date=None, to_date=None, doctor_id=None, clinic_id=None, exam_type=None):
+        # Đếm số lượt theo một chiều: dict nhãn -> số lượt (chỉ nhãn có lượt khám).
+        if dimension not in GROUP_BY_DIMENSIONS: raise ValueError(f"Chiều '{dimension}' không hợp lệ ({', '.join(GROUP_BY_DIMENSIONS)}).")
+        selected_codes = self._selected_values(dimension, from_date, to_date, doctor_id, clinic_id, exam_type)
+        if self.use_numpy:
+            if dimension in CATEGORICAL_DIMENSIONS:
+                code_counts = numpy.bincount(selected_codes, minlength=len(self.category_labels[dimension]))
+                counts_by_code = {code: int(count) for code, count in enumerate(code_counts) if count}
+            else:
+                unique_codes, code_counts = numpy.unique(selected_codes, return_counts=True)
+                counts_by_code = {int(code): int(count) for code, count in zip(unique_codes, code_counts)}
+        else:
+            counts_by_code = {}
+            for code in selected_codes: counts_by_code[code] = counts_by_code.get(code, 0) + 1
+        if dimension in CATEGORICAL_DIMENSIONS: return {self.category_labels[dimension][code]: count for code, count in counts_by_code.items()}
+        if dimension == "month": return {_month_label(code): count for code, count in counts_by_code.items()}
+        return {datetime.date.fromordinal(code): count for code, count in counts_by_code.items()}
+
+    def monthly_trend(self, from_date=None, to_date=None, doctor_id=None, clinic_id=None, exam_type=None):
+        # Danh sách (tháng 'YYYY-MM', số lượt) tăng dần theo tháng.
+        return sorted(self.count_by("month", from_date, to_date, doctor_id, clinic_id, exam_type).items())
+
+    def doctor_load_distribution(self, from_date=None, to_date=None, clinic_id=None):
+        # Phân bố số lượt khám theo BS trong khoảng ngày (chỉ các BS đã từng khám trong kho).
+        visits_by_doctor = self.count_by("doctor", from_date, to_date, clinic_id=clinic_id)
+        visits_by_doctor.pop('', None) # Lượt khám không ghi mã BS
+        doctor_loads = sorted(visits_by_doctor.get(label, 0) for label in self.category_labels["doctor"] if label)
+        if not doctor_loads: return {"doctor_count": 0, "per_doctor": {}}
+        def load_percentile(pct): return doctor_loads[min(len(doctor_loads) - 1, int(pct / 100.0 * len(doctor_loads)))]
+        return {"doctor_count": len(doctor_loads), "total_visits": sum(doctor_loads), "min": doctor_loads[0], "max": doctor_loads[-1],
+                "mean": sum(doctor_loads) / len(doctor_loads), "median": load_percentile(50), "p90": load_percentile(90), "per_doctor": visits_by_doctor}
@@ -2,10 +2,78 @@
 import customtkinter as ctk
 from tkinter import ttk, messagebox, simpledialog
 import datetime
+import queue
 
-from app_logic import MedicalSystemLogic 
+from app_logic import MedicalSystemLogic, DEFAULT_APPOINTMENT_MINUTES
+import metrics
 from models import PatientInQueue, Patient, DATE_FORMAT_CSV, Doctor, Clinic 
 from custom_structures import List 
+from task_dispatcher import BackgroundTaskDispatcher
+import change_events
+
+# Mô tả tác vụ nền hiển thị trên thanh trạng thái
+BACKGROUND_TASK_DESCRIPTIONS = {
+    "create_patient": "Tạo hồ sơ BN", "update_patient": "Cập nhật hồ sơ BN", "delete_patient": "Xóa hồ sơ BN",
+    "register_exam": "Đăng ký khám", "call_next": "Gọi BN tiếp theo", "complete_exam": "Lưu kết quả khám",
+    "absent_patient": "Xử lý BN vắng mặt", "leave_queue": "Xóa BN khỏi hàng đợi", "change_priority": "Đổi ưu tiên",
+    "create_doctor": "Thêm bác sĩ", "update_doctor": "Cập nhật bác sĩ", "delete_doctor": "Xóa bác sĩ",
+    "create_clinic": "Thêm phòng khám", "update_clinic": "Cập nhật phòng khám", "delete_clinic": "Xóa phòng khám",
+    "assign_doctor": "Gán/Xóa BS cho PK", "search_patients": "Tìm kiếm BN", "filter_history": "Lọc lịch sử khám",
+    "book_appointment": "Đặt lịch hẹn", "cancel_appointment": "Hủy lịch hẹn", "admit_appointments": "Đưa BN có lịch hẹn vào hàng đợi",
+}
+
+# Màu dòng trong bảng hàng đợi theo mức ưu tiên (số lớn hơn = ưu tiên cao hơn)
+QUEUE_PRIORITY_ROW_TAGS = {5: "prio_1", 4: "prio_2", 3: "prio_3", 2: "prio_4", 1: "prio_5"}
+AUTO_CLINIC_OPTION_PREFIX = "PK ít chờ nhất - " # Lựa chọn ở ô PK đăng ký khám: để hệ thống chọn PK theo chuyên khoa
+NO_DOCTOR_OPTION = "Không theo BS" # Tab hàng đợi: gọi/khám chung cho PK (không dùng ô khám theo BS)
+APPOINTMENT_ADMIT_POLL_MS = 30 * 1000 # Chu kỳ kiểm tra lịch hẹn đến giờ để đưa BN vào hàng đợi
+PATIENT_NAME_SUGGESTION_DELAY_MS = 200 # Chờ ngừng gõ bao lâu thì gợi ý họ tên gần đúng
+PATIENT_NAME_SUGGESTION_LIMIT = 5
+
+
+class TreeviewRowReconciler:
+    """Cập nhật một ttk.Treeview phẳng theo khóa dòng (mã BS/PK/BN) thay vì xóa hết rồi chèn lại.
+
+    Mỗi dòng có iid = khóa. Mỗi lần reconcile chỉ gọi Tk cho các dòng bị xóa, thêm, đổi vị trí
+    hoặc đổi nội dung, nên dòng đang chọn và vị trí cuộn được giữ nguyên.
+    """
+    def __init__(self, treeview_widget):
+        self.treeview_widget = treeview_widget
+        self._rendered_rows = {} # khóa -> (values, tags) đang hiển thị
+        self._rendered_order = [] # Thứ tự khóa đang hiển thị
+
+    def reconcile(self, new_rows):
+        # new_rows: danh sách (khóa, values, tags) theo thứ tự cần hiển thị. Trả về số thao tác Tk theo loại.
+        change_counts = {"deleted": 0, "inserted": 0, "moved": 0, "updated": 0}
+        new_row_keys = set(row_key for row_key, _values, _tags in new_rows)
+        if len(new_row_keys) != len(new_rows): raise ValueError("Khóa dòng trong Treeview bị trùng.")
+        first_visible_fraction = self.treeview_widget.yview()[0]
+
+        stale_keys = [row_key for row_key in self._rendered_order if row_key not in new_row_keys]
+        if stale_keys:
+            self.treeview_widget.delete(*stale_keys) # Một lệnh Tk cho tất cả dòng bị xóa
+            for row_key in stale_keys: del self._rendered_rows[row_key]
+            change_counts["deleted"] = len(stale_keys)
+
+        # Sau mỗi bước i: i dòng đầu của bảng đúng bằng new_rows[:i], phần sau là các dòng cũ chưa xét (giữ thứ tự cũ).
+        remaining_old_order = [row_key for row_key in self._rendered_order if row_key in new_row_keys]
+        placed_keys = set(); old_order_position = 0
+        for row_index, (row_key, row_values, row_tags) in enumerate(new_rows):
+            while old_order_position < len(remaining_old_order) and remaining_old_order[old_order_position] in placed_keys: old_order_position += 1
+            rendered_row = self._rendered_rows.get(row_key)
+            if rendered_row is None:
+                self.treeview_widget.insert("", row_index, iid=row_key, values=row_values, tags=row_tags); change_counts["inserted"] += 1
+            else:
+                if old_order_position < len(remaining_old_order) and remaining_old_order[old_order_position] == row_key: old_order_position += 1 # Đã đúng vị trí
+                else: self.treeview_widget.move(row_key, "", row_index); change_counts["moved"] += 1
+                if rendered_row != (row_values, row_tags):
+                    self.treeview_widget.item(row_key, values=row_values, tags=row_tags); change_counts["updated"] += 1
+            self._rendered_rows[row_key] = (row_values, row_tags); placed_keys.add(row_key)
+        self._rendered_order = [row_key for row_key, _values, _tags in new_rows]
+
+        if any(change_counts.values()): self.treeview_widget.yview_moveto(first_visible_fraction)
+        return change_counts
+
 
 class MedicalAppGUI(ctk.CTk): 
     def __init__(self, medical_system_logic_instance): 
@@ -22,15 +90,26 @@ class MedicalAppGUI(ctk.CTk):
         # Gọi hàm làm đẹp bảng (Treeview)
         self._apply_treeview_style()
 
+        # Luồng nền cho các lệnh gọi logic nặng (lưu CSV, lọc lịch sử...)
+        self.task_dispatcher = BackgroundTaskDispatcher(self, on_busy_state_changed=self._on_background_busy_state_changed)
+        self._setup_busy_status_bar()
+        self.protocol("WM_DELETE_WINDOW", self._on_close_window)
+
+        # Sự kiện thay đổi từ logic (phát trên luồng nền) -> gom lại, xử lý trên luồng giao diện
+        self._pending_change_events = queue.Queue()
+        self._change_event_subscription = self.medical_system_logic.change_event_bus.subscribe(change_events.ALL_EVENT_TYPES, self._pending_change_events.put)
+
         self.tab_view_widget = ctk.CTkTabview(self, width=1330, height=880) 
         self.tab_view_widget.pack(expand=True, fill="both", padx=10, pady=10)
 
         self.registration_profile_tab = self.tab_view_widget.add("Đăng ký & Hồ sơ BN") 
         self.examination_queue_tab = self.tab_view_widget.add("Hàng đợi Khám")  
+        self.appointment_tab = self.tab_view_widget.add("Lịch hẹn Khám")
         self.doctor_management_tab = self.tab_view_widget.add("Quản lý Bác sĩ") 
         self.clinic_management_tab = self.tab_view_widget.add("Quản lý Phòng khám") 
         self.patient_search_tab = self.tab_view_widget.add("Tìm kiếm BN")  
         self.examination_history_tab = self.tab_view_widget.add("Tra cứu Lịch sử Khám")  
+        self.visit_statistics_tab = self.tab_view_widget.add("Thống kê Lượt khám")
         
         self.priority_level_names = List() 
         temp_priority_keys_py = list(PatientInQueue.PRIORITY_MAP.keys()) 
@@ -39,10 +118,18 @@ class MedicalAppGUI(ctk.CTk):
         # Gọi các hàm setup cho từng tab
         self._setup_registration_profile_tab() 
         self._setup_examination_queue_tab() 
+        self._setup_appointment_tab()
         self._setup_doctor_management_tab() 
         self._setup_clinic_management_tab() 
         self._setup_patient_search_tab() 
         self._setup_examination_history_tab() 
+        self._setup_visit_statistics_tab()
+
+        # Cập nhật bảng BS / PK / hàng đợi theo khóa dòng
+        self.doctor_list_reconciler = TreeviewRowReconciler(self.doctor_list_treeview)
+        self.clinic_list_reconciler = TreeviewRowReconciler(self.clinic_list_treeview)
+        self.examination_queue_reconciler = TreeviewRowReconciler(self.examination_queue_treeview)
+        self.appointment_list_reconciler = TreeviewRowReconciler(self.appointment_list_treeview)
 
         self.current_exam_patient = None 
         self.current_exam_clinic_id = None 
@@ -52,8 +139,11 @@ class MedicalAppGUI(ctk.CTk):
         self._display_all_patients_in_search_tab() 
         self._refresh_clinic_queue_display() 
         self._refresh_full_examination_history_list() 
+        self._refresh_visit_statistics_display()
         self._refresh_doctor_list_display() 
         self._refresh_clinic_list_display()
+        self._refresh_appointment_list_display()
+        self.after(APPOINTMENT_ADMIT_POLL_MS, self._poll_due_appointments)
 
     # --- HÀM MỚI: LÀM ĐẸP TREEVIEW ---
     def _apply_treeview_style(self):
@@ -84,6 +174,77 @@ class MedicalAppGUI(ctk.CTk):
         )
     # ---------------------------------
 
+    def _setup_busy_status_bar(self):
+        # Thanh trạng thái cuối cửa sổ: báo đang xử lý tác vụ nền.
+        status_bar_frame = ctk.CTkFrame(self, height=28, fg_color="transparent")
+        status_bar_frame.pack(side="bottom", fill="x", padx=10, pady=(0, 5))
+        self.busy_status_label = ctk.CTkLabel(status_bar_frame, text="Sẵn sàng", anchor="w")
+        self.busy_status_label.pack(side="left")
+        self.busy_progress_bar = ctk.CTkProgressBar(status_bar_frame, mode="indeterminate", width=200)
+        self.busy_progress_bar.pack(side="right"); self.busy_progress_bar.set(0)
+
+    def _on_background_busy_state_changed(self, is_busy, task_key):
+        if is_busy:
+            self.busy_status_label.configure(text=f"Đang xử lý: {BACKGROUND_TASK_DESCRIPTIONS.get(task_key, task_key)}...")
+            self.busy_progress_bar.start()
+        else:
+            self.busy_status_label.configure(text="Sẵn sàng")
+            self.busy_progress_bar.stop(); self.busy_progress_bar.set(0)
+
+    def _run_logic_in_background(self, task_key, logic_func, *args, on_done=None, **kwargs):
+        # Gửi lệnh gọi logic sang luồng nền, on_done(kết quả) chạy lại trên luồng giao diện
+        # sau khi đã làm mới các phần bị ảnh hưởng (theo sự kiện thay đổi mà thao tác phát ra).
+        def on_task_success(logic_result):
+            self._apply_pending_change_events()
+            if on_done: on_done(logic_result)
+        def on_task_error(task_exception):
+            self._apply_pending_change_events()
+            self._on_background_task_error(task_exception)
+        if self.task_dispatcher.submit(task_key, logic_func, *args, on_success=on_task_success, on_error=on_task_error, **kwargs): return True
+        running_key = self.task_dispatcher.get_running_task_key()
+        self._show_gui_message(f"Hệ thống đang xử lý '{BACKGROUND_TASK_DESCRIPTIONS.get(running_key, running_key)}', vui lòng đợi.", "WARNING")
+        return False
+
+    def _on_background_task_error(self, task_exception):
+        self._show_gui_message(f"Lỗi khi xử lý: {task_exception}", "ERROR")
+
+    def _apply_pending_change_events(self):
+        # Gom các sự kiện đang chờ thành tập phần cần làm mới, mỗi phần chỉ làm mới 1 lần.
+        views_to_refresh = set()
+        selected_queue_clinic_id = self._get_selected_clinic_id_for_queue_tab()
+        while True:
+            try: change_event = self._pending_change_events.get_nowait()
+            except queue.Empty: break
+            event_type = change_event.event_type
+            if event_type == change_events.PATIENT_CREATED: views_to_refresh.add("patients")
+            elif event_type == change_events.PATIENT_UPDATED: views_to_refresh.update(("patients", "history", "queue")) # Lịch sử, HĐ hiển thị tên BN
+            elif event_type == change_events.PATIENT_DELETED: views_to_refresh.update(("patients", "history", "statistics")) # Lượt khám của BN bị bỏ khỏi thống kê
+            elif event_type == change_events.QUEUE_CHANGED:
+                if change_event.clinic_id == selected_queue_clinic_id: views_to_refresh.add("queue") # HĐ PK khác không hiển thị
+            elif event_type == change_events.VISIT_ADDED: views_to_refresh.update(("history", "statistics"))
+            elif event_type == change_events.DOCTOR_CHANGED: views_to_refresh.add("doctors")
+            elif event_type == change_events.APPOINTMENT_CHANGED: views_to_refresh.add("appointments")
+            elif event_type == change_events.CLINIC_CHANGED:
+                views_to_refresh.add("clinics")
+                if change_event.change_kind != change_events.CHANGE_KIND_ASSIGNMENT: views_to_refresh.add("clinic_combos") # Tên/DS PK đổi
+                else: views_to_refresh.add("queue") # DS BS của PK đang chọn có thể đã đổi
+        if "clinic_combos" in views_to_refresh: self._populate_clinic_comboboxes() # Đã làm mới cả HĐ PK đang chọn
+        elif "queue" in views_to_refresh: self._refresh_clinic_queue_display()
+        if "patients" in views_to_refresh: self._display_all_patients_in_search_tab()
+        if "doctors" in views_to_refresh: self._refresh_doctor_list_display()
+        if "clinics" in views_to_refresh: self._refresh_clinic_list_display()
+        if "appointments" in views_to_refresh: self._refresh_appointment_list_display()
+        if "statistics" in views_to_refresh: self._refresh_visit_statistics_display()
+        if "history" in views_to_refresh: self._refresh_full_examination_history_list() # Tác vụ nền, chạy sau cùng
+        return views_to_refresh
+
+    def _on_close_window(self):
+        # Chờ tác vụ nền (ví dụ đang lưu CSV) xong rồi mới đóng cửa sổ.
+        self.medical_system_logic.change_event_bus.unsubscribe(self._change_event_subscription)
+        self.task_dispatcher.shutdown(wait=True)
+        self.medical_system_logic.close() # Đóng nhật ký hàng đợi
+        self.destroy()
+
     def _show_gui_message(self, message_text, message_level): 
         if not message_text: return 
         if message_level == "INFO": messagebox.showinfo("Thông báo", message_text)
@@ -92,6 +253,7 @@ class MedicalAppGUI(ctk.CTk):
         else: messagebox.showinfo("Thông báo", message_text) 
 
     def _convert_custom_list_to_py_list(self, custom_list_obj): 
+        if isinstance(custom_list_obj, List): return custom_list_obj.to_py_list()
         py_list = []
         if custom_list_obj and len(custom_list_obj) > 0: 
              for i in range(len(custom_list_obj)):
@@ -108,21 +270,24 @@ class MedicalAppGUI(ctk.CTk):
         else:
             clinic_options_py = ["Chưa có phòng khám"]
         self.clinic_display_options_py = clinic_options_py 
+        # Ô đăng ký khám có thêm lựa chọn "PK ít chờ nhất của chuyên khoa X" (logic tự chọn PK)
+        registration_options_py = clinic_options_py + [f"{AUTO_CLINIC_OPTION_PREFIX}{specialty_key}" for specialty_key in self.medical_system_logic.list_clinic_specialties()]
 
-        combobox_attributes_to_update = ['clinic_combo_for_registration', 'clinic_selection_combo_queue_tab'] 
-        for attr_name in combobox_attributes_to_update: 
+        combobox_options_to_update = [('clinic_combo_for_registration', registration_options_py), ('clinic_selection_combo_queue_tab', self.clinic_display_options_py), ('appointment_clinic_combo', self.clinic_display_options_py)] 
+        for attr_name, combobox_options_py in combobox_options_to_update: 
             if hasattr(self, attr_name):
                 combobox_widget = getattr(self, attr_name) 
                 if isinstance(combobox_widget, ctk.CTkComboBox):
                     current_val = combobox_widget.get() 
-                    combobox_widget.configure(values=self.clinic_display_options_py) 
+                    combobox_widget.configure(values=combobox_options_py) 
                     if self.clinic_display_options_py[0] != "Chưa có phòng khám": 
-                        if current_val in self.clinic_display_options_py : combobox_widget.set(current_val) 
-                        else: combobox_widget.set(self.clinic_display_options_py[0])
+                        if current_val in combobox_options_py : combobox_widget.set(current_val) 
+                        else: combobox_widget.set(combobox_options_py[0])
                     else: combobox_widget.set(self.clinic_display_options_py[0])
 
         if hasattr(self, 'clinic_selection_combo_queue_tab') and isinstance(self.clinic_selection_combo_queue_tab, ctk.CTkComboBox): 
             self._refresh_clinic_queue_display()
+        if hasattr(self, 'appointment_doctor_combo'): self._refresh_doctor_options_for_appointment_tab()
 
     # --- TAB ĐĂNG KÝ & HỒ SƠ BN ---
     def _setup_registration_profile_tab(self):
@@ -221,16 +386,18 @@ class MedicalAppGUI(ctk.CTk):
             try: datetime.datetime.strptime(dob_str_val, DATE_FORMAT_CSV)
             except ValueError: self._show_gui_message(f"Định dạng Ngày sinh '{dob_str_val}' không hợp lệ (YYYY-MM-DD).", "ERROR"); return
         
-        patient_object_created, message_text, message_lvl = self.medical_system_logic.create_patient_record( 
+        def on_patient_created(logic_result):
+            patient_object_created, message_text, message_lvl = logic_result
+            self._show_gui_message(message_text, message_lvl)
+            if patient_object_created: 
+                self.patient_id_profile_entry.delete(0, "end"); self.patient_id_profile_entry.insert(0, patient_object_created.patient_id) 
+                self.patient_id_exam_reg_entry.delete(0,"end"); self.patient_id_exam_reg_entry.insert(0, patient_object_created.patient_id) 
+        self._run_logic_in_background("create_patient", self.medical_system_logic.create_patient_record, 
             full_name_val=form_data["full_name"], dob_str=form_data["date_of_birth"], gender_val=form_data["gender"],
             address_val=form_data["address"], phone_val=form_data["phone_number"], national_id_val=form_data["national_id"], 
-            health_insurance_id_val=form_data["health_insurance_id"], medical_history_val=form_data["medical_history_summary"], drug_allergies_val=form_data["drug_allergies"]
+            health_insurance_id_val=form_data["health_insurance_id"], medical_history_val=form_data["medical_history_summary"], drug_allergies_val=form_data["drug_allergies"],
+            on_done=on_patient_created
         )
-        self._show_gui_message(message_text, message_lvl)
-        if patient_object_created: 
-            self.patient_id_profile_entry.delete(0, "end"); self.patient_id_profile_entry.insert(0, patient_object_created.patient_id) 
-            self.patient_id_exam_reg_entry.delete(0,"end"); self.patient_id_exam_reg_entry.insert(0, patient_object_created.patient_id) 
-            self._refresh_all_application_lists()
 
     def _update_patient_record(self): 
         patient_id_val = self.patient_id_profile_entry.get().strip()
@@ -242,17 +409,20 @@ class MedicalAppGUI(ctk.CTk):
              try: datetime.datetime.strptime(dob_str_update, DATE_FORMAT_CSV)
              except ValueError: self._show_gui_message(f"Định dạng Ngày sinh '{dob_str_update}' không hợp lệ.", "ERROR"); return
         update_payload = { "full_name": update_data_raw_dict["full_name"], "date_of_birth": update_data_raw_dict["date_of_birth"], "gender": update_data_raw_dict["gender"], "address": update_data_raw_dict["address"], "phone_number": update_data_raw_dict["phone_number"], "national_id": update_data_raw_dict["national_id"], "health_insurance_id": update_data_raw_dict["health_insurance_id"], "medical_history_summary": update_data_raw_dict["medical_history_summary"], "drug_allergies": update_data_raw_dict["drug_allergies"]}
-        success_flag, message_text, message_lvl = self.medical_system_logic.update_patient_info(patient_id_val, **update_payload) 
-        self._show_gui_message(message_text, message_lvl)
-        if success_flag and message_lvl == "INFO": self._refresh_all_application_lists()
+        def on_patient_updated(logic_result):
+            success_flag, message_text, message_lvl = logic_result
+            self._show_gui_message(message_text, message_lvl)
+        self._run_logic_in_background("update_patient", self.medical_system_logic.update_patient_info, patient_id_val, on_done=on_patient_updated, **update_payload)
         
     def _delete_patient_record(self): 
         patient_id_val = self.patient_id_profile_entry.get().strip()
         if not patient_id_val: self._show_gui_message("Vui lòng tải Mã BN để xóa.", "ERROR"); return
         if messagebox.askyesno("Xác nhận xóa", f"Bạn chắc chắn muốn xóa hồ sơ BN: {patient_id_val}? \nLưu ý: Nếu BN đang trong hàng đợi, bạn cần xóa khỏi hàng đợi trước."):
-            success_flag, message_text, message_lvl = self.medical_system_logic.delete_patient_record(patient_id_val) 
-            self._show_gui_message(message_text, message_lvl)
-            if success_flag: self._clear_registration_form(clear_patient_id_field=True); self.patient_id_exam_reg_entry.delete(0, "end"); self._refresh_all_application_lists()
+            def on_patient_deleted(logic_result):
+                success_flag, message_text, message_lvl = logic_result
+                self._show_gui_message(message_text, message_lvl)
+                if success_flag: self._clear_registration_form(clear_patient_id_field=True); self.patient_id_exam_reg_entry.delete(0, "end")
+            self._run_logic_in_background("delete_patient", self.medical_system_logic.delete_patient_record, patient_id_val, on_done=on_patient_deleted)
 
     def _register_patient_for_exam(self): 
         patient_id_exam_input = self.patient_id_exam_reg_entry.get().strip() 
@@ -261,12 +431,18 @@ class MedicalAppGUI(ctk.CTk):
             self._show_gui_message("Vui lòng nhập Mã BN để đăng ký khám.", "ERROR"); return
         if not selected_clinic_full_str or selected_clinic_full_str in ["Chưa có phòng khám", "Đang tải..."]:
              self._show_gui_message("Vui lòng chọn Phòng khám.", "ERROR"); return
-        clinic_id_val = selected_clinic_full_str.split(" - ")[0] 
         priority_str_val = self.priority_dk_combo.get() 
         if not priority_str_val: self._show_gui_message("Vui lòng chọn mức độ ưu tiên.", "ERROR"); return
-        success_flag, message_text, message_lvl = self.medical_system_logic.register_for_examination(patient_id_exam_input, clinic_id_val, priority_str_val) 
-        self._show_gui_message(message_text, message_lvl)
-        if success_flag: self._refresh_clinic_queue_display(); self.patient_id_exam_reg_entry.delete(0,"end") 
+        def on_registered(logic_result):
+            success_flag, message_text, message_lvl = logic_result
+            self._show_gui_message(message_text, message_lvl)
+            if success_flag: self.patient_id_exam_reg_entry.delete(0,"end") 
+        if selected_clinic_full_str.startswith(AUTO_CLINIC_OPTION_PREFIX): # Để logic chọn PK ít chờ nhất của chuyên khoa
+            specialty_text = selected_clinic_full_str[len(AUTO_CLINIC_OPTION_PREFIX):]
+            self._run_logic_in_background("register_exam", self.medical_system_logic.register_to_best_clinic_for_specialty, patient_id_exam_input, specialty_text, priority_str_val, on_done=on_registered)
+            return
+        clinic_id_val = selected_clinic_full_str.split(" - ")[0] 
+        self._run_logic_in_background("register_exam", self.medical_system_logic.register_for_examination, patient_id_exam_input, clinic_id_val, priority_str_val, on_done=on_registered)
 
     # --- TAB HÀNG ĐỢI KHÁM ---
     def _setup_examination_queue_tab(self): 
@@ -277,6 +453,10 @@ class MedicalAppGUI(ctk.CTk):
         ctk.CTkLabel(clinic_selection_frame, text="Chọn Phòng khám để xem hàng đợi:").pack(side="left", padx=(0,5))
         self.clinic_selection_combo_queue_tab = ctk.CTkComboBox(clinic_selection_frame, values=["Đang tải..."], width=450, command=self._on_clinic_selection_changed_for_queue) 
         self.clinic_selection_combo_queue_tab.pack(side="left")
+        # Chọn BS: mỗi BS của PK có ô khám riêng, nhiều BS cùng PK gọi BN song song
+        ctk.CTkLabel(clinic_selection_frame, text="BS khám:").pack(side="left", padx=(15,5))
+        self.doctor_selection_combo_queue_tab = ctk.CTkComboBox(clinic_selection_frame, values=[NO_DOCTOR_OPTION], width=160, command=self._on_doctor_selection_changed_for_queue)
+        self.doctor_selection_combo_queue_tab.set(NO_DOCTOR_OPTION); self.doctor_selection_combo_queue_tab.pack(side="left")
 
         self.currently_examining_label = ctk.CTkLabel(queue_tab_frame, text="Đang khám: Chưa có BN / Chưa chọn PK", font=("Arial", 16, "bold"), text_color="green") 
         self.currently_examining_label.pack(pady=10)
@@ -303,12 +483,13 @@ class MedicalAppGUI(ctk.CTk):
 
         ctk.CTkLabel(queue_tab_frame, text="Danh sách bệnh nhân đang chờ khám:", font=("Arial", 12)).pack(pady=(10,0))
         queue_tree_frame = ctk.CTkFrame(queue_tab_frame); queue_tree_frame.pack(expand=True, fill="both", padx=10, pady=5)
-        queue_column_names = ("STT", "MaBN", "HoTen", "UuTien", "TGDangKy", "SoLanVang") 
+        queue_column_names = ("STT", "MaBN", "HoTen", "UuTien", "TGDangKy", "SoLanVang", "ChoDuKien") 
         self.examination_queue_treeview = ttk.Treeview(queue_tree_frame, columns=queue_column_names, show="headings", height=8) 
         for column_name_val in queue_column_names: self.examination_queue_treeview.heading(column_name_val, text=column_name_val) 
         self.examination_queue_treeview.column("STT", width=40, anchor="center"); self.examination_queue_treeview.column("MaBN", width=80, anchor="center")
         self.examination_queue_treeview.column("HoTen", width=220); self.examination_queue_treeview.column("UuTien", width=150, anchor="center")
         self.examination_queue_treeview.column("TGDangKy", width=100, anchor="center"); self.examination_queue_treeview.column("SoLanVang", width=50, anchor="center")
+        self.examination_queue_treeview.column("ChoDuKien", width=90, anchor="center")
         queue_scrollbar = ttk.Scrollbar(queue_tree_frame, orient="vertical", command=self.examination_queue_treeview.yview) 
         self.examination_queue_treeview.configure(yscrollcommand=queue_scrollbar.set); queue_scrollbar.pack(side="right", fill="y")
         self.examination_queue_treeview.pack(expand=True, fill="both")
@@ -323,8 +504,36 @@ class MedicalAppGUI(ctk.CTk):
         
     def _on_clinic_selection_changed_for_queue(self, selected_choice_val): 
         self._refresh_clinic_queue_display()
-        self.currently_examining_label.configure(text="Đang khám: Chưa có BN / Hãy gọi BN từ PK này")
         self.current_exam_patient = None; self.current_exam_clinic_id = None
+        self._refresh_currently_examining_label()
+
+    def _on_doctor_selection_changed_for_queue(self, selected_choice_val): self._refresh_currently_examining_label()
+
+    def _get_selected_doctor_id_for_queue_tab(self):
+        selected_doctor_str = self.doctor_selection_combo_queue_tab.get()
+        return selected_doctor_str if selected_doctor_str and selected_doctor_str != NO_DOCTOR_OPTION else None
+
+    def _refresh_doctor_options_for_queue_tab(self, selected_clinic_id):
+        # DS BS của PK đang chọn (bỏ chọn BS nếu BS không còn thuộc PK).
+        doctor_options_py = [NO_DOCTOR_OPTION]
+        if selected_clinic_id: doctor_options_py += sorted(self._convert_custom_list_to_py_list(self.medical_system_logic.get_doctor_ids_for_clinic(selected_clinic_id)))
+        current_doctor_option = self.doctor_selection_combo_queue_tab.get()
+        self.doctor_selection_combo_queue_tab.configure(values=doctor_options_py)
+        if current_doctor_option not in doctor_options_py: self.doctor_selection_combo_queue_tab.set(NO_DOCTOR_OPTION)
+
+    def _refresh_currently_examining_label(self):
+        # Nhãn "Đang khám": theo ô khám của BS đang chọn, hoặc BN gọi chung cho PK.
+        selected_clinic_id = self._get_selected_clinic_id_for_queue_tab(); selected_doctor_id = self._get_selected_doctor_id_for_queue_tab()
+        if selected_clinic_id and selected_doctor_id:
+            doctor_exam = self.medical_system_logic.get_doctor_exam_in_progress(selected_clinic_id, selected_doctor_id)
+            if doctor_exam:
+                exam_patient = doctor_exam.patient_in_queue
+                label_text = f"Đang khám (PK: {selected_clinic_id}, BS: {selected_doctor_id}): {exam_patient.patient_id} - {exam_patient.patient_profile.full_name} ({exam_patient.get_priority_display_name()})"
+            else: label_text = f"BS {selected_doctor_id} (PK: {selected_clinic_id}): Đang rảnh / Hãy gọi BN"
+        elif self.current_exam_patient:
+            label_text = f"Đang khám (PK: {self.current_exam_clinic_id}): {self.current_exam_patient.patient_id} - {self.current_exam_patient.patient_profile.full_name} ({self.current_exam_patient.get_priority_display_name()})"
+        else: label_text = "Đang khám: Chưa có BN / Hãy gọi BN từ PK này" if selected_clinic_id else "Đang khám: Chưa có BN / Chưa chọn PK"
+        self.currently_examining_label.configure(text=label_text)
 
     def _get_selected_clinic_id_for_queue_tab(self): 
         selected_clinic_full_str = self.clinic_selection_combo_queue_tab.get() 
@@ -332,84 +541,80 @@ class MedicalAppGUI(ctk.CTk):
         return selected_clinic_full_str.split(" - ")[0]
 
     def _refresh_clinic_queue_display(self):
-        for item_row in self.examination_queue_treeview.get_children():
-            self.examination_queue_treeview.delete(item_row)
         selected_clinic_id = self._get_selected_clinic_id_for_queue_tab()
+        self._refresh_doctor_options_for_queue_tab(selected_clinic_id)
+        if self._get_selected_doctor_id_for_queue_tab(): self._refresh_currently_examining_label() # BS khác cùng PK có thể vừa gọi/xong
         if not selected_clinic_id:
-            self.examination_queue_treeview.insert("", "end", values=("", "---", "Vui lòng chọn phòng khám", "---", "", ""))
+            self.examination_queue_reconciler.reconcile([("__placeholder__", ("", "---", "Vui lòng chọn phòng khám", "---", "", "", ""), ())])
             return
 
-        display_strings_custom_list = self.medical_system_logic.get_clinic_queue_display_list(selected_clinic_id)
-
-        if not display_strings_custom_list.is_empty():
-            first_item_str = display_strings_custom_list.get(0)
-            if first_item_str == "Hàng đợi rỗng.":
-                self.examination_queue_treeview.insert("", "end", values=("", selected_clinic_id, f"Hàng đợi của PK {selected_clinic_id} rỗng", "", "", ""))
-            else:
-                for i in range(len(display_strings_custom_list)):
-                    display_str_val = display_strings_custom_list.get(i)
-                    try:
-                        parts_list = display_str_val.split(',')
-                        if len(parts_list) < 5:
-                            self.examination_queue_treeview.insert("", "end", values=("Err", "Err", display_str_val, "Err", "Err", "Err"))
-                            continue
-
-                        stt_id_part = parts_list[0].split('ID:')
-                        stt_val = stt_id_part[0].split('.')[0].strip() if len(stt_id_part) > 0 else "N/A"
-                        patient_id_val = stt_id_part[1].strip() if len(stt_id_part) > 1 else "N/A"
-
-                        name_part = parts_list[1].split('Tên:')
-                        full_name_val = name_part[1].strip() if len(name_part) > 1 else "N/A"
-
-                        priority_part = parts_list[2].split('Ưu tiên:')
-                        priority_val = priority_part[1].strip() if len(priority_part) > 1 else "N/A"
-
-                        reg_time_part = parts_list[3].split('TGĐK:')
-                        reg_time_val = reg_time_part[1].strip() if len(reg_time_part) > 1 else "N/A"
-
-                        absent_count_part = parts_list[4].split('Vắng:')
-                        absent_count_val = absent_count_part[1].strip() if len(absent_count_part) > 1 else "N/A"
-
-                        # LOGIC CHỌN MÀU CHO DÒNG
-                        row_tag = "prio_5"
-                        prio_upper = priority_val.upper()
-                        if "HỒI SỨC" in prio_upper: row_tag = "prio_1"
-                        elif "CẤP CỨU" in prio_upper: row_tag = "prio_2"
-                        elif "KHẨN CẤP" in prio_upper: row_tag = "prio_3"
-                        elif "TIÊU CHUẨN" in prio_upper: row_tag = "prio_4"
-                        elif "KHÔNG KHẨN" in prio_upper: row_tag = "prio_5"
-
-                        self.examination_queue_treeview.insert("", "end", values=(stt_val, patient_id_val, full_name_val, priority_val, reg_time_val, absent_count_val), tags=(row_tag,))
-                    except Exception as e:
-                        print(f"Lỗi parse HĐ: '{display_str_val}'. Lỗi: {e}")
-                        self.examination_queue_treeview.insert("", "end", values=("Err", "Err", display_str_val, "Err", "Err", "Err"))
+        queue_wait_estimates = self.medical_system_logic.get_clinic_queue_wait_estimates(selected_clinic_id)
+        if queue_wait_estimates is None:
+            queue_rows = [("__placeholder__", ("", selected_clinic_id, "Không có dữ liệu hoặc hàng đợi rỗng", "", "", "", ""), ())]
+        elif queue_wait_estimates.is_empty():
+            queue_rows = [("__placeholder__", ("", selected_clinic_id, f"Hàng đợi của PK {selected_clinic_id} rỗng", "", "", "", ""), ())]
         else:
-            self.examination_queue_treeview.insert("", "end", values=("", selected_clinic_id, "Không có dữ liệu hoặc hàng đợi rỗng", "", "", ""))
+            queue_rows = []
+            for i in range(len(queue_wait_estimates)):
+                queued_patient, estimated_wait_seconds = queue_wait_estimates.get(i)
+                priority_display_str = f"{queued_patient.get_priority_display_name()}({queued_patient.priority})"
+                queue_rows.append((queued_patient.patient_id, (str(i + 1), queued_patient.patient_id, queued_patient.patient_profile.full_name, priority_display_str,
+                                   queued_patient.registration_time.strftime('%H:%M:%S'), str(queued_patient.absent_count), f"~{round(estimated_wait_seconds / 60)} phút"),
+                                   (QUEUE_PRIORITY_ROW_TAGS.get(queued_patient.priority, "prio_5"),)))
+        self.examination_queue_reconciler.reconcile(queue_rows)
 
     def _call_next_exam_patient(self): 
-        if self.current_exam_patient: self._show_gui_message(f"BN {self.current_exam_patient.patient.full_name} đang khám.", "WARNING"); return
+        selected_doctor_id = self._get_selected_doctor_id_for_queue_tab()
+        if selected_doctor_id: # Gọi vào ô khám của BS đang chọn (logic từ chối nếu BS đang khám BN khác)
+            selected_clinic_id = self._get_selected_clinic_id_for_queue_tab()
+            if not selected_clinic_id: self._show_gui_message("Chọn Phòng khám để gọi BN.", "ERROR"); return
+            def on_doctor_called_patient(logic_result):
+                exam_patient_obj, message_text, message_lvl = logic_result
+                self._show_gui_message(message_text, message_lvl); self._refresh_currently_examining_label()
+            self._run_logic_in_background("call_next", self.medical_system_logic.call_next_patient_for_doctor, selected_clinic_id, selected_doctor_id, on_done=on_doctor_called_patient)
+            return
+        if self.current_exam_patient: self._show_gui_message(f"BN {self.current_exam_patient.patient_profile.full_name} đang khám.", "WARNING"); return
         selected_clinic_id = self._get_selected_clinic_id_for_queue_tab() 
         if not selected_clinic_id: self._show_gui_message("Chọn Phòng khám để gọi BN.", "ERROR"); return
             
-        exam_patient_obj, message_text, message_lvl = self.medical_system_logic.call_next_patient_for_exam(selected_clinic_id) 
-        
-        if exam_patient_obj: 
-            self.current_exam_patient = exam_patient_obj; self.current_exam_clinic_id = selected_clinic_id
-            patient_profile_info = self.current_exam_patient.patient 
-            self.currently_examining_label.configure(text=f"Đang khám (PK: {selected_clinic_id}): {patient_profile_info.patient_id} - {patient_profile_info.full_name} ({self.current_exam_patient.get_priority_name()})")
-            self._show_gui_message(message_text, message_lvl)
-            self._refresh_clinic_queue_display()
-        else: 
-            self._show_gui_message(message_text, message_lvl)
-            self.currently_examining_label.configure(text=f"Đang khám (PK: {selected_clinic_id}): Hàng đợi rỗng"); self.current_exam_patient = None; self.current_exam_clinic_id = None
+        def on_next_patient_called(logic_result):
+            exam_patient_obj, message_text, message_lvl = logic_result
+            if exam_patient_obj: 
+                self.current_exam_patient = exam_patient_obj; self.current_exam_clinic_id = selected_clinic_id
+                patient_profile_info = self.current_exam_patient.patient_profile 
+                self.currently_examining_label.configure(text=f"Đang khám (PK: {selected_clinic_id}): {patient_profile_info.patient_id} - {patient_profile_info.full_name} ({self.current_exam_patient.get_priority_display_name()})")
+                self._show_gui_message(message_text, message_lvl)
+            else: 
+                self._show_gui_message(message_text, message_lvl)
+                self.currently_examining_label.configure(text=f"Đang khám (PK: {selected_clinic_id}): Hàng đợi rỗng"); self.current_exam_patient = None; self.current_exam_clinic_id = None
+        self._run_logic_in_background("call_next", self.medical_system_logic.call_next_patient_for_exam, selected_clinic_id, on_done=on_next_patient_called)
+
+    def _complete_doctor_examination(self, selected_clinic_id, selected_doctor_id):
+        # Hoàn thành khám cho BN trong ô khám của BS đang chọn (BS/PK khám lấy theo ô, không cần nhập).
+        doctor_exam = self.medical_system_logic.get_doctor_exam_in_progress(selected_clinic_id, selected_doctor_id)
+        if not doctor_exam: self._show_gui_message(f"BS {selected_doctor_id} chưa gọi BN nào.", "ERROR"); return
+        exam_patient_id = doctor_exam.patient_id; exam_patient_name = doctor_exam.patient_in_queue.patient_profile.full_name
+        exam_type_val = simpledialog.askstring("Loại khám", f"Nhập Loại khám cho BN {exam_patient_id} ({exam_patient_name}):", parent=self)
+        if exam_type_val is None: return
+        if not exam_type_val.strip(): self._show_gui_message("Loại khám không được để trống.", "WARNING"); return
+        exam_result_val = simpledialog.askstring("Kết quả khám", f"Kết quả khám cho BN {exam_patient_id} ({exam_patient_name}):", parent=self)
+        if exam_result_val is None: return
+        exam_notes_val = simpledialog.askstring("Ghi chú", f"Ghi chú cho BN {exam_patient_id}:", parent=self) or ""
+        def on_doctor_examination_completed(logic_result):
+            success_flag, message_text, message_lvl = logic_result
+            self._show_gui_message(message_text, message_lvl); self._refresh_currently_examining_label()
+        self._run_logic_in_background("complete_exam", self.medical_system_logic.complete_examination_for_doctor,
+            selected_clinic_id, selected_doctor_id, exam_type_val, exam_result_val, exam_notes_val, on_done=on_doctor_examination_completed)
 
     def _complete_current_examination(self): 
+        selected_doctor_id = self._get_selected_doctor_id_for_queue_tab(); selected_clinic_id = self._get_selected_clinic_id_for_queue_tab()
+        if selected_doctor_id and selected_clinic_id: self._complete_doctor_examination(selected_clinic_id, selected_doctor_id); return
         if not self.current_exam_patient: 
             self._show_gui_message("Chưa có BN được gọi khám.", "ERROR")
             return
         
-        current_patient_id = self.current_exam_patient.patient.patient_id
-        current_patient_name = self.current_exam_patient.patient.full_name 
+        current_patient_id = self.current_exam_patient.patient_profile.patient_id
+        current_patient_name = self.current_exam_patient.patient_profile.full_name 
         
         # HỎI THÊM LOẠI KHÁM
         exam_type_val = simpledialog.askstring("Loại khám", f"Nhập Loại khám cho BN {current_patient_id} ({current_patient_name}):", parent=self)
@@ -434,31 +639,42 @@ class MedicalAppGUI(ctk.CTk):
             exam_clinic_id_val_input = simpledialog.askstring("Thông tin khám", "Nhập Mã Phòng khám thực hiện (ví dụ PK001):", parent=self)
             exam_clinic_id_val = exam_clinic_id_val_input.strip().upper() if exam_clinic_id_val_input else ""
         
+        def on_examination_completed(logic_result):
+            success_flag, message_text, message_lvl = logic_result
+            self._show_gui_message(message_text, message_lvl)
+            if success_flag: 
+                self.currently_examining_label.configure(text="Đang khám: Chưa có BN / Chưa chọn PK")
+                self.current_exam_patient = None
+                self.current_exam_clinic_id = None
+
         # TRUYỀN THÊM exam_type_val
-        success_flag, message_text, message_lvl = self.medical_system_logic.complete_examination(
+        self._run_logic_in_background("complete_exam", self.medical_system_logic.complete_examination,
             current_patient_id, exam_type_val, exam_result_val, exam_notes_val, 
-            attending_doctor_id_val, exam_clinic_id_val
+            attending_doctor_id_val, exam_clinic_id_val, on_done=on_examination_completed
         ) 
-        self._show_gui_message(message_text, message_lvl)
-        
-        if success_flag: 
-            self.currently_examining_label.configure(text="Đang khám: Chưa có BN / Chưa chọn PK")
-            self.current_exam_patient = None
-            self.current_exam_clinic_id = None
-            self._refresh_clinic_queue_display()
-            self._refresh_full_examination_history_list()
             
     def _handle_current_patient_absent(self): 
+        selected_doctor_id = self._get_selected_doctor_id_for_queue_tab(); selected_clinic_id = self._get_selected_clinic_id_for_queue_tab()
+        if selected_doctor_id and selected_clinic_id:
+            doctor_exam = self.medical_system_logic.get_doctor_exam_in_progress(selected_clinic_id, selected_doctor_id)
+            if not doctor_exam: self._show_gui_message(f"BS {selected_doctor_id} chưa gọi BN nào.", "ERROR"); return
+            if messagebox.askyesno("Xác nhận vắng mặt", f"Xác nhận BN BS {selected_doctor_id} ĐANG GỌI: {doctor_exam.patient_in_queue.patient_profile.full_name} (ID: {doctor_exam.patient_id}) vắng mặt?"):
+                def on_doctor_absent_handled(logic_result):
+                    was_removed_flag, message_text, message_lvl = logic_result
+                    self._show_gui_message(message_text, message_lvl); self._refresh_currently_examining_label()
+                self._run_logic_in_background("absent_patient", self.medical_system_logic.handle_absent_for_doctor, selected_clinic_id, selected_doctor_id, on_done=on_doctor_absent_handled)
+            return
         if not self.current_exam_patient or not self.current_exam_clinic_id:
             self._show_gui_message("Chưa có BN đang được gọi hoặc không rõ PK.", "ERROR"); return
         
         absent_patient_object = self.current_exam_patient; original_clinic_id_val = self.current_exam_clinic_id 
         
-        if messagebox.askyesno("Xác nhận vắng mặt", f"Xác nhận BN ĐANG GỌI: {absent_patient_object.patient.full_name} (ID: {absent_patient_object.patient.patient_id}) từ PK {original_clinic_id_val} vắng mặt?"):
-            was_removed_flag, message_text, message_lvl = self.medical_system_logic.handle_absent_called_patient(absent_patient_object, original_clinic_id_val) 
-            self._show_gui_message(message_text, message_lvl)
-            self.currently_examining_label.configure(text="Đang khám: Chưa có BN / Chưa chọn PK"); self.current_exam_patient = None; self.current_exam_clinic_id = None 
-            self._refresh_clinic_queue_display() 
+        if messagebox.askyesno("Xác nhận vắng mặt", f"Xác nhận BN ĐANG GỌI: {absent_patient_object.patient_profile.full_name} (ID: {absent_patient_object.patient_id}) từ PK {original_clinic_id_val} vắng mặt?"):
+            def on_absent_handled(logic_result):
+                was_removed_flag, message_text, message_lvl = logic_result
+                self._show_gui_message(message_text, message_lvl)
+                self.currently_examining_label.configure(text="Đang khám: Chưa có BN / Chưa chọn PK"); self.current_exam_patient = None; self.current_exam_clinic_id = None 
+            self._run_logic_in_background("absent_patient", self.medical_system_logic.handle_absent_called_patient, absent_patient_object, original_clinic_id_val, on_done=on_absent_handled)
 
     def _handle_patient_leaving_selected_queue(self): 
         selected_clinic_id = self._get_selected_clinic_id_for_queue_tab() 
@@ -471,9 +687,10 @@ class MedicalAppGUI(ctk.CTk):
         
         patient_id_leaving_val = simpledialog.askstring("BN Rời Hàng Đợi", f"Nhập Mã BN rời đi từ HĐ của PK {selected_clinic_id}:", initialvalue=patient_id_to_remove_default, parent=self) 
         if patient_id_leaving_val and patient_id_leaving_val.strip():
-            success_flag, message_text, message_lvl = self.medical_system_logic.handle_patient_leaving_queue(patient_id_leaving_val.strip(), selected_clinic_id) 
-            self._show_gui_message(message_text, message_lvl); 
-            if success_flag: self._refresh_clinic_queue_display()
+            def on_patient_left(logic_result):
+                success_flag, message_text, message_lvl = logic_result
+                self._show_gui_message(message_text, message_lvl)
+            self._run_logic_in_background("leave_queue", self.medical_system_logic.handle_patient_leaving_queue, patient_id_leaving_val.strip(), selected_clinic_id, on_done=on_patient_left)
         elif patient_id_leaving_val is not None: self._show_gui_message("Mã BN không được để trống.", "WARNING")
 
     def _apply_priority_change_in_queue(self): 
@@ -486,11 +703,122 @@ class MedicalAppGUI(ctk.CTk):
         if not new_priority_level_str: self._show_gui_message("Chọn Mức ưu tiên mới.", "ERROR"); return
         
         if messagebox.askyesno("Xác nhận", f"Thay đổi ưu tiên của BN {patient_id_val} tại PK {selected_clinic_id} thành '{new_priority_level_str}'?"):
-            success_flag, message_text, message_lvl = self.medical_system_logic.change_patient_priority_in_queue(selected_clinic_id, patient_id_val, new_priority_level_str) 
+            def on_priority_changed(logic_result):
+                success_flag, message_text, message_lvl = logic_result
+                self._show_gui_message(message_text, message_lvl)
+                if success_flag: self.change_priority_patient_id_entry.delete(0, "end") 
+            self._run_logic_in_background("change_priority", self.medical_system_logic.change_patient_priority_in_queue, selected_clinic_id, patient_id_val, new_priority_level_str, on_done=on_priority_changed)
+
+    # --- TAB LỊCH HẸN KHÁM ---
+    def _setup_appointment_tab(self):
+        appointment_tab_frame = self.appointment_tab
+        ctk.CTkLabel(appointment_tab_frame, text="ĐẶT LỊCH HẸN KHÁM THEO KHUNG GIỜ", font=ctk.CTkFont(size=16, weight="bold")).pack(pady=10)
+        appointment_form_frame = ctk.CTkFrame(appointment_tab_frame); appointment_form_frame.pack(pady=5, padx=10, fill="x")
+        ctk.CTkLabel(appointment_form_frame, text="Mã BN:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
+        self.appointment_patient_id_entry = ctk.CTkEntry(appointment_form_frame, width=120); self.appointment_patient_id_entry.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+        ctk.CTkLabel(appointment_form_frame, text="Phòng khám:").grid(row=0, column=2, padx=5, pady=5, sticky="e")
+        self.appointment_clinic_combo = ctk.CTkComboBox(appointment_form_frame, values=["Đang tải..."], width=320, command=lambda selected_choice_val: self._refresh_doctor_options_for_appointment_tab())
+        self.appointment_clinic_combo.grid(row=0, column=3, padx=5, pady=5, sticky="w")
+        ctk.CTkLabel(appointment_form_frame, text="Bác sĩ:").grid(row=0, column=4, padx=5, pady=5, sticky="e")
+        self.appointment_doctor_combo = ctk.CTkComboBox(appointment_form_frame, values=[""], width=120); self.appointment_doctor_combo.grid(row=0, column=5, padx=5, pady=5, sticky="w")
+        ctk.CTkLabel(appointment_form_frame, text="Giờ hẹn:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
+        self.appointment_start_entry = ctk.CTkEntry(appointment_form_frame, placeholder_text="YYYY-MM-DD HH:MM", width=160); self.appointment_start_entry.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        ctk.CTkLabel(appointment_form_frame, text="Thời lượng (phút):").grid(row=1, column=2, padx=5, pady=5, sticky="e")
+        self.appointment_duration_entry = ctk.CTkEntry(appointment_form_frame, width=80); self.appointment_duration_entry.grid(row=1, column=3, padx=5, pady=5, sticky="w")
+        self.appointment_duration_entry.insert(0, str(DEFAULT_APPOINTMENT_MINUTES))
+        ctk.CTkLabel(appointment_form_frame, text="Ưu tiên:").grid(row=1, column=4, padx=5, pady=5, sticky="e")
+        self.appointment_priority_combo = ctk.CTkComboBox(appointment_form_frame, values=self._convert_custom_list_to_py_list(self.priority_level_names), width=160); self.appointment_priority_combo.grid(row=1, column=5, padx=5, pady=5, sticky="w")
+        if len(self.priority_level_names) > 1: self.appointment_priority_combo.set(self.priority_level_names.get(1))
+
+        appointment_buttons_frame = ctk.CTkFrame(appointment_tab_frame, fg_color="transparent"); appointment_buttons_frame.pack(pady=5)
+        ctk.CTkButton(appointment_buttons_frame, text="Đặt lịch hẹn", command=self._book_appointment, fg_color="#27ae60", hover_color="#2ecc71").pack(side="left", padx=5)
+        ctk.CTkButton(appointment_buttons_frame, text="Tìm giờ trống gần nhất", command=self._find_next_free_appointment_slot).pack(side="left", padx=5)
+        ctk.CTkButton(appointment_buttons_frame, text="Hủy lịch hẹn đã chọn", command=self._cancel_selected_appointment, fg_color="#c0392b", hover_color="#e74c3c").pack(side="left", padx=5)
+
+        appointment_filter_frame = ctk.CTkFrame(appointment_tab_frame, fg_color="transparent"); appointment_filter_frame.pack(pady=5, padx=10, fill="x")
+        ctk.CTkLabel(appointment_filter_frame, text="Xem lịch ngày:").pack(side="left", padx=(0, 5))
+        self.appointment_filter_date_entry = ctk.CTkEntry(appointment_filter_frame, placeholder_text="YYYY-MM-DD (trống: tất cả)", width=200); self.appointment_filter_date_entry.pack(side="left")
+        ctk.CTkButton(appointment_filter_frame, text="Xem", width=80, command=self._refresh_appointment_list_display).pack(side="left", padx=5)
+
+        appointment_tree_frame = ctk.CTkFrame(appointment_tab_frame); appointment_tree_frame.pack(expand=True, fill="both", padx=10, pady=5)
+        appointment_column_names = ("MaLH", "MaBN", "MaPK", "MaBS", "BatDau", "KetThuc", "UuTien", "TrangThai")
+        self.appointment_list_treeview = ttk.Treeview(appointment_tree_frame, columns=appointment_column_names, show="headings", height=14)
+        for column_name_val in appointment_column_names: self.appointment_list_treeview.heading(column_name_val, text=column_name_val); self.appointment_list_treeview.column(column_name_val, width=110, anchor="center")
+        self.appointment_list_treeview.column("BatDau", width=150); self.appointment_list_treeview.column("UuTien", width=130)
+        appointment_scrollbar = ttk.Scrollbar(appointment_tree_frame, orient="vertical", command=self.appointment_list_treeview.yview)
+        self.appointment_list_treeview.configure(yscrollcommand=appointment_scrollbar.set); appointment_scrollbar.pack(side="right", fill="y")
+        self.appointment_list_treeview.pack(expand=True, fill="both")
+
+    def _get_selected_clinic_id_for_appointment_tab(self):
+        selected_clinic_full_str = self.appointment_clinic_combo.get()
+        if not selected_clinic_full_str or selected_clinic_full_str in ["Chưa có phòng khám", "Đang tải..."]: return None
+        return selected_clinic_full_str.split(" - ")[0]
+
+    def _refresh_doctor_options_for_appointment_tab(self):
+        # Chỉ đặt lịch được với BS thuộc PK đang chọn.
+        selected_clinic_id = self._get_selected_clinic_id_for_appointment_tab()
+        doctor_options_py = sorted(self._convert_custom_list_to_py_list(self.medical_system_logic.get_doctor_ids_for_clinic(selected_clinic_id))) if selected_clinic_id else []
+        current_doctor_option = self.appointment_doctor_combo.get()
+        self.appointment_doctor_combo.configure(values=doctor_options_py or [""])
+        if current_doctor_option not in doctor_options_py: self.appointment_doctor_combo.set(doctor_options_py[0] if doctor_options_py else "")
+
+    def _read_appointment_form(self):
+        # (mã BN, mã PK, mã BS, giờ hẹn, thời lượng) từ form, hoặc None (đã báo lỗi) nếu thiếu PK/BS.
+        selected_clinic_id = self._get_selected_clinic_id_for_appointment_tab(); selected_doctor_id = self.appointment_doctor_combo.get().strip()
+        if not selected_clinic_id or not selected_doctor_id: self._show_gui_message("Chọn Phòng khám và Bác sĩ (BS phải được gán cho PK).", "ERROR"); return None
+        return (self.appointment_patient_id_entry.get().strip(), selected_clinic_id, selected_doctor_id,
+                self.appointment_start_entry.get().strip(), self.appointment_duration_entry.get().strip() or DEFAULT_APPOINTMENT_MINUTES)
+
+    def _book_appointment(self):
+        appointment_form_values = self._read_appointment_form()
+        if not appointment_form_values: return
+        patient_id_val, clinic_id_val, doctor_id_val, start_time_str, duration_minutes_val = appointment_form_values
+        if not patient_id_val: self._show_gui_message("Nhập Mã BN cần đặt lịch hẹn.", "ERROR"); return
+        if not start_time_str: self._show_gui_message("Nhập giờ hẹn (YYYY-MM-DD HH:MM) hoặc bấm 'Tìm giờ trống gần nhất'.", "ERROR"); return
+        def on_appointment_booked(logic_result):
+            appointment_obj, message_text, message_lvl = logic_result
             self._show_gui_message(message_text, message_lvl)
-            if success_flag: self._refresh_clinic_queue_display(); self.change_priority_patient_id_entry.delete(0, "end") 
-    
-    def _setup_doctor_management_tab(self): 
+            if appointment_obj: self.appointment_patient_id_entry.delete(0, "end"); self.appointment_start_entry.delete(0, "end")
+        self._run_logic_in_background("book_appointment", self.medical_system_logic.book_appointment, patient_id_val, clinic_id_val, doctor_id_val, start_time_str, duration_minutes_val,
+                                      self.appointment_priority_combo.get(), on_done=on_appointment_booked)
+
+    def _find_next_free_appointment_slot(self):
+        # Tra cây khoảng của BS (và của BN nếu đã nhập), O(log n) nên chạy thẳng trên luồng giao diện; điền giờ tìm được vào form.
+        appointment_form_values = self._read_appointment_form()
+        if not appointment_form_values: return
+        patient_id_val, _clinic_id_val, doctor_id_val, start_time_str, duration_minutes_val = appointment_form_values
+        free_start, message_text, message_lvl = self.medical_system_logic.find_next_free_appointment_slot(doctor_id_val, start_time_str or None, duration_minutes_val, patient_id_val or None)
+        if free_start is None: self._show_gui_message(message_text, message_lvl); return
+        self.appointment_start_entry.delete(0, "end"); self.appointment_start_entry.insert(0, free_start.strftime("%Y-%m-%d %H:%M"))
+
+    def _cancel_selected_appointment(self):
+        selected_row_ids = self.appointment_list_treeview.selection()
+        if not selected_row_ids: self._show_gui_message("Chọn lịch hẹn cần hủy trong bảng.", "ERROR"); return
+        appointment_id_val = selected_row_ids[0]
+        if messagebox.askyesno("Xác nhận", f"Hủy lịch hẹn {appointment_id_val}?"):
+            def on_appointment_cancelled(logic_result):
+                self._show_gui_message(logic_result[1], logic_result[2])
+            self._run_logic_in_background("cancel_appointment", self.medical_system_logic.cancel_appointment, appointment_id_val, on_done=on_appointment_cancelled)
+
+    def _refresh_appointment_list_display(self):
+        filter_date_str = self.appointment_filter_date_entry.get().strip()
+        from_time = to_time = None
+        if filter_date_str:
+            try: from_time = datetime.datetime.strptime(filter_date_str, DATE_FORMAT_CSV); to_time = from_time + datetime.timedelta(days=1)
+            except ValueError: self._show_gui_message(f"Ngày '{filter_date_str}' không đúng định dạng YYYY-MM-DD.", "ERROR"); return
+        appointment_rows = []
+        for appointment_obj in self.medical_system_logic.list_appointments(from_time, to_time):
+            appointment_rows.append((appointment_obj.appointment_id, (appointment_obj.appointment_id, appointment_obj.patient_id, appointment_obj.clinic_id, appointment_obj.doctor_id,
+                                     appointment_obj.start_time.strftime("%Y-%m-%d %H:%M"), appointment_obj.end_time.strftime("%H:%M"), appointment_obj.priority_level_str, appointment_obj.status), ()))
+        self.appointment_list_reconciler.reconcile(appointment_rows)
+
+    def _poll_due_appointments(self):
+        # Định kỳ đưa BN có lịch hẹn đã đến giờ vào hàng đợi (ngoài lúc gọi BN tiếp theo); bỏ qua lượt này nếu luồng nền đang bận.
+        if self.medical_system_logic.has_due_appointments() and not self.task_dispatcher.is_busy():
+            self._run_logic_in_background("admit_appointments", self.medical_system_logic.admit_due_appointments)
+        self.after(APPOINTMENT_ADMIT_POLL_MS, self._poll_due_appointments)
+
+    def _setup_doctor_management_tab(self):
         main_doctor_frame = ctk.CTkFrame(self.doctor_management_tab)
         main_doctor_frame.pack(expand=True, fill="both", padx=10, pady=10)
         ctk.CTkLabel(main_doctor_frame, text="QUẢN LÝ THÔNG TIN BÁC SĨ", font=ctk.CTkFont(size=16, weight="bold")).pack(pady=10)
@@ -539,14 +867,15 @@ class MedicalAppGUI(ctk.CTk):
         self.doctor_specialty_entry.delete(0, "end")
 
     def _refresh_doctor_list_display(self): 
-        for item_row in self.doctor_list_treeview.get_children(): self.doctor_list_treeview.delete(item_row)
         doctors_custom_list = self.medical_system_logic.list_all_doctors()
+        doctor_rows = []
         if doctors_custom_list:
             for i in range(len(doctors_custom_list)):
                 doctor_obj = doctors_custom_list.get(i)
                 clinic_ids_py_list = self._convert_custom_list_to_py_list(doctor_obj.clinic_id_list)
                 clinic_ids_display_str = ", ".join(clinic_ids_py_list) if clinic_ids_py_list else "Chưa có"
-                self.doctor_list_treeview.insert("", "end", values=(doctor_obj.doctor_id, doctor_obj.doctor_name, doctor_obj.specialty, clinic_ids_display_str))
+                doctor_rows.append((doctor_obj.doctor_id, (doctor_obj.doctor_id, doctor_obj.doctor_name, doctor_obj.specialty, clinic_ids_display_str), ()))
+        self.doctor_list_reconciler.reconcile(doctor_rows)
     
     def _on_doctor_selected_from_tree(self, event_data=None): 
         try:
@@ -571,9 +900,11 @@ class MedicalAppGUI(ctk.CTk):
     def _add_new_doctor(self): 
         doctor_full_name = self.doctor_name_entry.get().strip() 
         doctor_specialty_val = self.doctor_specialty_entry.get().strip() 
-        doctor_obj, message_text, message_lvl = self.medical_system_logic.create_doctor(doctor_full_name, doctor_specialty_val) 
-        self._show_gui_message(message_text, message_lvl)
-        if doctor_obj: self._refresh_doctor_list_display(); self._clear_doctor_form_fields(); self._refresh_all_application_lists()
+        def on_doctor_created(logic_result):
+            doctor_obj, message_text, message_lvl = logic_result
+            self._show_gui_message(message_text, message_lvl)
+            if doctor_obj: self._clear_doctor_form_fields()
+        self._run_logic_in_background("create_doctor", self.medical_system_logic.create_doctor, doctor_full_name, doctor_specialty_val, on_done=on_doctor_created)
 
     def _edit_doctor_info(self): 
         doctor_id_val = self.doctor_id_entry.get().strip() 
@@ -586,17 +917,20 @@ class MedicalAppGUI(ctk.CTk):
         if new_doctor_specialty: update_payload["new_specialty"] = new_doctor_specialty
         if not update_payload: self._show_gui_message("Không có thông tin mới để cập nhật cho bác sĩ.", "INFO"); return
 
-        success_flag, message_text, message_lvl = self.medical_system_logic.update_doctor_info(doctor_id_val, **update_payload) 
-        self._show_gui_message(message_text, message_lvl)
-        if success_flag and message_lvl == "INFO": self._refresh_doctor_list_display(); self._refresh_all_application_lists()
+        def on_doctor_updated(logic_result):
+            success_flag, message_text, message_lvl = logic_result
+            self._show_gui_message(message_text, message_lvl)
+        self._run_logic_in_background("update_doctor", self.medical_system_logic.update_doctor_info, doctor_id_val, on_done=on_doctor_updated, **update_payload)
 
     def _delete_selected_doctor(self): 
         doctor_id_val = self.doctor_id_entry.get().strip() 
         if not doctor_id_val: self._show_gui_message("Vui lòng nhập hoặc tải Mã Bác sĩ cần xóa.", "ERROR"); return
         if messagebox.askyesno("Xác nhận xóa", f"Bạn có chắc muốn xóa Bác sĩ {doctor_id_val}? \nThao tác này cũng sẽ xóa bác sĩ này khỏi danh sách các phòng khám liên quan."):
-            success_flag, message_text, message_lvl = self.medical_system_logic.delete_doctor(doctor_id_val) 
-            self._show_gui_message(message_text, message_lvl)
-            if success_flag: self._refresh_doctor_list_display(); self._refresh_clinic_list_display(); self._clear_doctor_form_fields(); self._refresh_all_application_lists()
+            def on_doctor_deleted(logic_result):
+                success_flag, message_text, message_lvl = logic_result
+                self._show_gui_message(message_text, message_lvl)
+                if success_flag: self._clear_doctor_form_fields()
+            self._run_logic_in_background("delete_doctor", self.medical_system_logic.delete_doctor, doctor_id_val, on_done=on_doctor_deleted)
 
     # --- TAB QUẢN LÝ PHÒNG KHÁM ---
     def _setup_clinic_management_tab(self): 
@@ -644,14 +978,15 @@ class MedicalAppGUI(ctk.CTk):
         self.clinic_id_entry.delete(0, "end"); self.clinic_name_entry.delete(0, "end"); self.clinic_specialty_entry.delete(0, "end")
 
     def _refresh_clinic_list_display(self): 
-        for item_row in self.clinic_list_treeview.get_children(): self.clinic_list_treeview.delete(item_row) 
         clinics_custom_list = self.medical_system_logic.list_all_clinics() 
+        clinic_rows = []
         if clinics_custom_list:
             for i in range(len(clinics_custom_list)):
                 clinic_obj = clinics_custom_list.get(i) 
                 doctor_ids_py_list = self._convert_custom_list_to_py_list(clinic_obj.doctor_id_list) 
                 doctor_ids_display_str = ", ".join(doctor_ids_py_list) if doctor_ids_py_list else "Chưa có" 
-                self.clinic_list_treeview.insert("", "end", values=(clinic_obj.clinic_id, clinic_obj.clinic_name, clinic_obj.clinic_specialty, doctor_ids_display_str))
+                clinic_rows.append((clinic_obj.clinic_id, (clinic_obj.clinic_id, clinic_obj.clinic_name, clinic_obj.clinic_specialty, doctor_ids_display_str), ()))
+        self.clinic_list_reconciler.reconcile(clinic_rows)
     
     def _on_clinic_selected_from_tree(self, event_data=None): 
         try:
@@ -676,9 +1011,11 @@ class MedicalAppGUI(ctk.CTk):
     def _add_new_clinic(self): 
         clinic_name_val = self.clinic_name_entry.get().strip() 
         clinic_specialty_val = self.clinic_specialty_entry.get().strip() 
-        clinic_obj, message_text, message_lvl = self.medical_system_logic.create_clinic(clinic_name_val, clinic_specialty_val) 
-        self._show_gui_message(message_text, message_lvl)
-        if clinic_obj: self._refresh_clinic_list_display(); self._clear_clinic_form_fields(); self._refresh_all_application_lists()
+        def on_clinic_created(logic_result):
+            clinic_obj, message_text, message_lvl = logic_result
+            self._show_gui_message(message_text, message_lvl)
+            if clinic_obj: self._clear_clinic_form_fields()
+        self._run_logic_in_background("create_clinic", self.medical_system_logic.create_clinic, clinic_name_val, clinic_specialty_val, on_done=on_clinic_created)
 
     def _edit_clinic_info(self): 
         clinic_id_val = self.clinic_id_entry.get().strip() 
@@ -691,17 +1028,20 @@ class MedicalAppGUI(ctk.CTk):
         if new_clinic_specialty: update_payload["new_specialty"] = new_clinic_specialty
         if not update_payload: self._show_gui_message("Không có thông tin mới để cập nhật cho phòng khám.", "INFO"); return
 
-        success_flag, message_text, message_lvl = self.medical_system_logic.update_clinic_info(clinic_id_val, **update_payload) 
-        self._show_gui_message(message_text, message_lvl)
-        if success_flag and message_lvl == "INFO": self._refresh_clinic_list_display(); self._refresh_all_application_lists()
+        def on_clinic_updated(logic_result):
+            success_flag, message_text, message_lvl = logic_result
+            self._show_gui_message(message_text, message_lvl)
+        self._run_logic_in_background("update_clinic", self.medical_system_logic.update_clinic_info, clinic_id_val, on_done=on_clinic_updated, **update_payload)
 
     def _delete_selected_clinic(self): 
         clinic_id_val = self.clinic_id_entry.get().strip() 
         if not clinic_id_val: self._show_gui_message("Vui lòng nhập hoặc tải Mã Phòng khám để xóa.", "ERROR"); return
         if messagebox.askyesno("Xác nhận", f"Bạn có chắc muốn xóa Phòng khám {clinic_id_val}? \nThao tác này cũng sẽ xóa phòng khám này khỏi danh sách làm việc của các bác sĩ liên quan và hàng đợi (nếu rỗng)."):
-            success_flag, message_text, message_lvl = self.medical_system_logic.delete_clinic(clinic_id_val) 
-            self._show_gui_message(message_text, message_lvl)
-            if success_flag: self._refresh_clinic_list_display(); self._refresh_doctor_list_display(); self._clear_clinic_form_fields(); self._refresh_all_application_lists()
+            def on_clinic_deleted(logic_result):
+                success_flag, message_text, message_lvl = logic_result
+                self._show_gui_message(message_text, message_lvl)
+                if success_flag: self._clear_clinic_form_fields()
+            self._run_logic_in_background("delete_clinic", self.medical_system_logic.delete_clinic, clinic_id_val, on_done=on_clinic_deleted)
             
     def _manage_doctors_for_clinic(self): 
         clinic_id_val = self.clinic_id_entry.get().strip() 
@@ -718,16 +1058,17 @@ class MedicalAppGUI(ctk.CTk):
             action_parts = action_input_str.strip().lower().split(); 
             command_str, doctor_id_val_action = (action_parts[0], action_parts[1].upper()) if len(action_parts) == 2 else (None, None) 
             
-            success_flag = False # Khởi tạo
             if command_str == "them" and doctor_id_val_action: 
-                success_flag, message_text, message_lvl = self.medical_system_logic.assign_doctor_to_clinic(doctor_id_val_action, clinic_id_val) 
+                assignment_logic_func = self.medical_system_logic.assign_doctor_to_clinic
             elif command_str == "xoa" and doctor_id_val_action: 
-                success_flag, message_text, message_lvl = self.medical_system_logic.remove_doctor_from_clinic(doctor_id_val_action, clinic_id_val) 
+                assignment_logic_func = self.medical_system_logic.remove_doctor_from_clinic
             else: 
                 self._show_gui_message("Lệnh không hợp lệ. Dùng 'them <Mã BS>' hoặc 'xoa <Mã BS>'.", "ERROR"); return
             
-            self._show_gui_message(message_text, message_lvl)
-            if success_flag and message_lvl == "INFO": self._refresh_clinic_list_display(); self._refresh_doctor_list_display()
+            def on_assignment_changed(logic_result):
+                success_flag, message_text, message_lvl = logic_result
+                self._show_gui_message(message_text, message_lvl)
+            self._run_logic_in_background("assign_doctor", assignment_logic_func, doctor_id_val_action, clinic_id_val, on_done=on_assignment_changed)
 
 
     # --- TAB TÌM KIẾM BỆNH NHÂN --- (Giữ nguyên từ phiên bản trước, chỉ đổi tên biến/hàm)
@@ -738,8 +1079,10 @@ class MedicalAppGUI(ctk.CTk):
         actual_search_form_frame = ctk.CTkFrame(search_form_outer_container); actual_search_form_frame.pack(pady=10, fill="x")
         ctk.CTkLabel(actual_search_form_frame, text="Mã BN:").grid(row=0, column=0, padx=(10,5), pady=5, sticky="w")
         self.search_patient_id_entry = ctk.CTkEntry(actual_search_form_frame, width=150); self.search_patient_id_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
-        ctk.CTkLabel(actual_search_form_frame, text="Họ tên (chứa):").grid(row=0, column=2, padx=(10,5), pady=5, sticky="w")
+        ctk.CTkLabel(actual_search_form_frame, text="Họ tên (chứa/gần đúng):").grid(row=0, column=2, padx=(10,5), pady=5, sticky="w")
         self.search_full_name_entry = ctk.CTkEntry(actual_search_form_frame, width=200); self.search_full_name_entry.grid(row=0, column=3, padx=5, pady=5, sticky="ew")
+        self._patient_name_suggestion_after_id = None
+        self.search_full_name_entry.bind("<KeyRelease>", self._schedule_patient_name_suggestions)
         ctk.CTkLabel(actual_search_form_frame, text="SĐT (chứa):").grid(row=1, column=0, padx=(10,5), pady=5, sticky="w")
         self.search_phone_entry = ctk.CTkEntry(actual_search_form_frame, width=150); self.search_phone_entry.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
         ctk.CTkLabel(actual_search_form_frame, text="Ngày sinh (YYYY-MM-DD):").grid(row=1, column=2, padx=(10,5), pady=5, sticky="w")
@@ -748,6 +1091,9 @@ class MedicalAppGUI(ctk.CTk):
         self.search_national_id_entry = ctk.CTkEntry(actual_search_form_frame, width=150); self.search_national_id_entry.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
         ctk.CTkLabel(actual_search_form_frame, text="BHYT (chứa):").grid(row=2, column=2, padx=(10,5), pady=5, sticky="w")
         self.search_health_insurance_entry = ctk.CTkEntry(actual_search_form_frame, width=200); self.search_health_insurance_entry.grid(row=2, column=3, padx=5, pady=5, sticky="ew")
+        ctk.CTkLabel(actual_search_form_frame, text="Gợi ý họ tên:").grid(row=3, column=0, padx=(10,5), pady=5, sticky="w")
+        self.patient_name_suggestion_label = ctk.CTkLabel(actual_search_form_frame, text="", anchor="w", justify="left")
+        self.patient_name_suggestion_label.grid(row=3, column=1, columnspan=3, padx=5, pady=5, sticky="ew")
         actual_search_form_frame.grid_columnconfigure(1, weight=1); actual_search_form_frame.grid_columnconfigure(3, weight=1)
         search_buttons_container = ctk.CTkFrame(search_form_outer_container); search_buttons_container.pack(pady=(10,5))
         ctk.CTkButton(search_buttons_container, text="Tìm kiếm BN", command=self._search_patients_action, height=35).pack(side="left", padx=10)
@@ -761,9 +1107,26 @@ class MedicalAppGUI(ctk.CTk):
         self.search_patient_id_entry.delete(0, "end"); self.search_full_name_entry.delete(0, "end")
         self.search_phone_entry.delete(0, "end"); self.search_dob_entry.delete(0, "end")
         self.search_national_id_entry.delete(0, "end"); self.search_health_insurance_entry.delete(0, "end")
+        self.patient_name_suggestion_label.configure(text="")
         self.patient_search_results_textbox.configure(state="normal"); self.patient_search_results_textbox.delete("1.0", "end")
         self.patient_search_results_textbox.insert("end", "Nhập tiêu chí và tìm kiếm, hoặc hiển thị tất cả bệnh nhân."); self.patient_search_results_textbox.configure(state="disabled")
 
+    def _schedule_patient_name_suggestions(self, event=None):
+        # Gõ liên tục thì chỉ tìm một lần sau khi ngừng gõ PATIENT_NAME_SUGGESTION_DELAY_MS.
+        if self._patient_name_suggestion_after_id: self.after_cancel(self._patient_name_suggestion_after_id)
+        self._patient_name_suggestion_after_id = self.after(PATIENT_NAME_SUGGESTION_DELAY_MS, self._refresh_patient_name_suggestions)
+
+    def _refresh_patient_name_suggestions(self):
+        # Tìm trên luồng giao diện (không qua luồng nền): chỉ giữ khóa đọc bảng BN vài ms, và luồng nền chỉ nhận
+        # một việc mỗi lúc nên gửi theo từng phím gõ sẽ bị từ chối khi đang lưu/khám.
+        self._patient_name_suggestion_after_id = None
+        name_query = self.search_full_name_entry.get().strip()
+        if not name_query: self.patient_name_suggestion_label.configure(text=""); return
+        similar_patients = self.medical_system_logic.fuzzy_search_patients_by_name(name_query, limit=PATIENT_NAME_SUGGESTION_LIMIT)
+        if similar_patients.is_empty(): self.patient_name_suggestion_label.configure(text="Không có họ tên gần đúng."); return
+        suggestion_texts = [f"{patient_obj.full_name} ({patient_obj.patient_id}{', sai ' + str(name_distance) if name_distance else ''})" for patient_obj, name_distance in similar_patients]
+        self.patient_name_suggestion_label.configure(text="; ".join(suggestion_texts))
+
     def _search_patients_action(self): 
         patient_id_query = self.search_patient_id_entry.get().strip(); full_name_query = self.search_full_name_entry.get().strip() 
         phone_query = self.search_phone_entry.get().strip(); dob_query = self.search_dob_entry.get().strip() 
@@ -775,8 +1138,10 @@ class MedicalAppGUI(ctk.CTk):
             else: result_title = f"Không tìm thấy BN với mã {patient_id_query}."
         elif full_name_query or phone_query or dob_query or national_id_query or health_insurance_query : 
             search_criteria_dict = {"full_name": full_name_query, "phone_number": phone_query, "date_of_birth": dob_query, "national_id": national_id_query, "health_insurance_id": health_insurance_query} 
-            search_results_custom_list = self.medical_system_logic.advanced_patient_search(**search_criteria_dict) 
-            if search_results_custom_list.is_empty(): result_title = "Không tìm thấy BN nào khớp tiêu chí."
+            def on_search_finished(search_results_custom_list):
+                self._display_patient_search_results(search_results_custom_list, search_title="Không tìm thấy BN nào khớp tiêu chí." if search_results_custom_list.is_empty() else f"Kết quả tìm kiếm ({len(search_results_custom_list)}):")
+            self._run_logic_in_background("search_patients", self.medical_system_logic.advanced_patient_search, on_done=on_search_finished, **search_criteria_dict)
+            return
         else: self._show_gui_message("Nhập ít nhất một tiêu chí tìm kiếm.", "INFO"); self._display_patient_search_results(List(), search_title="Vui lòng nhập tiêu chí."); return
         self._display_patient_search_results(search_results_custom_list, search_title=result_title if search_results_custom_list.is_empty() and patient_id_query else f"Kết quả tìm kiếm ({len(search_results_custom_list)}):")
 
@@ -844,19 +1209,23 @@ class MedicalAppGUI(ctk.CTk):
         self._refresh_full_examination_history_list(show_count_message=True)
 
     def _refresh_full_examination_history_list(self, show_count_message=False): # Thêm tham số show_count_message
-        for item_row in self.full_examination_history_treeview.get_children(): self.full_examination_history_treeview.delete(item_row)
         from_date_str_val = self.from_date_filter_entry.get().strip()
         to_date_str_val = self.to_date_filter_entry.get().strip()
         doctor_id_val = self.doctor_id_filter_entry.get().strip().upper()
         clinic_id_val = self.clinic_filter_entry.get().strip().upper()
     
-        history_custom_list, message_text, message_lvl = self.medical_system_logic.filter_examination_history(
+        # Lọc trên luồng nền, hiển thị khi có kết quả
+        self._run_logic_in_background("filter_history", self.medical_system_logic.filter_examination_history,
             from_date_str=from_date_str_val if from_date_str_val else None,
             to_date_str=to_date_str_val if to_date_str_val else None,
             doctor_id_filter=doctor_id_val if doctor_id_val else None,
-            clinic_id_filter=clinic_id_val if clinic_id_val else None
+            clinic_id_filter=clinic_id_val if clinic_id_val else None,
+            on_done=lambda logic_result: self._display_examination_history_results(logic_result, show_count_message)
         )
-    
+
+    def _display_examination_history_results(self, logic_result, show_count_message=False):
+        history_custom_list, message_text, message_lvl = logic_result
+        for item_row in self.full_examination_history_treeview.get_children(): self.full_examination_history_treeview.delete(item_row)
         if message_lvl == "ERROR":
             self._show_gui_message(message_text, message_lvl)
             self.full_examination_history_treeview.insert("", "end", values=("", "", message_text, "", "", "", "", "", "")) # Cập nhật số lượng cột trống
@@ -886,15 +1255,57 @@ class MedicalAppGUI(ctk.CTk):
                 ))
             if show_count_message and message_text and message_lvl == "INFO" and len(history_custom_list) > 0 : # Chỉ hiển thị nếu được yêu cầu
                 self._show_gui_message(message_text, message_lvl)
-            
-    def _refresh_all_application_lists(self): 
-        self._display_all_patients_in_search_tab() 
-        self._refresh_full_examination_history_list() 
-        self._refresh_doctor_list_display() 
-        self._refresh_clinic_list_display()
-        self._populate_clinic_comboboxes() 
+
+    # --- TAB THỐNG KÊ LƯỢT KHÁM ---
+    def _setup_visit_statistics_tab(self):
+        statistics_tab_frame = self.visit_statistics_tab
+        ctk.CTkLabel(statistics_tab_frame, text="THỐNG KÊ LƯỢT KHÁM", font=ctk.CTkFont(size=16, weight="bold")).pack(pady=10)
+        statistics_filter_frame = ctk.CTkFrame(statistics_tab_frame); statistics_filter_frame.pack(pady=5, padx=10, fill="x")
+        ctk.CTkLabel(statistics_filter_frame, text="Từ ngày:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.statistics_from_date_entry = ctk.CTkEntry(statistics_filter_frame, placeholder_text="YYYY-MM-DD", width=150); self.statistics_from_date_entry.grid(row=0, column=1, padx=5, pady=5)
+        ctk.CTkLabel(statistics_filter_frame, text="Đến ngày:").grid(row=0, column=2, padx=5, pady=5, sticky="w")
+        self.statistics_to_date_entry = ctk.CTkEntry(statistics_filter_frame, placeholder_text="YYYY-MM-DD", width=150); self.statistics_to_date_entry.grid(row=0, column=3, padx=5, pady=5)
+        ctk.CTkButton(statistics_filter_frame, text="Xem thống kê", command=lambda: self._refresh_visit_statistics_display(show_message=True)).grid(row=0, column=4, padx=10, pady=5)
+        ctk.CTkButton(statistics_filter_frame, text="Hôm nay", command=self._show_today_visit_statistics).grid(row=0, column=5, padx=5, pady=5)
+        self.statistics_total_label = ctk.CTkLabel(statistics_tab_frame, text="Tổng lượt khám: 0", font=("Arial", 13, "bold")); self.statistics_total_label.pack(pady=5)
+
+        statistics_tables_frame = ctk.CTkFrame(statistics_tab_frame, fg_color="transparent"); statistics_tables_frame.pack(expand=True, fill="both", padx=10, pady=5)
+        self.statistics_reconcilers = {}
+        table_definitions = (("by_clinic", "Mã PK"), ("by_doctor", "Mã BS"), ("by_exam_type", "Loại khám"), ("daily_totals", "Ngày"))
+        for column_index, (summary_key, key_column_title) in enumerate(table_definitions):
+            table_frame = ctk.CTkFrame(statistics_tables_frame); table_frame.grid(row=0, column=column_index, padx=5, pady=5, sticky="nsew")
+            statistics_tables_frame.grid_columnconfigure(column_index, weight=1); statistics_tables_frame.grid_rowconfigure(0, weight=1)
+            statistics_treeview = ttk.Treeview(table_frame, columns=("Khoa", "SoLuot"), show="headings", height=18)
+            statistics_treeview.heading("Khoa", text=key_column_title); statistics_treeview.heading("SoLuot", text="Số lượt")
+            statistics_treeview.column("Khoa", width=140, anchor="w"); statistics_treeview.column("SoLuot", width=80, anchor="center")
+            statistics_scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=statistics_treeview.yview)
+            statistics_treeview.configure(yscrollcommand=statistics_scrollbar.set); statistics_scrollbar.pack(side="right", fill="y"); statistics_treeview.pack(expand=True, fill="both")
+            self.statistics_reconcilers[summary_key] = TreeviewRowReconciler(statistics_treeview)
+
+    def _show_today_visit_statistics(self):
+        today_str = self.medical_system_logic.clock().strftime(DATE_FORMAT_CSV)
+        for date_entry in (self.statistics_from_date_entry, self.statistics_to_date_entry): date_entry.delete(0, "end"); date_entry.insert(0, today_str)
+        self._refresh_visit_statistics_display(show_message=True)
+
+    def _refresh_visit_statistics_display(self, show_message=False):
+        # Đọc từ bộ đếm (vài ms) nên chạy thẳng trên luồng giao diện, không chiếm luồng nền.
+        from_date_str_val = self.statistics_from_date_entry.get().strip(); to_date_str_val = self.statistics_to_date_entry.get().strip()
+        summary_dict, message_text, message_lvl = self.medical_system_logic.get_visit_statistics_summary(from_date_str_val or None, to_date_str_val or None)
+        if summary_dict is None: self._show_gui_message(message_text, message_lvl); return
+        self.statistics_total_label.configure(text=f"Tổng lượt khám: {summary_dict['total_visits']}")
+        for summary_key, statistics_reconciler in self.statistics_reconcilers.items():
+            statistics_rows = []
+            for row_key, visit_count in summary_dict[summary_key]:
+                key_display_str = row_key.strftime(DATE_FORMAT_CSV) if isinstance(row_key, datetime.date) else (row_key or "(Không rõ)")
+                statistics_rows.append((key_display_str, (key_display_str, str(visit_count)), ()))
+            if summary_key == "daily_totals": statistics_rows.reverse() # Ngày mới nhất lên đầu
+            statistics_reconciler.reconcile(statistics_rows)
+        if show_message: self._show_gui_message(message_text, message_lvl)
 
 if __name__ == "__main__":
+    metrics_registry = metrics.enable_from_environment() # Chỉ bật khi đặt MEDICAL_METRICS_FILE
     medical_system_instance = MedicalSystemLogic() 
     app_gui_instance = MedicalAppGUI(medical_system_instance) 
+    if metrics_registry: # Ctrl+Shift+M: ghi số liệu ngay
+        app_gui_instance.bind("<Control-Shift-M>", lambda event: metrics_registry.dump_to_file())
     app_gui_instance.mainloop()
\ No newline at end of file
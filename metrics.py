@@ -0,0 +1,212 @@
+# metrics.py
+# Đo độ trễ từng thao tác của MedicalSystemLogic (tùy chọn bật) và xuất số liệu
+# dạng Prometheus text hoặc JSON. Khi không bật, các phương thức gốc không bị bọc
+# nên không tốn thêm chi phí nào.
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+import weakref
+
+# Biến môi trường bật đo đạc: đường dẫn file xuất (đuôi .json -> JSON, còn lại -> Prometheus)
+METRICS_FILE_ENV_VAR = "MEDICAL_METRICS_FILE"
+
+# Các ngưỡng bucket (giây) của histogram độ trễ
+DEFAULT_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Các phương thức riêng tư vẫn được đo (đường đọc/ghi CSV)
+INSTRUMENTED_PRIVATE_METHODS = ("_load_data_from_csv", "_save_data_to_csv")
+
+
+class LatencyHistogram:
+    """Histogram độ trễ với các bucket cố định."""
+    def __init__(self, bucket_bounds=DEFAULT_LATENCY_BUCKETS):
+        self.bucket_bounds = tuple(bucket_bounds)
+        self.bucket_counts = [0] * (len(self.bucket_bounds) + 1) # bucket cuối là +Inf
+        self.total_count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, seconds):
+        # Ghi nhận một lần đo.
+        self.bucket_counts[bisect.bisect_left(self.bucket_bounds, seconds)] += 1
+        self.total_count += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds: self.max_seconds = seconds
+
+    def cumulative_counts(self):
+        # Số đếm tích lũy theo từng ngưỡng (định dạng Prometheus).
+        running_total = 0; cumulative = []
+        for count in self.bucket_counts: running_total += count; cumulative.append(running_total)
+        return cumulative
+
+    def quantile(self, q):
+        # Ước lượng phân vị q (0..1) theo cận trên của bucket chứa nó.
+        if self.total_count == 0: return None
+        target_rank = q * self.total_count
+        for bound_index, cumulative in enumerate(self.cumulative_counts()):
+            if cumulative >= target_rank: return self.bucket_bounds[bound_index] if bound_index < len(self.bucket_bounds) else self.max_seconds
+        return self.max_seconds
+
+
+class MetricsRegistry:
+    """Lưu số lần gọi, histogram độ trễ, số lỗi và gauge độ dài hàng đợi từng PK."""
+    def __init__(self, bucket_bounds=DEFAULT_LATENCY_BUCKETS):
+        self.bucket_bounds = tuple(bucket_bounds)
+        self.operation_histograms = {} # tên thao tác -> LatencyHistogram
+        self.operation_error_counts = {} # tên thao tác -> số lần ném ngoại lệ
+        self._lock = threading.Lock()
+        self._logic_ref = None # weakref tới MedicalSystemLogic để đọc độ dài hàng đợi
+        self.default_output_path = None # File xuất mặc định (đặt bởi enable_from_environment)
+
+    def attach_logic(self, logic_instance):
+        # Gắn instance logic để xuất gauge độ dài hàng đợi.
+        self._logic_ref = weakref.ref(logic_instance)
+
+    def observe(self, operation_name, seconds, raised_error=False):
+        with self._lock:
+            histogram = self.operation_histograms.get(operation_name)
+            if histogram is None: histogram = self.operation_histograms[operation_name] = LatencyHistogram(self.bucket_bounds)
+            histogram.observe(seconds)
+            if raised_error: self.operation_error_counts[operation_name] = self.operation_error_counts.get(operation_name, 0) + 1
+
+    def reset(self):
+        with self._lock: self.operation_histograms = {}; self.operation_error_counts = {}
+
+    def collect_queue_depths(self):
+        # Đọc độ dài hàng đợi hiện tại của từng PK (tính khi xuất, không tốn chi phí lúc chạy).
+        logic_instance = self._logic_ref() if self._logic_ref else None
+        if logic_instance is None: return {}
+        depths = {}
+        queue_pairs = logic_instance.clinic_examination_queues.get_all_key_value_pairs_as_list()
+        for i in range(len(queue_pairs)):
+            clinic_id, clinic_queue = queue_pairs.get(i)
+            depths[clinic_id] = clinic_queue.current_size if clinic_queue else 0
+        return depths
+
+    def _snapshot(self):
+        with self._lock:
+            return ({name: (h.cumulative_counts(), h.total_count, h.total_seconds, h.max_seconds, h.quantile(0.5), h.quantile(0.99)) for name, h in self.operation_histograms.items()},
+                    dict(self.operation_error_counts))
+
+    def to_json_dict(self):
+        # Xuất toàn bộ số liệu dạng dict (ghi JSON).
+        histograms, error_counts = self._snapshot()
+        operations = {}
+        for name in sorted(histograms):
+            cumulative, count, total_seconds, max_seconds, p50, p99 = histograms[name]
+            operations[name] = {"calls": count, "errors": error_counts.get(name, 0), "total_s": total_seconds, "mean_s": total_seconds / count if count else None,
+                                "max_s": max_seconds, "p50_s_upper_bound": p50, "p99_s_upper_bound": p99,
+                                "buckets": {("+Inf" if i == len(self.bucket_bounds) else repr(self.bucket_bounds[i])): c for i, c in enumerate(cumulative)}}
+        return {"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "operations": operations, "queue_depth": self.collect_queue_depths()}
+
+    def to_prometheus_text(self):
+        # Xuất theo định dạng text exposition của Prometheus.
+        histograms, error_counts = self._snapshot()
+        lines = ["# HELP medical_operation_duration_seconds Do tre cac thao tac cua MedicalSystemLogic.", "# TYPE medical_operation_duration_seconds histogram"]
+        for name in sorted(histograms):
+            cumulative, count, total_seconds, _max, _p50, _p99 = histograms[name]
+            label = _escape_label_value(name)
+            for i, bucket_count in enumerate(cumulative):
+                le_str = "+Inf" if i == len(self.bucket_bounds) else repr(self.bucket_bounds[i])
+                lines.append(f'medical_operation_duration_seconds_bucket{{operation="{label}",le="{le_str}"}} {bucket_count}')
+            lines.append(f'medical_operation_duration_seconds_sum{{operation="{label}"}} {total_seconds!r}')
+            lines.append(f'medical_operation_duration_seconds_count{{operation="{label}"}} {count}')
+        lines += ["# HELP medical_operation_errors_total So lan thao tac nem ngoai le.", "# TYPE medical_operation_errors_total counter"]
+        for name in sorted(histograms): lines.append(f'medical_operation_errors_total{{operation="{_escape_label_value(name)}"}} {error_counts.get(name, 0)}')
+        lines += ["# HELP medical_clinic_queue_depth So BN dang cho trong hang doi cua phong kham.", "# TYPE medical_clinic_queue_depth gauge"]
+        for clinic_id, depth in sorted(self.collect_queue_depths().items()): lines.append(f'medical_clinic_queue_depth{{clinic_id="{_escape_label_value(clinic_id)}"}} {depth}')
+        return "\n".join(lines) + "\n"
+
+    def dump_to_file(self, output_path=None, output_format=None):
+        # Ghi số liệu ra file (ghi file tạm rồi đổi tên để tránh file dở dang).
+        output_path = output_path if output_path else self.default_output_path
+        if not output_path: raise ValueError("Chưa chỉ định file xuất số liệu.")
+        if output_format is None: output_format = "json" if output_path.lower().endswith(".json") else "prometheus"
+        content = json.dumps(self.to_json_dict(), ensure_ascii=False, indent=2) + "\n" if output_format == "json" else self.to_prometheus_text()
+        temp_path = output_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f: f.write(content)
+        os.replace(temp_path, output_path)
+        return output_path
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# --- Bọc phương thức của MedicalSystemLogic ---
+_original_methods = {} # tên phương thức -> hàm gốc (để gỡ bỏ)
+_active_registry = None
+
+
+def _operation_name(method_name, args):
+    # Đường đọc/ghi CSV được tách theo tên file.
+    if method_name in INSTRUMENTED_PRIVATE_METHODS and args:
+        return f"{method_name.lstrip('_')}:{os.path.basename(str(args[0]))}"
+    return method_name
+
+
+def _wrap_method(method_name, original_func, registry):
+    @functools.wraps(original_func)
+    def instrumented(self, *args, **kwargs):
+        start = time.perf_counter()
+        try: result = original_func(self, *args, **kwargs)
+        except BaseException:
+            registry.observe(_operation_name(method_name, args), time.perf_counter() - start, raised_error=True); raise
+        registry.observe(_operation_name(method_name, args), time.perf_counter() - start)
+        return result
+    return instrumented
+
+
+def _wrap_init(original_init, registry):
+    @functools.wraps(original_init)
+    def instrumented_init(self, *args, **kwargs):
+        registry.attach_logic(self)
+        start = time.perf_counter()
+        original_init(self, *args, **kwargs)
+        registry.observe("startup", time.perf_counter() - start)
+    return instrumented_init
+
+
+def install_instrumentation(registry=None, logic_class=None):
+    # Bọc các phương thức công khai (+ đọc/ghi CSV) của lớp logic. Gọi trước khi tạo instance để đo cả lúc tải.
+    global _active_registry
+    if logic_class is None:
+        from app_logic import MedicalSystemLogic as logic_class
+    if _original_methods: uninstall_instrumentation(logic_class)
+    registry = registry if registry else MetricsRegistry()
+    for attr_name, attr_value in list(vars(logic_class).items()):
+        if not callable(attr_value) or isinstance(attr_value, (staticmethod, classmethod, type)): continue
+        if attr_name == "__init__":
+            _original_methods[attr_name] = attr_value; setattr(logic_class, attr_name, _wrap_init(attr_value, registry))
+        elif not attr_name.startswith("_") or attr_name in INSTRUMENTED_PRIVATE_METHODS:
+            _original_methods[attr_name] = attr_value; setattr(logic_class, attr_name, _wrap_method(attr_name, attr_value, registry))
+    _active_registry = registry
+    return registry
+
+
+def uninstall_instrumentation(logic_class=None):
+    # Khôi phục các phương thức gốc.
+    global _active_registry
+    if logic_class is None:
+        from app_logic import MedicalSystemLogic as logic_class
+    for attr_name, original_func in _original_methods.items(): setattr(logic_class, attr_name, original_func)
+    _original_methods.clear()
+    _active_registry = None
+
+
+def get_active_registry(): return _active_registry
+
+
+def enable_from_environment():
+    # Bật đo đạc nếu có biến môi trường MEDICAL_METRICS_FILE; tự ghi file khi thoát chương trình.
+    output_path = os.environ.get(METRICS_FILE_ENV_VAR, "").strip()
+    if not output_path: return None
+    registry = install_instrumentation()
+    registry.default_output_path = output_path
+    atexit.register(registry.dump_to_file)
+    print(f"Đã bật đo hiệu năng, số liệu sẽ ghi vào: {output_path}")
+    return registry
@@ -1,6 +1,8 @@
 # models.py
 import datetime
-from custom_structures import LinkedList, List # Sử dụng List và LinkedList tùy chỉnh
+import itertools
+import math
+from custom_structures import ChunkedList, List # Sử dụng List và ChunkedList tùy chỉnh
 
 # Định dạng ngày tháng và hằng số phân tách
 DATE_FORMAT_CSV = "%Y-%m-%d"
@@ -81,6 +83,55 @@ class Clinic:
     def __str__(self):
         return f"PK: {self.clinic_id} - {self.clinic_name} ({self.clinic_specialty})"
 
+class Appointment:
+    """Lớp đại diện Lịch hẹn khám: BN hẹn khám với một BS tại một PK trong khung giờ [start_time, end_time)."""
+    STATUS_BOOKED = "Đã đặt" # Chưa đến giờ, giữ chỗ của BS
+    STATUS_ADMITTED = "Đã vào HĐ" # Đến giờ, BN đã được đưa vào hàng đợi PK
+    STATUS_SKIPPED = "Không vào HĐ" # Đến giờ nhưng không đưa vào được (BN đang ở hàng đợi khác, ...)
+    STATUS_EXPIRED = "Quá hạn" # Hết ngày hẹn mà chưa được đưa vào hàng đợi (chương trình tắt cả ngày)
+
+    def __init__(self, appointment_id, patient_id, clinic_id, doctor_id, start_time, end_time, priority_level_str="Thông thường", status=STATUS_BOOKED):
+        self.appointment_id = appointment_id
+        self.patient_id = patient_id
+        self.clinic_id = clinic_id
+        self.doctor_id = doctor_id
+        self.start_time = start_time # datetime
+        self.end_time = end_time # datetime
+        self.priority_level_str = priority_level_str # Mức ưu tiên khi vào hàng đợi
+        self.status = status
+
+    def is_booked(self): return self.status == self.STATUS_BOOKED
+
+    def to_csv_row(self):
+        # Chuyển đổi Appointment thành dict để ghi CSV.
+        return {
+            "ma_lich_hen": self.appointment_id,
+            "ma_bn": self.patient_id,
+            "ma_phong_kham": self.clinic_id,
+            "ma_bac_si": self.doctor_id,
+            "bat_dau": self.start_time.strftime(DATETIME_FORMAT_DISPLAY),
+            "ket_thuc": self.end_time.strftime(DATETIME_FORMAT_DISPLAY),
+            "muc_uu_tien": self.priority_level_str,
+            "trang_thai": self.status
+        }
+
+    @classmethod
+    def from_csv_row(cls, row_data):
+        # Tạo Appointment từ dict (dữ liệu CSV); thời điểm sai định dạng -> ValueError (dòng bị bỏ qua).
+        return cls(
+            appointment_id=row_data.get("ma_lich_hen", ""),
+            patient_id=row_data.get("ma_bn", ""),
+            clinic_id=row_data.get("ma_phong_kham", ""),
+            doctor_id=row_data.get("ma_bac_si", ""),
+            start_time=datetime.datetime.strptime(row_data.get("bat_dau", ""), DATETIME_FORMAT_DISPLAY),
+            end_time=datetime.datetime.strptime(row_data.get("ket_thuc", ""), DATETIME_FORMAT_DISPLAY),
+            priority_level_str=row_data.get("muc_uu_tien") or "Thông thường",
+            status=row_data.get("trang_thai") or cls.STATUS_BOOKED
+        )
+
+    def __str__(self):
+        return f"LH: {self.appointment_id} - BN {self.patient_id} - PK {self.clinic_id} - BS {self.doctor_id} ({self.start_time.strftime('%Y-%m-%d %H:%M')}-{self.end_time.strftime('%H:%M')}, {self.status})"
+
 class Patient:
     """Lớp đại diện Bệnh nhân. Bao gồm thông tin cá nhân, y tế và lịch sử khám."""
     def __init__(self, patient_id, full_name, date_of_birth_val, gender, address, phone_number, national_id,
@@ -106,12 +157,12 @@ class Patient:
             try: self.system_registration_time = datetime.datetime.strptime(system_registration_time_str, DATETIME_FORMAT_DISPLAY)
             except ValueError: self.system_registration_time = datetime.datetime.now()
         else: self.system_registration_time = datetime.datetime.now()
-        self.examination_history = LinkedList() # Lịch sử khám bệnh dùng LinkedList
+        self.examination_history = ChunkedList() # Lịch sử khám bệnh: chỉ thêm cuối, truy cập theo chỉ mục O(1)
         if examination_history_str:
             self._deserialize_examination_history(examination_history_str)
 
     def _serialize_examination_history(self):
-        # Chuyển LinkedList lịch sử khám thành chuỗi CSV.
+        # Chuyển danh sách lịch sử khám thành chuỗi CSV.
         items_str_py_list = []
         for item_dict in self.examination_history:
             ng_kham_val = item_dict.get('ngay_kham')
@@ -125,7 +176,7 @@ class Patient:
         return HISTORY_ITEM_SEPARATOR.join(items_str_py_list)
 
     def _deserialize_examination_history(self, data_str):
-        # Chuyển chuỗi CSV lịch sử khám thành LinkedList các dict.
+        # Chuyển chuỗi CSV lịch sử khám thành ChunkedList các dict.
         if not data_str: return
         items = data_str.split(HISTORY_ITEM_SEPARATOR)
         for item_str in items:
@@ -211,18 +262,44 @@ class Patient:
         )
 
 class PatientInQueue:
-    """Lớp đại diện Bệnh nhân trong Hàng đợi Khám. Dùng trong PriorityQueue."""
+    """Lớp đại diện Bệnh nhân trong Hàng đợi Khám. Dùng trong PriorityQueue.
+
+    Thứ tự trong hàng đợi được tính sẵn thành ordering_key = (ưu tiên, -thời điểm đăng ký theo micro giây,
+    -số thứ tự tạo): so sánh 2 BN chỉ là so sánh 2 tuple số nguyên. Khóa được tính lại khi gán priority
+    hoặc registration_time; số thứ tự làm hòa giải ổn định khi trùng thời điểm (tạo trước -> gọi trước).
+    """
     PRIORITY_MAP = {'Tái khám': 1, 'Thông thường': 2, 'Ưu tiên': 3, 'Ưu tiên cao': 4, 'Cấp cứu': 5} # Ưu tiên số lớn hơn là cao hơn
     PRIORITY_DISPLAY_MAP = {v: k for k, v in PRIORITY_MAP.items()} # Map ngược để hiển thị tên
+    _creation_sequence = itertools.count() # Bộ đếm số thứ tạo (next() nguyên tử dưới GIL)
 
     def __init__(self, patient_profile_obj, priority_str_val, registration_timestamp=None):
         self.patient_profile = patient_profile_obj # Hồ sơ bệnh nhân
         self.patient_id = patient_profile_obj.patient_id
+        self._sequence_number = next(PatientInQueue._creation_sequence)
+        self._registration_time = registration_timestamp if registration_timestamp else datetime.datetime.now() # Thời điểm đăng ký
         if not self.create_and_set_priority(priority_str_val):
             raise ValueError(f"Mức ưu tiên không hợp lệ: {priority_str_val}")
-        self.registration_time = registration_timestamp if registration_timestamp else datetime.datetime.now() # Thời điểm đăng ký
         self.absent_count = 0 # Số lần vắng
 
+    @staticmethod
+    def _to_microseconds(registration_dt): return (registration_dt.toordinal() * 86400 + registration_dt.hour * 3600 + registration_dt.minute * 60 + registration_dt.second) * 1000000 + registration_dt.microsecond
+    def _refresh_ordering_key(self): self.ordering_key = (self._priority, -self._to_microseconds(self._registration_time), -self._sequence_number)
+
+    @classmethod
+    def ordering_key_for_new_registration(cls, numeric_priority, registration_timestamp):
+        # Khóa của một BN giả định đăng ký lúc registration_timestamp (đứng sau mọi BN cùng mức đăng ký không muộn hơn),
+        # dùng để ước lượng thời gian chờ khi chưa đăng ký.
+        return (numeric_priority, -cls._to_microseconds(registration_timestamp), -math.inf)
+
+    @property
+    def priority(self): return self._priority
+    @priority.setter
+    def priority(self, numeric_priority): self._priority = numeric_priority; self._refresh_ordering_key()
+    @property
+    def registration_time(self): return self._registration_time
+    @registration_time.setter
+    def registration_time(self, registration_timestamp): self._registration_time = registration_timestamp; self._refresh_ordering_key()
+
     def create_and_set_priority(self, priority_str_val):
         # Đặt ưu tiên (số) từ chuỗi.
         if priority_str_val in self.PRIORITY_MAP:
@@ -242,13 +319,6 @@ class PatientInQueue:
         )
 
     # Phương thức so sánh cho MaxHeap: ưu tiên số cao hơn -> "lớn hơn"
-    # Nếu ưu tiên bằng nhau, thời gian đăng ký sớm hơn (nhỏ hơn) -> "lớn hơn"
-    def __gt__(self, other_patient_in_queue): # self > other
-        if self.priority != other_patient_in_queue.priority:
-            return self.priority > other_patient_in_queue.priority
-        return self.registration_time < other_patient_in_queue.registration_time
-
-    def __lt__(self, other_patient_in_queue): # self < other
-        if self.priority != other_patient_in_queue.priority:
-            return self.priority < other_patient_in_queue.priority
-        return self.registration_time > other_patient_in_queue.registration_time
+    # Nếu ưu tiên bằng nhau, thời gian đăng ký sớm hơn (nhỏ hơn) -> "lớn hơn"; trùng thời gian thì BN tạo trước "lớn hơn"
+    def __gt__(self, other_patient_in_queue): return self.ordering_key > other_patient_in_queue.ordering_key # self > other
+    def __lt__(self, other_patient_in_queue): return self.ordering_key < other_patient_in_queue.ordering_key # self < other
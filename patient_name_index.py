@@ -0,0 +1,50 @@
+# patient_name_index.py
+# Tìm BN theo họ tên gõ sai chính tả hoặc không dấu ("Nguyn Thi An" -> "Nguyễn Thị An").
+# Họ tên được bỏ dấu, chữ thường, gộp khoảng trắng rồi đưa vào một BKTree (khoảng cách Levenshtein), mỗi tên giữ tập mã BN
+# trùng tên; tìm k tên gần nhất trong ngưỡng sai chỉ đi vào các nhánh thỏa bất đẳng thức tam giác thay vì so với mọi BN.
+# Chỉ mục không có khóa riêng: MedicalSystemLogic giữ khóa bảng BN khi gọi (như 2 Radix Tree SĐT/CCCD).
+import unicodedata
+
+from custom_structures import BKTree, List
+
+DEFAULT_MAX_NAME_EDIT_DISTANCE = 2 # Số ký tự sai tối đa mặc định khi tìm gần đúng
+NAME_QUERY_CHARS_PER_EDIT = 4 # Mỗi 4 ký tự của truy vấn cho phép thêm 1 ký tự sai (truy vấn ngắn sai 2 ký tự là ra tên khác hẳn)
+DEFAULT_FUZZY_NAME_LIMIT = 10
+
+
+def fold_name_for_search(full_name):
+    # "Đặng  Thị Ánh" -> "dang thi anh": bỏ dấu thanh/dấu mũ (tách NFD rồi bỏ dấu kết hợp), đ -> d, chữ thường, gộp khoảng trắng.
+    decomposed_name = unicodedata.normalize("NFD", (full_name or "").replace("đ", "d").replace("Đ", "D"))
+    return " ".join("".join(name_char for name_char in decomposed_name if not unicodedata.combining(name_char)).lower().split())
+
+
+def get_allowed_name_edit_distance(folded_query, max_distance=DEFAULT_MAX_NAME_EDIT_DISTANCE):
+    return min(max_distance, len(folded_query) // NAME_QUERY_CHARS_PER_EDIT)
+
+
+class PatientNameIndex:
+    """Họ tên BN đã bỏ dấu -> mã BN, tìm gần đúng theo số ký tự sai."""
+    def __init__(self):
+        self._folded_name_tree = BKTree() # khóa: họ tên đã bỏ dấu, giá trị: mã BN
+
+    def __len__(self): return len(self._folded_name_tree)
+
+    def add_patient(self, patient_id_val, full_name):
+        folded_name = fold_name_for_search(full_name)
+        if folded_name: self._folded_name_tree.add(folded_name, patient_id_val)
+
+    def remove_patient(self, patient_id_val, full_name):
+        folded_name = fold_name_for_search(full_name)
+        return bool(folded_name) and self._folded_name_tree.remove(folded_name, patient_id_val)
+
+    def rename_patient(self, patient_id_val, old_full_name, new_full_name):
+        if fold_name_for_search(old_full_name) == fold_name_for_search(new_full_name): return # Chỉ đổi dấu/hoa thường
+        self.remove_patient(patient_id_val, old_full_name); self.add_patient(patient_id_val, new_full_name)
+
+    def search(self, name_query, max_distance=DEFAULT_MAX_NAME_EDIT_DISTANCE, limit=DEFAULT_FUZZY_NAME_LIMIT):
+        # List các (mã BN, số ký tự sai) gần nhất, sắp theo số ký tự sai rồi theo tên. Ngưỡng sai co theo độ dài truy vấn.
+        folded_query = fold_name_for_search(name_query)
+        if not folded_query: return List()
+        allowed_distance = get_allowed_name_edit_distance(folded_query, max_distance)
+        return List.from_iterable((patient_id_val, name_distance) for name_distance, _folded_name, patient_id_val
+                                  in self._folded_name_tree.search(folded_query, allowed_distance, limit))
@@ -0,0 +1,131 @@
+# queue_journal.py
+# Nhật ký (journal) các thao tác trên hàng đợi khám để khôi phục hàng đợi sau khi tắt/treo chương trình.
+# Mỗi dòng ghi trạng thái sau thao tác của đúng một BN (không ghi "thao tác" nên phát lại không cần
+# đồng hồ hay luật ưu tiên): khởi động thì phát lại, dựng lại hàng đợi bằng heapify rồi ghi gọn lại file.
+# Khi chạy liên tục, nhật ký tự ghi gọn khi số bản ghi vượt quá JOURNAL_COMPACTION_RATIO lần số BN đang chờ
+# (nhật ký giữ sẵn dòng "Q" mới nhất của từng BN đang chờ nên ghi gọn không cần khóa hàng đợi nào).
+#
+# Định dạng (phân tách bằng tab, mỗi bản ghi một dòng):
+#   Q <mã PK> <mã BN> <ưu tiên số> <thời điểm đăng ký ISO> <số lần vắng>   BN đang chờ ở PK (thêm/cập nhật)
+#   D <mã PK> <mã BN>                                                     BN rời hàng đợi (được gọi/rời/bị loại)
+#   Z <mã PK>                                                             Làm rỗng hàng đợi PK
+import datetime
+import os
+import threading
+
+JOURNAL_RECORD_QUEUED = "Q"
+JOURNAL_RECORD_REMOVED = "D"
+JOURNAL_RECORD_CLEARED = "Z"
+JOURNAL_COMPACTION_RATIO = 4 # Ghi gọn khi số bản ghi > 4 lần số BN đang chờ ...
+JOURNAL_COMPACTION_MIN_RECORDS = 1000 # ... và đã có ít nhất ngần này bản ghi (hàng đợi gần rỗng thì không ghi gọn liên tục)
+
+
+class QueuedEntryState:
+    """Trạng thái một BN trong hàng đợi đọc từ nhật ký."""
+    __slots__ = ("patient_id", "priority", "registration_time", "absent_count")
+
+    def __init__(self, patient_id, priority, registration_time, absent_count):
+        self.patient_id = patient_id
+        self.priority = priority
+        self.registration_time = registration_time
+        self.absent_count = absent_count
+
+
+class ClinicQueueJournal:
+    """Ghi nối tiếp (append) nhật ký hàng đợi vào một file; an toàn khi nhiều luồng cùng ghi.
+
+    Mỗi bản ghi được flush ngay nên chương trình bị tắt ngang vẫn giữ được mọi thao tác đã xong;
+    fsync_each_record=True để chịu được cả mất điện (chậm hơn nhiều).
+    """
+    def __init__(self, journal_path, fsync_each_record=False):
+        self.journal_path = journal_path
+        self.fsync_each_record = fsync_each_record
+        self._write_lock = threading.Lock()
+        self._journal_file = None
+        self._live_lines_by_clinic = {} # mã PK -> {mã BN: dòng "Q" mới nhất} của các BN đang chờ (nội dung khi ghi gọn)
+        self.live_entry_count = 0 # Số BN đang chờ theo nhật ký
+        self.record_count = 0 # Số bản ghi trong file hiện tại (so với live_entry_count để biết khi nào ghi gọn)
+        self.compaction_count = 0 # Số lần tự ghi gọn khi đang chạy
+        self.skipped_line_count = 0 # Dòng hỏng bị bỏ qua ở lần phát lại gần nhất
+
+    def _append_line(self, journal_line):
+        # Gọi khi đang giữ _write_lock, sau khi đã cập nhật _live_lines_by_clinic.
+        if self.record_count >= JOURNAL_COMPACTION_MIN_RECORDS and self.record_count >= JOURNAL_COMPACTION_RATIO * self.live_entry_count:
+            self._write_live_lines(); self.compaction_count += 1 # Bản ghi mới đã nằm trong các dòng đang chờ
+            return
+        if self._journal_file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+            self._journal_file = open(self.journal_path, 'a', encoding='utf-8')
+        self._journal_file.write(journal_line + "\n"); self._journal_file.flush()
+        if self.fsync_each_record: os.fsync(self._journal_file.fileno())
+        self.record_count += 1
+
+    @staticmethod
+    def _format_queued_line(clinic_id_val, queue_item):
+        return "\t".join((JOURNAL_RECORD_QUEUED, clinic_id_val, queue_item.patient_id, str(queue_item.priority),
+                          queue_item.registration_time.isoformat(), str(queue_item.absent_count)))
+
+    def record_queued(self, clinic_id_val, queue_item):
+        # BN (PatientInQueue) đang ở hàng đợi PK với ưu tiên/số lần vắng hiện tại.
+        queued_line = self._format_queued_line(clinic_id_val, queue_item)
+        with self._write_lock:
+            clinic_live_lines = self._live_lines_by_clinic.setdefault(clinic_id_val, {})
+            if queue_item.patient_id not in clinic_live_lines: self.live_entry_count += 1
+            clinic_live_lines[queue_item.patient_id] = queued_line
+            self._append_line(queued_line)
+
+    def record_removed(self, clinic_id_val, patient_id_val):
+        with self._write_lock:
+            if self._live_lines_by_clinic.get(clinic_id_val, {}).pop(patient_id_val, None) is not None: self.live_entry_count -= 1
+            self._append_line("\t".join((JOURNAL_RECORD_REMOVED, clinic_id_val, patient_id_val)))
+
+    def record_cleared(self, clinic_id_val):
+        with self._write_lock:
+            self.live_entry_count -= len(self._live_lines_by_clinic.pop(clinic_id_val, {}))
+            self._append_line("\t".join((JOURNAL_RECORD_CLEARED, clinic_id_val)))
+
+    def replay(self):
+        # Đọc nhật ký -> dict {mã PK: dict {mã BN: QueuedEntryState}} theo thứ tự ghi.
+        # Dòng hỏng (ví dụ dòng cuối bị cắt ngang khi tắt máy) bị bỏ qua và đếm vào skipped_line_count.
+        entries_by_clinic = {}
+        self.skipped_line_count = 0; self.record_count = 0
+        if not os.path.exists(self.journal_path): return entries_by_clinic
+        with open(self.journal_path, 'r', encoding='utf-8', errors='replace') as journal_file:
+            for journal_line in journal_file:
+                fields = journal_line.rstrip("\n").split("\t")
+                try:
+                    record_type = fields[0]
+                    if record_type == JOURNAL_RECORD_QUEUED and len(fields) == 6:
+                        entry_state = QueuedEntryState(fields[2], int(fields[3]), datetime.datetime.fromisoformat(fields[4]), int(fields[5]))
+                        entries_by_clinic.setdefault(fields[1], {})[fields[2]] = entry_state
+                    elif record_type == JOURNAL_RECORD_REMOVED and len(fields) == 3: entries_by_clinic.get(fields[1], {}).pop(fields[2], None)
+                    elif record_type == JOURNAL_RECORD_CLEARED and len(fields) == 2: entries_by_clinic.pop(fields[1], None)
+                    else: self.skipped_line_count += 1; continue
+                except ValueError: self.skipped_line_count += 1; continue
+                self.record_count += 1
+        return entries_by_clinic
+
+    def _write_live_lines(self):
+        # Thay file bằng các dòng của BN đang chờ; gọi khi đang giữ _write_lock.
+        # Ghi ra file tạm rồi os.replace để không bao giờ còn lại file ghi dở.
+        temp_journal_path = self.journal_path + ".tmp"
+        if self._journal_file is not None: self._journal_file.close(); self._journal_file = None
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        with open(temp_journal_path, 'w', encoding='utf-8') as temp_file:
+            for clinic_live_lines in self._live_lines_by_clinic.values():
+                for queued_line in clinic_live_lines.values(): temp_file.write(queued_line + "\n")
+            temp_file.flush(); os.fsync(temp_file.fileno())
+        os.replace(temp_journal_path, self.journal_path)
+        self.record_count = self.live_entry_count
+
+    def rewrite(self, queue_items_by_clinic):
+        # Ghi gọn: thay file bằng đúng các BN đang chờ ({mã PK: iterable PatientInQueue}).
+        with self._write_lock:
+            self._live_lines_by_clinic = {clinic_id_val: {queue_item.patient_id: self._format_queued_line(clinic_id_val, queue_item) for queue_item in queue_items}
+                                          for clinic_id_val, queue_items in queue_items_by_clinic.items()}
+            self.live_entry_count = sum(len(clinic_live_lines) for clinic_live_lines in self._live_lines_by_clinic.values())
+            self._write_live_lines()
+
+    def close(self):
+        with self._write_lock:
+            if self._journal_file is not None: self._journal_file.close(); self._journal_file = None
@@ -0,0 +1,65 @@
+# sync_primitives.py
+# Khóa dùng chung cho MedicalSystemLogic khi nhiều quầy tiếp đón / phòng bác sĩ
+# cùng gọi vào một tiến trình.
+import contextlib
+import threading
+
+
+class ReadWriteLock:
+    """Khóa đọc-ghi: nhiều luồng đọc cùng lúc, luồng ghi độc quyền (ưu tiên luồng ghi đang chờ).
+
+    Luồng đang giữ khóa ghi có thể lấy lại khóa ghi/đọc (reentrant). Không hỗ trợ nâng
+    khóa đọc lên khóa ghi (sẽ ném RuntimeError thay vì bị deadlock).
+    """
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._reader_depths = {} # thread ident -> số lần đang giữ khóa đọc
+        self._writer_ident = None # Luồng đang giữ khóa ghi
+        self._writer_depth = 0
+        self._waiting_writers_count = 0
+
+    def acquire_read(self):
+        current_ident = threading.get_ident()
+        with self._condition:
+            if self._writer_ident == current_ident or current_ident in self._reader_depths: # Lấy lại khóa đang giữ
+                self._reader_depths[current_ident] = self._reader_depths.get(current_ident, 0) + 1; return
+            while self._writer_ident is not None or self._waiting_writers_count: self._condition.wait()
+            self._reader_depths[current_ident] = 1
+
+    def release_read(self):
+        current_ident = threading.get_ident()
+        with self._condition:
+            remaining_depth = self._reader_depths[current_ident] - 1
+            if remaining_depth: self._reader_depths[current_ident] = remaining_depth
+            else:
+                del self._reader_depths[current_ident]
+                if not self._reader_depths: self._condition.notify_all()
+
+    def acquire_write(self):
+        current_ident = threading.get_ident()
+        with self._condition:
+            if self._writer_ident == current_ident: self._writer_depth += 1; return
+            if current_ident in self._reader_depths: raise RuntimeError("Không thể nâng khóa đọc lên khóa ghi.")
+            self._waiting_writers_count += 1
+            try:
+                while self._writer_ident is not None or self._reader_depths: self._condition.wait()
+            finally: self._waiting_writers_count -= 1
+            self._writer_ident = current_ident; self._writer_depth = 1
+
+    def release_write(self):
+        with self._condition:
+            if self._writer_ident != threading.get_ident(): raise RuntimeError("Luồng hiện tại không giữ khóa ghi.")
+            self._writer_depth -= 1
+            if self._writer_depth == 0: self._writer_ident = None; self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try: yield
+        finally: self.release_read()
+
+    @contextlib.contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try: yield
+        finally: self.release_write()
@@ -0,0 +1,82 @@
+# task_dispatcher.py
+# Chạy các lệnh gọi logic nghiệp vụ trên một luồng nền, trả kết quả về luồng giao diện
+# qua after() để cửa sổ Tk không bị "đơ" khi lưu CSV hoặc lọc lịch sử lớn.
+import queue
+import threading
+import traceback
+
+
+class BackgroundTaskDispatcher:
+    """Bộ điều phối tác vụ nền: 1 luồng worker, kết quả được giao lại trên luồng Tk.
+
+    Chỉ một tác vụ được chạy tại một thời điểm; gửi thêm khi đang bận sẽ bị từ chối
+    (chống bấm nút nhiều lần và tránh GUI đọc dữ liệu khi worker đang sửa).
+    """
+    def __init__(self, tk_widget, poll_interval_ms=30, on_busy_state_changed=None):
+        self.tk_widget = tk_widget # Widget Tk dùng để đặt lịch after() trên luồng giao diện
+        self.poll_interval_ms = poll_interval_ms
+        self.on_busy_state_changed = on_busy_state_changed # callback(is_busy, task_key)
+        self._task_queue = queue.Queue()
+        self._result_queue = queue.Queue()
+        self._worker_thread = None
+        self._running_task_key = None # Chỉ đọc/ghi trên luồng giao diện
+        self._poll_scheduled = False
+        self._is_shut_down = False
+
+    def is_busy(self): return self._running_task_key is not None
+    def get_running_task_key(self): return self._running_task_key
+
+    def submit(self, task_key, func, *args, on_success=None, on_error=None, **kwargs):
+        # Gửi func(*args, **kwargs) sang worker. Trả về False nếu đang có tác vụ khác.
+        if self._is_shut_down or self.is_busy(): return False
+        self._ensure_worker_started()
+        self._running_task_key = task_key
+        self._notify_busy_state()
+        self._task_queue.put((task_key, func, args, kwargs, on_success, on_error))
+        self._schedule_poll()
+        return True
+
+    def _ensure_worker_started(self):
+        if self._worker_thread is None or not self._worker_thread.is_alive():
+            self._worker_thread = threading.Thread(target=self._worker_loop, name="MedicalLogicWorker", daemon=True)
+            self._worker_thread.start()
+
+    def _worker_loop(self):
+        # Luồng nền: lấy tác vụ, chạy, đẩy kết quả sang hàng đợi kết quả.
+        while True:
+            task = self._task_queue.get()
+            if task is None: break # Tín hiệu dừng
+            task_key, func, args, kwargs, on_success, on_error = task
+            try: self._result_queue.put((task_key, True, func(*args, **kwargs), on_success, on_error))
+            except Exception as task_exception:
+                traceback.print_exc()
+                self._result_queue.put((task_key, False, task_exception, on_success, on_error))
+
+    def _schedule_poll(self):
+        # Chỉ poll khi có tác vụ đang chạy (không đánh thức vòng lặp Tk khi rảnh).
+        if not self._poll_scheduled:
+            self._poll_scheduled = True
+            self.tk_widget.after(self.poll_interval_ms, self._poll_results)
+
+    def _poll_results(self):
+        # Chạy trên luồng giao diện: giao kết quả cho callback.
+        self._poll_scheduled = False
+        try: task_key, succeeded, payload, on_success, on_error = self._result_queue.get_nowait()
+        except queue.Empty:
+            if self.is_busy(): self._schedule_poll()
+            return
+        self._running_task_key = None
+        self._notify_busy_state()
+        if succeeded:
+            if on_success: on_success(payload)
+        elif on_error: on_error(payload)
+
+    def _notify_busy_state(self):
+        if self.on_busy_state_changed: self.on_busy_state_changed(self.is_busy(), self._running_task_key)
+
+    def shutdown(self, wait=True, timeout=None):
+        # Dừng worker; wait=True chờ tác vụ đang chạy (ví dụ đang lưu CSV) hoàn tất.
+        self._is_shut_down = True
+        if self._worker_thread is not None and self._worker_thread.is_alive():
+            self._task_queue.put(None)
+            if wait: self._worker_thread.join(timeout)
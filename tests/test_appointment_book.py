@@ -0,0 +1,94 @@
+# tests/test_appointment_book.py
+# Sổ lịch hẹn: tìm lịch "Đã đặt" theo BN/BS/PK khớp với duyệt cả sổ, lịch đã xử lý được dọn khi sang ngày mới,
+# và lịch không vào được hàng đợi được báo kèm lý do.
+#   python -m unittest discover -s tests
+import datetime
+import glob
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+from app_logic import MedicalSystemLogic  # noqa: E402
+from appointment_schedule import AppointmentBook  # noqa: E402
+from models import Appointment  # noqa: E402
+
+DAY_START_TIME = datetime.datetime(2025, 6, 2, 8, 0)
+
+
+class FixedClock:
+    def __init__(self, current_time): self.current_time = current_time
+    def __call__(self): return self.current_time
+
+
+def _scan_booked_appointment(appointment_book, patient_id_val=None, doctor_id_val=None, clinic_id_val=None):
+    return [appointment_obj.appointment_id for appointment_obj in appointment_book.iter_values()
+            if appointment_obj.is_booked() and (not patient_id_val or appointment_obj.patient_id == patient_id_val)
+            and (not doctor_id_val or appointment_obj.doctor_id == doctor_id_val) and (not clinic_id_val or appointment_obj.clinic_id == clinic_id_val)]
+
+
+class FindBookedAppointmentTest(unittest.TestCase):
+    def test_matches_full_scan_after_random_changes(self):
+        random_generator = random.Random(49); appointment_book = AppointmentBook(); next_appointment_number = 1
+        patient_ids = [f"BN{patient_index:04d}" for patient_index in range(6)]; doctor_ids = ["BS001", "BS002", "BS003"]; clinic_ids = ["PK001", "PK002"]
+        for _operation_index in range(400):
+            operation_roll = random_generator.random(); existing_ids = [appointment_obj.appointment_id for appointment_obj in appointment_book.iter_values()]
+            if operation_roll < 0.5 or not existing_ids:
+                start_time = DAY_START_TIME + datetime.timedelta(minutes=15 * random_generator.randrange(40))
+                appointment_obj = Appointment(f"LH{next_appointment_number:04d}", random_generator.choice(patient_ids), random_generator.choice(clinic_ids),
+                                              random_generator.choice(doctor_ids), start_time, start_time + datetime.timedelta(minutes=15))
+                try: appointment_book.add_appointment(appointment_obj); next_appointment_number += 1
+                except ValueError: pass # Trùng khung giờ
+            elif operation_roll < 0.75:
+                appointment_obj = appointment_book.get_appointment(random_generator.choice(existing_ids))
+                if appointment_obj.is_booked(): appointment_book.set_status(appointment_obj, random_generator.choice((Appointment.STATUS_ADMITTED, Appointment.STATUS_SKIPPED, Appointment.STATUS_EXPIRED)))
+            else: appointment_book.remove_appointment(random_generator.choice(existing_ids))
+            for owner_filter in ([{"patient_id_val": patient_id} for patient_id in patient_ids] + [{"doctor_id_val": doctor_id} for doctor_id in doctor_ids]
+                                 + [{"clinic_id_val": clinic_id} for clinic_id in clinic_ids] + [{"doctor_id_val": "BS001", "clinic_id_val": "PK002"}]):
+                found_appointment = appointment_book.find_booked_appointment(**owner_filter)
+                expected_ids = _scan_booked_appointment(appointment_book, **owner_filter)
+                if expected_ids: self.assertIn(found_appointment.appointment_id, expected_ids, owner_filter)
+                else: self.assertIsNone(found_appointment, owner_filter)
+
+
+class AdmitAndPruneAppointmentsTest(unittest.TestCase):
+    def setUp(self):
+        self.data_directory = tempfile.mkdtemp()
+        for csv_path in glob.glob(os.path.join(REPO_ROOT, "*.csv")): shutil.copy(csv_path, self.data_directory)
+        self.clock = FixedClock(DAY_START_TIME - datetime.timedelta(hours=1))
+        self.logic = MedicalSystemLogic(data_directory=self.data_directory, clock=self.clock)
+        self.addCleanup(self.logic.clinic_queue_journal.close)
+        self.doctor_id_val, self.clinic_id_val = next((doctor_obj.doctor_id, clinic_obj.clinic_id) for doctor_obj in self.logic.doctor_records_table.iter_values()
+                                                      for clinic_obj in self.logic.clinic_records_table.iter_values() if self.logic.doctor_clinic_assignments.has_link(doctor_obj.doctor_id, clinic_obj.clinic_id))
+
+    def tearDown(self):
+        shutil.rmtree(self.data_directory, ignore_errors=True)
+
+    def test_skipped_appointment_reason_is_reported_and_finished_ones_pruned_next_day(self):
+        admitted_appointment = self.logic.book_appointment("BN0001", self.clinic_id_val, self.doctor_id_val, DAY_START_TIME)[0]
+        skipped_appointment = self.logic.book_appointment("BN0002", self.clinic_id_val, self.doctor_id_val, DAY_START_TIME + datetime.timedelta(minutes=30))[0]
+        self.assertIsNotNone(admitted_appointment); self.assertIsNotNone(skipped_appointment)
+        self.assertTrue(self.logic.register_for_examination("BN0002", self.clinic_id_val, "Thông thường")[0]) # BN0002 đã ở HĐ nên lịch không vào được
+
+        self.clock.current_time = DAY_START_TIME + datetime.timedelta(hours=1)
+        admitted_list, admit_msg, admit_lvl = self.logic.admit_due_appointments()
+        self.assertEqual(len(admitted_list), 1)
+        self.assertEqual(admit_lvl, "WARNING")
+        self.assertIn(skipped_appointment.appointment_id, admit_msg)
+        self.assertEqual(skipped_appointment.status, Appointment.STATUS_SKIPPED)
+        self.assertIsNotNone(self.logic.appointment_book.find_doctor_conflict(self.doctor_id_val, DAY_START_TIME, DAY_START_TIME + datetime.timedelta(minutes=15)))
+
+        self.clock.current_time = DAY_START_TIME + datetime.timedelta(days=1)
+        self.logic.admit_due_appointments()
+        self.assertIsNone(self.logic.appointment_book.get_appointment(admitted_appointment.appointment_id))
+        self.assertIsNone(self.logic.appointment_book.get_appointment(skipped_appointment.appointment_id))
+        self.assertIsNone(self.logic.appointment_book.find_doctor_conflict(self.doctor_id_val, DAY_START_TIME, DAY_START_TIME + datetime.timedelta(minutes=15)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# tests/test_bk_tree.py
+# Cây BK: khoảng cách Levenshtein song song bit khớp với quy hoạch động thông thường, và search (có/không giới hạn số
+# kết quả) trả đúng các khóa mà duyệt hết mọi khóa tìm được, kể cả sau khi xóa nhiều khóa (cây được dựng lại).
+#   python -m unittest discover -s tests
+import os
+import random
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+from custom_structures import BKTree, edit_distance  # noqa: E402
+
+NAME_ALPHABET = "abcdeghnt "
+
+
+def _reference_edit_distance(first_text, second_text):
+    # Quy hoạch động O(n*m), giữ một hàng.
+    previous_row = list(range(len(second_text) + 1))
+    for first_index, first_char in enumerate(first_text, 1):
+        current_row = [first_index]
+        for second_index, second_char in enumerate(second_text, 1):
+            current_row.append(min(previous_row[second_index] + 1, current_row[second_index - 1] + 1, previous_row[second_index - 1] + (first_char != second_char)))
+        previous_row = current_row
+    return previous_row[-1]
+
+
+def _random_text(random_generator, max_length):
+    return "".join(random_generator.choice(NAME_ALPHABET) for _char_index in range(random_generator.randrange(max_length + 1)))
+
+
+class EditDistanceTest(unittest.TestCase):
+    def test_matches_reference_dynamic_programming(self):
+        random_generator = random.Random(50)
+        for _pair_index in range(3000):
+            first_text, second_text = _random_text(random_generator, 12), _random_text(random_generator, 12)
+            self.assertEqual(edit_distance(first_text, second_text), _reference_edit_distance(first_text, second_text), (first_text, second_text))
+        long_text = "nguyen thi thanh huong " * 5 # Dài hơn 64 ký tự: mặt nạ bit vượt một từ máy
+        self.assertEqual(edit_distance(long_text, long_text[::-1]), _reference_edit_distance(long_text, long_text[::-1]))
+
+
+class BKTreeSearchTest(unittest.TestCase):
+    def _assert_search_matches_brute_force(self, bk_tree, stored_items, random_generator):
+        for _query_index in range(40):
+            query_text = _random_text(random_generator, 10); max_distance = random_generator.randrange(4)
+            expected_results = sorted((edit_distance(query_text, key), key, value) for key, value in stored_items if edit_distance(query_text, key) <= max_distance)
+            self.assertEqual(bk_tree.search(query_text, max_distance).to_py_list(), expected_results)
+            result_limit = random_generator.randint(1, 5)
+            limited_results = bk_tree.search(query_text, max_distance, limit=result_limit).to_py_list()
+            self.assertEqual(len(limited_results), min(result_limit, len(expected_results)))
+            self.assertEqual([result[0] for result in limited_results], [result[0] for result in expected_results[:result_limit]])
+            for limited_result in limited_results: self.assertIn(limited_result, expected_results)
+
+    def test_search_matches_brute_force_after_adds_and_removes(self):
+        random_generator = random.Random(500); bk_tree = BKTree(); stored_items = set()
+        for value_index in range(300):
+            reuse_existing_key = stored_items and random_generator.random() < 0.2 # Tên trùng: thêm giá trị vào khóa đã có
+            key = random_generator.choice(sorted(stored_items))[0] if reuse_existing_key else _random_text(random_generator, 10)
+            if bk_tree.add(key, f"BN{value_index:04d}"): stored_items.add((key, f"BN{value_index:04d}"))
+        self.assertEqual(len(bk_tree), len(stored_items))
+        self.assertFalse(bk_tree.add(*next(iter(stored_items))))
+        self._assert_search_matches_brute_force(bk_tree, stored_items, random_generator)
+
+        for removed_item in random_generator.sample(sorted(stored_items), len(stored_items) * 3 // 4): # Đủ nhiều để cây dựng lại
+            self.assertTrue(bk_tree.remove(*removed_item)); stored_items.discard(removed_item)
+            self.assertFalse(bk_tree.remove(*removed_item))
+        self.assertEqual(len(bk_tree), len(stored_items))
+        self.assertEqual(set(bk_tree.iter_items()), stored_items)
+        self._assert_search_matches_brute_force(bk_tree, stored_items, random_generator)
+
+    def test_empty_tree_and_invalid_arguments(self):
+        bk_tree = BKTree()
+        self.assertEqual(len(bk_tree.search("an", 2)), 0)
+        bk_tree.add("an", "BN0001")
+        self.assertEqual(len(bk_tree.search("an", -1)), 0)
+        self.assertEqual(len(bk_tree.search("an", 2, limit=0)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
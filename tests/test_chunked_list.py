@@ -0,0 +1,51 @@
+# tests/test_chunked_list.py
+# ChunkedList: get/set/chỉ mục âm/duyệt xuôi và ngược/get_last phải khớp với list Python ở mọi kích thước khối,
+# kể cả khi số phần tử vừa đúng bội của kích thước khối.
+#   python -m unittest discover -s tests
+import os
+import random
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+from custom_structures import ChunkedList  # noqa: E402
+
+
+class ChunkedListTest(unittest.TestCase):
+    def test_matches_python_list_for_each_chunk_size(self):
+        random_generator = random.Random(39)
+        for chunk_size in (1, 2, 3, 8, 32):
+            chunked_list = ChunkedList(chunk_size); reference_list = []
+            self.assertIsNone(chunked_list.get_last())
+            for _operation_index in range(600):
+                operation_roll = random_generator.random()
+                if operation_roll < 0.5:
+                    new_item = random_generator.randrange(1000); chunked_list.append(new_item); reference_list.append(new_item)
+                elif operation_roll < 0.6:
+                    new_items = [random_generator.randrange(1000) for _item_index in range(random_generator.randrange(2 * chunk_size + 2))]
+                    chunked_list.extend(new_items); reference_list.extend(new_items)
+                elif operation_roll < 0.75 and reference_list:
+                    set_index = random_generator.randrange(len(reference_list)); new_item = random_generator.randrange(1000)
+                    chunked_list.set(set_index, new_item); reference_list[set_index] = new_item
+                elif reference_list:
+                    get_index = random_generator.randrange(-len(reference_list), len(reference_list))
+                    self.assertEqual(chunked_list[get_index], reference_list[get_index])
+                self.assertEqual(len(chunked_list), len(reference_list))
+                self.assertEqual(chunked_list.get_last(), reference_list[-1] if reference_list else None)
+            self.assertEqual(list(chunked_list), reference_list)
+            self.assertEqual(list(reversed(chunked_list)), reference_list[::-1])
+            self.assertEqual(chunked_list.get_all_elements_as_list().to_py_list(), reference_list)
+            self.assertEqual(list(ChunkedList.from_iterable(reference_list, chunk_size)), reference_list)
+
+    def test_out_of_range_indexes_raise(self):
+        chunked_list = ChunkedList.from_iterable(range(4), chunk_size=2)
+        with self.assertRaises(IndexError): chunked_list.get(4)
+        with self.assertRaises(IndexError): chunked_list[-5]
+        with self.assertRaises(IndexError): chunked_list.set(4, 0)
+        with self.assertRaises(ValueError): ChunkedList(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
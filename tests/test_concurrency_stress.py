@@ -0,0 +1,89 @@
+# tests/test_concurrency_stress.py
+# Bản ngắn, có seed của benchmarks/stress_concurrency.py: nhiều luồng cùng đăng ký, gọi khám, vắng mặt, rời hàng,
+# đổi ưu tiên và tăng ưu tiên BN chờ lâu trên một MedicalSystemLogic, rồi kiểm tra các bất biến của hàng đợi
+# (tính chất heap, chỉ mục BN đang chờ, cân bằng số lượt).
+#   python -m unittest discover -s tests
+import glob
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for import_directory in (REPO_ROOT, os.path.join(REPO_ROOT, "benchmarks")):
+    if import_directory not in sys.path: sys.path.insert(0, import_directory)
+
+from app_logic import MedicalSystemLogic  # noqa: E402
+from models import PatientInQueue  # noqa: E402
+from stress_concurrency import StressCounters, check_queue_invariants  # noqa: E402
+
+STRESS_SEED = 30
+RECEPTION_THREAD_COUNT = 4
+DOCTOR_THREAD_COUNT = 4
+STEPS_PER_THREAD = 300
+
+
+class ConcurrentQueueOperationsTest(unittest.TestCase):
+    def setUp(self):
+        self.data_directory = tempfile.mkdtemp()
+        for csv_path in glob.glob(os.path.join(REPO_ROOT, "*.csv")): shutil.copy(csv_path, self.data_directory)
+        self.logic = MedicalSystemLogic(data_directory=self.data_directory)
+        self.addCleanup(self.logic.close)
+        all_patients = self.logic.list_all_patients(); all_clinics = self.logic.list_all_clinics()
+        self.patient_ids = [all_patients.get(patient_index).patient_id for patient_index in range(len(all_patients))]
+        self.clinic_ids = sorted(all_clinics.get(clinic_index).clinic_id for clinic_index in range(len(all_clinics)))
+        self.priority_names = list(PatientInQueue.PRIORITY_MAP)
+        self.counters = StressCounters(); self.worker_exceptions = []; self.midrun_violations = []
+
+    def tearDown(self):
+        shutil.rmtree(self.data_directory, ignore_errors=True)
+
+    def _reception_steps(self, random_generator):
+        # Quầy tiếp đón: đăng ký, rồi thỉnh thoảng cho BN rời hàng, đổi ưu tiên hoặc tăng ưu tiên BN chờ lâu.
+        for _step_index in range(STEPS_PER_THREAD):
+            patient_id = random_generator.choice(self.patient_ids); clinic_id = random_generator.choice(self.clinic_ids)
+            self.counters.add("registered" if self.logic.register_for_examination(patient_id, clinic_id, random_generator.choice(self.priority_names))[0] else "register_rejected")
+            operation_roll = random_generator.random()
+            if operation_roll < 0.1:
+                if self.logic.handle_patient_leaving_queue(patient_id, clinic_id)[0]: self.counters.add("left")
+            elif operation_roll < 0.4: self.logic.change_patient_priority_in_queue(clinic_id, patient_id, random_generator.choice(self.priority_names))
+            elif operation_roll < 0.55:
+                self.logic.update_priority_for_long_waiters(clinic_id, max_wait_seconds=0) # Mọi BN đang chờ đều "chờ lâu"
+                self.midrun_violations.extend(check_queue_invariants(self.logic, quiescent=False)[1]) # Lỗi thứ tự có thể bị lượt sau che mất
+
+    def _doctor_steps(self, random_generator):
+        # Phòng khám: gọi BN tiếp theo (thưa hơn đăng ký để hàng đợi đủ dài), một phần vắng mặt (đưa lại hàng đợi hoặc bị loại).
+        for _step_index in range(STEPS_PER_THREAD):
+            clinic_id = random_generator.choice(self.clinic_ids)
+            if random_generator.random() < 0.6: continue
+            exam_patient = self.logic.call_next_patient_for_exam(clinic_id)[0]
+            if not exam_patient: continue
+            self.counters.add("called")
+            if random_generator.random() < 0.3:
+                was_removed = self.logic.handle_absent_called_patient(exam_patient, clinic_id)[0]
+                self.counters.add("removed_after_absent" if was_removed else "readded_after_absent")
+
+    def _run_worker(self, step_func, thread_seed):
+        try: step_func(random.Random(thread_seed))
+        except Exception as worker_exception: self.worker_exceptions.append(worker_exception)
+
+    def test_queue_invariants_hold_after_concurrent_operations(self):
+        worker_threads = [threading.Thread(target=self._run_worker, args=(self._reception_steps, STRESS_SEED * 100 + thread_index)) for thread_index in range(RECEPTION_THREAD_COUNT)]
+        worker_threads += [threading.Thread(target=self._run_worker, args=(self._doctor_steps, STRESS_SEED * 100 + 50 + thread_index)) for thread_index in range(DOCTOR_THREAD_COUNT)]
+        for worker_thread in worker_threads: worker_thread.start()
+        for worker_thread in worker_threads: worker_thread.join(timeout=60)
+        self.assertFalse([worker_thread.name for worker_thread in worker_threads if worker_thread.is_alive()], "luồng không dừng (nghi deadlock)")
+        self.assertEqual(self.worker_exceptions, [])
+
+        self.assertEqual(self.midrun_violations[:5], [])
+        queued_count, violations = check_queue_invariants(self.logic)
+        self.assertEqual(violations, [])
+        counter_values = self.counters.values
+        self.assertEqual(queued_count, counter_values["registered"] + counter_values["readded_after_absent"] - counter_values["called"] - counter_values["left"])
+
+
+if __name__ == "__main__":
+    unittest.main()
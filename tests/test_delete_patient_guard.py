@@ -0,0 +1,58 @@
+# tests/test_delete_patient_guard.py
+# Không được xóa hồ sơ BN khi BN đang nằm trong ô khám của một BS (đã rời HĐ nhưng chưa khám xong).
+#   python -m unittest discover -s tests
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+from app_logic import MedicalSystemLogic  # noqa: E402
+
+
+class DeletePatientInExamSlotTest(unittest.TestCase):
+    def setUp(self):
+        self.data_directory = tempfile.mkdtemp()
+        for csv_path in glob.glob(os.path.join(REPO_ROOT, "*.csv")): shutil.copy(csv_path, self.data_directory)
+        self.logic = MedicalSystemLogic(data_directory=self.data_directory)
+        self.addCleanup(self.logic.clinic_queue_journal.close)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_directory, ignore_errors=True)
+
+    def _find_assigned_doctor_and_clinic(self):
+        for doctor_obj in self.logic.doctor_records_table.iter_values():
+            for clinic_obj in self.logic.clinic_records_table.iter_values():
+                if self.logic.doctor_clinic_assignments.has_link(doctor_obj.doctor_id, clinic_obj.clinic_id): return doctor_obj.doctor_id, clinic_obj.clinic_id
+        self.skipTest("Dữ liệu mẫu không có BS nào được gán PK.")
+
+    def test_patient_in_exam_slot_cannot_be_deleted_until_completed(self):
+        doctor_id_val, clinic_id_val = self._find_assigned_doctor_and_clinic()
+        self.assertTrue(self.logic.register_for_examination("BN0001", clinic_id_val, "Thông thường")[0])
+        self.assertIsNotNone(self.logic.call_next_patient_for_doctor(clinic_id_val, doctor_id_val)[0])
+
+        was_deleted, _message, message_lvl = self.logic.delete_patient_record("BN0001")
+        self.assertFalse(was_deleted)
+        self.assertEqual(message_lvl, "ERROR")
+        self.assertIsNotNone(self.logic.patient_records_table.get_item("BN0001"))
+
+        self.assertTrue(self.logic.complete_examination_for_doctor(clinic_id_val, doctor_id_val, "Khám tổng quát", "Bình thường")[0])
+        self.assertIsNone(self.logic.examining_patient_slot_index.get_item("BN0001"))
+        self.assertTrue(self.logic.delete_patient_record("BN0001")[0])
+
+    def test_absent_patient_leaves_exam_slot_index(self):
+        doctor_id_val, clinic_id_val = self._find_assigned_doctor_and_clinic()
+        self.assertTrue(self.logic.register_for_examination("BN0002", clinic_id_val, "Thông thường")[0])
+        self.logic.call_next_patient_for_doctor(clinic_id_val, doctor_id_val)
+        self.assertEqual(self.logic.examining_patient_slot_index.get_item("BN0002"), (clinic_id_val, doctor_id_val))
+        self.logic.handle_absent_for_doctor(clinic_id_val, doctor_id_val)
+        self.assertIsNone(self.logic.examining_patient_slot_index.get_item("BN0002"))
+        self.assertEqual(self.logic.queued_patient_clinic_index.get_item("BN0002"), clinic_id_val) # Vắng lần đầu: đưa lại HĐ
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# tests/test_hash_table_iterators.py
+# iter_keys/iter_values/iter_items của HashTable: duyệt đủ mọi khóa một lần, cập nhật giá trị của khóa đã có trong lúc
+# duyệt thì được, còn thêm/xóa khóa thì lần lấy phần tử kế tiếp báo RuntimeError.
+#   python -m unittest discover -s tests
+import os
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+from custom_structures import HashTable  # noqa: E402
+
+
+def _make_filled_table(item_count=50):
+    hash_table = HashTable(initial_table_size=7) # Nhỏ để nhiều khóa chung bucket
+    for key_index in range(item_count): hash_table.put_item(f"BN{key_index:04d}", key_index)
+    return hash_table
+
+
+class HashTableIteratorTest(unittest.TestCase):
+    def test_iterators_visit_every_item_once(self):
+        hash_table = _make_filled_table()
+        expected_items = {f"BN{key_index:04d}": key_index for key_index in range(50)}
+        self.assertEqual(sorted(hash_table.iter_keys()), sorted(expected_items))
+        self.assertEqual(sorted(hash_table.iter_values()), sorted(expected_items.values()))
+        self.assertEqual(dict(hash_table.iter_items()), expected_items)
+        self.assertEqual(dict(hash_table.get_all_key_value_pairs_as_list()), expected_items)
+
+    def test_updating_existing_key_during_iteration_is_allowed(self):
+        hash_table = _make_filled_table()
+        for key, value in hash_table.iter_items(): hash_table.put_item(key, value + 1000)
+        self.assertEqual(sorted(hash_table.iter_values()), list(range(1000, 1050)))
+
+    def test_inserting_or_deleting_key_during_iteration_raises(self):
+        for modify_table in (lambda hash_table: hash_table.put_item("BN9999", 0), lambda hash_table: hash_table.delete_item("BN0003")):
+            for iterator_name in ("iter_keys", "iter_values", "iter_items"):
+                hash_table = _make_filled_table(); table_iterator = getattr(hash_table, iterator_name)()
+                next(table_iterator); modify_table(hash_table)
+                with self.assertRaises(RuntimeError): list(table_iterator)
+
+    def test_deleting_missing_key_does_not_invalidate_iterator(self):
+        hash_table = _make_filled_table(); table_iterator = hash_table.iter_keys()
+        next(table_iterator); hash_table.delete_item("BN9999")
+        self.assertEqual(len(list(table_iterator)), 49)
+
+    def test_snapshot_can_be_modified_against(self):
+        hash_table = _make_filled_table()
+        for key, _value in hash_table.get_all_key_value_pairs_as_list(): hash_table.delete_item(key)
+        self.assertEqual(len(hash_table), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+# tests/test_list_bulk_operations.py
+# List tùy chỉnh: chèn/xóa giữa mảng, extend, from_iterable, lát cắt, clear (thao tác dịch chuyển theo khối) phải cho
+# cùng kết quả với list Python sau một chuỗi thao tác ngẫu nhiên, kể cả khi mảng nội bộ giãn ra rồi co lại.
+#   python -m unittest discover -s tests
+import os
+import random
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+from custom_structures import List  # noqa: E402
+
+
+class ListBulkOperationsTest(unittest.TestCase):
+    def test_random_operations_match_python_list(self):
+        random_generator = random.Random(38); custom_list = List(); reference_list = []
+        for _operation_index in range(5000):
+            operation_roll = random_generator.random()
+            if operation_roll < 0.25:
+                new_item = random_generator.randrange(1000); custom_list.append(new_item); reference_list.append(new_item)
+            elif operation_roll < 0.45:
+                insert_index = random_generator.randint(0, len(reference_list)); new_item = random_generator.randrange(1000)
+                custom_list.insert(insert_index, new_item); reference_list.insert(insert_index, new_item)
+            elif operation_roll < 0.7 and reference_list:
+                pop_index = random_generator.randrange(len(reference_list))
+                self.assertEqual(custom_list.pop(pop_index), reference_list.pop(pop_index))
+            elif operation_roll < 0.8 and reference_list: self.assertEqual(custom_list.pop(), reference_list.pop())
+            elif operation_roll < 0.9:
+                new_items = [random_generator.randrange(1000) for _item_index in range(random_generator.randrange(30))]
+                custom_list.extend(List.from_iterable(new_items) if random_generator.random() < 0.5 else iter(new_items)); reference_list.extend(new_items)
+            elif operation_roll < 0.99:
+                slice_start, slice_stop = random_generator.randint(-5, len(reference_list) + 5), random_generator.randint(-5, len(reference_list) + 5)
+                slice_step = random_generator.choice((1, 2, -1, -3))
+                self.assertEqual(custom_list[slice_start:slice_stop:slice_step].to_py_list(), reference_list[slice_start:slice_stop:slice_step])
+            else: custom_list.clear(); reference_list.clear()
+            self.assertEqual(len(custom_list), len(reference_list))
+        self.assertEqual(list(custom_list), reference_list)
+        if reference_list: self.assertEqual(custom_list[-1], reference_list[-1])
+
+    def test_out_of_range_indexes_raise(self):
+        custom_list = List.from_iterable(range(3))
+        with self.assertRaises(IndexError): custom_list.get(3)
+        with self.assertRaises(IndexError): custom_list.insert(5, "x")
+        with self.assertRaises(IndexError): custom_list.pop(3)
+        with self.assertRaises(IndexError): List().pop()
+
+
+if __name__ == "__main__":
+    unittest.main()
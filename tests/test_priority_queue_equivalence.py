@@ -0,0 +1,70 @@
+# tests/test_priority_queue_equivalence.py
+# Hàng đợi chia ngăn (BucketedPriorityQueue) phải gọi BN đúng thứ tự như hàng đợi heap (CustomPriorityQueue),
+# kể cả sau khi tăng ưu tiên cho BN chờ lâu, đổi ưu tiên, xóa BN khỏi hàng đợi.
+#   python -m unittest discover -s tests
+import datetime
+import os
+import random
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+from custom_structures import BucketedPriorityQueue, CustomPriorityQueue  # noqa: E402
+from models import Patient, PatientInQueue  # noqa: E402
+
+PRIORITY_NAMES = list(PatientInQueue.PRIORITY_MAP)
+QUEUE_START_TIME = datetime.datetime(2025, 6, 2, 7, 0)
+
+
+def _build_queue_pair(random_generator, patient_count, heap_arity=2):
+    # Hai hàng đợi cùng nội dung; mỗi hàng đợi giữ bản PatientInQueue riêng vì tăng ưu tiên sửa trực tiếp phần tử.
+    # Thời điểm đăng ký khác nhau từng BN: thứ tự gọi được xác định hoàn toàn bởi (ưu tiên, thời điểm đăng ký).
+    heap_queue = CustomPriorityQueue(heap_arity, "ordering_key"); bucketed_queue = BucketedPriorityQueue()
+    for patient_index, registration_minute in enumerate(random_generator.sample(range(240), patient_count)):
+        patient_profile = Patient(f"BN{patient_index:04d}", f"Bệnh nhân {patient_index}", "", "Nam", "", "", "")
+        priority_name = random_generator.choice(PRIORITY_NAMES)
+        registration_time = QUEUE_START_TIME + datetime.timedelta(minutes=registration_minute)
+        heap_queue.add_item(PatientInQueue(patient_profile, priority_name, registration_time))
+        bucketed_queue.add_item(PatientInQueue(patient_profile, priority_name, registration_time))
+    return heap_queue, bucketed_queue
+
+
+def _drain_patient_ids(clinic_queue):
+    drained_patient_ids = []
+    while not clinic_queue.is_empty(): drained_patient_ids.append(clinic_queue.remove_first_item().patient_id)
+    return drained_patient_ids
+
+
+class PriorityQueueEquivalenceTest(unittest.TestCase):
+    def test_same_call_order_after_long_waiter_promotion(self):
+        random_generator = random.Random(2024)
+        for round_index in range(300):
+            heap_queue, bucketed_queue = _build_queue_pair(random_generator, 30, heap_arity=random_generator.choice((2, 4)))
+            current_time = QUEUE_START_TIME + datetime.timedelta(minutes=random_generator.randrange(60, 300))
+            max_wait_seconds = random_generator.randrange(0, 240) * 60
+            heap_updated_count = heap_queue.update_long_waiter_priority(max_wait_seconds, PatientInQueue, current_time=current_time)
+            bucketed_updated_count = bucketed_queue.update_long_waiter_priority(max_wait_seconds, PatientInQueue, current_time=current_time)
+            self.assertEqual(heap_updated_count, bucketed_updated_count)
+            self.assertEqual([queued_item.patient_id for queued_item in heap_queue.get_items_in_priority_order()],
+                             [queued_item.patient_id for queued_item in bucketed_queue.get_items_in_priority_order()])
+            self.assertEqual(_drain_patient_ids(heap_queue), _drain_patient_ids(bucketed_queue), f"vòng {round_index}")
+
+    def test_same_call_order_after_priority_changes_and_removals(self):
+        random_generator = random.Random(7)
+        for _round_index in range(100):
+            heap_queue, bucketed_queue = _build_queue_pair(random_generator, 30)
+            for _operation_index in range(20):
+                patient_id = f"BN{random_generator.randrange(30):04d}"
+                if random_generator.random() < 0.7:
+                    new_priority_name = random_generator.choice(PRIORITY_NAMES)
+                    self.assertEqual(heap_queue.change_queued_patient_priority(patient_id, new_priority_name, PatientInQueue),
+                                     bucketed_queue.change_queued_patient_priority(patient_id, new_priority_name, PatientInQueue))
+                else:
+                    self.assertEqual(heap_queue.remove_item(patient_id) is None, bucketed_queue.remove_item(patient_id) is None)
+            self.assertEqual(_drain_patient_ids(heap_queue), _drain_patient_ids(bucketed_queue))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# tests/test_queue_journal_restore.py
+# Khôi phục hàng đợi từ nhật ký khi khởi động: BN đăng ký từ ngày trước không được đưa lại vào hàng đợi;
+# nhật ký tự ghi gọn khi chạy liên tục mà phát lại vẫn ra đúng các BN đang chờ.
+#   python -m unittest discover -s tests
+import datetime
+import glob
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+from app_logic import MedicalSystemLogic, QUEUE_JOURNAL_FILENAME  # noqa: E402
+from queue_journal import JOURNAL_COMPACTION_MIN_RECORDS, JOURNAL_COMPACTION_RATIO, ClinicQueueJournal, QueuedEntryState  # noqa: E402
+
+
+class FixedClock:
+    def __init__(self, current_time): self.current_time = current_time
+    def __call__(self): return self.current_time
+
+
+class JournalRestoreAcrossDaysTest(unittest.TestCase):
+    def setUp(self):
+        self.data_directory = tempfile.mkdtemp()
+        for csv_path in glob.glob(os.path.join(REPO_ROOT, "*.csv")): shutil.copy(csv_path, self.data_directory)
+        self.clock = FixedClock(datetime.datetime(2025, 6, 2, 9, 0))
+
+    def tearDown(self):
+        shutil.rmtree(self.data_directory, ignore_errors=True)
+
+    def _start_logic(self):
+        logic = MedicalSystemLogic(data_directory=self.data_directory, clock=self.clock)
+        self.addCleanup(logic.clinic_queue_journal.close)
+        return logic
+
+    def test_previous_day_entries_are_dropped_and_journal_compacted(self):
+        first_day_logic = self._start_logic()
+        self.assertTrue(first_day_logic.register_for_examination("BN0001", "PK001", "Thông thường")[0])
+        self.clock.current_time = datetime.datetime(2025, 6, 2, 16, 0)
+        self.assertTrue(first_day_logic.register_for_examination("BN0002", "PK001", "Ưu tiên")[0])
+        first_day_logic.clinic_queue_journal.close()
+
+        self.clock.current_time = datetime.datetime(2025, 6, 3, 7, 30)
+        next_day_logic = self._start_logic()
+        self.assertEqual(len(next_day_logic.get_clinic_queue_items("PK001")), 0)
+        self.assertIsNone(next_day_logic.queued_patient_clinic_index.get_item("BN0001"))
+        with open(os.path.join(self.data_directory, QUEUE_JOURNAL_FILENAME), encoding="utf-8") as journal_file:
+            self.assertEqual(journal_file.read(), "")
+
+        self.assertTrue(next_day_logic.register_for_examination("BN0001", "PK001", "Thông thường")[0])
+        self.assertEqual(next_day_logic.get_clinic_queue_items("PK001").get(0).registration_time, datetime.datetime(2025, 6, 3, 7, 30))
+
+    def test_same_day_entries_are_restored(self):
+        first_run_logic = self._start_logic()
+        self.assertTrue(first_run_logic.register_for_examination("BN0001", "PK001", "Thông thường")[0])
+        first_run_logic.clinic_queue_journal.close()
+
+        self.clock.current_time = datetime.datetime(2025, 6, 2, 11, 0)
+        restarted_logic = self._start_logic()
+        restored_queue = restarted_logic.get_clinic_queue_items("PK001")
+        self.assertEqual(len(restored_queue), 1)
+        self.assertEqual(restored_queue.get(0).registration_time, datetime.datetime(2025, 6, 2, 9, 0))
+
+
+class JournalCompactionTest(unittest.TestCase):
+    def setUp(self):
+        self.data_directory = tempfile.mkdtemp()
+        self.journal_path = os.path.join(self.data_directory, QUEUE_JOURNAL_FILENAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_directory, ignore_errors=True)
+
+    def test_long_running_journal_is_compacted_and_replays_live_entries(self):
+        random_generator = random.Random(43); clinic_queue_journal = ClinicQueueJournal(self.journal_path)
+        self.addCleanup(clinic_queue_journal.close)
+        expected_entries_by_clinic = {}; registration_time = datetime.datetime(2025, 6, 2, 7, 0)
+        for operation_index in range(20000):
+            clinic_id_val = f"PK00{random_generator.randrange(1, 4)}"; patient_id_val = f"BN{random_generator.randrange(60):04d}"
+            clinic_entries = expected_entries_by_clinic.setdefault(clinic_id_val, {})
+            if random_generator.random() < 0.55:
+                queue_item = QueuedEntryState(patient_id_val, random_generator.randrange(1, 6), registration_time + datetime.timedelta(seconds=operation_index), random_generator.randrange(3))
+                clinic_queue_journal.record_queued(clinic_id_val, queue_item); clinic_entries[patient_id_val] = queue_item
+            elif random_generator.random() < 0.98: clinic_queue_journal.record_removed(clinic_id_val, patient_id_val); clinic_entries.pop(patient_id_val, None)
+            else: clinic_queue_journal.record_cleared(clinic_id_val); expected_entries_by_clinic.pop(clinic_id_val)
+        clinic_queue_journal.close()
+
+        live_entry_count = sum(len(clinic_entries) for clinic_entries in expected_entries_by_clinic.values())
+        self.assertGreater(clinic_queue_journal.compaction_count, 0)
+        self.assertEqual(clinic_queue_journal.live_entry_count, live_entry_count)
+        with open(self.journal_path, encoding="utf-8") as journal_file: journal_line_count = sum(1 for _journal_line in journal_file)
+        self.assertLessEqual(journal_line_count, max(JOURNAL_COMPACTION_MIN_RECORDS, JOURNAL_COMPACTION_RATIO * live_entry_count))
+
+        replayed_entries_by_clinic = ClinicQueueJournal(self.journal_path).replay()
+        for clinic_id_val in set(expected_entries_by_clinic) | set(replayed_entries_by_clinic):
+            expected_entries = expected_entries_by_clinic.get(clinic_id_val, {}); replayed_entries = replayed_entries_by_clinic.get(clinic_id_val, {})
+            self.assertEqual(set(replayed_entries), set(expected_entries), clinic_id_val)
+            for patient_id_val, entry_state in replayed_entries.items():
+                expected_state = expected_entries[patient_id_val]
+                self.assertEqual((entry_state.priority, entry_state.registration_time, entry_state.absent_count),
+                                 (expected_state.priority, expected_state.registration_time, expected_state.absent_count))
+
+
+if __name__ == "__main__":
+    unittest.main()
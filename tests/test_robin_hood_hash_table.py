@@ -0,0 +1,72 @@
+# tests/test_robin_hood_hash_table.py
+# RobinHoodHashTable: chuỗi thêm/cập nhật/xóa ngẫu nhiên (qua nhiều lần nhân đôi bảng, xóa bằng dịch lùi) phải cho
+# cùng nội dung với dict Python; khóa có mã băm trùng nhau vẫn tra được; duyệt báo RuntimeError khi thêm/xóa khóa.
+#   python -m unittest discover -s tests
+import os
+import random
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+from custom_structures import HashTable, RobinHoodHashTable, get_hash_table_class  # noqa: E402
+
+
+class CollidingKey:
+    # Khóa có mã băm cố định, để nhiều khóa cùng dò từ một vị trí gốc.
+    def __init__(self, key_name, hash_val): self.key_name = key_name; self.hash_val = hash_val
+    def __hash__(self): return self.hash_val
+    def __eq__(self, other): return isinstance(other, CollidingKey) and self.key_name == other.key_name
+
+
+class RobinHoodHashTableTest(unittest.TestCase):
+    def _assert_same_content(self, hash_table, reference_items):
+        self.assertEqual(len(hash_table), len(reference_items))
+        self.assertEqual(dict(hash_table.iter_items()), reference_items)
+
+    def test_random_operations_match_dict(self):
+        random_generator = random.Random(41)
+        for max_load_factor in (0.5, 0.85, 0.95):
+            hash_table = RobinHoodHashTable(initial_table_size=4, max_load_factor=max_load_factor); reference_items = {}
+            for _operation_index in range(6000):
+                key = f"BN{random_generator.randrange(1500):07d}"; operation_roll = random_generator.random()
+                if operation_roll < 0.55:
+                    new_value = random_generator.randrange(10 ** 6); hash_table.put_item(key, new_value); reference_items[key] = new_value
+                elif operation_roll < 0.8: self.assertEqual(hash_table.delete_item(key), reference_items.pop(key, None) is not None)
+                else:
+                    self.assertEqual(hash_table.get_item(key), reference_items.get(key))
+                    self.assertEqual(hash_table.contains_key(key), key in reference_items)
+            self._assert_same_content(hash_table, reference_items)
+            self.assertLessEqual(len(hash_table), hash_table.table_size * max_load_factor)
+            for key in list(reference_items): self.assertTrue(hash_table.delete_item(key))
+            self._assert_same_content(hash_table, {})
+            self.assertEqual(hash_table.max_probe_distance(), -1)
+
+    def test_colliding_keys_survive_backward_shift_delete(self):
+        random_generator = random.Random(410); hash_table = RobinHoodHashTable(initial_table_size=64); reference_items = {}
+        colliding_keys = [CollidingKey(f"K{key_index}", key_index % 3) for key_index in range(40)]
+        for key_index, colliding_key in enumerate(colliding_keys): hash_table.put_item(colliding_key, key_index); reference_items[colliding_key] = key_index
+        for colliding_key in random_generator.sample(colliding_keys, 25):
+            self.assertTrue(hash_table.delete_item(colliding_key)); del reference_items[colliding_key]
+            self.assertFalse(hash_table.delete_item(colliding_key))
+            for remaining_key, remaining_value in reference_items.items(): self.assertEqual(hash_table.get_item(remaining_key), remaining_value)
+        self._assert_same_content(hash_table, reference_items)
+
+    def test_iterators_fail_fast_on_structural_change(self):
+        hash_table = RobinHoodHashTable()
+        for key_index in range(20): hash_table.put_item(key_index, key_index)
+        for key, value in hash_table.iter_items(): hash_table.put_item(key, value * 2) # Chỉ cập nhật giá trị: được phép
+        self.assertEqual(sorted(hash_table.iter_values()), [key_index * 2 for key_index in range(20)])
+        table_iterator = hash_table.iter_keys(); next(table_iterator); hash_table.delete_item(5)
+        with self.assertRaises(RuntimeError): list(table_iterator)
+
+    def test_implementation_lookup(self):
+        self.assertIs(get_hash_table_class("chaining"), HashTable)
+        self.assertIs(get_hash_table_class("robin_hood"), RobinHoodHashTable)
+        with self.assertRaises(ValueError): get_hash_table_class("cuckoo")
+        with self.assertRaises(ValueError): RobinHoodHashTable(max_load_factor=1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+# tests/test_visit_statistics.py
+# Bộ đếm lượt khám theo ngày: kết quả theo khoảng ngày (đủ 2 đầu mút, 1 đầu mút, không giới hạn) phải khớp với
+# đếm thẳng trên danh sách lượt khám, kể cả sau khi bỏ lượt khám (xóa hồ sơ BN).
+#   python -m unittest discover -s tests
+import datetime
+import os
+import random
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+from visit_statistics import VisitStatistics  # noqa: E402
+
+FIRST_VISIT_DATE = datetime.date(2025, 1, 1)
+
+
+class VisitStatisticsRangeTest(unittest.TestCase):
+    def test_range_queries_match_direct_count(self):
+        random_generator = random.Random(36); visit_statistics = VisitStatistics(); recorded_visits = []
+        for _operation_index in range(3000):
+            if recorded_visits and random_generator.random() < 0.3:
+                removed_visit = recorded_visits.pop(random_generator.randrange(len(recorded_visits)))
+                self.assertTrue(visit_statistics.remove_visit(*removed_visit))
+            else:
+                new_visit = (FIRST_VISIT_DATE + datetime.timedelta(days=random_generator.randrange(120)), random_generator.choice(("PK001", "PK002", "")),
+                             random_generator.choice(("BS001", "BS002", "BS003", "")), random_generator.choice(("Khám tổng quát", "Tái khám")))
+                visit_statistics.record_visit(*new_visit); recorded_visits.append(new_visit)
+
+        for _query_index in range(200):
+            range_start = FIRST_VISIT_DATE + datetime.timedelta(days=random_generator.randrange(-10, 130))
+            from_date, to_date = random_generator.choice(((range_start, range_start + datetime.timedelta(days=random_generator.randrange(40))), (range_start, None), (None, range_start), (None, None)))
+            visits_in_range = [visit for visit in recorded_visits if (from_date is None or visit[0] >= from_date) and (to_date is None or visit[0] <= to_date)]
+            range_summary = visit_statistics.build_summary(from_date, to_date)
+            self.assertEqual(range_summary["total_visits"], len(visits_in_range))
+            daily_totals = list(range_summary["daily_totals"])
+            self.assertEqual([day_date for day_date, _day_total in daily_totals], sorted({visit[0] for visit in visits_in_range}))
+            self.assertEqual(visit_statistics.count_visits_for_clinic("PK001", from_date, to_date), sum(1 for visit in visits_in_range if visit[1] == "PK001"))
+            self.assertEqual(visit_statistics.count_visits_for_doctor("BS002", from_date, to_date), sum(1 for visit in visits_in_range if visit[2] == "BS002"))
+
+
+if __name__ == "__main__":
+    unittest.main()
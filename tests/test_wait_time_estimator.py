@@ -0,0 +1,73 @@
+# tests/test_wait_time_estimator.py
+# Ước lượng thời gian chờ: số BN phía trước khớp thứ tự gọi thật, thứ tự gọi giữ sẵn được cập nhật đúng sau mỗi thay đổi
+# hàng đợi, và lượt gọi chưa đóng không bị giữ mãi trong bộ ước lượng.
+#   python -m unittest discover -s tests
+import datetime
+import os
+import random
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+from custom_structures import CustomPriorityQueue  # noqa: E402
+from models import Patient, PatientInQueue  # noqa: E402
+from wait_time_estimator import ClinicServiceTimeEstimator  # noqa: E402
+
+PRIORITY_NAMES = list(PatientInQueue.PRIORITY_MAP)
+QUEUE_START_TIME = datetime.datetime(2025, 6, 2, 7, 0)
+
+
+def _make_queued_patient(random_generator, patient_index):
+    patient_profile = Patient(f"BN{patient_index:04d}", f"Bệnh nhân {patient_index}", "", "Nữ", "", "", "")
+    return PatientInQueue(patient_profile, random_generator.choice(PRIORITY_NAMES), QUEUE_START_TIME + datetime.timedelta(minutes=random_generator.randrange(240)))
+
+
+def _drain_patient_ids(clinic_queue):
+    drained_patient_ids = []
+    while not clinic_queue.is_empty(): drained_patient_ids.append(clinic_queue.remove_first_item().patient_id)
+    return drained_patient_ids
+
+
+class CallOrderMaintenanceTest(unittest.TestCase):
+    def test_call_order_and_patients_ahead_follow_queue_changes(self):
+        random_generator = random.Random(47)
+        for _round_index in range(60):
+            clinic_queue = CustomPriorityQueue(random_generator.choice((2, 4)), "ordering_key"); next_patient_index = 0
+            for _operation_index in range(120):
+                operation_roll = random_generator.random()
+                if operation_roll < 0.4: clinic_queue.add_item(_make_queued_patient(random_generator, next_patient_index)); next_patient_index += 1
+                elif operation_roll < 0.55: clinic_queue.remove_first_item()
+                elif operation_roll < 0.65 and next_patient_index: clinic_queue.remove_item(f"BN{random_generator.randrange(next_patient_index):04d}")
+                elif operation_roll < 0.8 and next_patient_index: clinic_queue.change_queued_patient_priority(f"BN{random_generator.randrange(next_patient_index):04d}", random_generator.choice(PRIORITY_NAMES), PatientInQueue)
+                elif operation_roll < 0.85: clinic_queue.update_long_waiter_priority(3600, PatientInQueue, current_time=QUEUE_START_TIME + datetime.timedelta(minutes=random_generator.randrange(60, 300)))
+                else:
+                    ordered_items = list(clinic_queue.get_items_in_priority_order())
+                    self.assertEqual([queued_item.ordering_key for queued_item in ordered_items], sorted((queued_item.ordering_key for queued_item in ordered_items), reverse=True))
+                    probe_key = PatientInQueue.ordering_key_for_new_registration(random_generator.choice(list(PatientInQueue.PRIORITY_MAP.values())), QUEUE_START_TIME + datetime.timedelta(minutes=random_generator.randrange(300)))
+                    self.assertEqual(clinic_queue.count_items_ahead_of(probe_key), sum(1 for queued_item in ordered_items if queued_item.ordering_key > probe_key))
+            expected_patient_ids = [queued_item.patient_id for queued_item in clinic_queue.get_items_in_priority_order()]
+            self.assertEqual(_drain_patient_ids(clinic_queue), expected_patient_ids)
+
+
+class CallsInProgressTest(unittest.TestCase):
+    def test_skipped_clinic_call_is_dropped_when_clinic_calls_next(self):
+        service_time_estimator = ClinicServiceTimeEstimator()
+        service_time_estimator.record_call("PK001", "BN0001", QUEUE_START_TIME, replaces_previous_clinic_call=True)
+        service_time_estimator.record_call("PK001", "BN0002", QUEUE_START_TIME + datetime.timedelta(minutes=5), replaces_previous_clinic_call=True)
+        self.assertIsNone(service_time_estimator.record_completion("BN0001", QUEUE_START_TIME + datetime.timedelta(minutes=20)))
+        self.assertEqual(service_time_estimator.record_completion("BN0002", QUEUE_START_TIME + datetime.timedelta(minutes=20)), ("PK001", 15 * 60))
+        self.assertEqual(len(service_time_estimator._calls_in_progress), 0)
+
+    def test_doctor_calls_in_same_clinic_are_kept(self):
+        service_time_estimator = ClinicServiceTimeEstimator()
+        service_time_estimator.record_call("PK001", "BN0001", QUEUE_START_TIME)
+        service_time_estimator.record_call("PK001", "BN0002", QUEUE_START_TIME)
+        self.assertEqual(len(service_time_estimator._calls_in_progress), 2)
+        service_time_estimator.discard_call("BN0001"); service_time_estimator.discard_call("BN0002")
+        self.assertEqual(len(service_time_estimator._calls_in_progress), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# visit_statistics.py
+# Thống kê lượt khám cập nhật tăng dần: đếm theo (ngày, PK), (ngày, BS), (ngày, loại khám).
+# Dựng một lần khi tải dữ liệu, sau đó mỗi lần khám xong chỉ tăng vài bộ đếm, nên báo cáo
+# không phải duyệt lại toàn bộ lịch sử khám như filter_examination_history.
+import bisect
+import datetime
+
+from custom_structures import HashTable, List
+
+
+class DayVisitCounters:
+    """Bộ đếm lượt khám của một ngày."""
+    def __init__(self, day_date):
+        self.day_date = day_date
+        self.total_visits = 0
+        self.visits_by_clinic = HashTable(initial_table_size=32) # clinic_id -> số lượt
+        self.visits_by_doctor = HashTable(initial_table_size=64) # doctor_id -> số lượt
+        self.visits_by_exam_type = HashTable(initial_table_size=16) # loại khám -> số lượt
+
+
+def _adjust_counter(counter_table, key, delta):
+    # Cộng delta vào bộ đếm; xóa khóa khi về 0 để bảng không phình.
+    new_count = (counter_table.get_item(key) or 0) + delta
+    if new_count > 0: counter_table.put_item(key, new_count)
+    else: counter_table.delete_item(key)
+
+
+def _add_table_into_py_dict(counter_table, target_py_dict):
+    for key, count in counter_table.iter_items(): target_py_dict[key] = target_py_dict.get(key, 0) + count
+
+
+def _sorted_count_pairs(counts_py_dict):
+    # List (khóa, số lượt) giảm dần theo số lượt, cùng số lượt thì theo khóa.
+    sorted_pairs_custom_list = List()
+    for key, count in sorted(counts_py_dict.items(), key=lambda pair: (-pair[1], pair[0])): sorted_pairs_custom_list.append((key, count))
+    return sorted_pairs_custom_list
+
+
+class VisitStatistics:
+    """Bộ đếm lượt khám theo ngày (key: datetime.date -> DayVisitCounters).
+
+    Không tự khóa: logic cập nhật khi giữ khóa ghi bảng BN và đọc khi giữ khóa đọc.
+    Lượt khám không có PK/BS vẫn được tính vào tổng và loại khám.
+    """
+    def __init__(self): self.clear()
+
+    def clear(self):
+        self._day_counters = HashTable(initial_table_size=512)
+        self._sorted_day_dates = [] # Các ngày có lượt khám, tăng dần (ngày mới thường nối đuôi), để duyệt theo khoảng ngày
+        self.total_visits = 0
+        self.visits_by_exam_type = HashTable(initial_table_size=16) # Tổng toàn thời gian theo loại khám
+
+    def _apply_visit(self, exam_date, clinic_id_val, doctor_id_val, exam_type, delta):
+        if not isinstance(exam_date, datetime.date): return False # Ngày lỗi trong CSV: bỏ qua như bộ lọc lịch sử
+        day_counters = self._day_counters.get_item(exam_date)
+        if day_counters is None:
+            if delta < 0: return False
+            day_counters = DayVisitCounters(exam_date); self._day_counters.put_item(exam_date, day_counters); bisect.insort(self._sorted_day_dates, exam_date)
+        exam_type_key = exam_type or ""
+        day_counters.total_visits += delta; self.total_visits += delta
+        _adjust_counter(day_counters.visits_by_exam_type, exam_type_key, delta)
+        _adjust_counter(self.visits_by_exam_type, exam_type_key, delta)
+        if clinic_id_val: _adjust_counter(day_counters.visits_by_clinic, clinic_id_val, delta)
+        if doctor_id_val: _adjust_counter(day_counters.visits_by_doctor, doctor_id_val, delta)
+        if day_counters.total_visits <= 0:
+            self._day_counters.delete_item(exam_date); del self._sorted_day_dates[bisect.bisect_left(self._sorted_day_dates, exam_date)]
+        return True
+
+    def record_visit(self, exam_date, clinic_id_val="", doctor_id_val="", exam_type=""):
+        # Ghi nhận một lượt khám; trả về False nếu ngày không hợp lệ.
+        return self._apply_visit(exam_date, clinic_id_val, doctor_id_val, exam_type, 1)
+
+    def remove_visit(self, exam_date, clinic_id_val="", doctor_id_val="", exam_type=""):
+        # Bỏ một lượt khám (ví dụ khi xóa hồ sơ BN).
+        return self._apply_visit(exam_date, clinic_id_val, doctor_id_val, exam_type, -1)
+
+    def record_history_item(self, history_item_dict, delta=1):
+        # Ghi nhận / bỏ một bản ghi trong Patient.examination_history.
+        return self._apply_visit(history_item_dict.get('ngay_kham'), history_item_dict.get('ma_phong_kham_kham', ''), history_item_dict.get('ma_bac_si_kham', ''), history_item_dict.get('loai_kham', ''), delta)
+
+    def rebuild_from_patients(self, patients_iterable):
+        # Dựng lại toàn bộ bộ đếm từ lịch sử khám (gọi khi tải dữ liệu).
+        self.clear()
+        for patient_obj in patients_iterable:
+            for history_item_dict in patient_obj.examination_history: self.record_history_item(history_item_dict)
+
+    def get_day_counters(self, day_date): return self._day_counters.get_item(day_date) # O(1), None nếu ngày không có lượt khám
+
+    def _iter_day_counters(self, from_date=None, to_date=None):
+        # Duyệt bộ đếm các ngày trong khoảng theo thứ tự ngày (đầu mút None: không giới hạn). Tìm nhị phân 2 đầu mút
+        # trên danh sách ngày đã sắp, nên chỉ đi qua các ngày có lượt khám trong khoảng (O(log D + số ngày)).
+        start_index = bisect.bisect_left(self._sorted_day_dates, from_date) if from_date else 0
+        end_index = bisect.bisect_right(self._sorted_day_dates, to_date) if to_date else len(self._sorted_day_dates)
+        for day_index in range(start_index, end_index): yield self._day_counters.get_item(self._sorted_day_dates[day_index])
+
+    def count_visits_for_clinic(self, clinic_id_val, from_date=None, to_date=None):
+        return sum(day_counters.visits_by_clinic.get_item(clinic_id_val) or 0 for day_counters in self._iter_day_counters(from_date, to_date))
+
+    def count_visits_for_doctor(self, doctor_id_val, from_date=None, to_date=None):
+        return sum(day_counters.visits_by_doctor.get_item(doctor_id_val) or 0 for day_counters in self._iter_day_counters(from_date, to_date))
+
+    def build_summary(self, from_date=None, to_date=None):
+        # Tổng hợp trong khoảng ngày: tổng lượt, theo PK, theo BS, theo loại khám, theo từng ngày.
+        if from_date is None and to_date is None:
+            exam_type_counts_py = {}; _add_table_into_py_dict(self.visits_by_exam_type, exam_type_counts_py) # Dùng luôn tổng toàn thời gian
+        else: exam_type_counts_py = None
+        clinic_counts_py = {}; doctor_counts_py = {}; range_exam_type_counts_py = {}
+        daily_totals_custom_list = List(); total_visits_in_range = 0
+        for day_counters in self._iter_day_counters(from_date, to_date):
+            total_visits_in_range += day_counters.total_visits
+            daily_totals_custom_list.append((day_counters.day_date, day_counters.total_visits))
+            _add_table_into_py_dict(day_counters.visits_by_clinic, clinic_counts_py)
+            _add_table_into_py_dict(day_counters.visits_by_doctor, doctor_counts_py)
+            if exam_type_counts_py is None: _add_table_into_py_dict(day_counters.visits_by_exam_type, range_exam_type_counts_py)
+        return {
+            "from_date": from_date, "to_date": to_date, "total_visits": total_visits_in_range,
+            "by_clinic": _sorted_count_pairs(clinic_counts_py), "by_doctor": _sorted_count_pairs(doctor_counts_py),
+            "by_exam_type": _sorted_count_pairs(exam_type_counts_py if exam_type_counts_py is not None else range_exam_type_counts_py),
+            "daily_totals": daily_totals_custom_list,
+        }
@@ -0,0 +1,82 @@
+# wait_time_estimator.py
+# Ước lượng thời gian chờ khám của từng PK.
+# Thời gian khám một BN = từ lúc gọi (call_next_patient_for_exam) đến lúc hoàn thành (complete_examination);
+# mỗi PK giữ trung bình trượt có trọng số mũ (EWMA) của thời gian này, cập nhật O(1) sau mỗi lượt khám.
+# Thời gian chờ dự kiến = số BN đứng trước * thời gian khám trung bình / số BS của PK; số BN đứng trước
+# lấy thẳng từ cấu trúc hàng đợi (count_items_ahead_of), không sắp xếp lại cả hàng đợi.
+import threading
+
+from custom_structures import HashTable
+
+DEFAULT_SERVICE_SECONDS = 10 * 60 # Giá trị ban đầu khi PK chưa có lượt khám nào được đo
+DEFAULT_SMOOTHING_FACTOR = 0.3 # Trọng số của lượt khám mới nhất trong EWMA
+MAX_SERVICE_SAMPLE_SECONDS = 4 * 3600 # Lượt dài hơn (quên bấm hoàn thành, ...) không đưa vào trung bình
+
+
+class ClinicServiceStats:
+    """Thời gian khám trung bình (EWMA, giây) và số lượt đã đo của một PK."""
+    __slots__ = ("average_service_seconds", "sample_count")
+
+    def __init__(self, average_service_seconds, sample_count=0):
+        self.average_service_seconds = average_service_seconds
+        self.sample_count = sample_count
+
+
+class ClinicServiceTimeEstimator:
+    """Đo thời gian khám theo PK và ước lượng thời gian chờ; an toàn khi nhiều luồng (khóa riêng, lấy sau cùng)."""
+    def __init__(self, smoothing_factor=DEFAULT_SMOOTHING_FACTOR, default_service_seconds=DEFAULT_SERVICE_SECONDS):
+        if not 0 < smoothing_factor <= 1: raise ValueError("Hệ số làm trơn EWMA phải trong (0, 1].")
+        self.smoothing_factor = smoothing_factor
+        self.default_service_seconds = default_service_seconds
+        self._lock = threading.Lock()
+        self._stats_by_clinic = HashTable(initial_table_size=32) # mã PK -> ClinicServiceStats
+        self._calls_in_progress = HashTable(initial_table_size=64) # mã BN -> (mã PK, thời điểm gọi)
+        self._clinic_call_by_clinic = HashTable(initial_table_size=32) # mã PK -> mã BN của lượt gọi chung gần nhất
+
+    def record_call(self, clinic_id_val, patient_id_val, call_time, replaces_previous_clinic_call=False):
+        # BN vừa được gọi vào khám tại PK. replaces_previous_clinic_call: lượt gọi chung của PK (không theo ô BS) -
+        # PK gọi BN kế tiếp nghĩa là BN gọi trước đó đã xong hoặc bị bỏ qua; lượt chưa đóng của BN đó bỏ đi để không tồn mãi.
+        with self._lock:
+            if replaces_previous_clinic_call:
+                previous_patient_id = self._clinic_call_by_clinic.get_item(clinic_id_val)
+                if previous_patient_id is not None and previous_patient_id != patient_id_val:
+                    previous_call_entry = self._calls_in_progress.get_item(previous_patient_id)
+                    if previous_call_entry is not None and previous_call_entry[0] == clinic_id_val: self._calls_in_progress.delete_item(previous_patient_id)
+                self._clinic_call_by_clinic.put_item(clinic_id_val, patient_id_val)
+            self._calls_in_progress.put_item(patient_id_val, (clinic_id_val, call_time))
+
+    def discard_call(self, patient_id_val):
+        # BN được gọi nhưng không khám (vắng mặt, bị xóa hồ sơ): bỏ lượt đang đo.
+        with self._lock: self._calls_in_progress.delete_item(patient_id_val)
+
+    def record_completion(self, patient_id_val, completion_time):
+        # BN khám xong: cập nhật EWMA của PK đã gọi BN. Trả về (mã PK, trung bình mới) hoặc None nếu không đo được.
+        with self._lock:
+            call_entry = self._calls_in_progress.get_item(patient_id_val)
+            if call_entry is None: return None
+            self._calls_in_progress.delete_item(patient_id_val)
+            clinic_id_val, call_time = call_entry
+            service_seconds = (completion_time - call_time).total_seconds()
+            if not 0 < service_seconds <= MAX_SERVICE_SAMPLE_SECONDS: return None
+            clinic_stats = self._stats_by_clinic.get_item(clinic_id_val)
+            if clinic_stats is None: clinic_stats = ClinicServiceStats(service_seconds); self._stats_by_clinic.put_item(clinic_id_val, clinic_stats)
+            else: clinic_stats.average_service_seconds += self.smoothing_factor * (service_seconds - clinic_stats.average_service_seconds)
+            clinic_stats.sample_count += 1
+            return clinic_id_val, clinic_stats.average_service_seconds
+
+    def remove_clinic(self, clinic_id_val):
+        with self._lock: self._stats_by_clinic.delete_item(clinic_id_val); self._clinic_call_by_clinic.delete_item(clinic_id_val)
+
+    def get_average_service_seconds(self, clinic_id_val):
+        with self._lock:
+            clinic_stats = self._stats_by_clinic.get_item(clinic_id_val)
+            return clinic_stats.average_service_seconds if clinic_stats else self.default_service_seconds
+
+    def get_sample_count(self, clinic_id_val):
+        with self._lock:
+            clinic_stats = self._stats_by_clinic.get_item(clinic_id_val)
+            return clinic_stats.sample_count if clinic_stats else 0
+
+    def estimate_wait_seconds(self, clinic_id_val, patients_ahead_count, doctor_count):
+        # Các BS của PK khám song song nên mỗi "lượt" trước BN tốn trung bình / số BS.
+        return patients_ahead_count * self.get_average_service_seconds(clinic_id_val) / max(1, doctor_count)